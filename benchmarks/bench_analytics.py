@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+跨会话统计基准测试
+
+用固定随机种子生成合成会话（每个会话 20 个思考步骤、约四分之一的步骤带工具调用，
+分布在多个模板和 90 天内），写入统计汇总表后测量：
+
+- 写入吞吐量：AnalyticsIndex.index_session 每秒计入的思考步骤数（会话写入时的额外开销）
+- 查询延迟：get_analytics 使用的 AnalyticsIndex.report 的 p50/p95（不过滤、按模板、按 7 天范围）
+- 对照：在内存中逐个遍历会话计算同样的统计（不含读取会话文件的耗时）
+
+默认规模为 10 万和 100 万个思考步骤。会话直接在内存中构造，不写入会话文件。
+
+使用方式：
+    # 默认（10 万和 100 万个思考步骤）
+    python benchmarks/bench_analytics.py
+
+    # 指定规模和查询次数，输出 JSON 结果
+    python benchmarks/bench_analytics.py --sizes 100000 --queries 50 --json analytics.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from deep_thinking.models.thinking_session import ThinkingSession  # noqa: E402
+from deep_thinking.models.thought import Thought  # noqa: E402
+from deep_thinking.models.tool_call import (  # noqa: E402
+    ToolCallData,
+    ToolCallRecord,
+    ToolResultData,
+)
+from deep_thinking.storage.analytics_index import AnalyticsIndex  # noqa: E402
+
+DEFAULT_SIZES = [100_000, 1_000_000]
+
+DEFAULT_SEED = 42
+
+# 每个会话的思考步骤数
+THOUGHTS_PER_SESSION = 20
+
+# 合成数据的时间范围（天）
+DAYS = 90
+
+TEMPLATES = ["", "problem_solving", "decision_making", "analysis"]
+PHASES = ["thinking", "tool_call", "analysis"]
+TOOLS = ["search", "fetch_url", "query_db", "run_tests", "read_file", "write_file"]
+STATUSES = ["active", "completed", "archived"]
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def build_session(index: int, rng: random.Random) -> ThinkingSession:
+    """生成一个会话（跳过模型验证，只构造统计用到的字段）"""
+    created = START + timedelta(days=rng.randrange(DAYS), seconds=rng.randrange(86400))
+    thoughts = [
+        Thought.model_construct(
+            thought_number=n,
+            content="x" * rng.randint(50, 2000),
+            phase=rng.choice(PHASES),
+            timestamp=created + timedelta(minutes=n),
+        )
+        for n in range(1, THOUGHTS_PER_SESSION + 1)
+    ]
+    records = []
+    for thought in thoughts:
+        if rng.random() >= 0.25:
+            continue
+        status = "failed" if rng.random() < 0.1 else "completed"
+        call = ToolCallData.model_construct(
+            call_id=f"{index}-{thought.thought_number}",
+            tool_name=rng.choice(TOOLS),
+            timestamp=thought.timestamp,
+        )
+        result = ToolResultData.model_construct(
+            call_id=call.call_id,
+            success=status == "completed",
+            execution_time_ms=rng.uniform(1, 500),
+            from_cache=rng.random() < 0.2,
+        )
+        records.append(
+            ToolCallRecord.model_construct(
+                thought_number=thought.thought_number,
+                call_data=call,
+                result_data=result,
+                status=status,
+            )
+        )
+    return ThinkingSession.model_construct(
+        session_id=f"bench-{index}",
+        created_at=created,
+        status=rng.choice(STATUSES),
+        metadata={"template_id": rng.choice(TEMPLATES)},
+        thoughts=thoughts,
+        tool_call_history=records,
+    )
+
+
+def scan_sessions(sessions: list[ThinkingSession], max_thoughts: int) -> dict:
+    """对照：逐个遍历会话计算概览、阶段分布和各工具的失败次数"""
+    phases: Counter[str] = Counter()
+    failures: Counter[str] = Counter()
+    at_limit = thoughts = chars = 0
+    for session in sessions:
+        at_limit += len(session.thoughts) >= max_thoughts
+        for thought in session.thoughts:
+            thoughts += 1
+            chars += len(thought.content)
+            phases[thought.phase] += 1
+        for record in session.tool_call_history:
+            failures[record.call_data.tool_name] += record.status == "failed"
+    return {
+        "at_limit": at_limit,
+        "thoughts": thoughts,
+        "chars": chars,
+        "phases": phases,
+        "failures": failures,
+    }
+
+
+def percentile_ms(samples: list[float], pct: float) -> float:
+    """百分位耗时（毫秒）"""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index] * 1000, 3)
+
+
+def bench_size(size: int, args: argparse.Namespace, data_dir: Path) -> list[dict]:
+    """写入 size 个思考步骤后测量各查询的延迟"""
+    rng = random.Random(args.seed)
+    sessions = [build_session(i, rng) for i in range(max(size // THOUGHTS_PER_SESSION, 1))]
+    thoughts = sum(len(session.thoughts) for session in sessions)
+
+    index = AnalyticsIndex(data_dir / f"analytics-{size}" / "rollups.db")
+    started = time.perf_counter()
+    for session in sessions:
+        index.index_session(session)
+    index.mark_built(True)
+    ingest_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    expected = scan_sessions(sessions, THOUGHTS_PER_SESSION)
+    scan_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    week_end = (START + timedelta(days=DAYS // 2)).date()
+    queries: dict[str, dict] = {
+        "all": {},
+        "template": {"template_id": "analysis"},
+        "range7d": {"since": week_end - timedelta(days=6), "until": week_end},
+    }
+    results = []
+    for name, filters in queries.items():
+        samples = []
+        for _ in range(args.queries):
+            started = time.perf_counter()
+            report = index.report(THOUGHTS_PER_SESSION, **filters)
+            samples.append(time.perf_counter() - started)
+        if name == "all":
+            # 汇总结果应与逐个遍历会话的结果一致
+            assert report.thoughts == expected["thoughts"]
+            assert report.chars == expected["chars"]
+            assert report.max_thoughts_sessions == expected["at_limit"]
+            assert report.phases == dict(expected["phases"])
+            assert {t.tool_name: t.failures for t in report.tools} == dict(expected["failures"])
+        results.append(
+            {
+                "name": f"analytics[{name},{thoughts}]",
+                "thoughts": thoughts,
+                "sessions": len(sessions),
+                "ingest_thoughts_per_second": round(thoughts / ingest_seconds),
+                "query_p50_ms": percentile_ms(samples, 50),
+                "query_p95_ms": percentile_ms(samples, 95),
+                "scan_ms": scan_ms,
+            }
+        )
+    index.close()
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="跨会话统计基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="思考步骤总数")
+    parser.add_argument("--queries", type=int, default=20, help="每个查询的重复次数")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="合成数据的随机种子")
+    parser.add_argument("--json", type=str, default=None, help="JSON 结果输出路径")
+    args = parser.parse_args()
+    args.queries = max(args.queries, 1)
+
+    logging.getLogger("deep_thinking").setLevel(logging.WARNING)
+
+    results: list[dict] = []
+    with tempfile.TemporaryDirectory(prefix="bench_analytics_") as temp_dir:
+        for size in args.sizes:
+            results.extend(bench_size(size, args, Path(temp_dir)))
+
+    print(f"{'用例':<32} {'写入(步骤/秒)':>14} {'p50(ms)':>9} {'p95(ms)':>9} {'遍历对照(ms)':>13}")
+    for result in results:
+        print(
+            f"{result['name']:<32} {result['ingest_thoughts_per_second']:>14} "
+            f"{result['query_p50_ms']:>9} {result['query_p95_ms']:>9} {result['scan_ms']:>13}"
+        )
+
+    if args.json:
+        output = {
+            "benchmark": "analytics",
+            "seed": args.seed,
+            "queries": args.queries,
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+            },
+            "results": results,
+        }
+        Path(args.json).write_text(json.dumps(output, ensure_ascii=False, indent=2), "utf-8")
+        print(f"\n结果已写入: {args.json}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
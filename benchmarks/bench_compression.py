@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+会话文件压缩基准测试
+
+用固定随机种子生成接近真实内容的会话（思考内容长度 200-10000 字符、
+约三分之一的步骤带 JSON 格式的工具结果），对每种可用的压缩格式测量：
+
+- 压缩率：未压缩文件大小 / 压缩后文件大小
+- 写入耗时：JsonFileStore.write 的耗时（含序列化、压缩和 fsync）
+- 读取耗时：StorageManager.get_session 的耗时（含解压、JSON 解析和模型验证），
+  以及相对未压缩文件的读取延迟增加
+
+功能：
+- 自动检测可用的压缩格式（zstd 需要安装 zstandard，否则只测量 gzip）
+- 支持输出 JSON 结果
+
+使用方式：
+    # 默认（10/100/1000 个步骤）
+    python benchmarks/bench_compression.py
+
+    # 指定规模和重复次数，输出 JSON 结果
+    python benchmarks/bench_compression.py --sizes 100 1000 --repeat 10 --json compression.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from deep_thinking.models.thinking_session import ThinkingSession  # noqa: E402
+from deep_thinking.models.thought import Thought  # noqa: E402
+from deep_thinking.models.tool_call import (  # noqa: E402
+    ToolCallData,
+    ToolCallRecord,
+    ToolResultData,
+)
+from deep_thinking.storage.json_file_store import COMPRESSION_CODECS  # noqa: E402
+from deep_thinking.storage.storage_manager import StorageManager  # noqa: E402
+
+DEFAULT_SIZES = [10, 100, 1000]
+
+DEFAULT_SEED = 42
+
+# 思考内容的词汇（中英文混合，模拟真实的分析文本）
+WORDS = [
+    "分析",
+    "假设",
+    "验证",
+    "结论",
+    "数据",
+    "方案",
+    "风险",
+    "性能",
+    "接口",
+    "依赖",
+    "边界条件",
+    "回归",
+    "latency",
+    "throughput",
+    "cache",
+    "index",
+    "request",
+    "timeout",
+    "retry",
+    "p95",
+    "因此",
+    "但是",
+    "如果",
+    "需要",
+    "考虑",
+    "比较",
+]
+
+TOOL_NAMES = ["search", "read_file", "run_tests", "fetch_url"]
+
+
+def build_text(rng: random.Random, length: int) -> str:
+    """生成约 length 个字符的文本"""
+    parts: list[str] = []
+    total = 0
+    while total < length:
+        word = rng.choice(WORDS)
+        if rng.random() < 0.15:
+            word += f" {rng.randint(0, 99999)}"
+        if rng.random() < 0.1:
+            word += "。"
+        parts.append(word)
+        total += len(word) + 1
+    return " ".join(parts)[:length]
+
+
+def build_session(rng: random.Random, size: int, session_id: str) -> ThinkingSession:
+    """生成包含 size 个思考步骤的会话（同一种子生成相同内容）"""
+    session = ThinkingSession(session_id=session_id, name=f"压缩基准会话 {size}")
+
+    for number in range(1, size + 1):
+        record_ids = []
+        if rng.random() < 0.35:
+            payload = {
+                "items": [
+                    {
+                        "id": rng.randint(1, 10**6),
+                        "score": round(rng.random(), 4),
+                        "title": build_text(rng, rng.randint(20, 80)),
+                    }
+                    for _ in range(rng.randint(1, 20))
+                ],
+                "elapsed_ms": round(rng.uniform(1, 500), 2),
+            }
+            record = ToolCallRecord(
+                thought_number=number,
+                call_data=ToolCallData(
+                    tool_name=rng.choice(TOOL_NAMES),
+                    arguments={"query": build_text(rng, 30), "limit": rng.randint(1, 50)},
+                ),
+                result_data=ToolResultData(
+                    call_id=f"call-{number}",
+                    success=True,
+                    result=payload,
+                    execution_time_ms=payload["elapsed_ms"],
+                ),
+                status="completed",
+            )
+            session.add_tool_call_record(record)
+            record_ids.append(record.record_id)
+
+        content = build_text(rng, int(min(9800, rng.lognormvariate(7, 0.8))) + 200)
+        session.add_thought(Thought(thought_number=number, content=content, tool_calls=record_ids))
+
+    session.update_statistics()
+    return session
+
+
+def time_calls(func: Callable[[], Any], repeat: int) -> list[float]:
+    """预热一次后重复调用，返回每次的耗时（秒）"""
+    func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def median_ms(samples: list[float]) -> float:
+    """中位数耗时（毫秒）"""
+    return round(statistics.median(samples) * 1000, 3)
+
+
+def bench_size(size: int, args: argparse.Namespace, data_dir: Path) -> list[dict]:
+    """测量 size 个步骤的会话在各压缩格式下的大小和读写耗时"""
+    session = build_session(random.Random(args.seed), size, f"bench-{size}")
+    results: list[dict] = []
+    baseline_read = 0.0
+    raw_size = 0
+
+    for codec in ["none", *args.codecs]:
+        manager = StorageManager(data_dir / f"{codec}-{size}", compress_threshold=0)
+        if codec != "none":
+            manager.store.compression = codec
+        compress = codec != "none"
+
+        manager.create_sessions([session])
+        data = manager.store.read(session.session_id)
+        assert data is not None
+        write_samples = time_calls(
+            lambda manager=manager, data=data, compress=compress: manager.store.write(
+                session.session_id, data, compress=compress
+            ),
+            args.repeat,
+        )
+        file_size = manager.store._get_file_path(session.session_id).stat().st_size
+        read_samples = time_calls(
+            lambda manager=manager: manager.get_session(session.session_id), args.repeat
+        )
+
+        read_ms = median_ms(read_samples)
+        if codec == "none":
+            baseline_read = read_ms
+            raw_size = file_size
+        results.append(
+            {
+                "name": f"compression[{codec},{size}]",
+                "codec": codec,
+                "size": size,
+                "bytes": file_size,
+                "ratio": round(raw_size / file_size, 2),
+                "write_median_ms": median_ms(write_samples),
+                "read_median_ms": read_ms,
+                "read_penalty_ms": round(read_ms - baseline_read, 3),
+                "read_penalty": round(read_ms / baseline_read - 1, 3) if baseline_read else 0.0,
+            }
+        )
+
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="会话文件压缩基准测试")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="会话思考步骤数"
+    )
+    parser.add_argument(
+        "--codecs",
+        type=str,
+        nargs="+",
+        default=list(COMPRESSION_CODECS),
+        choices=COMPRESSION_CODECS,
+        help="测量的压缩格式（默认全部可用格式）",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="每个用例的重复次数")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="合成会话的随机种子")
+    parser.add_argument("--json", type=str, default=None, help="JSON 结果输出路径")
+    args = parser.parse_args()
+    args.repeat = max(args.repeat, 1)
+    # 创建会话的 INFO 日志会干扰计时和输出
+    logging.getLogger("deep_thinking").setLevel(logging.WARNING)
+
+    results: list[dict] = []
+    with tempfile.TemporaryDirectory(prefix="bench_compression_") as temp_dir:
+        for size in args.sizes:
+            results.extend(bench_size(size, args, Path(temp_dir)))
+
+    print(
+        f"{'用例':<28} {'大小(KB)':>10} {'压缩率':>8} {'写入(ms)':>10} "
+        f"{'读取(ms)':>10} {'读取增加':>10}"
+    )
+    for result in results:
+        print(
+            f"{result['name']:<28} {result['bytes'] / 1024:>10.1f} {result['ratio']:>8} "
+            f"{result['write_median_ms']:>10} {result['read_median_ms']:>10} "
+            f"{result['read_penalty']:>+10.1%}"
+        )
+
+    if args.json:
+        output = {
+            "benchmark": "compression",
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+            },
+            "results": results,
+        }
+        Path(args.json).write_text(json.dumps(output, ensure_ascii=False, indent=2), "utf-8")
+        print(f"\n结果已写入: {args.json}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+HTML 导出吞吐量基准测试
+
+构造包含指定数量思考步骤的会话，测量 SessionFormatter.to_html 的吞吐量（思考步骤/秒）。
+
+功能：
+- 覆盖常规、修订、分支步骤和工具调用
+- 分别测量内联样式表和外部样式表模式
+- 支持输出 JSON 结果，便于与历史结果对比
+
+使用方式：
+    # 默认规模（10/100/1000 步骤）
+    python benchmarks/bench_html_export.py
+
+    # 指定规模和重复次数
+    python benchmarks/bench_html_export.py --sizes 100 10000 --repeat 3
+
+    # 输出 JSON 结果
+    python benchmarks/bench_html_export.py --json results.json
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+from deep_thinking.models.thinking_session import ThinkingSession  # noqa: E402
+from deep_thinking.models.thought import Thought  # noqa: E402
+from deep_thinking.models.tool_call import ToolCallData, ToolCallRecord  # noqa: E402
+from deep_thinking.utils.formatters import SessionFormatter  # noqa: E402
+from deep_thinking.utils.html_template import HTML_STYLESHEET_NAME  # noqa: E402
+
+DEFAULT_SIZES = [10, 100, 1000]
+
+
+def build_session(size: int) -> ThinkingSession:
+    """构造包含 size 个思考步骤的会话"""
+    session = ThinkingSession(session_id=f"bench-{size}", name=f"基准会话 {size}")
+
+    for number in range(1, size + 1):
+        content = f"第 {number} 步：分析 <输入> 并比较方案 A & B。" * 4
+        if number % 10 == 0:
+            thought = Thought(
+                thought_number=number,
+                content=content,
+                type="revision",
+                is_revision=True,
+                revises_thought=number - 1,
+            )
+        elif number % 15 == 0:
+            thought = Thought(
+                thought_number=number,
+                content=content,
+                type="branch",
+                branch_from_thought=number - 1,
+                branch_id=f"branch-{number}",
+            )
+        elif number % 5 == 0:
+            record_id = f"rec-{number}"
+            session.tool_call_history.append(
+                ToolCallRecord(
+                    record_id=record_id,
+                    thought_number=number,
+                    call_data=ToolCallData(tool_name="search", arguments={"q": "x"}),
+                    status="completed",
+                )
+            )
+            thought = Thought(thought_number=number, content=content, tool_calls=[record_id])
+        else:
+            thought = Thought(thought_number=number, content=content, phase="analysis")
+        session.add_thought(thought)
+
+    return session
+
+
+def measure(session: ThinkingSession, css_href: str | None, repeat: int) -> dict:
+    """测量渲染耗时（取最快的一次）"""
+    best = float("inf")
+    size = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        html = SessionFormatter.to_html(session, css_href=css_href)
+        best = min(best, time.perf_counter() - start)
+        size = len(html.encode("utf-8"))
+
+    count = len(session.thoughts)
+    return {
+        "thoughts": count,
+        "seconds": round(best, 6),
+        "thoughts_per_sec": round(count / best, 1) if best > 0 else None,
+        "bytes": size,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="HTML 导出吞吐量基准测试")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="会话思考步骤数"
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="每个规模的重复次数")
+    parser.add_argument("--json", type=str, default=None, help="JSON 结果输出路径")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'步骤数':>8} {'模式':>8} {'耗时(s)':>10} {'步骤/秒':>12} {'字节':>10}")
+    for size in args.sizes:
+        session = build_session(size)
+        for mode, css_href in (("inline", None), ("external", HTML_STYLESHEET_NAME)):
+            result = {"mode": mode, **measure(session, css_href, max(args.repeat, 1))}
+            results.append(result)
+            print(
+                f"{result['thoughts']:>8} {mode:>8} {result['seconds']:>10.4f} "
+                f"{result['thoughts_per_sec']:>12} {result['bytes']:>10}"
+            )
+
+    if args.json:
+        output = {"benchmark": "html_export", "results": results}
+        Path(args.json).write_text(json.dumps(output, ensure_ascii=False, indent=2), "utf-8")
+        print(f"\n结果已写入: {args.json}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+HTTP传输首字节时间（TTFB）基准测试
+
+在子进程中启动 HTTP 模式的服务器，通过导出端点下载大会话，
+测量首字节时间和完整下载耗时，并与完整渲染耗时（缓冲式响应的首字节下限）对比。
+
+功能：
+- 覆盖不同会话规模和导出格式
+- 分别测量不压缩和 gzip 压缩
+- 以首字节时间中位数作为目标，超出 --target-ms 时返回非零退出码
+- 支持输出 JSON 结果
+
+使用方式：
+    # 默认规模（100/1000/5000 步骤，HTML 格式）
+    python benchmarks/bench_http_ttfb.py
+
+    # 指定规模、格式和重复次数
+    python benchmarks/bench_http_ttfb.py --sizes 1000 10000 --formats html markdown --repeat 5
+
+    # 指定首字节时间目标并输出 JSON 结果
+    python benchmarks/bench_http_ttfb.py --target-ms 150 --json results.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import aiohttp
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from deep_thinking.models.thought import Thought  # noqa: E402
+from deep_thinking.storage.storage_manager import StorageManager  # noqa: E402
+from deep_thinking.utils.formatters import render_session  # noqa: E402
+
+DEFAULT_SIZES = [100, 1000, 5000]
+
+DEFAULT_TARGET_MS = 200.0
+
+
+def find_free_port() -> int:
+    """获取一个空闲端口"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+def create_session(manager: StorageManager, size: int) -> str:
+    """创建包含 size 个思考步骤的会话，返回会话ID"""
+    session = manager.create_session(name=f"基准会话 {size}")
+    for number in range(1, size + 1):
+        content = f"第 {number} 步：分析 <输入> 并比较方案 A & B。" * 4
+        session.add_thought(Thought(thought_number=number, content=content, phase="analysis"))
+    manager.update_session(session)
+    return session.session_id
+
+
+def buffered_render_ms(manager: StorageManager, session_id: str, format_type: str) -> float:
+    """完整加载并渲染会话的耗时（缓冲式响应在此之后才能发送首字节）"""
+    start = time.perf_counter()
+    session = manager.get_session(session_id)
+    assert session is not None
+    render_session(session, format_type)
+    return (time.perf_counter() - start) * 1000
+
+
+async def wait_until_healthy(base_url: str, timeout: float = 30.0) -> None:
+    """等待服务器健康检查通过"""
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as http:
+        while time.monotonic() < deadline:
+            with contextlib.suppress(aiohttp.ClientError):
+                async with http.get(f"{base_url}/health") as response:
+                    if response.status == 200:
+                        return
+            await asyncio.sleep(0.1)
+    raise RuntimeError("服务器启动超时")
+
+
+async def download(
+    http: aiohttp.ClientSession, url: str, encoding: str
+) -> tuple[float, float, int]:
+    """下载一次，返回（首字节毫秒，总毫秒，传输字节数）"""
+    start = time.perf_counter()
+    async with http.get(
+        url, headers={"Accept-Encoding": encoding}, auto_decompress=False
+    ) as response:
+        response.raise_for_status()
+        first = await response.content.readany()
+        ttfb = time.perf_counter() - start
+        size = len(first)
+        async for chunk in response.content.iter_any():
+            size += len(chunk)
+    total = time.perf_counter() - start
+    return ttfb * 1000, total * 1000, size
+
+
+async def measure(
+    base_url: str, session_id: str, format_type: str, encoding: str, repeat: int
+) -> dict:
+    """测量一个会话、格式和压缩方式的组合（取中位数）"""
+    url = f"{base_url}/sessions/{session_id}/export?format={format_type}"
+    ttfbs, totals = [], []
+    size = 0
+    async with aiohttp.ClientSession() as http:
+        # 预热一次，建立 keep-alive 连接
+        await download(http, url, encoding)
+        for _ in range(repeat):
+            ttfb, total, size = await download(http, url, encoding)
+            ttfbs.append(ttfb)
+            totals.append(total)
+
+    return {
+        "encoding": encoding,
+        "ttfb_ms": round(statistics.median(ttfbs), 2),
+        "total_ms": round(statistics.median(totals), 2),
+        "wire_bytes": size,
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> list[dict]:
+    """准备会话数据，启动服务器子进程并依次测量"""
+    port = args.port or find_free_port()
+    base_url = f"http://127.0.0.1:{port}"
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        manager = StorageManager(data_dir)
+        sessions = {size: create_session(manager, size) for size in args.sizes}
+
+        env = {
+            **os.environ,
+            "DEEP_THINKING_DATA_DIR": data_dir,
+            "PYTHONPATH": str(PROJECT_ROOT / "src"),
+        }
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "deep_thinking",
+                "--transport",
+                "http",
+                "--host",
+                "127.0.0.1",
+                "--port",
+                str(port),
+                "--log-level",
+                "WARNING",
+            ],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            await wait_until_healthy(base_url)
+            results = []
+            for size, session_id in sessions.items():
+                for format_type in args.formats:
+                    render_ms = buffered_render_ms(manager, session_id, format_type)
+                    for encoding in ("identity", "gzip"):
+                        result = await measure(
+                            base_url, session_id, format_type, encoding, max(args.repeat, 1)
+                        )
+                        results.append(
+                            {
+                                "thoughts": size,
+                                "format": format_type,
+                                "buffered_render_ms": round(render_ms, 2),
+                                **result,
+                            }
+                        )
+            return results
+        finally:
+            server.terminate()
+            with contextlib.suppress(subprocess.TimeoutExpired):
+                server.wait(timeout=10)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="HTTP传输首字节时间基准测试")
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="会话思考步骤数"
+    )
+    parser.add_argument(
+        "--formats",
+        type=str,
+        nargs="+",
+        default=["html"],
+        choices=["json", "markdown", "html", "text"],
+        help="导出格式",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="每个组合的重复次数")
+    parser.add_argument(
+        "--target-ms", type=float, default=DEFAULT_TARGET_MS, help="首字节时间中位数目标（毫秒）"
+    )
+    parser.add_argument("--port", type=int, default=0, help="服务器端口（默认随机）")
+    parser.add_argument("--json", type=str, default=None, help="JSON 结果输出路径")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args))
+
+    print(
+        f"{'步骤数':>8} {'格式':>9} {'压缩':>9} {'首字节(ms)':>11} {'总耗时(ms)':>11} "
+        f"{'完整渲染(ms)':>12} {'传输字节':>10}"
+    )
+    for result in results:
+        print(
+            f"{result['thoughts']:>8} {result['format']:>9} {result['encoding']:>9} "
+            f"{result['ttfb_ms']:>11} {result['total_ms']:>11} "
+            f"{result['buffered_render_ms']:>12} {result['wire_bytes']:>10}"
+        )
+
+    over_target = [r for r in results if r["ttfb_ms"] > args.target_ms]
+    if over_target:
+        print(f"\n{len(over_target)} 项首字节时间超出目标 {args.target_ms} ms")
+
+    if args.json:
+        output = {"benchmark": "http_ttfb", "target_ms": args.target_ms, "results": results}
+        Path(args.json).write_text(json.dumps(output, ensure_ascii=False, indent=2), "utf-8")
+        print(f"\n结果已写入: {args.json}")
+
+    return 1 if over_target else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+事件循环延迟基准测试
+
+在同一事件循环中并发执行多个大会话的导出和可视化，同时用 LoopLagProbe
+测量事件循环的调度延迟，对比三种执行方式：
+
+- inline: 不使用执行器，渲染直接在事件循环中执行（此前的行为）
+- thread: 渲染在线程池中执行（DEEP_THINKING_RENDER_WORKERS=0）
+- process: 渲染在进程池中执行（默认）
+
+功能：
+- 报告总耗时、最大延迟和 p99 延迟
+- process 模式最大延迟超出 --target-ms 时返回非零退出码
+- 支持输出 JSON 结果
+
+使用方式：
+    # 默认（2000 步骤，8 个并发请求）
+    python benchmarks/bench_loop_lag.py
+
+    # 指定规模、并发数和渲染进程数
+    python benchmarks/bench_loop_lag.py --size 5000 --concurrency 16 --render-workers 4
+
+    # 输出 JSON 结果
+    python benchmarks/bench_loop_lag.py --json results.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from deep_thinking import server  # noqa: E402
+from deep_thinking.models.thought import Thought  # noqa: E402
+from deep_thinking.tools import export, visualization  # noqa: E402
+from deep_thinking.utils.executor import LoopLagProbe, TaskExecutor  # noqa: E402
+
+MODES = ["inline", "thread", "process"]
+
+DEFAULT_TARGET_MS = 150.0
+
+
+def create_session(size: int) -> str:
+    """创建包含 size 个思考步骤的会话，返回会话ID"""
+    manager = server.get_storage_manager()
+    session = manager.create_session(name=f"基准会话 {size}")
+    for number in range(1, size + 1):
+        content = f"第 {number} 步：分析 <输入> 并比较方案 A & B。" * 4
+        session.add_thought(Thought(thought_number=number, content=content, phase="analysis"))
+    manager.update_session(session)
+    return session.session_id
+
+
+async def run_requests(session_id: str, concurrency: int, output_dir: Path) -> None:
+    """并发执行导出和可视化请求（交替）"""
+    requests = []
+    for index in range(concurrency):
+        if index % 2 == 0:
+            output = str(output_dir / f"export_{index}.html")
+            requests.append(export.export_session(session_id, "html", output))
+        else:
+            requests.append(visualization.visualize_session(session_id, "mermaid"))
+    await asyncio.gather(*requests)
+
+
+async def measure(mode: str, session_id: str, args: argparse.Namespace, output_dir: Path) -> dict:
+    """测量一种执行方式"""
+    executor = None
+    if mode != "inline":
+        workers = args.render_workers if mode == "process" else 0
+        executor = TaskExecutor(render_workers=workers, render_timeout=0)
+    # 工具通过 get_task_executor() 读取该全局实例
+    server._task_executor = executor
+
+    try:
+        # 预热（进程池启动、导入渲染模块）
+        await run_requests(session_id, 2, output_dir)
+
+        async with LoopLagProbe(interval=0.005) as probe:
+            start = time.perf_counter()
+            await run_requests(session_id, args.concurrency, output_dir)
+            elapsed = time.perf_counter() - start
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return {
+        "mode": mode,
+        "seconds": round(elapsed, 3),
+        "max_lag_ms": round(probe.max_lag * 1000, 2),
+        "p99_lag_ms": round(probe.percentile(99) * 1000, 2),
+        "samples": len(probe.samples),
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> list[dict]:
+    """在临时数据目录中准备会话并依次测量"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        os.environ["DEEP_THINKING_DATA_DIR"] = data_dir
+        os.environ["DEEP_THINKING_RENDER_CACHE_SIZE"] = "0"
+
+        async with server.server_lifespan(server.app):
+            session_id = create_session(args.size)
+            output_dir = Path(data_dir) / "exports"
+            return [await measure(mode, session_id, args, output_dir) for mode in args.modes]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="事件循环延迟基准测试")
+    parser.add_argument("--size", type=int, default=2000, help="会话思考步骤数")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发请求数")
+    parser.add_argument(
+        "--modes", type=str, nargs="+", default=MODES, choices=MODES, help="执行方式"
+    )
+    parser.add_argument("--render-workers", type=int, default=2, help="process 模式的渲染进程数")
+    parser.add_argument(
+        "--target-ms",
+        type=float,
+        default=DEFAULT_TARGET_MS,
+        help="process 模式最大延迟目标（毫秒）",
+    )
+    parser.add_argument("--json", type=str, default=None, help="JSON 结果输出路径")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args))
+
+    print(f"{'方式':>8} {'总耗时(s)':>10} {'最大延迟(ms)':>13} {'p99延迟(ms)':>12} {'采样数':>8}")
+    for result in results:
+        print(
+            f"{result['mode']:>8} {result['seconds']:>10} {result['max_lag_ms']:>13} "
+            f"{result['p99_lag_ms']:>12} {result['samples']:>8}"
+        )
+
+    over_target = [
+        r for r in results if r["mode"] == "process" and r["max_lag_ms"] > args.target_ms
+    ]
+    if over_target:
+        print(f"\nprocess 模式最大延迟超出目标 {args.target_ms} ms")
+
+    if args.json:
+        output = {"benchmark": "loop_lag", "target_ms": args.target_ms, "results": results}
+        Path(args.json).write_text(json.dumps(output, ensure_ascii=False, indent=2), "utf-8")
+        print(f"\n结果已写入: {args.json}")
+
+    return 1 if over_target else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+相似思考检索基准测试
+
+在 10 万和 100 万个思考步骤的索引上测量 find_similar_thoughts 的查询延迟：
+
+- 单个查询：每次查询一个文本的延迟（p50/p95）
+- 批量查询：一次矩阵乘法处理多个查询，按查询数平均的延迟
+- 向量化吞吐量：每秒向量化的思考步骤数（决定增量索引的开销）
+
+索引行由固定随机种子生成的合成思考内容向量化后加入扰动得到（查询延迟只取决于行数和维度，
+与向量内容无关），通过 SimilarityIndex.add_vectors 批量写入后内存映射查询。
+
+需要安装 numpy（pip install "DeepThinking[similarity]"）。
+
+使用方式：
+    # 默认（10 万和 100 万行）
+    python benchmarks/bench_similarity.py
+
+    # 指定规模、维度和批量大小，输出 JSON 结果
+    python benchmarks/bench_similarity.py --sizes 100000 --dim 512 --batch 64 --json similarity.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from deep_thinking.storage.similarity_index import (  # noqa: E402
+    DEFAULT_SIMILARITY_DIM,
+    SIMILARITY_AVAILABLE,
+    SimilarityIndex,
+    vectorize,
+)
+
+DEFAULT_SIZES = [100_000, 1_000_000]
+
+DEFAULT_SEED = 42
+
+# 合成思考内容的词汇（中英文混合）
+WORDS = [
+    "分析",
+    "假设",
+    "验证",
+    "结论",
+    "数据",
+    "方案",
+    "风险",
+    "性能",
+    "接口",
+    "依赖",
+    "边界条件",
+    "连接池",
+    "缓存命中率",
+    "latency",
+    "throughput",
+    "cache",
+    "index",
+    "request",
+    "timeout",
+    "retry",
+    "p95",
+    "因此",
+    "但是",
+    "如果",
+    "需要",
+    "比较",
+]
+
+# 不同内容的向量个数（索引行由这些向量加扰动得到）
+POOL_SIZE = 5000
+
+# 每次写入的行数
+WRITE_BATCH = 100_000
+
+
+def build_text(rng: random.Random) -> str:
+    """生成一段 50-400 字符的思考内容"""
+    length = rng.randint(50, 400)
+    parts: list[str] = []
+    total = 0
+    while total < length:
+        word = rng.choice(WORDS)
+        if rng.random() < 0.2:
+            word += str(rng.randint(0, 999))
+        parts.append(word)
+        total += len(word) + 1
+    return " ".join(parts)
+
+
+def percentile_ms(samples: list[float], pct: float) -> float:
+    """百分位耗时（毫秒）"""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index] * 1000, 3)
+
+
+def build_index(index: SimilarityIndex, size: int, pool, rng) -> float:
+    """写入 size 行，返回耗时（秒）"""
+    import numpy as np
+
+    started = time.perf_counter()
+    for start in range(0, size, WRITE_BATCH):
+        count = min(WRITE_BATCH, size - start)
+        rows = pool[rng.integers(0, len(pool), count)]
+        rows = rows + rng.normal(0, 0.02, rows.shape).astype(np.float32)
+        rows /= np.linalg.norm(rows, axis=1, keepdims=True)
+        keys = [(f"bench-{i // 1000}", i % 1000 + 1) for i in range(start, start + count)]
+        index.add_vectors(keys, rows)
+    return time.perf_counter() - started
+
+
+def bench_size(size: int, args: argparse.Namespace, texts: list[str], pool, data_dir: Path) -> dict:
+    """在 size 行的索引上测量查询延迟"""
+    import numpy as np
+
+    rng = np.random.default_rng(args.seed)
+    index = SimilarityIndex(data_dir / f"similarity-{size}", dim=args.dim)
+    build_seconds = build_index(index, size, pool, rng)
+
+    queries = [texts[i % len(texts)] for i in range(args.queries)]
+    index.query(queries[:1], top_k=args.top_k)  # 预热（建立内存映射）
+
+    single: list[float] = []
+    for text in queries:
+        started = time.perf_counter()
+        index.query([text], top_k=args.top_k)
+        single.append(time.perf_counter() - started)
+
+    batched: list[float] = []
+    for start in range(0, len(queries), args.batch):
+        batch = queries[start : start + args.batch]
+        started = time.perf_counter()
+        index.query(batch, top_k=args.top_k)
+        batched.append((time.perf_counter() - started) / len(batch))
+
+    result = {
+        "name": f"similarity[{size},dim={args.dim}]",
+        "size": size,
+        "dim": args.dim,
+        "index_bytes": index.vectors_path.stat().st_size,
+        "build_seconds": round(build_seconds, 2),
+        "query_p50_ms": percentile_ms(single, 50),
+        "query_p95_ms": percentile_ms(single, 95),
+        "batch_size": args.batch,
+        "batched_per_query_ms": round(statistics.median(batched) * 1000, 3),
+    }
+    index.close()
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="相似思考检索基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="索引行数")
+    parser.add_argument("--dim", type=int, default=DEFAULT_SIMILARITY_DIM, help="向量维度")
+    parser.add_argument("--queries", type=int, default=50, help="每个规模的查询次数")
+    parser.add_argument("--batch", type=int, default=32, help="批量查询的查询数")
+    parser.add_argument("--top-k", type=int, default=5, help="每个查询返回的条数")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="合成数据的随机种子")
+    parser.add_argument("--json", type=str, default=None, help="JSON 结果输出路径")
+    args = parser.parse_args()
+    args.queries = max(args.queries, 1)
+    args.batch = max(args.batch, 1)
+
+    if not SIMILARITY_AVAILABLE:
+        print('需要安装 numpy: pip install "DeepThinking[similarity]"', file=sys.stderr)
+        return 1
+    logging.getLogger("deep_thinking").setLevel(logging.WARNING)
+
+    rng = random.Random(args.seed)
+    texts = [build_text(rng) for _ in range(POOL_SIZE)]
+    started = time.perf_counter()
+    pool = vectorize(texts, args.dim)
+    vectorize_rate = round(len(texts) / (time.perf_counter() - started))
+
+    results: list[dict] = []
+    with tempfile.TemporaryDirectory(prefix="bench_similarity_") as temp_dir:
+        for size in args.sizes:
+            results.append(bench_size(size, args, texts, pool, Path(temp_dir)))
+
+    print(f"向量化吞吐量: {vectorize_rate} 个思考步骤/秒")
+    print(
+        f"{'用例':<32} {'索引(MB)':>10} {'写入(s)':>8} {'p50(ms)':>9} {'p95(ms)':>9} "
+        f"{'批量(ms/查询)':>14}"
+    )
+    for result in results:
+        print(
+            f"{result['name']:<32} {result['index_bytes'] / 1024 / 1024:>10.1f} "
+            f"{result['build_seconds']:>8} {result['query_p50_ms']:>9} "
+            f"{result['query_p95_ms']:>9} {result['batched_per_query_ms']:>14}"
+        )
+
+    if args.json:
+        output = {
+            "benchmark": "similarity",
+            "seed": args.seed,
+            "queries": args.queries,
+            "top_k": args.top_k,
+            "vectorize_per_second": vectorize_rate,
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+            },
+            "results": results,
+        }
+        Path(args.json).write_text(json.dumps(output, ensure_ascii=False, indent=2), "utf-8")
+        print(f"\n结果已写入: {args.json}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+SSE传输负载测试
+
+在子进程中启动 SSE 模式的服务器，使用本地 aiohttp 客户端建立多个 MCP 会话，
+测量不同并发客户端数下的吞吐量（请求/秒）和延迟分位数（p50/p99）。
+
+功能：
+- 每个客户端一个事件流，通过消息端点发送 JSON-RPC 请求
+- 每个连接同时保持多个在途请求（按 id 匹配响应，验证多路复用）
+- 支持输出 JSON 结果
+
+使用方式：
+    # 默认并发（1/10/100 个客户端）
+    python benchmarks/bench_sse_load.py
+
+    # 指定并发、每客户端请求数和在途请求数
+    python benchmarks/bench_sse_load.py --clients 1 10 --requests 200 --inflight 8
+
+    # 输出 JSON 结果
+    python benchmarks/bench_sse_load.py --json results.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import aiohttp
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_CLIENTS = [1, 10, 100]
+
+INITIALIZE_PARAMS = {
+    "protocolVersion": "2025-06-18",
+    "capabilities": {},
+    "clientInfo": {"name": "bench-sse-load", "version": "1.0"},
+}
+
+
+def find_free_port() -> int:
+    """获取一个空闲端口"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+async def wait_until_healthy(base_url: str, timeout: float = 30.0) -> None:
+    """等待服务器健康检查通过"""
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as http:
+        while time.monotonic() < deadline:
+            with contextlib.suppress(aiohttp.ClientError):
+                async with http.get(f"{base_url}/health") as response:
+                    if response.status == 200:
+                        return
+            await asyncio.sleep(0.1)
+    raise RuntimeError("服务器启动超时")
+
+
+class MCPClient:
+    """最小化的 MCP-over-SSE 客户端"""
+
+    def __init__(self, http: aiohttp.ClientSession, base_url: str):
+        self.http = http
+        self.base_url = base_url
+        self.endpoint = ""
+        self._pending: dict[int, asyncio.Future[dict]] = {}
+        self._next_id = 0
+        self._stream: aiohttp.ClientResponse | None = None
+        self._reader: asyncio.Task[None] | None = None
+
+    async def connect(self) -> None:
+        """建立事件流并完成初始化握手"""
+        self._stream = await self.http.get(f"{self.base_url}/sse", timeout=None)
+        event, data = await self._read_event()
+        if event != "endpoint":
+            raise RuntimeError(f"未收到 endpoint 事件: {event}")
+        self.endpoint = f"{self.base_url}{data}"
+        self._reader = asyncio.create_task(self._dispatch())
+
+        await self.request("initialize", INITIALIZE_PARAMS)
+        await self._post({"jsonrpc": "2.0", "method": "notifications/initialized"})
+
+    async def close(self) -> None:
+        """关闭事件流"""
+        if self._reader is not None:
+            self._reader.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._reader
+        if self._stream is not None:
+            self._stream.close()
+
+    async def request(self, method: str, params: dict | None = None) -> dict:
+        """发送请求并等待对应 id 的响应"""
+        self._next_id += 1
+        request_id = self._next_id
+        future: asyncio.Future[dict] = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+
+        message: dict = {"jsonrpc": "2.0", "id": request_id, "method": method}
+        if params is not None:
+            message["params"] = params
+        await self._post(message)
+        return await future
+
+    async def _post(self, message: dict) -> None:
+        async with self.http.post(self.endpoint, json=message) as response:
+            if response.status != 202:
+                raise RuntimeError(f"消息端点返回 {response.status}")
+
+    async def _read_event(self) -> tuple[str, str]:
+        assert self._stream is not None
+        event, data = "", ""
+        while True:
+            raw = await self._stream.content.readline()
+            if not raw:
+                raise ConnectionError("事件流已关闭")
+            line = raw.decode().rstrip("\r\n")
+            if not line:
+                if event or data:
+                    return event, data
+                continue
+            if line.startswith(":"):
+                continue
+            field, _, value = line.partition(": ")
+            if field == "event":
+                event = value
+            elif field == "data":
+                data = value
+
+    async def _dispatch(self) -> None:
+        while True:
+            event, data = await self._read_event()
+            if event != "message":
+                continue
+            message = json.loads(data)
+            future = self._pending.pop(message.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(message)
+
+
+async def run_client(
+    http: aiohttp.ClientSession,
+    base_url: str,
+    requests: int,
+    inflight: int,
+    tool: str,
+    latencies: list[float],
+    errors: list[str],
+) -> None:
+    """单个客户端：保持 inflight 个在途请求，直到发送完 requests 个"""
+    client = MCPClient(http, base_url)
+    try:
+        await client.connect()
+        remaining = requests
+
+        async def worker() -> None:
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                response = await client.request("tools/call", {"name": tool, "arguments": {}})
+                latencies.append(time.perf_counter() - start)
+                if "error" in response or response.get("result", {}).get("isError"):
+                    errors.append(json.dumps(response, ensure_ascii=False)[:200])
+
+        await asyncio.gather(*(worker() for _ in range(max(inflight, 1))))
+    except Exception as e:
+        errors.append(repr(e))
+    finally:
+        await client.close()
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """计算分位数（最近秩法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def measure(base_url: str, clients: int, requests: int, inflight: int, tool: str) -> dict:
+    """测量一个并发级别"""
+    latencies: list[float] = []
+    errors: list[str] = []
+    connector = aiohttp.TCPConnector(limit=0)
+
+    async with aiohttp.ClientSession(connector=connector) as http:
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                run_client(http, base_url, requests, inflight, tool, latencies, errors)
+                for _ in range(clients)
+            )
+        )
+        elapsed = time.perf_counter() - start
+
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed > 0 else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "first_error": errors[0] if errors else None,
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> list[dict]:
+    """启动服务器子进程并依次测量各并发级别"""
+    port = args.port or find_free_port()
+    base_url = f"http://127.0.0.1:{port}"
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        env = {
+            **os.environ,
+            "DEEP_THINKING_DATA_DIR": data_dir,
+            "PYTHONPATH": str(PROJECT_ROOT / "src"),
+        }
+        server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "deep_thinking",
+                "--transport",
+                "sse",
+                "--host",
+                "127.0.0.1",
+                "--port",
+                str(port),
+                "--log-level",
+                "WARNING",
+            ],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            await wait_until_healthy(base_url)
+            results = []
+            for clients in args.clients:
+                results.append(
+                    await measure(base_url, clients, args.requests, args.inflight, args.tool)
+                )
+            return results
+        finally:
+            server.terminate()
+            with contextlib.suppress(subprocess.TimeoutExpired):
+                server.wait(timeout=10)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="SSE传输负载测试")
+    parser.add_argument(
+        "--clients", type=int, nargs="+", default=DEFAULT_CLIENTS, help="并发客户端数"
+    )
+    parser.add_argument("--requests", type=int, default=50, help="每个客户端的请求数")
+    parser.add_argument("--inflight", type=int, default=4, help="每个连接的在途请求数")
+    parser.add_argument("--tool", type=str, default="list_sessions", help="调用的工具名")
+    parser.add_argument("--port", type=int, default=0, help="服务器端口（默认随机）")
+    parser.add_argument("--json", type=str, default=None, help="JSON 结果输出路径")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args))
+
+    print(
+        f"{'客户端':>6} {'请求数':>8} {'错误':>6} {'请求/秒':>10} {'p50(ms)':>10} {'p99(ms)':>10}"
+    )
+    for result in results:
+        print(
+            f"{result['clients']:>6} {result['requests']:>8} {result['errors']:>6} "
+            f"{result['rps']:>10} {result['p50_ms']:>10} {result['p99_ms']:>10}"
+        )
+        if result["first_error"]:
+            print(f"       首个错误: {result['first_error']}")
+
+    if args.json:
+        output = {"benchmark": "sse_load", "results": results}
+        Path(args.json).write_text(json.dumps(output, ensure_ascii=False, indent=2), "utf-8")
+        print(f"\n结果已写入: {args.json}")
+
+    return 0 if all(not r["errors"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
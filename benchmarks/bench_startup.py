@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+启动时间基准测试
+
+在子进程中以 python -X importtime 导入服务器入口（deep_thinking.__main__），
+解析导入耗时，检查 STDIO 冷启动的导入开销。
+
+功能：
+- 报告入口模块的总导入耗时，以及扣除 MCP SDK（mcp.server.fastmcp）本身导入耗时后的启动开销（中位数）
+- 列出自身耗时最高的模块
+- 检查延迟导入的模块（aiohttp、numpy、渲染模块等）没有在启动时加载
+- 启动开销超出 --budget-ms 或延迟模块被加载时返回非零退出码
+- 支持输出 JSON 结果
+
+说明：
+- 启动开销包括本项目模块、工具参数模式的注册以及 MCP SDK 之外的依赖
+- 工具的参数模式在导入时注册，实现依赖的渲染、导出模块在首次调用时导入
+
+使用方式：
+    # 默认（重复 5 次）
+    python benchmarks/bench_startup.py
+
+    # 指定重复次数、预算和输出的模块数
+    python benchmarks/bench_startup.py --repeat 10 --budget-ms 250 --top 20
+
+    # 输出 JSON 结果
+    python benchmarks/bench_startup.py --json results.json
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+ENTRY_MODULE = "deep_thinking.__main__"
+
+# 启动时不应加载的模块（前缀匹配）
+LAZY_MODULES = [
+    "aiohttp",
+    "numpy",
+    "deep_thinking.transports.sse",
+    "deep_thinking.transports.http",
+    "deep_thinking.utils.formatters",
+    "deep_thinking.utils.html_template",
+    "deep_thinking.utils.incremental_visualizer",
+]
+
+# 扣除 MCP SDK 后的启动开销基线模块
+SDK_MODULE = "mcp.server.fastmcp"
+
+# 启动开销预算（毫秒）
+DEFAULT_BUDGET_MS = 300.0
+
+IMPORTTIME_PATTERN = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$")
+
+
+def run_importtime(module: str) -> list[tuple[str, int, int, int]]:
+    """
+    在子进程中导入模块
+
+    Args:
+        module: 模块名
+
+    Returns:
+        (模块名, 嵌套深度, 自身耗时微秒, 累计耗时微秒) 列表
+    """
+    env = {**os.environ, "PYTHONPATH": str(PROJECT_ROOT / "src")}
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    rows = []
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_PATTERN.match(line)
+        if match:
+            rows.append((match[4], len(match[3]), int(match[1]), int(match[2])))
+    return rows
+
+
+def total_ms(rows: list[tuple[str, int, int, int]]) -> float:
+    """一次导入的总耗时（毫秒）：顶层条目（含父包）的累计耗时之和"""
+    return sum(cumulative for _, depth, _, cumulative in rows if depth == 0) / 1000
+
+
+def measure(repeat: int, top: int) -> dict:
+    """重复导入并汇总（第一次用于生成字节码缓存，不计入结果）"""
+    run_importtime(ENTRY_MODULE)
+
+    totals: list[float] = []
+    overheads: list[float] = []
+    self_times: dict[str, list[float]] = {}
+    loaded: set[str] = set()
+
+    for _ in range(repeat):
+        rows = run_importtime(ENTRY_MODULE)
+        total = total_ms(rows)
+        totals.append(total)
+        overheads.append(total - total_ms(run_importtime(SDK_MODULE)))
+        for name, _, self_us, _ in rows:
+            loaded.add(name)
+            self_times.setdefault(name, []).append(self_us / 1000)
+
+    slowest = sorted(
+        ((name, statistics.median(times)) for name, times in self_times.items()),
+        key=lambda item: item[1],
+        reverse=True,
+    )[:top]
+    lazy_loaded = sorted(
+        name
+        for name in loaded
+        if any(name == prefix or name.startswith(f"{prefix}.") for prefix in LAZY_MODULES)
+    )
+
+    return {
+        "total_ms": round(statistics.median(totals), 1),
+        "overhead_ms": round(statistics.median(overheads), 1),
+        "modules": len(loaded),
+        "slowest": [{"module": name, "self_ms": round(ms, 2)} for name, ms in slowest],
+        "lazy_loaded": lazy_loaded,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="启动时间基准测试")
+    parser.add_argument("--repeat", type=int, default=5, help="重复次数")
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=DEFAULT_BUDGET_MS,
+        help="启动开销预算（毫秒，扣除 MCP SDK 导入耗时）",
+    )
+    parser.add_argument("--top", type=int, default=10, help="列出自身耗时最高的模块数")
+    parser.add_argument("--json", type=str, default=None, help="JSON 结果输出路径")
+    args = parser.parse_args()
+
+    result = measure(max(args.repeat, 1), args.top)
+
+    print(f"入口模块总导入耗时: {result['total_ms']} ms（{result['modules']} 个模块）")
+    print(f"扣除 {SDK_MODULE} 后的启动开销: {result['overhead_ms']} ms（预算 {args.budget_ms} ms）")
+    print(f"\n{'自身耗时(ms)':>12}  模块")
+    for item in result["slowest"]:
+        print(f"{item['self_ms']:>12}  {item['module']}")
+
+    failed = False
+    if result["overhead_ms"] > args.budget_ms:
+        print(f"\n启动开销超出预算 {args.budget_ms} ms")
+        failed = True
+    if result["lazy_loaded"]:
+        print(f"\n启动时加载了延迟导入的模块: {', '.join(result['lazy_loaded'])}")
+        failed = True
+
+    if args.json:
+        output = {"benchmark": "startup", "budget_ms": args.budget_ms, **result}
+        Path(args.json).write_text(json.dumps(output, ensure_ascii=False, indent=2), "utf-8")
+        print(f"\n结果已写入: {args.json}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
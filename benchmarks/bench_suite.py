@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""
+存储和工具热路径基准测试套件
+
+用固定随机种子生成包含工具调用的合成会话（默认 10/100/1000/10000 个思考步骤），
+测量存储和工具的热路径：
+
+- sequential_thinking: 会话增长到指定规模时每个思考步骤的耗时（含工具调用记录）
+- get_session: StorageManager 加载会话的耗时
+- list_sessions / get_stats: 数据目录中有 N 个会话时的耗时
+- export: 各导出格式的渲染耗时（json/markdown/html/text）
+- visualize: 各可视化格式的完整渲染耗时（mermaid/ascii/tree）
+
+功能：
+- 每个结果有稳定的名称（例如 "export[html,1000]"），不同运行的 JSON 结果可以直接对比
+- --baseline 指定历史结果，中位数耗时超出阈值时列出回归并返回非零退出码
+- 支持输出 JSON 结果
+
+说明：
+- 绝对耗时依赖机器，只应与同一台机器上的历史结果对比
+- 回归同时要求相对变化超出 --threshold 且绝对变化超出 --min-delta-ms，避免微秒级用例的抖动误报
+
+使用方式：
+    # 默认（全部用例和规模）
+    python benchmarks/bench_suite.py
+
+    # 只运行部分用例和规模
+    python benchmarks/bench_suite.py --cases get_session export --sizes 100 1000
+
+    # 保存基线，之后与基线对比（中位数变慢超过 20% 视为回归）
+    python benchmarks/bench_suite.py --json baseline.json
+    python benchmarks/bench_suite.py --baseline baseline.json --threshold 0.2 --json current.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from deep_thinking import server  # noqa: E402
+from deep_thinking.models.config import ThinkingConfig, set_global_config  # noqa: E402
+from deep_thinking.models.thinking_session import ThinkingSession  # noqa: E402
+from deep_thinking.models.thought import Thought  # noqa: E402
+from deep_thinking.models.tool_call import (  # noqa: E402
+    ToolCallData,
+    ToolCallRecord,
+    ToolResultData,
+)
+from deep_thinking.storage.storage_manager import StorageManager  # noqa: E402
+from deep_thinking.tools.export import _render_export  # noqa: E402
+from deep_thinking.tools.sequential_thinking import sequential_thinking  # noqa: E402
+from deep_thinking.utils.formatters import Visualizer  # noqa: E402
+
+CASES = ["sequential_thinking", "get_session", "list_sessions", "get_stats", "export", "visualize"]
+
+EXPORT_FORMATS = ["json", "markdown", "html", "text"]
+
+VISUALIZE_FORMATS = {
+    "mermaid": Visualizer.to_mermaid,
+    "ascii": Visualizer.to_ascii,
+    "tree": Visualizer.to_tree,
+}
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+
+DEFAULT_SESSION_COUNTS = [10, 100, 1000]
+
+DEFAULT_SEED = 42
+
+# 回归阈值：中位数耗时相对基线的变化比例
+DEFAULT_THRESHOLD = 0.2
+
+# 回归的最小绝对变化（毫秒）
+DEFAULT_MIN_DELTA_MS = 1.0
+
+PHASES = ["thinking", "tool_call", "analysis"]
+
+TOOL_NAMES = ["search", "read_file", "run_tests", "fetch_url"]
+
+
+def build_session(rng: random.Random, size: int, session_id: str) -> ThinkingSession:
+    """
+    生成包含 size 个思考步骤的合成会话（同一种子生成相同内容）
+
+    每 10 步一个修订、每 15 步一个分支，约五分之一的步骤带 1-3 个工具调用。
+    """
+    session = ThinkingSession(session_id=session_id, name=f"基准会话 {size}")
+
+    for number in range(1, size + 1):
+        words = rng.randint(4, 24)
+        content = f"第 {number} 步：" + "分析输入 <数据> 并比较方案 A & B；" * words
+        fields: dict[str, Any] = {"phase": rng.choice(PHASES)}
+        if number % 10 == 0:
+            fields.update(type="revision", is_revision=True, revises_thought=number - 1)
+        elif number % 15 == 0:
+            fields.update(type="branch", branch_from_thought=number - 1, branch_id=f"b-{number}")
+
+        record_ids = []
+        if rng.random() < 0.2:
+            for _ in range(rng.randint(1, 3)):
+                record = ToolCallRecord(
+                    thought_number=number,
+                    call_data=ToolCallData(
+                        tool_name=rng.choice(TOOL_NAMES),
+                        arguments={"query": f"q-{number}", "limit": rng.randint(1, 50)},
+                    ),
+                    result_data=ToolResultData(
+                        call_id=f"call-{number}",
+                        success=rng.random() > 0.1,
+                        result="结果 " * rng.randint(1, 40),
+                        execution_time_ms=round(rng.uniform(1, 500), 2),
+                    ),
+                    status="completed",
+                )
+                session.add_tool_call_record(record)
+                record_ids.append(record.record_id)
+
+        session.add_thought(
+            Thought(thought_number=number, content=content, tool_calls=record_ids, **fields)
+        )
+
+    session.update_statistics()
+    return session
+
+
+def summarize(name: str, case: str, samples: list[float], **labels: Any) -> dict:
+    """汇总一个用例的耗时样本（秒）"""
+    return {
+        "name": name,
+        "case": case,
+        **labels,
+        "runs": len(samples),
+        "median_ms": round(statistics.median(samples) * 1000, 3),
+        "min_ms": round(min(samples) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3),
+    }
+
+
+def time_calls(func: Callable[[], Any], repeat: int) -> list[float]:
+    """预热一次后重复调用，返回每次的耗时（秒）"""
+    func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def bench_sequential_thinking(size: int, steps: int, seed: int) -> dict:
+    """会话从 size - steps 个步骤增长到 size 个步骤，测量每个步骤的耗时"""
+    manager = server.get_storage_manager()
+    steps = min(steps, size)
+    session_id = f"bench-seq-{size}"
+    manager.create_sessions([build_session(random.Random(seed), size - steps, session_id)])
+
+    samples = []
+    for number in range(size - steps + 1, size + 1):
+        kwargs: dict[str, Any] = {}
+        if number % 2 == 0:
+            kwargs["toolCalls"] = [{"name": "search", "arguments": {"query": f"q-{number}"}}]
+            kwargs["toolResults"] = [{"result": "结果", "success": True}]
+        start = time.perf_counter()
+        sequential_thinking(
+            thought=f"第 {number} 步：继续分析。",
+            nextThoughtNeeded=number < size,
+            thoughtNumber=number,
+            totalThoughts=size,
+            session_id=session_id,
+            **kwargs,
+        )
+        samples.append(time.perf_counter() - start)
+
+    manager.delete_session(session_id)
+    return summarize(f"sequential_thinking[{size}]", "sequential_thinking", samples, size=size)
+
+
+def bench_session(size: int, args: argparse.Namespace) -> list[dict]:
+    """加载、导出和可视化 size 个步骤的会话"""
+    manager = server.get_storage_manager()
+    session = build_session(random.Random(args.seed), size, f"bench-{size}")
+    manager.create_sessions([session])
+
+    results = []
+    if "get_session" in args.cases:
+        samples = time_calls(lambda: manager.get_session(session.session_id), args.repeat)
+        results.append(summarize(f"get_session[{size}]", "get_session", samples, size=size))
+
+    if "export" in args.cases:
+        for fmt in EXPORT_FORMATS:
+            samples = time_calls(lambda fmt=fmt: _render_export(session, fmt), args.repeat)
+            results.append(
+                summarize(f"export[{fmt},{size}]", "export", samples, size=size, format=fmt)
+            )
+
+    if "visualize" in args.cases:
+        for fmt, render in VISUALIZE_FORMATS.items():
+            samples = time_calls(lambda render=render: render(session), args.repeat)
+            results.append(
+                summarize(f"visualize[{fmt},{size}]", "visualize", samples, size=size, format=fmt)
+            )
+
+    manager.delete_session(session.session_id)
+    return results
+
+
+def bench_listing(count: int, args: argparse.Namespace, data_dir: Path) -> list[dict]:
+    """数据目录中有 count 个会话（每个 10 个步骤）时，测量 list_sessions 和 get_stats"""
+    manager = StorageManager(data_dir / f"listing-{count}")
+    rng = random.Random(args.seed)
+    manager.create_sessions(
+        [build_session(rng, 10, f"bench-list-{index}") for index in range(count)]
+    )
+
+    results = []
+    if "list_sessions" in args.cases:
+        samples = time_calls(lambda: manager.list_sessions(limit=count), args.repeat)
+        results.append(
+            summarize(f"list_sessions[{count}]", "list_sessions", samples, sessions=count)
+        )
+    if "get_stats" in args.cases:
+        samples = time_calls(manager.get_stats, args.repeat)
+        results.append(summarize(f"get_stats[{count}]", "get_stats", samples, sessions=count))
+    return results
+
+
+async def run_benchmark(args: argparse.Namespace) -> list[dict]:
+    """在临时数据目录中依次运行各用例"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        os.environ["DEEP_THINKING_DATA_DIR"] = data_dir
+        os.environ["DEEP_THINKING_RENDER_CACHE_SIZE"] = "0"
+        # 放宽步骤数和工具调用数上限，覆盖 10000 个步骤的会话
+        set_global_config(ThinkingConfig(max_thoughts=10000, max_tool_calls=10000))
+
+        results: list[dict] = []
+        async with server.server_lifespan(server.app):
+            for size in args.sizes:
+                if "sequential_thinking" in args.cases:
+                    results.append(bench_sequential_thinking(size, args.steps, args.seed))
+                results.extend(bench_session(size, args))
+
+        if {"list_sessions", "get_stats"} & set(args.cases):
+            for count in args.session_counts:
+                results.extend(bench_listing(count, args, Path(data_dir)))
+        return results
+
+
+def compare(
+    results: list[dict], baseline: list[dict], threshold: float, min_delta_ms: float
+) -> list[dict]:
+    """
+    与基线对比，找出中位数耗时回归的用例
+
+    Args:
+        results: 本次结果
+        baseline: 基线结果
+        threshold: 相对变化阈值（0.2 表示变慢 20%）
+        min_delta_ms: 最小绝对变化（毫秒）
+
+    Returns:
+        回归列表
+    """
+    baseline_by_name = {item["name"]: item for item in baseline}
+    regressions = []
+    for result in results:
+        previous = baseline_by_name.get(result["name"])
+        if previous is None or previous["median_ms"] <= 0:
+            continue
+        delta = result["median_ms"] - previous["median_ms"]
+        change = delta / previous["median_ms"]
+        if change > threshold and delta > min_delta_ms:
+            regressions.append(
+                {
+                    "name": result["name"],
+                    "baseline_ms": previous["median_ms"],
+                    "current_ms": result["median_ms"],
+                    "change": round(change, 3),
+                }
+            )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="存储和工具热路径基准测试套件")
+    parser.add_argument(
+        "--cases", type=str, nargs="+", default=CASES, choices=CASES, help="运行的用例"
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="会话思考步骤数"
+    )
+    parser.add_argument(
+        "--session-counts",
+        type=int,
+        nargs="+",
+        default=DEFAULT_SESSION_COUNTS,
+        help="list_sessions/get_stats 的会话数",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="每个用例的重复次数")
+    parser.add_argument("--steps", type=int, default=10, help="sequential_thinking 测量的步骤数")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="合成会话的随机种子")
+    parser.add_argument("--baseline", type=str, default=None, help="对比的基线 JSON 结果路径")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="回归阈值（中位数耗时相对基线的变化比例）",
+    )
+    parser.add_argument(
+        "--min-delta-ms",
+        type=float,
+        default=DEFAULT_MIN_DELTA_MS,
+        help="回归的最小绝对变化（毫秒）",
+    )
+    parser.add_argument("--json", type=str, default=None, help="JSON 结果输出路径")
+    args = parser.parse_args()
+    args.repeat = max(args.repeat, 1)
+    # 创建、删除会话的 INFO 日志会干扰计时和输出
+    logging.getLogger("deep_thinking").setLevel(logging.WARNING)
+
+    results = asyncio.run(run_benchmark(args))
+
+    print(f"{'用例':<32} {'次数':>6} {'中位数(ms)':>12} {'最小(ms)':>12} {'最大(ms)':>12}")
+    for result in results:
+        print(
+            f"{result['name']:<32} {result['runs']:>6} {result['median_ms']:>12} "
+            f"{result['min_ms']:>12} {result['max_ms']:>12}"
+        )
+
+    regressions: list[dict] = []
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text("utf-8"))
+        if baseline.get("seed") != args.seed:
+            print(f"\n基线的随机种子不同（{baseline.get('seed')}），合成会话内容不一致")
+        regressions = compare(
+            results, baseline.get("results", []), args.threshold, args.min_delta_ms
+        )
+        if regressions:
+            print(f"\n与基线相比变慢超过 {args.threshold:.0%} 的用例:")
+            for item in regressions:
+                print(
+                    f"  {item['name']}: {item['baseline_ms']} ms -> {item['current_ms']} ms "
+                    f"(+{item['change']:.0%})"
+                )
+        else:
+            print(f"\n没有超出阈值 {args.threshold:.0%} 的回归")
+
+    if args.json:
+        output = {
+            "benchmark": "suite",
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+            },
+            "results": results,
+            "regressions": regressions,
+        }
+        Path(args.json).write_text(json.dumps(output, ensure_ascii=False, indent=2), "utf-8")
+        print(f"\n结果已写入: {args.json}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
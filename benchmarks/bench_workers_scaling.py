@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+多工作进程扩展性基准测试
+
+在子进程中以不同工作进程数启动 HTTP 模式的服务器（--workers N），
+并发调用 CPU 密集的工具（默认对大会话执行 get_session），
+测量吞吐量（请求/秒）、延迟分位数（p50/p99）以及相对单进程的加速比。
+
+说明：
+- 关闭渲染缓存（DEEP_THINKING_RENDER_CACHE_SIZE=0），每次请求都完整渲染
+- 加速比受 CPU 核心数限制，单核机器上不会有提升
+
+使用方式：
+    # 默认（1/2/4 个工作进程）
+    python benchmarks/bench_workers_scaling.py
+
+    # 指定工作进程数、并发数和请求总数
+    python benchmarks/bench_workers_scaling.py --workers 1 2 4 8 --concurrency 32 --requests 400
+
+    # 调用可视化工具并输出 JSON 结果
+    python benchmarks/bench_workers_scaling.py --tool visualize_session --json results.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import aiohttp
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+from deep_thinking.models.thought import Thought  # noqa: E402
+from deep_thinking.storage.storage_manager import StorageManager  # noqa: E402
+
+DEFAULT_WORKERS = [1, 2, 4]
+
+
+def find_free_port() -> int:
+    """获取一个空闲端口"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+def create_session(manager: StorageManager, size: int) -> str:
+    """创建包含 size 个思考步骤的会话，返回会话ID"""
+    session = manager.create_session(name=f"基准会话 {size}")
+    for number in range(1, size + 1):
+        content = f"第 {number} 步：分析输入并比较方案 A 与 B 的取舍。" * 4
+        session.add_thought(Thought(thought_number=number, content=content, phase="analysis"))
+    manager.update_session(session)
+    return session.session_id
+
+
+async def wait_until_healthy(base_url: str, timeout: float = 60.0) -> None:
+    """等待服务器健康检查通过"""
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as http:
+        while time.monotonic() < deadline:
+            with contextlib.suppress(aiohttp.ClientError):
+                async with http.get(f"{base_url}/health") as response:
+                    if response.status == 200:
+                        return
+            await asyncio.sleep(0.1)
+    raise RuntimeError("服务器启动超时")
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """计算分位数（最近秩法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def measure(
+    base_url: str, tool: str, arguments: dict, concurrency: int, requests: int
+) -> dict:
+    """保持 concurrency 个并发请求，直到完成 requests 个"""
+    latencies: list[float] = []
+    errors: list[str] = []
+    remaining = requests
+    # 每个请求独立连接，由内核在工作进程之间分发
+    connector = aiohttp.TCPConnector(limit=0, force_close=True)
+
+    async with aiohttp.ClientSession(connector=connector) as http:
+
+        async def worker() -> None:
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                message = {
+                    "jsonrpc": "2.0",
+                    "id": remaining,
+                    "method": "tools/call",
+                    "params": {"name": tool, "arguments": arguments},
+                }
+                start = time.perf_counter()
+                async with http.post(f"{base_url}/mcp", json=message) as response:
+                    body = await response.json()
+                latencies.append(time.perf_counter() - start)
+                if "error" in body or body.get("result", {}).get("isError"):
+                    errors.append(json.dumps(body, ensure_ascii=False)[:200])
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(max(concurrency, 1))))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "first_error": errors[0] if errors else None,
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> list[dict]:
+    """准备会话数据，依次以不同工作进程数启动服务器并测量"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        manager = StorageManager(data_dir)
+        session_id = create_session(manager, args.size)
+        arguments = {"session_id": session_id}
+
+        env = {
+            **os.environ,
+            "DEEP_THINKING_DATA_DIR": data_dir,
+            "DEEP_THINKING_RENDER_CACHE_SIZE": "0",
+            "PYTHONPATH": str(PROJECT_ROOT / "src"),
+        }
+
+        results = []
+        for workers in args.workers:
+            port = find_free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            server = subprocess.Popen(
+                [
+                    sys.executable,
+                    "-m",
+                    "deep_thinking",
+                    "--transport",
+                    "http",
+                    "--host",
+                    "127.0.0.1",
+                    "--port",
+                    str(port),
+                    "--workers",
+                    str(workers),
+                    "--log-level",
+                    "WARNING",
+                ],
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            try:
+                await wait_until_healthy(base_url)
+                # 等待全部工作进程就绪后预热
+                await asyncio.sleep(1.0 + workers * 0.5)
+                await measure(base_url, args.tool, arguments, args.concurrency, workers * 2)
+
+                result = await measure(
+                    base_url, args.tool, arguments, args.concurrency, args.requests
+                )
+                results.append({"workers": workers, **result})
+            finally:
+                server.terminate()
+                with contextlib.suppress(subprocess.TimeoutExpired):
+                    server.wait(timeout=15)
+
+    baseline = next((r["rps"] for r in results if r["workers"] == 1), None)
+    for result in results:
+        result["speedup"] = round(result["rps"] / baseline, 2) if baseline else None
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="多工作进程扩展性基准测试")
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=DEFAULT_WORKERS, help="工作进程数"
+    )
+    parser.add_argument("--size", type=int, default=1000, help="会话思考步骤数")
+    parser.add_argument("--tool", type=str, default="get_session", help="调用的工具名")
+    parser.add_argument("--concurrency", type=int, default=16, help="并发请求数")
+    parser.add_argument("--requests", type=int, default=200, help="每个级别的请求总数")
+    parser.add_argument("--json", type=str, default=None, help="JSON 结果输出路径")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_benchmark(args))
+
+    print(f"CPU 核心数: {os.cpu_count()}")
+    print(
+        f"{'工作进程':>8} {'请求数':>8} {'错误':>6} {'请求/秒':>10} "
+        f"{'p50(ms)':>10} {'p99(ms)':>10} {'加速比':>8}"
+    )
+    for result in results:
+        print(
+            f"{result['workers']:>8} {result['requests']:>8} {result['errors']:>6} "
+            f"{result['rps']:>10} {result['p50_ms']:>10} {result['p99_ms']:>10} "
+            f"{result['speedup']:>8}"
+        )
+        if result["first_error"]:
+            print(f"         首个错误: {result['first_error']}")
+
+    if args.json:
+        output = {"benchmark": "workers_scaling", "cpu_count": os.cpu_count(), "results": results}
+        Path(args.json).write_text(json.dumps(output, ensure_ascii=False, indent=2), "utf-8")
+        print(f"\n结果已写入: {args.json}")
+
+    return 0 if all(not r["errors"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,7 @@
 """
 DeepThinking CLI入口
 
-支持STDIO和SSE双传输模式的命令行接口。
+支持STDIO、SSE和Streamable HTTP传输模式的命令行接口。
 
 使用示例:
     # STDIO模式（本地）
@@ -12,6 +12,22 @@ DeepThinking CLI入口
 
     # SSE模式（带认证）
     python -m deep_thinking --transport sse --auth-token your-token
+
+    # Streamable HTTP模式（远程，无需事件流长连接）
+    python -m deep_thinking --transport http --port 8000 --host 0.0.0.0
+
+    # 多工作进程（共享端口和数据目录，利用多核）
+    python -m deep_thinking --transport http --port 8000 --workers 4
+
+    # 批量导出已完成的会话为 ZIP 归档
+    python -m deep_thinking export --format html --archive zip --status completed
+
+    # 迁移旧数据目录（./.deepthinking/）并准备数据目录
+    python -m deep_thinking migrate
+
+    # 记录 10% 工具调用的追踪，之后转换为火焰图的折叠栈格式
+    python -m deep_thinking --trace-file trace.jsonl --trace-sample-rate 0.1
+    python -m deep_thinking trace-fold trace.jsonl > trace.folded
 """
 
 import argparse
@@ -21,21 +37,45 @@ import os
 import sys
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any
 
 from mcp.server import FastMCP
 
 # 导入 server.py 中的 app 实例（已注册所有工具）
 # 这必须在使用前导入，以确保工具装饰器执行
-from deep_thinking.server import app  # noqa: E402
-from deep_thinking.transports.sse import run_sse
+from deep_thinking.server import app, get_default_data_dir  # noqa: E402
 
-# 导入传输层模块
+# 导入传输层模块（SSE/HTTP 依赖 aiohttp，启动对应模式时才导入）
 from deep_thinking.transports.stdio import run_stdio
-from deep_thinking.utils.logger import setup_logging
+from deep_thinking.transports.workers import get_worker_id, reuse_port_supported, run_workers
+from deep_thinking.utils.bulk_export import ARCHIVE_MODES
+from deep_thinking.utils.logger import (
+    DEFAULT_LOG_QUEUE_SIZE,
+    LOG_FORMATS,
+    LOG_OVERFLOW_POLICIES,
+    setup_logging,
+    shutdown_logging,
+)
+from deep_thinking.utils.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
 
+async def run_sse(app: FastMCP, **kwargs: Any) -> None:
+    """使用SSE传输运行MCP服务器（首次调用时导入aiohttp）"""
+    from deep_thinking.transports.sse import run_sse as run
+
+    await run(app, **kwargs)
+
+
+async def run_http(app: FastMCP, **kwargs: Any) -> None:
+    """使用Streamable HTTP传输运行MCP服务器（首次调用时导入aiohttp）"""
+    from deep_thinking.transports.http import run_http as run
+
+    await run(app, **kwargs)
+
+
 @asynccontextmanager
 async def server_lifespan(_app: FastMCP) -> AsyncGenerator[None, None]:
     """
@@ -94,38 +134,87 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--transport",
         type=str,
-        choices=["stdio", "sse"],
+        choices=["stdio", "sse", "http"],
         default=os.getenv("DEEP_THINKING_TRANSPORT", "stdio"),
-        help="传输模式: stdio（本地）或 sse（远程）",
+        help="传输模式: stdio（本地）、sse 或 http（远程）",
     )
 
-    # SSE模式参数
+    # SSE/HTTP模式参数
     parser.add_argument(
         "--host",
         type=str,
         default=os.getenv("DEEP_THINKING_HOST", "localhost"),
-        help="SSE模式监听地址（默认: localhost）",
+        help="SSE/HTTP模式监听地址（默认: localhost）",
     )
 
     parser.add_argument(
         "--port",
         type=int,
         default=int(os.getenv("DEEP_THINKING_PORT", "8000")),
-        help="SSE模式监听端口（默认: 8000）",
+        help="SSE/HTTP模式监听端口（默认: 8000）",
     )
 
     parser.add_argument(
         "--auth-token",
         type=str,
         default=os.getenv("DEEP_THINKING_AUTH_TOKEN"),
-        help="Bearer Token用于SSE模式认证",
+        help="Bearer Token用于SSE/HTTP模式认证",
     )
 
     parser.add_argument(
         "--api-key",
         type=str,
         default=os.getenv("DEEP_THINKING_API_KEY"),
-        help="API Key用于SSE模式认证",
+        help="API Key用于SSE/HTTP模式认证",
+    )
+
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("DEEP_THINKING_WORKERS", "1")),
+        help="SSE/HTTP模式工作进程数，大于1时多进程共享端口（默认: 1）",
+    )
+
+    parser.add_argument(
+        "--sse-heartbeat-interval",
+        type=float,
+        default=float(os.getenv("DEEP_THINKING_SSE_HEARTBEAT_INTERVAL", "15")),
+        help="SSE模式心跳间隔秒数（默认: 15）",
+    )
+
+    parser.add_argument(
+        "--sse-idle-timeout",
+        type=float,
+        default=float(os.getenv("DEEP_THINKING_SSE_IDLE_TIMEOUT", "1800")),
+        help="SSE模式空闲连接超时秒数，0 表示不限制（默认: 1800）",
+    )
+
+    parser.add_argument(
+        "--sse-max-connections",
+        type=int,
+        default=int(os.getenv("DEEP_THINKING_SSE_MAX_CONNECTIONS", "1000")),
+        help="SSE模式最大连接数，超出时返回503，0 表示不限制（默认: 1000）",
+    )
+
+    parser.add_argument(
+        "--sse-write-buffer-limit",
+        type=int,
+        default=int(os.getenv("DEEP_THINKING_SSE_WRITE_BUFFER_LIMIT", str(1024 * 1024))),
+        help="SSE模式写缓冲区高水位字节数，持续超出时断开慢速客户端（默认: 1048576）",
+    )
+
+    parser.add_argument(
+        "--trace-file",
+        type=str,
+        default=os.getenv("DEEP_THINKING_TRACE_FILE", ""),
+        help="请求追踪输出文件（JSONL，每行一个 span；默认不追踪）",
+    )
+
+    parser.add_argument(
+        "--trace-sample-rate",
+        type=float,
+        default=float(os.getenv("DEEP_THINKING_TRACE_SAMPLE_RATE", "1")),
+        help="请求追踪采样率，0-1（默认: 1，追踪每次工具调用）",
     )
 
     # 存储目录参数
@@ -145,6 +234,36 @@ def parse_args() -> argparse.Namespace:
         help="日志级别（默认: INFO）",
     )
 
+    parser.add_argument(
+        "--log-format",
+        type=str,
+        choices=list(LOG_FORMATS),
+        default=os.getenv("DEEP_THINKING_LOG_FORMAT", "text"),
+        help="日志格式: 纯文本或 JSON（每行一个对象）（默认: text）",
+    )
+
+    parser.add_argument(
+        "--log-file",
+        type=str,
+        default=os.getenv("DEEP_THINKING_LOG_FILE", ""),
+        help="同时写入的轮转日志文件（10 MB 轮转，保留 5 个；默认不写文件）",
+    )
+
+    parser.add_argument(
+        "--log-queue-size",
+        type=int,
+        default=int(os.getenv("DEEP_THINKING_LOG_QUEUE_SIZE", str(DEFAULT_LOG_QUEUE_SIZE))),
+        help=f"日志队列长度，由后台线程写出日志；0 表示同步写出（默认: {DEFAULT_LOG_QUEUE_SIZE}）",
+    )
+
+    parser.add_argument(
+        "--log-overflow",
+        type=str,
+        choices=list(LOG_OVERFLOW_POLICIES),
+        default=os.getenv("DEEP_THINKING_LOG_OVERFLOW", "drop"),
+        help="日志队列已满时丢弃（drop）或阻塞等待（block）（默认: drop）",
+    )
+
     # 思考配置参数
     parser.add_argument(
         "--max-thoughts",
@@ -167,9 +286,292 @@ def parse_args() -> argparse.Namespace:
         help="思考步骤增量（默认: 10，支持 1-100）",
     )
 
+    # 子命令（不指定时启动MCP服务器）
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+    export_parser = subparsers.add_parser(
+        "export", help="批量导出会话（多进程并行渲染，支持断点续传）"
+    )
+    export_parser.add_argument(
+        "--format",
+        dest="format_type",
+        type=str,
+        choices=["json", "markdown", "html", "text"],
+        default="markdown",
+        help="导出格式（默认: markdown）",
+    )
+    export_parser.add_argument(
+        "--archive",
+        type=str,
+        choices=list(ARCHIVE_MODES),
+        default="dir",
+        help="输出模式: 目录、ZIP 或 TAR 归档（默认: dir）",
+    )
+    export_parser.add_argument(
+        "--output",
+        type=str,
+        default="",
+        help="输出目录或归档文件路径（默认: ~/exports/sessions_<格式>_<参数摘要>，相同参数重新运行时续传）",
+    )
+    export_parser.add_argument(
+        "--status",
+        type=str,
+        choices=["active", "completed", "archived"],
+        default=None,
+        help="按会话状态过滤",
+    )
+    export_parser.add_argument(
+        "--since", type=str, default=None, help="仅导出在此时间之后更新的会话（ISO 8601）"
+    )
+    export_parser.add_argument(
+        "--until", type=str, default=None, help="仅导出在此时间之前更新的会话（ISO 8601）"
+    )
+    export_parser.add_argument(
+        "--ids", type=str, default=None, help="逗号分隔的会话ID列表（指定时仅导出这些会话）"
+    )
+    export_parser.add_argument(
+        "--workers",
+        dest="export_workers",
+        type=int,
+        default=0,
+        help="导出工作进程数（默认: 0，使用CPU核心数）",
+    )
+    export_parser.add_argument(
+        "--no-resume", action="store_true", help="忽略已有检查点，重新导出全部会话"
+    )
+    export_parser.add_argument(
+        "--external-css",
+        action="store_true",
+        help="HTML 格式时写出共享样式表 deepthinking.css，文档以 <link> 引用",
+    )
+
+    migrate_parser = subparsers.add_parser(
+        "migrate", help="迁移旧数据目录并准备数据目录（写入存储版本标记）"
+    )
+    migrate_parser.add_argument(
+        "--force", action="store_true", help="数据目录已有会话时仍然迁移（覆盖已有会话）"
+    )
+    migrate_parser.add_argument("--no-backup", action="store_true", help="迁移前不备份旧数据")
+
+    trace_fold_parser = subparsers.add_parser(
+        "trace-fold", help="把追踪文件转换为折叠栈格式（用于生成火焰图）"
+    )
+    trace_fold_parser.add_argument("trace_file", type=str, help="追踪文件（JSONL）")
+
+    analytics_parser = subparsers.add_parser(
+        "analytics", help="跨会话统计报告（思考步骤、执行阶段和工具调用）"
+    )
+    analytics_parser.add_argument(
+        "--since", type=str, default=None, help="起始日期（ISO 8601，按 UTC 日期）"
+    )
+    analytics_parser.add_argument(
+        "--until", type=str, default=None, help="结束日期（ISO 8601，按 UTC 日期，含当天）"
+    )
+    analytics_parser.add_argument(
+        "--template", type=str, default=None, help="模板ID过滤（none 表示未使用模板的会话）"
+    )
+    analytics_parser.add_argument(
+        "--status",
+        type=str,
+        choices=["active", "completed", "archived"],
+        default=None,
+        help="按会话状态过滤",
+    )
+    analytics_parser.add_argument(
+        "--top", type=int, default=10, help="工具统计和每日统计的最大条数（默认: 10）"
+    )
+    analytics_parser.add_argument("--json", action="store_true", help="以 JSON 格式输出")
+
     return parser.parse_args()
 
 
+def run_export_command(args: argparse.Namespace) -> int:
+    """
+    执行批量导出子命令
+
+    进度输出到stderr，结果摘要输出到stdout。
+
+    Args:
+        args: 解析后的参数命名空间
+
+    Returns:
+        退出码: 0表示全部成功，1表示存在失败的会话
+    """
+    from deep_thinking.storage.storage_manager import StorageManager
+    from deep_thinking.tools.export import _parse_datetime
+    from deep_thinking.utils.bulk_export import (
+        default_output_path,
+        export_sessions_bulk,
+        select_sessions,
+    )
+
+    data_dir = get_default_data_dir()
+    manager = StorageManager(data_dir)
+
+    session_ids = [sid.strip() for sid in args.ids.split(",") if sid.strip()] if args.ids else None
+    since = _parse_datetime(args.since, "--since")
+    until = _parse_datetime(args.until, "--until")
+    selected = select_sessions(
+        manager,
+        status=args.status,
+        updated_after=since,
+        updated_before=until,
+        session_ids=session_ids,
+    )
+
+    output = args.output or default_output_path(
+        args.format_type,
+        args.archive,
+        args.status,
+        since,
+        until,
+        session_ids,
+        args.external_css,
+    )
+
+    # 约每1%输出一次进度
+    step = max(len(selected) // 100, 1)
+
+    def report(done: int, total: int) -> None:
+        if done % step == 0 or done == total:
+            print(f"\r导出进度: {done}/{total}", end="", file=sys.stderr, flush=True)
+
+    result = export_sessions_bulk(
+        data_dir,
+        selected,
+        args.format_type,
+        output,
+        archive=args.archive,
+        workers=args.export_workers,
+        resume=not args.no_resume,
+        progress=report,
+        external_css=args.external_css,
+    )
+    print(file=sys.stderr)
+
+    print(f"输出路径: {result.output}")
+    print(
+        f"选中 {result.total}，导出 {result.exported}，跳过 {result.skipped}，"
+        f"失败 {len(result.failed)}，耗时 {result.elapsed_seconds:.2f}s"
+    )
+    for session_id, error in result.failed.items():
+        print(f"  失败 {session_id}: {error}")
+
+    return 1 if result.failed else 0
+
+
+def run_migrate_command(args: argparse.Namespace) -> int:
+    """
+    执行迁移子命令
+
+    把旧数据目录迁移到当前数据目录（进度输出到stderr），然后准备数据目录并写入存储版本标记，
+    之后的服务器启动不再检查迁移。
+
+    Args:
+        args: 解析后的参数命名空间
+
+    Returns:
+        退出码: 0表示成功，1表示迁移失败
+    """
+    from deep_thinking.server import has_pending_migration, prepare_data_dir
+    from deep_thinking.storage import migration
+
+    data_dir = get_default_data_dir()
+    print(f"数据目录: {data_dir}")
+
+    if has_pending_migration(data_dir):
+        print(f"旧数据目录: {migration.OLD_DATA_DIR}")
+        if not args.no_backup:
+            backup_dir = migration.create_migration_backup()
+            if backup_dir is None:
+                print("创建迁移备份失败", file=sys.stderr)
+                return 1
+            print(f"迁移备份: {backup_dir}")
+
+        def report(done: int, total: int) -> None:
+            print(f"\r迁移进度: {done}/{total}", end="", file=sys.stderr, flush=True)
+
+        # 数据目录只有空索引时（服务器已启动过）视为没有数据
+        force = args.force or not migration.has_sessions(data_dir)
+        success = migration.migrate_data(data_dir, force=force, progress=report)
+        print(file=sys.stderr)
+        if not success:
+            hint = "" if force else "：数据目录已有会话，使用 --force 覆盖"
+            print(f"数据迁移失败{hint}", file=sys.stderr)
+            return 1
+        print("数据迁移完成")
+    else:
+        print("没有需要迁移的旧数据")
+
+    prepare_data_dir(data_dir)
+    print(f"存储版本: v{migration.STORE_VERSION}")
+    return 0
+
+
+def run_trace_fold_command(args: argparse.Namespace) -> int:
+    """
+    执行追踪折叠子命令
+
+    折叠栈输出到stdout（每行 "调用栈 自身耗时微秒"），可交给 flamegraph.pl 或 speedscope。
+
+    Args:
+        args: 解析后的参数命名空间
+
+    Returns:
+        退出码: 0表示成功，1表示文件无法读取
+    """
+    from deep_thinking.utils.tracing import fold_spans, read_spans
+
+    try:
+        lines = fold_spans(read_spans(args.trace_file))
+    except OSError as e:
+        print(f"读取追踪文件失败: {e}", file=sys.stderr)
+        return 1
+
+    for line in lines:
+        print(line)
+    return 0
+
+
+def run_analytics_command(args: argparse.Namespace) -> int:
+    """
+    执行统计报告子命令
+
+    报告输出到stdout（Markdown 或 JSON），思考步骤上限使用 --max-thoughts。
+
+    Args:
+        args: 解析后的参数命名空间
+
+    Returns:
+        退出码: 0表示成功，1表示参数无效
+    """
+    import json
+
+    from deep_thinking.storage.storage_manager import StorageManager
+    from deep_thinking.tools.analytics import format_analytics_report, load_analytics
+
+    manager = StorageManager(get_default_data_dir())
+    try:
+        report, filters = load_analytics(
+            manager,
+            since=args.since,
+            until=args.until,
+            template_id=args.template,
+            status=args.status,
+            top=args.top,
+            max_thoughts=args.max_thoughts,
+        )
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps({"filters": filters, **report.to_dict()}, ensure_ascii=False, indent=2))
+    else:
+        print(format_analytics_report(report, filters))
+    return 0
+
+
 async def main_async() -> int:
     """
     异步主函数
@@ -201,11 +603,47 @@ async def main_async() -> int:
 
     # 配置日志（传输感知）
     log_level = getattr(logging, args.log_level)
-    setup_logging(args.transport)
-    logging.getLogger().setLevel(log_level)
+    log_file = args.log_file
+    worker_id = get_worker_id()
+    if log_file and worker_id is not None:
+        # 多工作进程各写各的文件，避免多个进程同时轮转同一文件
+        path = Path(log_file)
+        log_file = str(path.with_name(f"{path.stem}.worker{worker_id}{path.suffix}"))
+    setup_logging(
+        args.transport,
+        level=log_level,
+        log_format=args.log_format,
+        log_file=log_file or None,
+        queue_size=args.log_queue_size,
+        overflow=args.log_overflow,
+    )
+
+    if args.command == "export":
+        return run_export_command(args)
+    if args.command == "migrate":
+        return run_migrate_command(args)
+    if args.command == "trace-fold":
+        return run_trace_fold_command(args)
+    if args.command == "analytics":
+        return run_analytics_command(args)
+
+    if args.trace_file:
+        tracer.configure(args.trace_file, args.trace_sample_rate)
+        logger.info(f"请求追踪已启用: {tracer.path}（采样率 {args.trace_sample_rate:g}）")
 
     logger.info(f"传输模式: {args.transport}")
 
+    # 多工作进程：当前进程作为监督进程，工作进程以相同参数重新启动
+    reuse_port = get_worker_id() is not None
+    if args.workers > 1 and not reuse_port:
+        if args.transport == "stdio":
+            logger.warning("STDIO模式不支持多工作进程，忽略 --workers")
+        elif not reuse_port_supported():
+            logger.warning("当前平台不支持SO_REUSEPORT，以单进程模式运行")
+        else:
+            logger.info(f"多工作进程模式: {args.workers} 个工作进程")
+            return await run_workers(args.workers, sys.argv[1:])
+
     # 使用 server.py 中已配置工具的 app 实例
     # 该实例已通过工具模块导入注册了所有 MCP 工具
     # app = create_server()  # 不再需要创建新实例
@@ -229,6 +667,27 @@ async def main_async() -> int:
                 port=args.port,
                 auth_token=args.auth_token,
                 api_key=args.api_key,
+                reuse_port=reuse_port,
+                heartbeat_interval=args.sse_heartbeat_interval,
+                idle_timeout=args.sse_idle_timeout,
+                max_connections=args.sse_max_connections,
+                write_buffer_limit=args.sse_write_buffer_limit,
+            )
+
+        elif args.transport == "http":
+            # Streamable HTTP模式
+            logger.info(f"使用HTTP传输模式启动，监听: {args.host}:{args.port}")
+
+            if args.auth_token or args.api_key:
+                logger.info("认证已启用")
+
+            await run_http(
+                app,
+                host=args.host,
+                port=args.port,
+                auth_token=args.auth_token,
+                api_key=args.api_key,
+                reuse_port=reuse_port,
             )
 
         return 0
@@ -254,6 +713,9 @@ def main() -> int:
     except Exception as e:
         print(f"启动失败: {e}", file=sys.stderr)
         return 1
+    finally:
+        # 写出日志队列中剩余的日志
+        shutdown_logging()
 
 
 if __name__ == "__main__":
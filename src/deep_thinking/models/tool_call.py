@@ -128,6 +128,7 @@ class ToolResultData(BaseModel):
         call_id: 对应的调用ID
         success: 是否成功
         result: 返回结果（成功时）
+        result_blob: 较大的返回结果移入内容寻址存储后的哈希（此时 result 为空，渲染时按需加载）
         error: 错误信息（失败时）
         execution_time_ms: 执行时间（毫秒）
         timestamp: 结果时间戳
@@ -150,6 +151,12 @@ class ToolResultData(BaseModel):
         description="返回结果",
     )
 
+    result_blob: str | None = Field(
+        default=None,
+        pattern="^[0-9a-f]{64}$",
+        description="返回结果在内容寻址存储中的哈希",
+    )
+
     error: ToolCallError | None = Field(
         default=None,
         description="错误信息",
@@ -176,9 +183,9 @@ class ToolResultData(BaseModel):
         转换为字典格式
 
         Returns:
-            包含所有字段的字典
+            包含所有字段的字典（result_blob 只在返回结果已移出时包含）
         """
-        return {
+        data = {
             "call_id": self.call_id,
             "success": self.success,
             "result": self.result,
@@ -187,6 +194,9 @@ class ToolResultData(BaseModel):
             "timestamp": self.timestamp.isoformat(),
             "from_cache": self.from_cache,
         }
+        if self.result_blob is not None:
+            data["result_blob"] = self.result_blob
+        return data
 
 
 class ToolCallRecord(BaseModel):
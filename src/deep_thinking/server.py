@@ -4,21 +4,53 @@ FastMCP服务器实例
 提供MCP工具注册和生命周期管理。
 """
 
+import asyncio
 import logging
 import os
+import time
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Any
 
 from mcp.server import FastMCP
 
+from deep_thinking.storage import migration
 from deep_thinking.storage.migration import (
-    create_migration_backup,
-    detect_old_data,
     get_migration_info,
-    migrate_data,
+    is_store_ready,
+    mark_store_ready,
+    should_migrate,
+)
+from deep_thinking.storage.retention import (
+    DEFAULT_ARCHIVE_AFTER_DAYS,
+    DEFAULT_BACKUP_MAX_AGE_DAYS,
+    DEFAULT_BACKUP_MAX_BYTES,
+    DEFAULT_IO_BYTES_PER_SECOND,
+    DEFAULT_MAINTENANCE_INTERVAL,
+    DEFAULT_SNAPSHOT_KEEP,
+    RetentionPolicy,
+    RetentionService,
 )
 from deep_thinking.storage.storage_manager import StorageManager
+from deep_thinking.transports.workers import get_worker_id
+from deep_thinking.utils.executor import (
+    DEFAULT_IO_THREADS,
+    DEFAULT_RENDER_TIMEOUT,
+    TaskExecutor,
+    default_render_workers,
+    parse_tool_timeouts,
+)
+from deep_thinking.utils.metrics import metrics
+from deep_thinking.utils.profiler import PROFILES_DIR_NAME, profiler
+from deep_thinking.utils.render_cache import (
+    DEFAULT_MAX_DISK_AGE,
+    DEFAULT_MAX_DISK_BYTES,
+    DEFAULT_MAX_ENTRIES,
+    RenderCache,
+)
+from deep_thinking.utils.template_registry import TemplateRegistry, builtin_templates_dir
+from deep_thinking.utils.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
@@ -75,6 +107,12 @@ def ensure_gitignore(data_dir: Path) -> None:
             "# 忽略备份数据\n"
             ".backups/\n"
             "backups/\n"
+            "# 忽略搜索索引和统计汇总表\n"
+            "search/\n"
+            "similarity/\n"
+            "analytics/\n"
+            "# 忽略渲染缓存\n"
+            "cache/\n"
             "# 忽略迁移日志\n"
             "migration.log\n"
             "*.log\n",
@@ -83,6 +121,62 @@ def ensure_gitignore(data_dir: Path) -> None:
         logger.debug(f"创建 .gitignore: {gitignore_path}")
 
 
+def has_pending_migration(data_dir: Path) -> bool:
+    """
+    检查是否有待迁移到数据目录的旧数据
+
+    数据目录就是旧数据目录本身（向后兼容时直接使用项目本地目录）时不需要迁移。
+
+    Args:
+        data_dir: 数据目录路径
+
+    Returns:
+        存在待迁移的旧数据时返回True
+    """
+    if data_dir.resolve() == migration.OLD_DATA_DIR.resolve():
+        return False
+    return should_migrate(data_dir)
+
+
+def prepare_data_dir(data_dir: Path) -> bool:
+    """
+    准备数据目录（冷启动）
+
+    创建目录和 .gitignore、初始化存储，没有待迁移的旧数据时写入存储版本标记。
+    之后的启动只检查标记是否存在，不再重复这些步骤。
+
+    旧数据迁移需要复制整个目录，不在启动时执行（会阻塞MCP握手），
+    由 deep-thinking migrate 子命令完成；迁移前每次启动都会给出提示。
+
+    Args:
+        data_dir: 数据目录路径
+
+    Returns:
+        是否已写入存储版本标记
+    """
+    data_dir.mkdir(parents=True, exist_ok=True)
+    logger.info(f"初始化数据目录: {data_dir}")
+
+    # 确保 .gitignore 存在
+    ensure_gitignore(data_dir)
+
+    # 创建会话目录和索引
+    StorageManager(data_dir)
+
+    migration_info = get_migration_info(data_dir)
+    if migration_info:
+        logger.info(f"数据已迁移: {migration_info.get('target', data_dir)}")
+    elif has_pending_migration(data_dir):
+        logger.warning(
+            f"检测到旧数据目录 {migration.OLD_DATA_DIR}，"
+            "运行 deep-thinking migrate 迁移到当前数据目录"
+        )
+        return False
+
+    mark_store_ready(data_dir)
+    return True
+
+
 # 全局存储管理器实例
 _storage_manager: StorageManager | None = None
 
@@ -103,6 +197,227 @@ def get_storage_manager() -> StorageManager:
     return _storage_manager
 
 
+# 全局渲染缓存实例（未初始化或已禁用时为None）
+_render_cache: RenderCache | None = None
+
+
+def get_render_cache() -> RenderCache | None:
+    """
+    获取全局渲染缓存实例
+
+    Returns:
+        RenderCache实例，未初始化或已禁用时返回None
+    """
+    return _render_cache
+
+
+def create_render_cache(data_dir: Path) -> RenderCache | None:
+    """
+    根据环境变量创建渲染缓存
+
+    DEEP_THINKING_RENDER_CACHE_SIZE 控制内存缓存条目数（默认256），
+    设置为 0 时禁用渲染缓存。DEEP_THINKING_RENDER_CACHE_DISK_MB（默认256）和
+    DEEP_THINKING_RENDER_CACHE_DISK_DAYS（默认7）限制磁盘层的容量和未使用文件的保留天数，
+    0 表示不限制。
+
+    Args:
+        data_dir: 数据存储目录（磁盘缓存位于 cache/render/）
+
+    Returns:
+        RenderCache实例，禁用时返回None
+    """
+    try:
+        max_entries = int(os.getenv("DEEP_THINKING_RENDER_CACHE_SIZE", str(DEFAULT_MAX_ENTRIES)))
+    except ValueError:
+        logger.warning("DEEP_THINKING_RENDER_CACHE_SIZE 无效，使用默认值")
+        max_entries = DEFAULT_MAX_ENTRIES
+
+    if max_entries <= 0:
+        logger.info("渲染缓存已禁用")
+        return None
+
+    disk_mb = _env_number(
+        "DEEP_THINKING_RENDER_CACHE_DISK_MB", DEFAULT_MAX_DISK_BYTES / 1024 / 1024
+    )
+    disk_days = _env_number("DEEP_THINKING_RENDER_CACHE_DISK_DAYS", DEFAULT_MAX_DISK_AGE / 86400)
+    return RenderCache(
+        data_dir / "cache" / "render",
+        max_entries=max_entries,
+        max_disk_bytes=int(disk_mb * 1024 * 1024),
+        max_disk_age=disk_days * 86400,
+    )
+
+
+# 全局任务执行器实例（未初始化时为None，渲染直接在事件循环中执行）
+_task_executor: TaskExecutor | None = None
+
+
+def get_task_executor() -> TaskExecutor | None:
+    """
+    获取全局任务执行器实例
+
+    Returns:
+        TaskExecutor实例，未初始化时返回None
+    """
+    return _task_executor
+
+
+def _env_number(name: str, default: float) -> float:
+    """读取数值环境变量，无效时使用默认值"""
+    try:
+        return float(os.getenv(name, str(default)))
+    except ValueError:
+        logger.warning(f"{name} 无效，使用默认值")
+        return default
+
+
+def create_task_executor() -> TaskExecutor:
+    """
+    根据环境变量创建任务执行器
+
+    - DEEP_THINKING_RENDER_WORKERS: 渲染进程数（默认CPU核心数，最多4；0 表示不使用进程池）
+    - DEEP_THINKING_IO_THREADS: I/O线程数（默认8）
+    - DEEP_THINKING_RENDER_TIMEOUT: 渲染超时秒数（默认60，0 表示不限制）
+    - DEEP_THINKING_TOOL_TIMEOUTS: 按工具覆盖超时，例如 "export_session=120"
+
+    Returns:
+        TaskExecutor实例
+    """
+    try:
+        tool_timeouts = parse_tool_timeouts(os.getenv("DEEP_THINKING_TOOL_TIMEOUTS", ""))
+    except ValueError as e:
+        logger.warning(f"DEEP_THINKING_TOOL_TIMEOUTS {e}，忽略按工具超时配置")
+        tool_timeouts = {}
+
+    return TaskExecutor(
+        render_workers=int(_env_number("DEEP_THINKING_RENDER_WORKERS", default_render_workers())),
+        io_threads=int(_env_number("DEEP_THINKING_IO_THREADS", DEFAULT_IO_THREADS)),
+        render_timeout=_env_number("DEEP_THINKING_RENDER_TIMEOUT", DEFAULT_RENDER_TIMEOUT),
+        tool_timeouts=tool_timeouts,
+    )
+
+
+# 全局数据维护服务实例（未初始化时为None）
+_retention_service: RetentionService | None = None
+
+# 后台数据维护任务（未启动时为None）
+_maintenance_task: "asyncio.Task[None] | None" = None
+
+
+def get_retention_service() -> RetentionService:
+    """
+    获取全局数据维护服务实例
+
+    Returns:
+        RetentionService实例
+
+    Raises:
+        RuntimeError: 如果服务未初始化
+    """
+    if _retention_service is None:
+        raise RuntimeError("数据维护服务未初始化")
+    return _retention_service
+
+
+def create_retention_policy() -> RetentionPolicy:
+    """
+    根据环境变量创建保留策略（数值为 0 表示禁用对应策略）
+
+    归档和清理备份会改变或删除数据，默认禁用，设置对应环境变量后才启用：
+
+    - DEEP_THINKING_ARCHIVE_AFTER_DAYS: 已完成会话超过多少天未更新后归档（默认0，不归档）
+    - DEEP_THINKING_COMPRESS_ARCHIVED: 是否压缩已归档的会话（默认1）
+    - DEEP_THINKING_BACKUP_MAX_AGE_DAYS: 逐次写入备份的最长保留天数（默认0，不限制）
+    - DEEP_THINKING_BACKUP_MAX_BYTES: 逐次写入备份的总大小上限（默认0，不限制）
+    - DEEP_THINKING_SNAPSHOT_KEEP: 保留的完整备份个数（默认0，全部保留）
+    - DEEP_THINKING_MAINTENANCE_IO_RATE: 归档改写和压缩的 I/O 速率上限，字节/秒（默认8 MiB）
+
+    Returns:
+        RetentionPolicy实例
+    """
+    return RetentionPolicy(
+        archive_after_days=_env_number(
+            "DEEP_THINKING_ARCHIVE_AFTER_DAYS", DEFAULT_ARCHIVE_AFTER_DAYS
+        ),
+        compress_archived=os.getenv("DEEP_THINKING_COMPRESS_ARCHIVED", "1") != "0",
+        backup_max_age_days=_env_number(
+            "DEEP_THINKING_BACKUP_MAX_AGE_DAYS", DEFAULT_BACKUP_MAX_AGE_DAYS
+        ),
+        backup_max_bytes=int(
+            _env_number("DEEP_THINKING_BACKUP_MAX_BYTES", DEFAULT_BACKUP_MAX_BYTES)
+        ),
+        snapshot_keep=int(_env_number("DEEP_THINKING_SNAPSHOT_KEEP", DEFAULT_SNAPSHOT_KEEP)),
+        io_bytes_per_second=int(
+            _env_number("DEEP_THINKING_MAINTENANCE_IO_RATE", DEFAULT_IO_BYTES_PER_SECOND)
+        ),
+    )
+
+
+def _start_maintenance() -> None:
+    """
+    启动后台数据维护任务
+
+    DEEP_THINKING_MAINTENANCE_INTERVAL 设置维护间隔（秒，默认3600，0 表示不定期维护）。
+    多工作进程模式下只在 0 号工作进程中运行。
+    """
+    global _maintenance_task
+
+    interval = _env_number("DEEP_THINKING_MAINTENANCE_INTERVAL", DEFAULT_MAINTENANCE_INTERVAL)
+    if interval <= 0 or _retention_service is None:
+        return
+    worker_id = get_worker_id()
+    if worker_id not in (None, "0"):
+        return
+
+    _maintenance_task = asyncio.get_running_loop().create_task(
+        _retention_service.run_forever(interval), name="deepthinking-maintenance"
+    )
+    logger.debug(f"数据维护任务已启动（间隔 {interval:g} 秒）")
+
+
+# 全局模板注册表实例（首次使用时创建）
+_template_registry: TemplateRegistry | None = None
+
+
+def create_template_registry(data_dir: Path) -> TemplateRegistry:
+    """
+    创建模板注册表
+
+    模板目录按优先级从低到高：包内 templates 目录、数据目录下的 templates/、
+    环境变量 DEEP_THINKING_TEMPLATE_DIRS 指定的目录（以路径分隔符分隔）。
+    同名模板以优先级高的目录为准。
+
+    Args:
+        data_dir: 数据存储目录
+
+    Returns:
+        TemplateRegistry实例
+    """
+    template_dirs = [builtin_templates_dir(), data_dir / "templates"]
+    for item in os.getenv("DEEP_THINKING_TEMPLATE_DIRS", "").split(os.pathsep):
+        if item.strip():
+            template_dirs.append(Path(os.path.expandvars(item.strip())).expanduser())
+    return TemplateRegistry(template_dirs)
+
+
+def get_template_registry() -> TemplateRegistry:
+    """
+    获取全局模板注册表实例（首次调用时创建）
+
+    Returns:
+        TemplateRegistry实例
+    """
+    global _template_registry
+    if _template_registry is None:
+        _template_registry = create_template_registry(get_default_data_dir())
+    return _template_registry
+
+
+def get_profiles_dir() -> Path:
+    """性能分析结果目录（数据目录下的 profiles/）"""
+    return get_default_data_dir() / PROFILES_DIR_NAME
+
+
 def get_server_instructions() -> str:
     """
     获取服务器instructions
@@ -138,53 +453,93 @@ def get_server_instructions() -> str:
     return default_instructions
 
 
+# 生命周期引用计数（SSE 等多会话传输中每个会话都会进入生命周期，共享同一份资源）
+_lifespan_refs = 0
+
+
 @asynccontextmanager
 async def server_lifespan(_server: FastMCP) -> AsyncGenerator[None, None]:
     """
     服务器生命周期管理
 
-    处理服务器的初始化和清理。
+    处理服务器的初始化和清理。生命周期可以嵌套进入：
+    只有第一次进入时初始化，最后一次退出时清理。
 
     Args:
         _server: FastMCP服务器实例（未使用，保留用于API兼容性）
     """
-    global _storage_manager
+    global _lifespan_refs
+
+    if _lifespan_refs == 0:
+        _init_server_resources()
+        _start_maintenance()
+    _lifespan_refs += 1
+
+    try:
+        yield
+    finally:
+        _lifespan_refs -= 1
+        if _lifespan_refs == 0:
+            _cleanup_server_resources()
+
+
+def _init_server_resources() -> None:
+    """初始化数据目录、存储管理器、渲染缓存、任务执行器和数据维护服务"""
+    global _storage_manager, _render_cache, _task_executor, _retention_service
 
     # 获取数据存储目录（支持环境变量和项目本地目录）
     data_dir = get_default_data_dir()
-    data_dir.mkdir(parents=True, exist_ok=True)
 
-    logger.info(f"初始化数据目录: {data_dir}")
+    # 热启动只检查存储版本标记；冷启动准备数据目录
+    if is_store_ready(data_dir):
+        logger.debug(f"数据目录已就绪: {data_dir}")
+    else:
+        prepare_data_dir(data_dir)
 
-    # 确保 .gitignore 存在
-    ensure_gitignore(data_dir)
-
-    # 检查并执行数据迁移
-    migration_info = get_migration_info(data_dir)
-    if migration_info:
-        logger.info(f"数据已迁移: {migration_info.get('target', data_dir)}")
-    elif detect_old_data():
-        logger.info("检测到旧数据目录，开始自动迁移...")
-        backup_dir = create_migration_backup()
-        if backup_dir:
-            logger.info(f"迁移备份已创建: {backup_dir}")
-
-        success = migrate_data(data_dir)
-        if success:
-            logger.info("数据迁移完成")
-        else:
-            logger.warning("数据迁移失败，将继续使用旧数据目录")
-
-    # 初始化存储管理器
-    _storage_manager = StorageManager(data_dir)
+    # 初始化存储管理器（目录和索引已准备好）
+    _storage_manager = StorageManager(data_dir, prepare=False)
     logger.info("存储管理器已初始化")
 
-    try:
-        yield
-    finally:
-        # 清理资源
-        logger.info("清理服务器资源")
-        _storage_manager = None
+    # 初始化渲染缓存，会话变更时失效
+    _render_cache = create_render_cache(data_dir)
+    if _render_cache is not None:
+        _storage_manager.add_change_listener(_render_cache.invalidate)
+
+    # 初始化任务执行器（进程池和线程池在首次提交任务时创建）
+    _task_executor = create_task_executor()
+
+    # 渲染缓存磁盘层的过期清理和大小统计会遍历缓存目录，在I/O线程池中执行，不阻塞启动
+    if _render_cache is not None:
+        _task_executor.submit(_render_cache.prune_disk)
+
+    # 思考步骤索引在I/O线程池中批量更新，不阻塞会话写入
+    _storage_manager.defer_thought_indexes(_task_executor.submit)
+
+    # 初始化数据维护服务（后台任务由生命周期启动）
+    _retention_service = RetentionService(_storage_manager, create_retention_policy())
+
+
+def _cleanup_server_resources() -> None:
+    """清理服务器资源"""
+    global _storage_manager, _render_cache, _task_executor, _template_registry
+    global _retention_service, _maintenance_task
+
+    logger.info("清理服务器资源")
+    if _maintenance_task is not None:
+        _maintenance_task.cancel()
+    if _retention_service is not None:
+        _retention_service.stop()
+    if _storage_manager is not None:
+        # 停止后台索引更新，执行尚未完成的索引操作
+        _storage_manager.defer_thought_indexes(None)
+    if _task_executor is not None:
+        _task_executor.shutdown()
+    _storage_manager = None
+    _render_cache = None
+    _task_executor = None
+    _template_registry = None
+    _retention_service = None
+    _maintenance_task = None
 
 
 # 创建FastMCP服务器实例
@@ -195,12 +550,62 @@ app = FastMCP(
 )
 
 
+def instrument_tool_calls(server: FastMCP) -> None:
+    """
+    记录工具调用耗时、失败次数和请求追踪，并通知性能分析器
+
+    替换工具管理器的 call_tool（stdio、SSE 和 HTTP 传输都经过它）。
+    每次调用是一条追踪，根 span 名为 tool.<工具名>。
+    指标、追踪和性能分析都未启用或工具不存在时直接调用原方法。
+
+    Args:
+        server: FastMCP服务器实例
+    """
+    tool_manager = server._tool_manager
+    call_tool = tool_manager.call_tool
+
+    async def instrumented_call_tool(
+        name: str,
+        arguments: dict[str, Any],
+        context: Any = None,
+        convert_result: bool = False,
+    ) -> Any:
+        if (
+            not (metrics.enabled or tracer.enabled or profiler.active)
+            or tool_manager.get_tool(name) is None
+        ):
+            return await call_tool(name, arguments, context=context, convert_result=convert_result)
+
+        started = time.perf_counter()
+        error = False
+        try:
+            with tracer.trace(f"tool.{name}", tool=name):
+                return await call_tool(
+                    name, arguments, context=context, convert_result=convert_result
+                )
+        except Exception:
+            error = True
+            raise
+        finally:
+            if metrics.enabled:
+                metrics.observe_tool(name, time.perf_counter() - started, error)
+            if profiler.active:
+                profiler.on_tool_call(started)
+
+    tool_manager.call_tool = instrumented_call_tool  # type: ignore[method-assign]
+
+
 # 导出工具模块
 from deep_thinking.tools import (  # noqa: E402, F401
+    analytics,
+    diagnostics,
     export,
+    search,
     sequential_thinking,
     session_manager,
     task_manager,
     template,
     visualization,
 )
+
+instrument_tool_calls(app)
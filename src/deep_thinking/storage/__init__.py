@@ -4,15 +4,22 @@
 提供数据持久化和迁移功能。
 """
 
+from deep_thinking.storage.analytics_index import AnalyticsIndex, AnalyticsReport
+from deep_thinking.storage.blob_store import BlobStore
 from deep_thinking.storage.json_file_store import JsonFileStore
 from deep_thinking.storage.migration import (
     create_migration_backup,
     detect_old_data,
     get_migration_info,
+    is_store_ready,
+    mark_store_ready,
     migrate_data,
     rollback_migration,
     should_migrate,
 )
+from deep_thinking.storage.retention import RetentionPolicy, RetentionReport, RetentionService
+from deep_thinking.storage.search_index import SearchIndex
+from deep_thinking.storage.similarity_index import SimilarityIndex
 from deep_thinking.storage.storage_manager import StorageManager
 from deep_thinking.storage.task_list_store import TaskListStore
 
@@ -21,6 +28,15 @@ __all__ = [
     "StorageManager",
     "JsonFileStore",
     "TaskListStore",
+    "BlobStore",
+    "SearchIndex",
+    "SimilarityIndex",
+    "AnalyticsIndex",
+    "AnalyticsReport",
+    # 数据保留与压缩
+    "RetentionPolicy",
+    "RetentionReport",
+    "RetentionService",
     # 数据迁移
     "detect_old_data",
     "migrate_data",
@@ -28,4 +44,6 @@ __all__ = [
     "rollback_migration",
     "get_migration_info",
     "should_migrate",
+    "is_store_ready",
+    "mark_store_ready",
 ]
@@ -0,0 +1,627 @@
+"""
+跨会话统计模块
+
+按日期、模板和会话状态预聚合的思考步骤与工具调用统计（SQLite）。
+关键特性:
+- 三张汇总表：会话（按思考步骤数）、思考步骤（按执行阶段）、工具调用（按工具名称）
+- 增量维护：保存每个会话上次计入的汇总值，会话写入时只把差值累加到汇总表
+- 查询只扫描汇总行，耗时与思考步骤总数无关
+- 多个工作进程可共享统计文件（WAL 模式，写入时等待锁）
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from collections import defaultdict
+from collections.abc import Iterable
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from deep_thinking.models.thinking_session import ThinkingSession
+from deep_thinking.models.tool_call import ToolCallRecord
+
+logger = logging.getLogger(__name__)
+
+# 统计文件相对数据目录的路径
+ANALYTICS_INDEX_PATH = Path("analytics") / "rollups.db"
+
+# 等待其他进程释放写锁的时间（毫秒）
+_BUSY_TIMEOUT_MS = 5000
+
+# 视为失败的工具调用状态
+_FAILED_STATUSES = frozenset({"failed", "timeout", "cancelled"})
+
+# 汇总表：表名 -> (维度列, 度量列)；第一个度量列为行数，减为0时删除该行
+_ROLLUPS: dict[str, tuple[tuple[str, ...], tuple[str, ...]]] = {
+    "session_rollups": (("day", "template_id", "status", "thought_count"), ("sessions",)),
+    "thought_rollups": (("day", "template_id", "status", "phase"), ("thoughts", "chars")),
+    "tool_rollups": (
+        ("day", "template_id", "status", "tool_name"),
+        ("calls", "failures", "cached", "timed", "total_ms"),
+    ),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS contributions (
+    session_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS session_rollups (
+    day TEXT NOT NULL,
+    template_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    thought_count INTEGER NOT NULL,
+    sessions INTEGER NOT NULL,
+    PRIMARY KEY (day, template_id, status, thought_count)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS thought_rollups (
+    day TEXT NOT NULL,
+    template_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    thoughts INTEGER NOT NULL,
+    chars INTEGER NOT NULL,
+    PRIMARY KEY (day, template_id, status, phase)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tool_rollups (
+    day TEXT NOT NULL,
+    template_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    tool_name TEXT NOT NULL,
+    calls INTEGER NOT NULL,
+    failures INTEGER NOT NULL,
+    cached INTEGER NOT NULL,
+    timed INTEGER NOT NULL,
+    total_ms REAL NOT NULL,
+    PRIMARY KEY (day, template_id, status, tool_name)
+) WITHOUT ROWID;
+"""
+
+# 一个会话计入的汇总值：表名 -> {维度值: 度量值}
+Contribution = dict[str, dict[tuple[Any, ...], list[float]]]
+
+
+def _day(value: datetime) -> str:
+    """UTC 日期（YYYY-MM-DD，无时区时按 UTC）"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).date().isoformat()
+
+
+def _is_failure(record: ToolCallRecord) -> bool:
+    """工具调用是否失败（失败、超时、取消或结果标记为失败）"""
+    if record.status in _FAILED_STATUSES:
+        return True
+    return record.result_data is not None and not record.result_data.success
+
+
+def session_contribution(session: ThinkingSession) -> Contribution:
+    """
+    计算会话计入各汇总表的值
+
+    会话按创建日期、思考步骤按思考时间、工具调用按调用时间计入对应的日期。
+
+    Args:
+        session: 会话对象
+
+    Returns:
+        各汇总表的维度值和度量值
+    """
+    template_id = str(session.metadata.get("template_id") or "")
+    status = session.status
+    contribution: Contribution = {name: {} for name in _ROLLUPS}
+
+    key: tuple[Any, ...] = (
+        _day(session.created_at),
+        template_id,
+        status,
+        len(session.thoughts),
+    )
+    contribution["session_rollups"][key] = [1]
+
+    thoughts = contribution["thought_rollups"]
+    for thought in session.thoughts:
+        key = (_day(thought.timestamp), template_id, status, thought.phase)
+        values = thoughts.setdefault(key, [0, 0])
+        values[0] += 1
+        values[1] += len(thought.content)
+
+    tools = contribution["tool_rollups"]
+    for record in session.tool_call_history:
+        key = (_day(record.call_data.timestamp), template_id, status, record.call_data.tool_name)
+        values = tools.setdefault(key, [0, 0, 0, 0, 0.0])
+        values[0] += 1
+        values[1] += _is_failure(record)
+        result = record.result_data
+        if result is not None:
+            values[2] += result.from_cache
+            if result.execution_time_ms is not None:
+                values[3] += 1
+                values[4] += result.execution_time_ms
+    return contribution
+
+
+def _dump_contribution(contribution: Contribution) -> str:
+    """序列化汇总值（维度值和度量值拼接为一行）"""
+    return json.dumps(
+        {
+            name: [[*key, *values] for key, values in rows.items()]
+            for name, rows in contribution.items()
+        },
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
+def _load_contribution(data: str) -> Contribution:
+    """反序列化汇总值"""
+    loaded = json.loads(data)
+    contribution: Contribution = {}
+    for name, (dimensions, _measures) in _ROLLUPS.items():
+        size = len(dimensions)
+        contribution[name] = {tuple(row[:size]): row[size:] for row in loaded.get(name, [])}
+    return contribution
+
+
+@dataclass
+class TemplateStats:
+    """
+    一个模板（或未使用模板）的会话统计
+
+    Attributes:
+        template_id: 模板ID（未使用模板时为空字符串）
+        sessions: 会话数
+        max_thoughts_sessions: 思考步骤数达到上限的会话数
+        thoughts: 思考步骤数
+        chars: 思考内容总字符数
+        phases: 各执行阶段的思考步骤数
+    """
+
+    template_id: str
+    sessions: int = 0
+    max_thoughts_sessions: int = 0
+    thoughts: int = 0
+    chars: int = 0
+    phases: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def avg_thought_length(self) -> float:
+        """平均思考内容长度（字符）"""
+        return self.chars / self.thoughts if self.thoughts else 0.0
+
+
+@dataclass
+class ToolStats:
+    """
+    一个工具的调用统计
+
+    Attributes:
+        tool_name: 工具名称
+        calls: 调用次数
+        failures: 失败次数（失败、超时、取消或结果标记为失败）
+        cached: 命中缓存的次数
+        timed: 有执行时间的调用次数
+        total_ms: 执行时间总和（毫秒）
+    """
+
+    tool_name: str
+    calls: int = 0
+    failures: int = 0
+    cached: int = 0
+    timed: int = 0
+    total_ms: float = 0.0
+
+    @property
+    def failure_rate(self) -> float:
+        """失败率（0-1）"""
+        return self.failures / self.calls if self.calls else 0.0
+
+    @property
+    def avg_ms(self) -> float:
+        """平均执行时间（毫秒）"""
+        return self.total_ms / self.timed if self.timed else 0.0
+
+
+@dataclass
+class DayStats:
+    """
+    一天的统计
+
+    Attributes:
+        day: 日期（YYYY-MM-DD，UTC）
+        sessions: 当天创建的会话数
+        thoughts: 当天的思考步骤数
+        tool_calls: 当天的工具调用次数
+        failures: 当天失败的工具调用次数
+    """
+
+    day: str
+    sessions: int = 0
+    thoughts: int = 0
+    tool_calls: int = 0
+    failures: int = 0
+
+
+@dataclass
+class AnalyticsReport:
+    """
+    跨会话统计报告
+
+    Attributes:
+        sessions: 会话数
+        max_thoughts: 判断达到上限使用的思考步骤数
+        max_thoughts_sessions: 思考步骤数达到上限的会话数
+        thoughts: 思考步骤数
+        chars: 思考内容总字符数
+        tool_calls: 工具调用次数
+        failures: 失败的工具调用次数
+        phases: 各执行阶段的思考步骤数
+        templates: 按会话数降序的模板统计
+        tools: 按失败次数降序的工具统计
+        days: 按日期降序的每日统计
+    """
+
+    sessions: int
+    max_thoughts: int
+    max_thoughts_sessions: int
+    thoughts: int
+    chars: int
+    tool_calls: int
+    failures: int
+    phases: dict[str, int]
+    templates: list[TemplateStats]
+    tools: list[ToolStats]
+    days: list[DayStats]
+
+    @property
+    def avg_thought_length(self) -> float:
+        """平均思考内容长度（字符）"""
+        return self.chars / self.thoughts if self.thoughts else 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        转换为字典格式
+
+        Returns:
+            包含全部统计和派生指标（平均长度、失败率、平均执行时间）的字典
+        """
+        data = asdict(self)
+        data["avg_thought_length"] = self.avg_thought_length
+        for item, stats in zip(data["templates"], self.templates, strict=True):
+            item["avg_thought_length"] = stats.avg_thought_length
+        for item, tool in zip(data["tools"], self.tools, strict=True):
+            item["failure_rate"] = tool.failure_rate
+            item["avg_ms"] = tool.avg_ms
+        return data
+
+
+class AnalyticsIndex:
+    """
+    跨会话统计汇总表
+
+    首次使用时打开（或创建）统计文件；同一实例可在多个线程中使用。
+    与思考步骤索引的维护接口相同（index_session/update_session/remove_session/clear/mark_built）。
+
+    Attributes:
+        path: 统计文件路径
+    """
+
+    def __init__(self, path: str | Path):
+        """
+        初始化统计汇总表（不访问文件系统）
+
+        Args:
+            path: 统计文件路径
+        """
+        self.path = Path(path)
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.RLock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """打开统计文件并创建表（在锁内调用）"""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                self.path,
+                timeout=_BUSY_TIMEOUT_MS / 1000,
+                check_same_thread=False,
+                isolation_level=None,
+            )
+            conn.execute(f"PRAGMA busy_timeout = {_BUSY_TIMEOUT_MS}")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        """关闭统计文件"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def is_built(self) -> bool:
+        """
+        检查汇总表是否已包含全部会话（首次使用或维护失败后需要重建）
+
+        Returns:
+            汇总表是否完整
+        """
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM meta WHERE key = 'built'").fetchone()
+        return row is not None and row[0] == "1"
+
+    def mark_built(self, built: bool) -> None:
+        """
+        设置汇总表完整标记
+
+        Args:
+            built: 汇总表是否完整
+        """
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('built', ?)",
+                ("1" if built else "0",),
+            )
+
+    def _replace(self, session_id: str, contribution: Contribution | None) -> bool:
+        """
+        把会话计入的汇总值替换为新值（None 表示移除），只累加差值
+
+        Returns:
+            汇总表是否有变化
+        """
+        data = None if contribution is None else _dump_contribution(contribution)
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT data FROM contributions WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                if (row[0] if row else None) == data:
+                    conn.execute("COMMIT")
+                    return False
+                previous = _load_contribution(row[0]) if row else {}
+                for name in _ROLLUPS:
+                    self._apply_delta(
+                        conn,
+                        name,
+                        previous.get(name, {}),
+                        {} if contribution is None else contribution[name],
+                    )
+                if data is None:
+                    conn.execute("DELETE FROM contributions WHERE session_id = ?", (session_id,))
+                else:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO contributions (session_id, data) VALUES (?, ?)",
+                        (session_id, data),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return True
+
+    @staticmethod
+    def _apply_delta(
+        conn: sqlite3.Connection,
+        name: str,
+        previous: dict[tuple[Any, ...], list[float]],
+        current: dict[tuple[Any, ...], list[float]],
+    ) -> None:
+        """把一张汇总表的差值累加到对应的行，行数减为0的行删除"""
+        dimensions, measures = _ROLLUPS[name]
+        columns = ", ".join((*dimensions, *measures))
+        placeholders = ", ".join("?" * (len(dimensions) + len(measures)))
+        updates = ", ".join(f"{column} = {column} + excluded.{column}" for column in measures)
+        upsert = (
+            f"INSERT INTO {name} ({columns}) VALUES ({placeholders}) "
+            f"ON CONFLICT ({', '.join(dimensions)}) DO UPDATE SET {updates}"
+        )
+        prune = (
+            f"DELETE FROM {name} WHERE "
+            + " AND ".join(f"{column} = ?" for column in dimensions)
+            + f" AND {measures[0]} <= 0"
+        )
+
+        for key in previous.keys() | current.keys():
+            old = previous.get(key, [0] * len(measures))
+            new = current.get(key, [0] * len(measures))
+            delta = [b - a for a, b in zip(old, new, strict=True)]
+            if not any(delta):
+                continue
+            conn.execute(upsert, (*key, *delta))
+            if delta[0] < 0:
+                conn.execute(prune, key)
+
+    def index_session(
+        self,
+        session: ThinkingSession,
+        thought_numbers: Iterable[int] | None = None,  # noqa: ARG002
+    ) -> int:
+        """
+        重新计算会话计入的汇总值（会话的汇总值未变化时不写入）
+
+        Args:
+            session: 会话对象
+            thought_numbers: 变化的思考步骤编号（会话级汇总总是整体重算，仅为接口一致）
+
+        Returns:
+            会话的思考步骤数
+        """
+        self._replace(session.session_id, session_contribution(session))
+        return len(session.thoughts)
+
+    def update_session(self, session: ThinkingSession) -> None:
+        """
+        会话状态、工具调用记录等变化后重新计算汇总值
+
+        Args:
+            session: 会话对象
+        """
+        self._replace(session.session_id, session_contribution(session))
+
+    def remove_session(self, session_id: str) -> None:
+        """
+        从汇总表中减去会话计入的值
+
+        Args:
+            session_id: 会话ID
+        """
+        self._replace(session_id, None)
+
+    def clear(self) -> None:
+        """清空汇总表（同时清除完整标记）"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for name in ("contributions", *_ROLLUPS):
+                    conn.execute(f"DELETE FROM {name}")
+                conn.execute("DELETE FROM meta WHERE key = 'built'")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def count(self) -> int:
+        """
+        获取已计入的会话数
+
+        Returns:
+            会话数
+        """
+        with self._lock:
+            return int(self._connect().execute("SELECT COUNT(*) FROM contributions").fetchone()[0])
+
+    def report(
+        self,
+        max_thoughts: int,
+        since: date | None = None,
+        until: date | None = None,
+        template_id: str | None = None,
+        status: str | None = None,
+        top: int = 10,
+    ) -> AnalyticsReport:
+        """
+        汇总统计报告
+
+        日期过滤按 UTC 日期（含两端）：会话按创建日期，思考步骤和工具调用按各自的时间。
+
+        Args:
+            max_thoughts: 思考步骤数达到此值的会话计为达到上限
+            since: 起始日期（可选）
+            until: 结束日期（可选）
+            template_id: 模板ID过滤（空字符串表示未使用模板的会话，可选）
+            status: 会话状态过滤（可选）
+            top: 工具统计和每日统计的最大条数
+
+        Returns:
+            统计报告
+        """
+        conditions: list[str] = []
+        params: list[Any] = []
+        if since is not None:
+            conditions.append("day >= ?")
+            params.append(since.isoformat())
+        if until is not None:
+            conditions.append("day <= ?")
+            params.append(until.isoformat())
+        if template_id is not None:
+            conditions.append("template_id = ?")
+            params.append(template_id)
+        if status is not None:
+            conditions.append("status = ?")
+            params.append(status)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self._lock:
+            conn = self._connect()
+            session_rows = conn.execute(
+                "SELECT template_id, SUM(sessions), "
+                "SUM(CASE WHEN thought_count >= ? THEN sessions ELSE 0 END) "
+                f"FROM session_rollups {where} GROUP BY template_id",
+                (max_thoughts, *params),
+            ).fetchall()
+            thought_rows = conn.execute(
+                "SELECT template_id, phase, SUM(thoughts), SUM(chars) "
+                f"FROM thought_rollups {where} GROUP BY template_id, phase",
+                params,
+            ).fetchall()
+            tool_rows = conn.execute(
+                "SELECT tool_name, SUM(calls), SUM(failures), SUM(cached), SUM(timed), "
+                f"SUM(total_ms) FROM tool_rollups {where} GROUP BY tool_name",
+                params,
+            ).fetchall()
+            day_rows = {
+                name: conn.execute(
+                    f"SELECT day, {measures} FROM {name} {where} GROUP BY day "
+                    "ORDER BY day DESC LIMIT ?",
+                    (*params, top),
+                ).fetchall()
+                for name, measures in (
+                    ("session_rollups", "SUM(sessions), 0"),
+                    ("thought_rollups", "SUM(thoughts), 0"),
+                    ("tool_rollups", "SUM(calls), SUM(failures)"),
+                )
+            }
+
+        templates: dict[str, TemplateStats] = {}
+        for tid, sessions, at_limit in session_rows:
+            stats = templates.setdefault(tid, TemplateStats(tid))
+            stats.sessions, stats.max_thoughts_sessions = int(sessions), int(at_limit)
+        phases: dict[str, int] = defaultdict(int)
+        for tid, phase, thoughts, chars in thought_rows:
+            stats = templates.setdefault(tid, TemplateStats(tid))
+            stats.thoughts += int(thoughts)
+            stats.chars += int(chars)
+            stats.phases[phase] = int(thoughts)
+            phases[phase] += int(thoughts)
+
+        tools = [
+            ToolStats(name, int(calls), int(failures), int(cached), int(timed), float(total_ms))
+            for name, calls, failures, cached, timed, total_ms in tool_rows
+        ]
+        tools.sort(key=lambda s: (-s.failures, -s.calls, s.tool_name))
+
+        days: dict[str, DayStats] = {}
+        for name, rows in day_rows.items():
+            for day, first, second in rows:
+                entry = days.setdefault(day, DayStats(day))
+                if name == "session_rollups":
+                    entry.sessions = int(first)
+                elif name == "thought_rollups":
+                    entry.thoughts = int(first)
+                else:
+                    entry.tool_calls, entry.failures = int(first), int(second)
+
+        return AnalyticsReport(
+            sessions=sum(s.sessions for s in templates.values()),
+            max_thoughts=max_thoughts,
+            max_thoughts_sessions=sum(s.max_thoughts_sessions for s in templates.values()),
+            thoughts=sum(s.thoughts for s in templates.values()),
+            chars=sum(s.chars for s in templates.values()),
+            tool_calls=sum(s.calls for s in tools),
+            failures=sum(s.failures for s in tools),
+            phases=dict(sorted(phases.items(), key=lambda item: -item[1])),
+            templates=sorted(templates.values(), key=lambda s: (-s.sessions, s.template_id)),
+            tools=tools[:top],
+            days=sorted(days.values(), key=lambda s: s.day, reverse=True)[:top],
+        )
+
+
+__all__ = [
+    "ANALYTICS_INDEX_PATH",
+    "AnalyticsIndex",
+    "AnalyticsReport",
+    "DayStats",
+    "TemplateStats",
+    "ToolStats",
+    "session_contribution",
+]
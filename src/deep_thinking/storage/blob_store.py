@@ -0,0 +1,333 @@
+"""
+内容寻址存储模块
+
+把较大的工具调用结果从会话文件中移出，按内容的 SHA-256 哈希存储。
+关键特性:
+- 内容寻址：相同内容只存储一份（跨会话去重），文件名即哈希
+- 引用计数：记录每个内容被多少个会话引用，计数由存储管理器在更新索引时维护
+- 垃圾回收：删除没有引用且超过宽限期的内容（宽限期避免删除刚写入、尚未登记引用的内容）
+- 透明压缩：压缩后更小时以压缩格式存储，读取时按魔数识别
+"""
+
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from collections.abc import Iterable, Mapping
+from pathlib import Path
+from typing import Any
+
+from deep_thinking.storage.json_file_store import (
+    COMPRESSION_CODECS,
+    JsonFileStore,
+    compress_bytes,
+    decompress_bytes,
+)
+from deep_thinking.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# 默认的移出阈值（字节）
+DEFAULT_BLOB_THRESHOLD = 64 * 1024
+
+# 没有引用的内容在删除前保留的时间（秒）
+DEFAULT_BLOB_GRACE_SECONDS = 3600.0
+
+# 引用计数文件的键名
+REFS_KEY = "refs"
+
+
+def get_blob_threshold() -> int:
+    """
+    获取工具结果移出阈值
+
+    由环境变量 DEEP_THINKING_BLOB_THRESHOLD 设置（字节，0 表示不移出），无效值回退为默认值。
+
+    Returns:
+        移出阈值（字节）
+    """
+    value = os.getenv("DEEP_THINKING_BLOB_THRESHOLD", str(DEFAULT_BLOB_THRESHOLD))
+    try:
+        return max(0, int(value))
+    except ValueError:
+        logger.warning(f"无效的 DEEP_THINKING_BLOB_THRESHOLD: {value}，使用默认值")
+        return DEFAULT_BLOB_THRESHOLD
+
+
+def encode_blob(value: Any) -> bytes:
+    """
+    序列化内容（紧凑 JSON，保留字典键顺序）
+
+    Args:
+        value: 可JSON序列化的值
+
+    Returns:
+        UTF-8 编码的 JSON
+
+    Raises:
+        TypeError: 数据不可序列化
+    """
+    try:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    except (TypeError, ValueError) as e:
+        raise TypeError(f"数据序列化失败: {e}") from e
+
+
+class BlobStore:
+    """
+    内容寻址存储
+
+    内容保存在 base_dir/<哈希前两位>/<哈希>，引用计数保存在 base_dir/refs.json。
+
+    Attributes:
+        base_dir: 存储目录
+    """
+
+    def __init__(self, base_dir: str | Path, create_dirs: bool = True):
+        """
+        初始化内容寻址存储
+
+        Args:
+            base_dir: 存储目录
+            create_dirs: 是否创建存储目录（目录已存在时可跳过）
+        """
+        self.base_dir = Path(base_dir)
+        self._refs = JsonFileStore(self.base_dir, enable_backup=False, create_dirs=create_dirs)
+
+    def _get_path(self, digest: str) -> Path:
+        """获取内容文件路径"""
+        return self.base_dir / digest[:2] / digest
+
+    def put(self, payload: bytes, created: dict[str, int] | None = None) -> str:
+        """
+        存储内容
+
+        内容已存在时只刷新修改时间（重新进入垃圾回收宽限期）。
+
+        Args:
+            payload: encode_blob 序列化后的内容
+            created: 传入时记录新写入的内容：哈希 -> 写入后的修改时间（纳秒），供 discard 撤销
+
+        Returns:
+            内容的 SHA-256 哈希（十六进制）
+
+        Raises:
+            OSError: 写入失败
+        """
+        digest = hashlib.sha256(payload).hexdigest()
+        path = self._get_path(digest)
+
+        try:
+            os.utime(path)
+            return digest
+        except FileNotFoundError:
+            pass
+
+        packed = compress_bytes(payload, COMPRESSION_CODECS[0])
+        data = packed if len(packed) < len(payload) else payload
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp_")
+        try:
+            with os.fdopen(temp_fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+                mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+            os.replace(temp_path, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(temp_path)
+            raise
+
+        if created is not None:
+            created[digest] = mtime_ns
+        if metrics.enabled:
+            metrics.count_storage("blob_write")
+            metrics.add_bytes(written=len(data))
+        logger.debug(f"写入内容: {digest}（{len(payload)} -> {len(data)} 字节）")
+        return digest
+
+    def discard(self, created: Mapping[str, int]) -> int:
+        """
+        删除新写入但不再需要的内容（如批量写入失败回滚时，持有跨进程锁）
+
+        只删除没有引用、且修改时间仍为写入时记录的值的内容：
+        其间其他会话写入了相同内容（put 会刷新修改时间）时保留，由垃圾回收按宽限期处理。
+
+        Args:
+            created: put 记录的 内容哈希 -> 写入后的修改时间（纳秒）
+
+        Returns:
+            删除的内容数
+        """
+        removed = 0
+        if not created:
+            return removed
+
+        with self._refs.lock(REFS_KEY):
+            refs = self._read_refs()
+            for digest, mtime_ns in created.items():
+                if refs.get(digest, 0) > 0:
+                    continue
+                path = self._get_path(digest)
+                try:
+                    if path.stat().st_mtime_ns != mtime_ns:
+                        continue
+                    path.unlink()
+                except OSError:
+                    continue
+                removed += 1
+
+        logger.debug(f"撤销写入的内容: {removed} 个")
+        return removed
+
+    def get(self, digest: str) -> Any:
+        """
+        读取内容
+
+        Args:
+            digest: 内容哈希
+
+        Returns:
+            反序列化后的值
+
+        Raises:
+            ValueError: 内容不存在或解析失败
+        """
+        try:
+            raw = self._get_path(digest).read_bytes()
+        except FileNotFoundError as e:
+            raise ValueError(f"内容不存在: {digest}") from e
+
+        if metrics.enabled:
+            metrics.count_storage("blob_read")
+            metrics.add_bytes(read=len(raw))
+        try:
+            return json.loads(decompress_bytes(raw))
+        except json.JSONDecodeError as e:
+            raise ValueError(f"JSON解析失败: {e}") from e
+
+    def exists(self, digest: str) -> bool:
+        """
+        检查内容是否存在
+
+        Args:
+            digest: 内容哈希
+
+        Returns:
+            内容是否存在
+        """
+        return self._get_path(digest).exists()
+
+    def _read_refs(self) -> dict[str, int]:
+        """读取引用计数（文件损坏时视为空）"""
+        try:
+            return {str(k): int(v) for k, v in (self._refs.read(REFS_KEY) or {}).items()}
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取引用计数失败: {e}")
+            return {}
+
+    def refcount(self, digest: str) -> int:
+        """
+        获取引用计数
+
+        Args:
+            digest: 内容哈希
+
+        Returns:
+            引用该内容的会话数
+        """
+        return self._read_refs().get(digest, 0)
+
+    def update_refs(self, added: Iterable[str] = (), removed: Iterable[str] = ()) -> None:
+        """
+        更新引用计数（持有跨进程锁）
+
+        Args:
+            added: 新增引用的内容哈希
+            removed: 移除引用的内容哈希
+        """
+        added, removed = list(added), list(removed)
+        if not added and not removed:
+            return
+
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        with self._refs.lock(REFS_KEY):
+            refs = self._read_refs()
+            for digest in added:
+                refs[digest] = refs.get(digest, 0) + 1
+            for digest in removed:
+                count = refs.get(digest, 0) - 1
+                if count > 0:
+                    refs[digest] = count
+                else:
+                    refs.pop(digest, None)
+            self._refs.write(REFS_KEY, refs)
+
+    def rebuild_refs(self, references: Iterable[Iterable[str]]) -> None:
+        """
+        按每个会话引用的内容重建引用计数（如从完整备份恢复后）
+
+        Args:
+            references: 每个会话引用的内容哈希
+        """
+        refs: dict[str, int] = {}
+        for digests in references:
+            for digest in set(digests):
+                refs[digest] = refs.get(digest, 0) + 1
+
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        with self._refs.lock(REFS_KEY):
+            self._refs.write(REFS_KEY, refs)
+
+    def collect_garbage(self, grace_seconds: float = DEFAULT_BLOB_GRACE_SECONDS) -> tuple[int, int]:
+        """
+        删除没有引用且超过宽限期未写入的内容
+
+        Args:
+            grace_seconds: 宽限期（秒）
+
+        Returns:
+            (删除的内容数, 释放的字节数)
+        """
+        removed = 0
+        freed = 0
+        cutoff = time.time() - grace_seconds
+        if not self.base_dir.exists():
+            return removed, freed
+
+        with self._refs.lock(REFS_KEY):
+            refs = self._read_refs()
+            for shard in self.base_dir.iterdir():
+                if not shard.is_dir() or len(shard.name) != 2:
+                    continue
+                for path in shard.iterdir():
+                    if path.name.startswith(".") or refs.get(path.name, 0) > 0:
+                        continue
+                    try:
+                        stat = path.stat()
+                        if stat.st_mtime > cutoff:
+                            continue
+                        path.unlink()
+                    except OSError as e:
+                        logger.warning(f"删除内容失败: {e}")
+                        continue
+                    removed += 1
+                    freed += stat.st_size
+
+        if removed:
+            logger.info(f"回收内容: {removed} 个，释放 {freed} 字节")
+        return removed, freed
+
+
+__all__ = [
+    "DEFAULT_BLOB_GRACE_SECONDS",
+    "DEFAULT_BLOB_THRESHOLD",
+    "BlobStore",
+    "encode_blob",
+    "get_blob_threshold",
+]
@@ -5,29 +5,387 @@ JSON文件存储模块
 关键特性:
 - 原子写入：临时文件+重命名机制
 - 文件锁：跨平台文件锁（fcntl/msvcrt）
+- 跨进程互斥：按键名加锁，多个工作进程的读-改-写串行执行
 - 自动备份：每次写入前自动备份
 - 异常安全：操作失败自动清理
+- 区间读取：可选为列表字段记录字节偏移，按下标读取单个元素而无需解析整个文件
+- 修订标记：文件内容的摘要，随偏移索引一起记录，读取时无需重新计算
+- 透明压缩：超过大小阈值或显式要求时以 zstd（需安装 zstandard）或 gzip 写入，
+  compress 把已有文件就地压缩；读取时按魔数识别（压缩文件不支持区间读取，回退为完整解析）
 """
 
 import contextlib
 import fcntl
+import gzip
+import hashlib
 import json
 import logging
 import os
 import shutil
 import sys
 import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from collections.abc import Iterator, Mapping, Sequence
 from pathlib import Path
-from typing import Any, TypeVar, cast
+from typing import IO, Any, TypeVar, cast
+
+from deep_thinking.utils.metrics import metrics
+from deep_thinking.utils.tracing import span, traced
 
 # Windows专用模块，仅在Windows系统导入
 if sys.platform == "win32":
     import msvcrt  # noqa: F401
 
+# zstd 为可选依赖，未安装时使用标准库 gzip
+try:
+    import zstandard
+
+    _HAS_ZSTD = True
+except ImportError:  # pragma: no cover - 取决于安装环境
+    _HAS_ZSTD = False
+
 logger = logging.getLogger(__name__)
 
 T = TypeVar("T")
 
+# 偏移索引目录名（位于基础目录下）
+RANGES_DIR_NAME = ".ranges"
+
+# 锁文件目录名（位于基础目录下）
+LOCKS_DIR_NAME = ".locks"
+
+# 内存中缓存的偏移索引数量
+_LAYOUT_CACHE_SIZE = 64
+
+# 压缩文件魔数
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# 可用的压缩格式（优先使用第一个）
+COMPRESSION_CODECS: tuple[str, ...] = ("zstd", "gzip") if _HAS_ZSTD else ("gzip",)
+
+# 默认压缩级别
+_DEFAULT_LEVELS = {"zstd": 3, "gzip": 6}
+
+# 默认自动压缩阈值（字节）
+DEFAULT_COMPRESS_THRESHOLD = 1024 * 1024
+
+
+def get_compress_threshold() -> int:
+    """
+    获取自动压缩阈值
+
+    由环境变量 DEEP_THINKING_COMPRESS_THRESHOLD 设置（字节，0 表示不按大小自动压缩），
+    无效值回退为默认值。
+
+    Returns:
+        自动压缩阈值（字节）
+    """
+    value = os.getenv("DEEP_THINKING_COMPRESS_THRESHOLD", str(DEFAULT_COMPRESS_THRESHOLD))
+    try:
+        return max(0, int(value))
+    except ValueError:
+        logger.warning(f"无效的 DEEP_THINKING_COMPRESS_THRESHOLD: {value}，使用默认值")
+        return DEFAULT_COMPRESS_THRESHOLD
+
+
+def detect_compression(raw: bytes) -> str | None:
+    """
+    按魔数识别压缩格式
+
+    Args:
+        raw: 文件内容（至少包含前 4 个字节）
+
+    Returns:
+        压缩格式（zstd/gzip），未压缩时返回None
+    """
+    if raw[:4] == ZSTD_MAGIC:
+        return "zstd"
+    if raw[:2] == GZIP_MAGIC:
+        return "gzip"
+    return None
+
+
+def compress_bytes(raw: bytes, codec: str, level: int | None = None) -> bytes:
+    """
+    压缩数据
+
+    Args:
+        raw: 原始数据
+        codec: 压缩格式（zstd/gzip）
+        level: 压缩级别（默认 zstd 3、gzip 6）
+
+    Returns:
+        压缩后的数据
+
+    Raises:
+        ValueError: 压缩格式不可用
+    """
+    if codec not in COMPRESSION_CODECS:
+        raise ValueError(f"不支持的压缩格式: {codec}（可用: {', '.join(COMPRESSION_CODECS)}）")
+    if level is None:
+        level = _DEFAULT_LEVELS[codec]
+    if codec == "zstd":
+        packed: bytes = zstandard.ZstdCompressor(level=level).compress(raw)
+        return packed
+    return gzip.compress(raw, compresslevel=level, mtime=0)
+
+
+def decompress_bytes(raw: bytes) -> bytes:
+    """
+    解压数据（未压缩的数据原样返回）
+
+    Args:
+        raw: 文件内容
+
+    Returns:
+        解压后的数据
+
+    Raises:
+        ValueError: 解压失败，或文件为 zstd 格式但未安装 zstandard
+    """
+    codec = detect_compression(raw)
+    if codec is None:
+        return raw
+    if codec == "zstd":
+        if not _HAS_ZSTD:
+            raise ValueError("解压失败: 文件为 zstd 格式，需要安装 zstandard")
+        try:
+            data: bytes = zstandard.ZstdDecompressor().decompress(raw)
+        except zstandard.ZstdError as e:
+            raise ValueError(f"解压失败: {e}") from e
+        return data
+    try:
+        return gzip.decompress(raw)
+    except (OSError, EOFError, zlib.error) as e:
+        raise ValueError(f"解压失败: {e}") from e
+
+
+def _content_revision(raw: bytes) -> str:
+    """
+    计算文件内容的修订标记（BLAKE2b 摘要）
+
+    Args:
+        raw: 文件字节内容
+
+    Returns:
+        32 位十六进制摘要
+    """
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def _loads(raw: bytes) -> Any:
+    """
+    解析文件内容（压缩的内容先解压）
+
+    Raises:
+        json.JSONDecodeError: JSON解析失败
+        ValueError: 解压失败
+    """
+    return json.loads(decompress_bytes(raw))
+
+
+def _dumps_nested(value: Any, depth: int) -> str:
+    """按 indent=2 序列化嵌套在 depth 层的值（与整体序列化的对应片段一致）"""
+    text = json.dumps(value, ensure_ascii=False, indent=2)
+    return text.replace("\n", "\n" + "  " * depth) if depth else text
+
+
+def dumps_with_layout(
+    data: dict[str, Any], indexed_fields: Mapping[str, str | None]
+) -> tuple[str, dict[str, Any]]:
+    """
+    序列化JSON并记录字节偏移
+
+    输出与 json.dumps(data, ensure_ascii=False, indent=2) 逐字节一致。
+
+    Args:
+        data: 顶层为字典的数据
+        indexed_fields: 需要记录元素偏移的列表字段 -> 元素键名（None 表示不记录键）
+
+    Returns:
+        (JSON文本, 偏移布局)。布局包含:
+        - fields: 顶层字段 -> [起始, 结束) 字节偏移
+        - items: 列表字段 -> 每个元素的 [起始, 结束) 字节偏移
+        - keys: 列表字段 -> 每个元素的键值
+    """
+    chunks: list[str] = []
+    pos = 0
+
+    def emit(text: str) -> None:
+        nonlocal pos
+        chunks.append(text)
+        pos += len(text.encode("utf-8"))
+
+    fields: dict[str, list[int]] = {}
+    items: dict[str, list[list[int]]] = {}
+    keys: dict[str, list[Any]] = {}
+
+    emit("{")
+    for i, (name, value) in enumerate(data.items()):
+        emit(("," if i else "") + "\n  " + json.dumps(name, ensure_ascii=False) + ": ")
+        start = pos
+        if name in indexed_fields and isinstance(value, list):
+            spans: list[list[int]] = []
+            if value:
+                emit("[")
+                for j, item in enumerate(value):
+                    emit(("," if j else "") + "\n    ")
+                    item_start = pos
+                    emit(_dumps_nested(item, 2))
+                    spans.append([item_start, pos])
+                emit("\n  ]")
+            else:
+                emit("[]")
+            items[name] = spans
+            key_name = indexed_fields[name]
+            if key_name is not None:
+                keys[name] = [
+                    item.get(key_name) if isinstance(item, dict) else None for item in value
+                ]
+        else:
+            emit(_dumps_nested(value, 1))
+        fields[name] = [start, pos]
+    emit("\n}" if data else "}")
+
+    return "".join(chunks), {"fields": fields, "items": items, "keys": keys}
+
+
+class RangeReader:
+    """
+    单个JSON文件的区间读取器
+
+    持有已加锁的文件句柄，所有读取来自同一文件版本。
+    偏移布局有效时按字节区间读取，否则回退为已解析的完整数据。
+    """
+
+    def __init__(
+        self,
+        file_obj: IO[bytes],
+        layout: dict[str, Any] | None,
+        data: dict[str, Any] | None,
+        indexed_fields: Mapping[str, str | None],
+    ):
+        """
+        初始化区间读取器
+
+        Args:
+            file_obj: 已打开的二进制文件对象
+            layout: 偏移布局（None 表示回退模式）
+            data: 回退模式下的完整数据
+            indexed_fields: 列表字段 -> 元素键名
+        """
+        self._file = file_obj
+        self._layout = layout
+        self._data = data or {}
+        self._indexed_fields = indexed_fields
+
+    @property
+    def ranged(self) -> bool:
+        """是否使用字节区间读取"""
+        return self._layout is not None
+
+    def _read_span(self, start: int, end: int) -> Any:
+        """读取并解析一个字节区间"""
+        self._file.seek(start)
+        if metrics.enabled:
+            metrics.add_bytes(read=end - start)
+        return json.loads(self._file.read(end - start))
+
+    def read_fields(self, names: Sequence[str]) -> dict[str, Any]:
+        """
+        读取顶层字段
+
+        Args:
+            names: 字段名列表（不存在的字段会被忽略）
+
+        Returns:
+            字段名 -> 值
+        """
+        result: dict[str, Any] = {}
+        for name in names:
+            if self._layout is None:
+                if name in self._data:
+                    result[name] = self._data[name]
+                continue
+            span = self._layout["fields"].get(name)
+            if span is not None:
+                result[name] = self._read_span(*span)
+        return result
+
+    def item_count(self, field: str) -> int:
+        """
+        获取列表字段的元素数量
+
+        Args:
+            field: 列表字段名
+
+        Returns:
+            元素数量
+        """
+        if self._layout is None:
+            value = self._data.get(field)
+            return len(value) if isinstance(value, list) else 0
+        return len(self._layout["items"].get(field, []))
+
+    def item_keys(self, field: str) -> list[Any]:
+        """
+        获取列表字段每个元素的键值（不读取元素内容）
+
+        Args:
+            field: 列表字段名
+
+        Returns:
+            键值列表，与元素下标一一对应
+        """
+        if self._layout is None:
+            key_name = self._indexed_fields.get(field)
+            value = self._data.get(field)
+            if key_name is None or not isinstance(value, list):
+                return []
+            return [item.get(key_name) if isinstance(item, dict) else None for item in value]
+        return list(self._layout["keys"].get(field, []))
+
+    def read_items(self, field: str, indices: Sequence[int]) -> list[Any]:
+        """
+        按下标读取列表字段的元素
+
+        连续下标合并为一次读取。
+
+        Args:
+            field: 列表字段名
+            indices: 元素下标（升序）
+
+        Returns:
+            元素列表（越界下标被忽略）
+        """
+        if self._layout is None:
+            value = self._data.get(field)
+            if not isinstance(value, list):
+                return []
+            return [value[i] for i in indices if 0 <= i < len(value)]
+
+        spans = self._layout["items"].get(field, [])
+        valid = [i for i in indices if 0 <= i < len(spans)]
+        if not valid:
+            return []
+
+        if valid == list(range(valid[0], valid[-1] + 1)):
+            block_start = spans[valid[0]][0]
+            self._file.seek(block_start)
+            block = self._file.read(spans[valid[-1]][1] - block_start)
+            if metrics.enabled:
+                metrics.add_bytes(read=len(block))
+            return [
+                json.loads(block[spans[i][0] - block_start : spans[i][1] - block_start])
+                for i in valid
+            ]
+
+        return [self._read_span(*spans[i]) for i in valid]
+
 
 class JsonFileStore:
     """
@@ -40,6 +398,8 @@ class JsonFileStore:
         backup_dir: 备份目录路径
         enable_backup: 是否启用自动备份
         enable_lock: 是否启用文件锁
+        compression: 压缩格式（zstd/gzip）
+        compress_threshold: 自动压缩阈值（字节，0 表示不按大小自动压缩）
     """
 
     def __init__(
@@ -48,6 +408,10 @@ class JsonFileStore:
         backup_dir: str | Path | None = None,
         enable_backup: bool = True,
         enable_lock: bool = True,
+        indexed_fields: Mapping[str, str | None] | None = None,
+        create_dirs: bool = True,
+        compression: str | None = None,
+        compress_threshold: int = 0,
     ):
         """
         初始化JSON文件存储
@@ -57,13 +421,39 @@ class JsonFileStore:
             backup_dir: 备份目录路径（默认为base_dir/.backups）
             enable_backup: 是否启用自动备份
             enable_lock: 是否启用文件锁
+            indexed_fields: 写入时记录元素偏移的列表字段 -> 元素键名（可选）
+            create_dirs: 是否创建基础目录和备份目录（目录已存在时可跳过）
+            compression: 压缩格式（默认优先 zstd，未安装 zstandard 时使用 gzip）
+            compress_threshold: 序列化结果达到该字节数时压缩写入（0 表示不按大小自动压缩）
+
+        Raises:
+            ValueError: 压缩格式不可用
         """
+        if compression is None:
+            compression = COMPRESSION_CODECS[0]
+        if compression not in COMPRESSION_CODECS:
+            raise ValueError(
+                f"不支持的压缩格式: {compression}（可用: {', '.join(COMPRESSION_CODECS)}）"
+            )
+
         self.base_dir = Path(base_dir)
         self.enable_backup = enable_backup
         self.enable_lock = enable_lock
+        self.indexed_fields: dict[str, str | None] = dict(indexed_fields or {})
+        self.compression = compression
+        self.compress_threshold = compress_threshold
+        self.ranges_dir = self.base_dir / RANGES_DIR_NAME
+        self.locks_dir = self.base_dir / LOCKS_DIR_NAME
+
+        # 当前线程持有的键锁及嵌套深度（同一线程重复加锁时直接进入）
+        self._held_locks = threading.local()
+
+        # 键名 -> (文件状态标记, 修订标记, 偏移布局)
+        self._layouts: OrderedDict[str, tuple[str, str, dict[str, Any] | None]] = OrderedDict()
 
         # 创建基础目录
-        self.base_dir.mkdir(parents=True, exist_ok=True)
+        if create_dirs:
+            self.base_dir.mkdir(parents=True, exist_ok=True)
 
         # 设置备份目录
         if backup_dir is None:
@@ -71,7 +461,7 @@ class JsonFileStore:
         else:
             self.backup_dir = Path(backup_dir)
 
-        if enable_backup:
+        if enable_backup and create_dirs:
             self.backup_dir.mkdir(parents=True, exist_ok=True)
 
     def _get_file_path(self, key: str) -> Path:
@@ -98,6 +488,18 @@ class JsonFileStore:
         """
         return self.backup_dir / f"{key}.json"
 
+    def _get_ranges_path(self, key: str) -> Path:
+        """
+        获取偏移索引文件路径
+
+        Args:
+            key: 文件键名
+
+        Returns:
+            偏移索引文件完整路径
+        """
+        return self.ranges_dir / f"{key}.json"
+
     def _acquire_lock(self, file_obj: Any) -> None:
         """
         获取文件锁
@@ -140,6 +542,41 @@ class JsonFileStore:
                 with contextlib.suppress(AttributeError, OSError):
                     msvcrt.locking(file_obj.fileno(), msvcrt.LK_UNLOCK, 1)  # type: ignore[attr-defined]
 
+    @contextlib.contextmanager
+    def lock(self, key: str) -> Iterator[None]:
+        """
+        获取键名的跨进程独占锁（可重入）
+
+        锁定 .locks/ 下的专用锁文件而不是数据文件：原子写入会替换数据文件，
+        加在旧文件上的锁无法让后续的读-改-写互斥。
+        同一线程嵌套获取同一键名的锁时直接进入。
+
+        Args:
+            key: 文件键名
+
+        Yields:
+            None
+        """
+        depths: dict[str, int] = self._held_locks.__dict__.setdefault("depths", {})
+        if depths.get(key):
+            depths[key] += 1
+            try:
+                yield
+            finally:
+                depths[key] -= 1
+            return
+
+        self.locks_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.locks_dir / f"{key}.lock", "a+b") as f:
+            self._acquire_lock(f)
+            depths[key] = 1
+            try:
+                yield
+            finally:
+                del depths[key]
+                self._release_lock(f)
+
+    @traced("store.backup")
     def _create_backup(self, key: str) -> None:
         """
         创建备份文件
@@ -160,7 +597,7 @@ class JsonFileStore:
             except OSError as e:
                 logger.warning(f"创建备份失败: {e}")
 
-    def _atomic_write(self, file_path: Path, data: str) -> None:
+    def _atomic_write(self, file_path: Path, data: str | bytes, fsync: bool = True) -> str:
         """
         原子写入文件
 
@@ -168,20 +605,36 @@ class JsonFileStore:
 
         Args:
             file_path: 目标文件路径
-            data: 要写入的数据
+            data: 要写入的数据（文本按 UTF-8 编码）
+            fsync: 重命名前是否将数据刷新到磁盘（可重建的辅助文件不需要）
+
+        Returns:
+            写入后文件的状态标记（重命名不改变 inode 和修改时间）
         """
         # 创建临时文件
-        temp_fd, temp_path = tempfile.mkstemp(dir=self.base_dir, prefix=".tmp_", suffix=".json")
+        temp_fd, temp_path = tempfile.mkstemp(dir=file_path.parent, prefix=".tmp_", suffix=".json")
 
         try:
-            # 写入数据到临时文件
-            with os.fdopen(temp_fd, "w", encoding="utf-8") as f:
-                f.write(data)
+            # 写入数据到临时文件（不转换换行符，保证字节偏移一致）
+            with os.fdopen(temp_fd, "wb") as f:
+                f.write(data.encode("utf-8") if isinstance(data, str) else data)
                 f.flush()
-                os.fsync(f.fileno())
+                if fsync:
+                    with span("store.fsync"):
+                        if metrics.enabled:
+                            started = time.perf_counter()
+                            os.fsync(f.fileno())
+                            metrics.observe_fsync(time.perf_counter() - started)
+                        else:
+                            os.fsync(f.fileno())
+                stat = os.fstat(f.fileno())
+                token = self._stat_token(stat)
+                if metrics.enabled:
+                    metrics.add_bytes(written=stat.st_size)
 
             # 原子重命名
             os.replace(temp_path, file_path)
+            return token
 
         except Exception:
             # 清理临时文件
@@ -189,6 +642,7 @@ class JsonFileStore:
                 os.unlink(temp_path)
             raise
 
+    @traced("store.read")
     def read(self, key: str) -> dict[str, Any] | None:
         """
         读取JSON文件
@@ -209,10 +663,14 @@ class JsonFileStore:
             return None
 
         try:
-            with open(file_path, encoding="utf-8") as f:
+            with open(file_path, "rb") as f:
                 self._acquire_lock(f)
                 try:
-                    data: dict[str, Any] = cast(dict[str, Any], json.load(f))
+                    raw = f.read()
+                    data: dict[str, Any] = cast(dict[str, Any], _loads(raw))
+                    if metrics.enabled:
+                        metrics.count_storage("read")
+                        metrics.add_bytes(read=len(raw))
                     return data
                 finally:
                     self._release_lock(f)
@@ -223,13 +681,19 @@ class JsonFileStore:
             logger.error(f"读取文件失败: {e}")
             raise
 
-    def write(self, key: str, data: dict[str, Any] | list[Any]) -> None:
+    @traced("store.write")
+    def write(
+        self, key: str, data: dict[str, Any] | list[Any], compress: bool | None = None
+    ) -> None:
         """
         写入JSON文件（原子写入）
 
+        压缩后不小于原内容时按未压缩写入。
+
         Args:
             key: 文件键名
             data: 要写入的数据
+            compress: 是否压缩写入（None 表示序列化结果达到自动压缩阈值时压缩）
 
         Raises:
             OSError: 写入失败
@@ -237,23 +701,44 @@ class JsonFileStore:
         """
         file_path = self._get_file_path(key)
 
+        if metrics.enabled:
+            metrics.count_storage("write")
+
         # 创建备份
         self._create_backup(key)
 
         # 序列化数据
+        layout: dict[str, Any] | None = None
         try:
-            json_str = json.dumps(data, ensure_ascii=False, indent=2)
+            if self.indexed_fields and isinstance(data, dict):
+                json_str, layout = dumps_with_layout(data, self.indexed_fields)
+            else:
+                json_str = json.dumps(data, ensure_ascii=False, indent=2)
         except (TypeError, ValueError) as e:
             raise TypeError(f"数据序列化失败: {e}") from e
 
+        payload = json_str.encode("utf-8")
+        if compress is None:
+            compress = 0 < self.compress_threshold <= len(payload)
+        if compress:
+            packed = compress_bytes(payload, self.compression)
+            if len(packed) < len(payload):
+                payload = packed
+                layout = None
+                if metrics.enabled:
+                    metrics.count_storage("compress")
+
         # 原子写入
         try:
-            self._atomic_write(file_path, json_str)
+            token = self._atomic_write(file_path, payload)
             logger.debug(f"写入文件成功: {file_path}")
         except OSError as e:
             logger.error(f"写入文件失败: {e}")
             raise
 
+        self._save_layout(key, token, _content_revision(payload), layout)
+
+    @traced("store.delete")
     def delete(self, key: str) -> bool:
         """
         删除JSON文件
@@ -275,6 +760,9 @@ class JsonFileStore:
 
             # 删除文件
             file_path.unlink()
+            self._drop_layout(key)
+            if metrics.enabled:
+                metrics.count_storage("delete")
             logger.debug(f"删除文件成功: {file_path}")
             return True
 
@@ -294,6 +782,251 @@ class JsonFileStore:
         """
         return self._get_file_path(key).exists()
 
+    def size(self, key: str) -> int:
+        """
+        获取文件大小
+
+        Args:
+            key: 文件键名
+
+        Returns:
+            文件字节数，文件不存在时返回0
+        """
+        try:
+            return self._get_file_path(key).stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def revision(self, key: str) -> str | None:
+        """
+        获取文件修订标记（文件内容的摘要）
+
+        inode、修改时间和大小在原子替换后可能不变（inode 复用、时间戳精度不足），
+        不能单独作为修订标记。写入时把内容摘要与文件状态一起记在偏移索引文件中，
+        文件状态一致时直接返回记录的摘要（每次从磁盘读取，其他进程的写入立即可见）；
+        未记录（未启用偏移索引、旧文件或被外部修改）时读取文件计算摘要。
+
+        Args:
+            key: 文件键名
+
+        Returns:
+            修订标记，文件不存在时返回None
+        """
+        try:
+            with open(self._get_file_path(key), "rb") as f:
+                token = self._stat_token(os.fstat(f.fileno()))
+                stored = self._read_layout_file(key)
+                if stored is not None and stored.get("stat") == token:
+                    return str(stored["revision"])
+                raw = f.read()
+        except FileNotFoundError:
+            return None
+        return _content_revision(raw)
+
+    @staticmethod
+    def _stat_token(stat: os.stat_result) -> str:
+        """由文件状态生成状态标记（用于判断偏移索引是否对应当前文件）"""
+        return f"{stat.st_ino:x}-{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+    @contextlib.contextmanager
+    def open_range(self, key: str) -> Iterator[RangeReader | None]:
+        """
+        打开区间读取器
+
+        持有文件锁直到退出上下文。偏移索引缺失或与文件状态不一致时，
+        解析完整文件；若文件内容与重新序列化的结果一致则重建偏移索引。
+
+        Args:
+            key: 文件键名
+
+        Yields:
+            区间读取器，文件不存在时为None
+
+        Raises:
+            ValueError: JSON解析失败
+        """
+        file_path = self._get_file_path(key)
+
+        with contextlib.ExitStack() as stack:
+            try:
+                f = stack.enter_context(open(file_path, "rb"))
+            except FileNotFoundError:
+                yield None
+                return
+
+            self._acquire_lock(f)
+            try:
+                token = self._stat_token(os.fstat(f.fileno()))
+                stored = self._load_layout(key, token)
+                layout = None if stored is None else stored[1]
+                data: dict[str, Any] | None = None
+
+                if metrics.enabled:
+                    metrics.count_storage("range_read")
+
+                if layout is None:
+                    raw = f.read()
+                    if metrics.enabled:
+                        metrics.add_bytes(read=len(raw))
+                    try:
+                        data = cast(dict[str, Any], _loads(raw))
+                    except json.JSONDecodeError as e:
+                        raise ValueError(f"JSON解析失败: {e}") from e
+                    if stored is None and self.indexed_fields:
+                        if detect_compression(raw) is None:
+                            layout = self._rebuild_layout(raw, data)
+                        self._save_layout(key, token, _content_revision(raw), layout)
+
+                yield RangeReader(f, layout, data, self.indexed_fields)
+            finally:
+                self._release_lock(f)
+
+    def _read_layout_file(self, key: str) -> dict[str, Any] | None:
+        """读取偏移索引文件（不存在或无法解析时返回None）"""
+        if not self.indexed_fields:
+            return None
+
+        try:
+            with open(self._get_ranges_path(key), encoding="utf-8") as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return stored if isinstance(stored, dict) and "stat" in stored else None
+
+    def _load_layout(self, key: str, token: str) -> tuple[str, dict[str, Any] | None] | None:
+        """加载与文件状态一致的 (修订标记, 偏移布局)（内存缓存优先）"""
+        if not self.indexed_fields:
+            return None
+
+        cached = self._layouts.get(key)
+        if cached is not None and cached[0] == token:
+            self._layouts.move_to_end(key)
+            if metrics.enabled:
+                metrics.count_cache("layout", "hit")
+            return cached[1], cached[2]
+
+        stored = self._read_layout_file(key)
+        if stored is None or stored["stat"] != token:
+            if metrics.enabled:
+                metrics.count_cache("layout", "miss")
+            return None
+
+        revision = str(stored["revision"])
+        layout = cast(dict[str, Any] | None, stored["layout"])
+        self._cache_layout(key, token, revision, layout)
+        if metrics.enabled:
+            metrics.count_cache("layout", "disk_hit")
+        return revision, layout
+
+    def _rebuild_layout(self, raw: bytes, data: Any) -> dict[str, Any] | None:
+        """为旧文件重建偏移布局（仅当文件内容与重新序列化结果一致时）"""
+        if not isinstance(data, dict):
+            return None
+
+        try:
+            text, layout = dumps_with_layout(data, self.indexed_fields)
+        except (TypeError, ValueError):
+            return None
+
+        if text.encode("utf-8") != raw:
+            return None
+        return layout
+
+    def _save_layout(
+        self, key: str, token: str, revision: str, layout: dict[str, Any] | None
+    ) -> None:
+        """
+        保存文件状态标记、修订标记和偏移布局（压缩文件的布局为None）
+
+        未启用偏移索引时不保存。失败只记录警告，读取时回退为完整解析。
+        原子写入但不刷新到磁盘：崩溃后内容丢失或与会话文件不一致时，
+        读取会校验状态标记并回退为完整解析，不需要为它多一次 fsync。
+        """
+        if not self.indexed_fields:
+            return
+        self._cache_layout(key, token, revision, layout)
+
+        try:
+            self.ranges_dir.mkdir(parents=True, exist_ok=True)
+            payload = json.dumps(
+                {"stat": token, "revision": revision, "layout": layout}, separators=(",", ":")
+            )
+            self._atomic_write(self._get_ranges_path(key), payload, fsync=False)
+        except OSError as e:
+            logger.warning(f"写入偏移索引失败: {e}")
+
+    def _cache_layout(
+        self, key: str, token: str, revision: str, layout: dict[str, Any] | None
+    ) -> None:
+        """缓存偏移布局"""
+        self._layouts[key] = (token, revision, layout)
+        self._layouts.move_to_end(key)
+        while len(self._layouts) > _LAYOUT_CACHE_SIZE:
+            self._layouts.popitem(last=False)
+
+    def _drop_layout(self, key: str) -> None:
+        """删除偏移布局"""
+        self._layouts.pop(key, None)
+        with contextlib.suppress(OSError):
+            self._get_ranges_path(key).unlink()
+
+    def is_compressed(self, key: str) -> bool:
+        """
+        检查文件是否已压缩
+
+        Args:
+            key: 文件键名
+
+        Returns:
+            文件以压缩格式存储时返回True（文件不存在时返回False）
+        """
+        try:
+            with open(self._get_file_path(key), "rb") as f:
+                return detect_compression(f.read(4)) is not None
+        except FileNotFoundError:
+            return False
+
+    @traced("store.compress")
+    def compress(self, key: str, level: int | None = None) -> tuple[int, int]:
+        """
+        把文件就地改写为压缩格式（持有键名锁，原子替换）
+
+        内容不变，不创建备份；之后的写入是否压缩由 write 决定。
+        压缩后不小于原文件时保持原样。
+
+        Args:
+            key: 文件键名
+            level: 压缩级别（默认 zstd 3、gzip 6）
+
+        Returns:
+            (压缩前字节数, 压缩后字节数)，文件不存在、已压缩或压缩无收益时返回 (0, 0)
+
+        Raises:
+            OSError: 写入失败
+        """
+        file_path = self._get_file_path(key)
+
+        with self.lock(key):
+            try:
+                raw = file_path.read_bytes()
+            except FileNotFoundError:
+                return 0, 0
+            if detect_compression(raw) is not None:
+                return 0, 0
+
+            compressed = compress_bytes(raw, self.compression, level)
+            if len(compressed) >= len(raw):
+                return 0, 0
+
+            token = self._atomic_write(file_path, compressed)
+            self._save_layout(key, token, _content_revision(compressed), None)
+
+        if metrics.enabled:
+            metrics.count_storage("compress")
+            metrics.add_bytes(read=len(raw))
+        logger.debug(f"压缩文件: {file_path}（{len(raw)} -> {len(compressed)} 字节）")
+        return len(raw), len(compressed)
+
     def list_keys(self) -> list[str]:
         """
         列出所有文件键名
@@ -342,20 +1075,60 @@ class JsonFileStore:
         Returns:
             清理的文件数量
         """
-        import time
+        cleared, _ = self.prune_backups(older_than_days=older_than_days)
 
-        cutoff_time = time.time() - (older_than_days * 86400)
-        cleared = 0
+        if cleared > 0:
+            logger.info(f"清理了 {cleared} 个旧备份文件")
 
+        return cleared
+
+    def prune_backups(
+        self,
+        older_than_days: float | None = None,
+        max_total_bytes: int | None = None,
+    ) -> tuple[int, int]:
+        """
+        按保留策略清理备份文件
+
+        先删除早于指定天数的备份，再按修改时间从旧到新删除，直到备份总大小不超过上限。
+
+        Args:
+            older_than_days: 删除多少天前的备份（None 表示不按时间清理）
+            max_total_bytes: 备份总大小上限（None 表示不限制）
+
+        Returns:
+            (删除的文件数, 释放的字节数)
+        """
+        backups: list[tuple[float, int, Path]] = []
         for backup_path in self.backup_dir.glob("*.json"):
             try:
-                if backup_path.stat().st_mtime < cutoff_time:
-                    backup_path.unlink()
-                    cleared += 1
+                stat = backup_path.stat()
             except OSError as e:
                 logger.warning(f"清理备份失败 {backup_path}: {e}")
+                continue
+            backups.append((stat.st_mtime, stat.st_size, backup_path))
+        backups.sort()
+
+        cutoff_time = None if older_than_days is None else time.time() - older_than_days * 86400
+        total = sum(size for _, size, _ in backups)
+        removed = 0
+        freed = 0
+
+        for mtime, size, backup_path in backups:
+            expired = cutoff_time is not None and mtime < cutoff_time
+            over_limit = max_total_bytes is not None and total > max_total_bytes
+            if not expired and not over_limit:
+                # 按修改时间排序，之后的备份都更新
+                break
+            try:
+                backup_path.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"清理备份失败 {backup_path}: {e}")
+                continue
+            total -= size
+            removed += 1
+            freed += size
 
-        if cleared > 0:
-            logger.info(f"清理了 {cleared} 个旧备份文件")
-
-        return cleared
+        return removed, freed
@@ -1,11 +1,13 @@
 """
 数据迁移模块
 
-提供从旧存储位置（./.deepthinking/）迁移到新位置（~/.deepthinking/）的功能。
+提供从旧存储位置（./.deepthinking/）迁移到新位置（~/.deepthinking/）的功能，
+以及存储版本标记：数据目录准备完成后写入标记，之后的启动只需检查标记是否存在。
 """
 
 import logging
 import shutil
+from collections.abc import Callable
 from datetime import datetime
 from pathlib import Path
 
@@ -28,6 +30,88 @@ OLD_DATA_DIR = get_old_data_dir()
 # 迁移状态文件
 MIGRATION_MARKER = ".migration_completed"
 
+# 存储格式版本（数据目录结构变化时递增，旧版本的数据目录在下次启动时重新准备）
+STORE_VERSION = 1
+
+# 存储版本标记文件名前缀（位于 sessions/ 下，文件名带版本号，检查只需一次 stat）
+STORE_MARKER_PREFIX = ".store_v"
+
+
+def get_store_marker(data_dir: Path) -> Path:
+    """
+    获取当前存储版本的标记文件路径
+
+    Args:
+        data_dir: 数据目录路径
+
+    Returns:
+        标记文件路径
+    """
+    return data_dir / "sessions" / f"{STORE_MARKER_PREFIX}{STORE_VERSION}"
+
+
+def is_store_ready(data_dir: Path) -> bool:
+    """
+    检查数据目录是否已按当前存储版本准备完成
+
+    Args:
+        data_dir: 数据目录路径
+
+    Returns:
+        存在当前版本的标记时返回True
+    """
+    return get_store_marker(data_dir).exists()
+
+
+def mark_store_ready(data_dir: Path) -> Path:
+    """
+    写入当前存储版本标记，删除旧版本标记
+
+    Args:
+        data_dir: 数据目录路径
+
+    Returns:
+        标记文件路径
+    """
+    marker = get_store_marker(data_dir)
+    marker.parent.mkdir(parents=True, exist_ok=True)
+    for old_marker in marker.parent.glob(f"{STORE_MARKER_PREFIX}*"):
+        if old_marker != marker:
+            old_marker.unlink(missing_ok=True)
+    marker.write_text(
+        f"version: {STORE_VERSION}\nprepared_at: {datetime.now().isoformat()}\n",
+        encoding="utf-8",
+    )
+    return marker
+
+
+def has_sessions(data_dir: Path) -> bool:
+    """
+    检查数据目录中是否已有会话文件（索引和标记不计入）
+
+    Args:
+        data_dir: 数据目录路径
+
+    Returns:
+        存在会话文件时返回True
+    """
+    sessions_dir = data_dir / "sessions"
+    return sessions_dir.exists() and any(
+        not path.name.startswith(".") for path in sessions_dir.glob("*.json")
+    )
+
+
+def _copy_tree(src: Path, dst: Path, progress: Callable[[int, int], None] | None) -> None:
+    """逐个复制目录中的文件，每复制一个文件报告一次进度"""
+    files = [path for path in src.rglob("*") if path.is_file()]
+    dst.mkdir(parents=True, exist_ok=True)
+    for done, path in enumerate(files, 1):
+        target = dst / path.relative_to(src)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(path, target)
+        if progress is not None:
+            progress(done, len(files))
+
 
 def detect_old_data() -> bool:
     """
@@ -87,13 +171,18 @@ def create_migration_backup(backup_dir: Path | None = None) -> Path | None:
         return None
 
 
-def migrate_data(target_dir: Path, force: bool = False) -> bool:
+def migrate_data(
+    target_dir: Path,
+    force: bool = False,
+    progress: Callable[[int, int], None] | None = None,
+) -> bool:
     """
     迁移数据到新位置
 
     Args:
         target_dir: 目标目录路径
         force: 是否强制迁移（覆盖已有数据）
+        progress: 进度回调 (已复制文件数, 文件总数)
 
     Returns:
         是否成功迁移
@@ -127,7 +216,7 @@ def migrate_data(target_dir: Path, force: bool = False) -> bool:
             sessions_dst = target_dir / "sessions"
             if sessions_dst.exists():
                 shutil.rmtree(sessions_dst)
-            shutil.copytree(sessions_src, sessions_dst)
+            _copy_tree(sessions_src, sessions_dst, progress)
 
         # 迁移索引文件
         index_src = OLD_DATA_DIR / "sessions" / ".index.json"
@@ -0,0 +1,347 @@
+"""
+数据保留与压缩模块
+
+后台维护服务按保留策略回收数据目录的空间。
+关键特性:
+- 归档：已完成且超过 N 天未更新的会话标记为已归档（默认不启用）
+- 压缩：把仍未压缩的已归档会话文件（如之前未启用压缩时归档的会话）就地压缩（读取时自动识别）
+- 备份清理：删除超过 N 天的逐次写入备份，并把备份总大小限制在上限内（默认不启用）
+- 完整备份保留：create_backup 创建的备份只保留最新的 K 个（默认不启用）
+- 内容回收：删除没有会话引用的工具调用结果（内容寻址存储）
+- I/O 限速：归档改写和压缩按字节速率限速，每处理一个会话检查一次停止标志，不与前台工具调用争抢磁盘
+- 每次运行返回回收报告（归档数、压缩节省的字节数、删除的备份数和释放的字节数）
+
+服务在独立线程中运行一轮维护，事件循环只负责定时调度。
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+from deep_thinking.storage.blob_store import DEFAULT_BLOB_GRACE_SECONDS
+from deep_thinking.storage.storage_manager import StorageManager
+
+logger = logging.getLogger(__name__)
+
+# 默认维护间隔（秒）
+DEFAULT_MAINTENANCE_INTERVAL = 3600.0
+
+# 默认保留策略：归档、备份清理和完整备份清理会改变或删除数据，默认不启用，需要显式配置
+DEFAULT_ARCHIVE_AFTER_DAYS = 0.0
+DEFAULT_BACKUP_MAX_AGE_DAYS = 0.0
+DEFAULT_BACKUP_MAX_BYTES = 0
+DEFAULT_SNAPSHOT_KEEP = 0
+DEFAULT_IO_BYTES_PER_SECOND = 8 * 1024 * 1024
+
+
+@dataclass
+class RetentionPolicy:
+    """
+    保留策略（数值为 0 表示禁用对应策略）
+
+    归档、备份清理和完整备份清理默认禁用；压缩已归档的会话和回收没有引用的工具调用结果默认启用。
+
+    Attributes:
+        archive_after_days: 已完成会话超过多少天未更新后归档
+        compress_archived: 是否压缩已归档的会话
+        backup_max_age_days: 逐次写入备份的最长保留天数
+        backup_max_bytes: 逐次写入备份的总大小上限
+        snapshot_keep: 保留的完整备份个数
+        io_bytes_per_second: 归档改写和压缩的 I/O 速率上限（字节/秒）
+        blob_grace_seconds: 没有引用的工具调用结果在回收前保留的时间（秒）
+    """
+
+    archive_after_days: float = DEFAULT_ARCHIVE_AFTER_DAYS
+    compress_archived: bool = True
+    backup_max_age_days: float = DEFAULT_BACKUP_MAX_AGE_DAYS
+    backup_max_bytes: int = DEFAULT_BACKUP_MAX_BYTES
+    snapshot_keep: int = DEFAULT_SNAPSHOT_KEEP
+    io_bytes_per_second: int = DEFAULT_IO_BYTES_PER_SECOND
+    blob_grace_seconds: float = DEFAULT_BLOB_GRACE_SECONDS
+
+
+@dataclass
+class RetentionReport:
+    """
+    一轮维护的回收报告
+
+    Attributes:
+        archived: 归档的会话数
+        compressed: 压缩的会话数
+        compressed_bytes_saved: 压缩节省的字节数
+        backups_removed: 删除的逐次写入备份数
+        backup_bytes_freed: 删除逐次写入备份释放的字节数
+        snapshots_removed: 删除的完整备份数
+        snapshot_bytes_freed: 删除完整备份释放的字节数
+        blobs_removed: 回收的工具调用结果数
+        blob_bytes_freed: 回收工具调用结果释放的字节数
+        errors: 处理失败的项目（项目 -> 错误信息）
+        stopped: 是否因服务停止而提前结束
+        elapsed_seconds: 耗时（秒）
+    """
+
+    archived: int = 0
+    compressed: int = 0
+    compressed_bytes_saved: int = 0
+    backups_removed: int = 0
+    backup_bytes_freed: int = 0
+    snapshots_removed: int = 0
+    snapshot_bytes_freed: int = 0
+    blobs_removed: int = 0
+    blob_bytes_freed: int = 0
+    errors: dict[str, str] = field(default_factory=dict)
+    stopped: bool = False
+    elapsed_seconds: float = 0.0
+
+    @property
+    def reclaimed_bytes(self) -> int:
+        """回收的总字节数"""
+        return (
+            self.compressed_bytes_saved
+            + self.backup_bytes_freed
+            + self.snapshot_bytes_freed
+            + self.blob_bytes_freed
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        转换为字典格式
+
+        Returns:
+            包含所有字段和回收总字节数的字典
+        """
+        return {
+            "archived": self.archived,
+            "compressed": self.compressed,
+            "compressed_bytes_saved": self.compressed_bytes_saved,
+            "backups_removed": self.backups_removed,
+            "backup_bytes_freed": self.backup_bytes_freed,
+            "snapshots_removed": self.snapshots_removed,
+            "snapshot_bytes_freed": self.snapshot_bytes_freed,
+            "blobs_removed": self.blobs_removed,
+            "blob_bytes_freed": self.blob_bytes_freed,
+            "reclaimed_bytes": self.reclaimed_bytes,
+            "errors": dict(self.errors),
+            "stopped": self.stopped,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+        }
+
+
+class IoRateLimiter:
+    """
+    字节速率限制器
+
+    记录已处理的字节数，超出速率时休眠到平均速率回到上限以内。
+    """
+
+    def __init__(self, bytes_per_second: int, stop_event: threading.Event | None = None):
+        """
+        初始化限速器
+
+        Args:
+            bytes_per_second: 速率上限（0 表示不限速）
+            stop_event: 停止标志（设置后休眠立即结束）
+        """
+        self.bytes_per_second = bytes_per_second
+        self._stop_event = stop_event or threading.Event()
+        self._started = time.monotonic()
+        self._consumed = 0
+
+    def consume(self, count: int) -> None:
+        """
+        记录处理的字节数，必要时休眠
+
+        Args:
+            count: 字节数
+        """
+        if self.bytes_per_second <= 0:
+            return
+        self._consumed += count
+        delay = self._consumed / self.bytes_per_second - (time.monotonic() - self._started)
+        if delay > 0:
+            self._stop_event.wait(delay)
+
+
+class RetentionService:
+    """
+    数据保留与压缩服务
+
+    Attributes:
+        manager: 存储管理器
+        policy: 保留策略
+        last_report: 最近一轮维护的报告
+    """
+
+    def __init__(self, manager: StorageManager, policy: RetentionPolicy | None = None):
+        """
+        初始化服务
+
+        Args:
+            manager: 存储管理器
+            policy: 保留策略（默认使用默认策略）
+        """
+        self.manager = manager
+        self.policy = policy or RetentionPolicy()
+        self.last_report: RetentionReport | None = None
+        self._stop_event = threading.Event()
+        self._run_lock = threading.Lock()
+
+    def stop(self) -> None:
+        """请求停止（正在进行的一轮维护在处理完当前会话后结束）"""
+        self._stop_event.set()
+
+    def run_once(self, now: datetime | None = None) -> RetentionReport:
+        """
+        执行一轮维护（同步，应在线程中调用；同一时间只执行一轮）
+
+        Args:
+            now: 当前时间（默认当前UTC时间）
+
+        Returns:
+            回收报告
+        """
+        with self._run_lock:
+            report = self._run(now or datetime.now(timezone.utc))
+        self.last_report = report
+
+        if report.reclaimed_bytes or report.archived:
+            logger.info(
+                f"数据维护完成: 归档 {report.archived} 个会话，压缩 {report.compressed} 个会话，"
+                f"删除 {report.backups_removed} 个备份文件和 {report.snapshots_removed} 个完整备份，"
+                f"回收 {report.blobs_removed} 个工具调用结果，"
+                f"回收 {report.reclaimed_bytes} 字节"
+            )
+        else:
+            logger.debug("数据维护完成: 没有需要回收的数据")
+        for item, error in report.errors.items():
+            logger.warning(f"数据维护失败 {item}: {error}")
+        return report
+
+    def _run(self, now: datetime) -> RetentionReport:
+        started = time.perf_counter()
+        report = RetentionReport()
+        policy = self.policy
+        limiter = IoRateLimiter(policy.io_bytes_per_second, self._stop_event)
+
+        if policy.archive_after_days > 0:
+            cutoff = now - timedelta(days=policy.archive_after_days)
+            for session_id in self.manager.find_session_ids(
+                status="completed", updated_before=cutoff
+            ):
+                if self._stop_event.is_set():
+                    break
+                try:
+                    rewritten = self._archive(session_id, cutoff)
+                except Exception as e:
+                    report.errors[session_id] = str(e)
+                    continue
+                if rewritten is not None:
+                    report.archived += 1
+                    limiter.consume(rewritten)
+
+        if policy.compress_archived:
+            for session_id in self.manager.find_session_ids(status="archived"):
+                if self._stop_event.is_set():
+                    break
+                try:
+                    if self.manager.store.is_compressed(session_id):
+                        continue
+                    before, after = self.manager.store.compress(session_id)
+                except Exception as e:
+                    report.errors[session_id] = str(e)
+                    continue
+                if before:
+                    report.compressed += 1
+                    report.compressed_bytes_saved += before - after
+                    limiter.consume(before + after)
+
+        if not self._stop_event.is_set() and (
+            policy.backup_max_age_days > 0 or policy.backup_max_bytes > 0
+        ):
+            report.backups_removed, report.backup_bytes_freed = self.manager.store.prune_backups(
+                older_than_days=policy.backup_max_age_days or None,
+                max_total_bytes=policy.backup_max_bytes or None,
+            )
+
+        if not self._stop_event.is_set() and policy.snapshot_keep > 0:
+            try:
+                report.snapshots_removed, report.snapshot_bytes_freed = (
+                    self.manager.prune_snapshots(policy.snapshot_keep)
+                )
+            except OSError as e:
+                report.errors["backups"] = str(e)
+
+        if not self._stop_event.is_set():
+            try:
+                report.blobs_removed, report.blob_bytes_freed = self.manager.blobs.collect_garbage(
+                    policy.blob_grace_seconds
+                )
+            except OSError as e:
+                report.errors["blobs"] = str(e)
+
+        report.stopped = self._stop_event.is_set()
+        report.elapsed_seconds = time.perf_counter() - started
+        return report
+
+    def _archive(self, session_id: str, cutoff: datetime) -> int | None:
+        """
+        在会话锁内确认会话仍满足条件后归档
+
+        Returns:
+            改写会话文件读写的字节数（读取、写入备份、压缩写入），未归档时返回None
+        """
+        store = self.manager.store
+        with self.manager.session_lock(session_id):
+            session = self.manager.get_session(session_id)
+            if session is None or session.status != "completed":
+                return None
+            updated_at = session.updated_at
+            if updated_at.tzinfo is None:
+                updated_at = updated_at.replace(tzinfo=timezone.utc)
+            if updated_at > cutoff:
+                return None
+            before = store.size(session_id)
+            session.mark_archived()
+            if not self.manager.update_session(session):
+                return None
+            return 2 * before + store.size(session_id)
+
+    async def run_forever(self, interval: float, initial_delay: float | None = None) -> None:
+        """
+        按间隔定期执行维护，直到任务被取消
+
+        每轮在独立线程中执行；任务取消时请求停止正在进行的一轮。
+
+        Args:
+            interval: 间隔（秒）
+            initial_delay: 首轮之前的等待时间（秒，默认为间隔和 60 秒中的较小值）
+        """
+        delay = min(interval, 60.0) if initial_delay is None else initial_delay
+        try:
+            while True:
+                await asyncio.sleep(delay)
+                delay = interval
+                try:
+                    await asyncio.to_thread(self.run_once)
+                except Exception as e:
+                    logger.error(f"数据维护失败: {e}", exc_info=True)
+        finally:
+            self.stop()
+
+
+__all__ = [
+    "DEFAULT_ARCHIVE_AFTER_DAYS",
+    "DEFAULT_BACKUP_MAX_AGE_DAYS",
+    "DEFAULT_BACKUP_MAX_BYTES",
+    "DEFAULT_IO_BYTES_PER_SECOND",
+    "DEFAULT_MAINTENANCE_INTERVAL",
+    "DEFAULT_SNAPSHOT_KEEP",
+    "IoRateLimiter",
+    "RetentionPolicy",
+    "RetentionReport",
+    "RetentionService",
+]
@@ -0,0 +1,483 @@
+"""
+全文搜索索引模块
+
+跨会话搜索思考步骤的倒排索引（SQLite FTS5）。
+关键特性:
+- 索引字段：思考内容、对比/逆向/假设字段、思考步骤关联的工具名称
+- 中日韩文本按相邻字符二元组切分，拉丁文本按单词切分（不区分大小写）
+- 按会话状态、思考类型、执行阶段和时间范围过滤，BM25 排序，分页返回
+- 增量维护：添加、更新思考步骤只重建对应的文档，删除会话只删除该会话的文档
+- 多个工作进程可共享索引文件（WAL 模式，写入时等待锁）
+"""
+
+import logging
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from deep_thinking.models.thinking_session import ThinkingSession
+from deep_thinking.models.thought import Thought
+
+logger = logging.getLogger(__name__)
+
+# 索引文件相对数据目录的路径
+SEARCH_INDEX_PATH = Path("search") / "thoughts.db"
+
+# 等待其他进程释放写锁的时间（毫秒）
+_BUSY_TIMEOUT_MS = 5000
+
+# BM25 各列权重（内容、类型字段、工具名称）
+_BM25_WEIGHTS = (1.0, 0.8, 0.5)
+
+# 中日韩字符（汉字、假名、谚文）
+_CJK = "぀-ヿ㐀-䶿一-鿿가-힯豈-﫿"
+_TOKEN_RE = re.compile(f"[{_CJK}]+|[^\\W_{_CJK}]+")
+_CJK_RE = re.compile(f"[{_CJK}]")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    thought_number INTEGER NOT NULL,
+    type TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    content TEXT NOT NULL,
+    UNIQUE (session_id, thought_number)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
+    content, details, tools, tokenize = 'unicode61 remove_diacritics 0'
+);
+"""
+
+
+def _normalize(text: str) -> str:
+    """统一全角/半角并转为小写"""
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    切分索引文本
+
+    拉丁文本按单词切分；中日韩文本切分为相邻字符的二元组，
+    并追加连续片段的最后一个字符，使任意单个字符都是某个词元的开头。
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        词元列表
+    """
+    tokens: list[str] = []
+    for run in _TOKEN_RE.findall(_normalize(text)):
+        if _CJK_RE.match(run):
+            tokens.extend(run[i : i + 2] for i in range(len(run) - 1))
+            tokens.append(run[-1])
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def build_match_query(query: str) -> str:
+    """
+    把搜索词转换为 FTS5 查询（所有词都要匹配）
+
+    中日韩片段转换为二元组短语，单个中日韩字符按前缀匹配。
+
+    Args:
+        query: 搜索词
+
+    Returns:
+        FTS5 查询表达式
+
+    Raises:
+        ValueError: 搜索词中没有可搜索的内容
+    """
+    terms: list[str] = []
+    for run in _TOKEN_RE.findall(_normalize(query)):
+        if _CJK_RE.match(run) and len(run) == 1:
+            terms.append(f'"{run}"*')
+        elif _CJK_RE.match(run):
+            terms.append('"' + " ".join(run[i : i + 2] for i in range(len(run) - 1)) + '"')
+        else:
+            terms.append(f'"{run}"')
+    if not terms:
+        raise ValueError(f"搜索词中没有可搜索的内容: {query!r}")
+    return " AND ".join(terms)
+
+
+def _thought_details(thought: Thought) -> str:
+    """拼接思考步骤的对比、逆向和假设字段"""
+    parts: list[str] = []
+    for items in (thought.comparison_items, thought.comparison_dimensions, thought.reverse_steps):
+        parts.extend(items or [])
+    for value in (
+        thought.comparison_result,
+        thought.reverse_target,
+        thought.hypothetical_condition,
+        thought.hypothetical_impact,
+        thought.hypothetical_probability,
+    ):
+        if value:
+            parts.append(value)
+    return "\n".join(parts)
+
+
+def _tool_names(session: ThinkingSession) -> dict[int, list[str]]:
+    """按思考步骤编号收集工具调用记录的工具名称"""
+    names: dict[int, list[str]] = {}
+    for record in session.tool_call_history:
+        tools = names.setdefault(record.thought_number, [])
+        if record.call_data.tool_name not in tools:
+            tools.append(record.call_data.tool_name)
+    return names
+
+
+def _timestamp(value: datetime) -> float:
+    """转换为 UNIX 时间戳（无时区时按 UTC）"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+@dataclass
+class SearchHit:
+    """
+    搜索结果中的一个思考步骤
+
+    Attributes:
+        session_id: 会话ID
+        session_name: 会话名称
+        session_status: 会话状态
+        thought_number: 思考步骤编号
+        type: 思考类型
+        phase: 执行阶段
+        timestamp: 思考时间（UTC）
+        score: 相关度（越大越相关）
+        content: 思考内容
+    """
+
+    session_id: str
+    session_name: str
+    session_status: str
+    thought_number: int
+    type: str
+    phase: str
+    timestamp: datetime
+    score: float
+    content: str
+
+
+class SearchIndex:
+    """
+    思考步骤全文搜索索引
+
+    首次使用时打开（或创建）索引文件；同一实例可在多个线程中使用。
+
+    Attributes:
+        path: 索引文件路径
+    """
+
+    def __init__(self, path: str | Path):
+        """
+        初始化搜索索引（不访问文件系统）
+
+        Args:
+            path: 索引文件路径
+        """
+        self.path = Path(path)
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.RLock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """打开索引文件并创建表（在锁内调用）"""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                self.path,
+                timeout=_BUSY_TIMEOUT_MS / 1000,
+                check_same_thread=False,
+                isolation_level=None,
+            )
+            conn.execute(f"PRAGMA busy_timeout = {_BUSY_TIMEOUT_MS}")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        """关闭索引文件"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _write(self, statements: Iterable[tuple[str, tuple[Any, ...]]]) -> None:
+        """在一个事务中执行写入语句"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, params in statements:
+                    conn.execute(sql, params)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def is_built(self) -> bool:
+        """
+        检查索引是否已包含全部会话（首次使用或维护失败后需要重建）
+
+        Returns:
+            索引是否完整
+        """
+        with self._lock:
+            row = self._connect().execute("SELECT value FROM meta WHERE key = 'built'").fetchone()
+        return row is not None and row[0] == "1"
+
+    def mark_built(self, built: bool) -> None:
+        """
+        设置索引完整标记
+
+        Args:
+            built: 索引是否完整
+        """
+        self._write(
+            [
+                (
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('built', ?)",
+                    ("1" if built else "0",),
+                )
+            ]
+        )
+
+    def index_session(
+        self, session: ThinkingSession, thought_numbers: Iterable[int] | None = None
+    ) -> int:
+        """
+        索引会话的思考步骤（已索引的步骤重建文档），同时更新会话信息
+
+        Args:
+            session: 会话对象
+            thought_numbers: 要索引的思考步骤编号（默认全部，并删除会话中已不存在的步骤）
+
+        Returns:
+            索引的思考步骤数
+        """
+        tools = _tool_names(session)
+        wanted = None if thought_numbers is None else set(thought_numbers)
+        statements: list[tuple[str, tuple[Any, ...]]] = [self._session_statement(session)]
+        if wanted is None:
+            statements.extend(self._delete_statements(session.session_id))
+
+        count = 0
+        for thought in session.thoughts:
+            if wanted is not None and thought.thought_number not in wanted:
+                continue
+            statements.extend(
+                self._thought_statements(
+                    session.session_id, thought, tools.get(thought.thought_number, [])
+                )
+            )
+            count += 1
+
+        self._write(statements)
+        return count
+
+    def update_session(self, session: ThinkingSession) -> None:
+        """
+        更新会话名称、状态和更新时间（不重建思考步骤文档）
+
+        Args:
+            session: 会话对象
+        """
+        self._write([self._session_statement(session)])
+
+    def remove_session(self, session_id: str) -> None:
+        """
+        删除会话的全部文档
+
+        Args:
+            session_id: 会话ID
+        """
+        self._write(
+            [
+                *self._delete_statements(session_id),
+                ("DELETE FROM sessions WHERE session_id = ?", (session_id,)),
+            ]
+        )
+
+    def clear(self) -> None:
+        """清空索引（同时清除完整标记）"""
+        self._write(
+            [
+                ("DELETE FROM docs_fts", ()),
+                ("DELETE FROM docs", ()),
+                ("DELETE FROM sessions", ()),
+                ("DELETE FROM meta WHERE key = 'built'", ()),
+            ]
+        )
+
+    def count(self) -> int:
+        """
+        获取已索引的思考步骤数
+
+        Returns:
+            文档数
+        """
+        with self._lock:
+            return int(self._connect().execute("SELECT COUNT(*) FROM docs").fetchone()[0])
+
+    @staticmethod
+    def _session_statement(session: ThinkingSession) -> tuple[str, tuple[Any, ...]]:
+        return (
+            "INSERT OR REPLACE INTO sessions (session_id, name, status, updated_at) "
+            "VALUES (?, ?, ?, ?)",
+            (session.session_id, session.name, session.status, session.updated_at.isoformat()),
+        )
+
+    @staticmethod
+    def _delete_statements(session_id: str) -> list[tuple[str, tuple[Any, ...]]]:
+        return [
+            (
+                "DELETE FROM docs_fts WHERE rowid IN (SELECT id FROM docs WHERE session_id = ?)",
+                (session_id,),
+            ),
+            ("DELETE FROM docs WHERE session_id = ?", (session_id,)),
+        ]
+
+    @staticmethod
+    def _thought_statements(
+        session_id: str, thought: Thought, tools: list[str]
+    ) -> list[tuple[str, tuple[Any, ...]]]:
+        key = (session_id, thought.thought_number)
+        return [
+            (
+                "DELETE FROM docs_fts WHERE rowid IN "
+                "(SELECT id FROM docs WHERE session_id = ? AND thought_number = ?)",
+                key,
+            ),
+            ("DELETE FROM docs WHERE session_id = ? AND thought_number = ?", key),
+            (
+                "INSERT INTO docs (session_id, thought_number, type, phase, timestamp, content) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    *key,
+                    thought.type,
+                    thought.phase,
+                    _timestamp(thought.timestamp),
+                    thought.content,
+                ),
+            ),
+            (
+                "INSERT INTO docs_fts (rowid, content, details, tools) VALUES ("
+                "(SELECT id FROM docs WHERE session_id = ? AND thought_number = ?), ?, ?, ?)",
+                (
+                    *key,
+                    " ".join(tokenize(thought.content)),
+                    " ".join(tokenize(_thought_details(thought))),
+                    " ".join(tokenize(" ".join(tools))),
+                ),
+            ),
+        ]
+
+    def search(
+        self,
+        query: str,
+        status: str | None = None,
+        thought_type: str | None = None,
+        phase: str | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> tuple[list[SearchHit], int]:
+        """
+        搜索思考步骤
+
+        Args:
+            query: 搜索词（多个词时全部匹配）
+            status: 会话状态过滤（可选）
+            thought_type: 思考类型过滤（可选）
+            phase: 执行阶段过滤（可选）
+            since: 仅包含此时间之后（含）的思考步骤（可选）
+            until: 仅包含此时间之前（含）的思考步骤（可选）
+            limit: 返回的最大条数
+            offset: 跳过的条数
+
+        Returns:
+            (按相关度降序的结果, 匹配总数)
+
+        Raises:
+            ValueError: 搜索词中没有可搜索的内容
+        """
+        conditions = ["docs_fts MATCH ?"]
+        params: list[Any] = [build_match_query(query)]
+        for column, value in (("s.status", status), ("d.type", thought_type), ("d.phase", phase)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            conditions.append("d.timestamp >= ?")
+            params.append(_timestamp(since))
+        if until is not None:
+            conditions.append("d.timestamp <= ?")
+            params.append(_timestamp(until))
+
+        source = (
+            "FROM docs_fts JOIN docs d ON d.id = docs_fts.rowid "
+            "JOIN sessions s ON s.session_id = d.session_id "
+            f"WHERE {' AND '.join(conditions)}"
+        )
+        weights = ", ".join(str(w) for w in _BM25_WEIGHTS)
+
+        with self._lock:
+            conn = self._connect()
+            total = int(conn.execute(f"SELECT COUNT(*) {source}", params).fetchone()[0])
+            rows = conn.execute(
+                "SELECT d.session_id, s.name, s.status, d.thought_number, d.type, d.phase, "
+                f"d.timestamp, bm25(docs_fts, {weights}) AS rank, d.content {source} "
+                "ORDER BY rank, d.timestamp DESC LIMIT ? OFFSET ?",
+                [*params, limit, offset],
+            ).fetchall()
+
+        hits = [
+            SearchHit(
+                session_id=row[0],
+                session_name=row[1],
+                session_status=row[2],
+                thought_number=row[3],
+                type=row[4],
+                phase=row[5],
+                timestamp=datetime.fromtimestamp(row[6], tz=timezone.utc),
+                score=-row[7],
+                content=row[8],
+            )
+            for row in rows
+        ]
+        return hits, total
+
+
+__all__ = [
+    "SEARCH_INDEX_PATH",
+    "SearchHit",
+    "SearchIndex",
+    "build_match_query",
+    "tokenize",
+]
@@ -0,0 +1,545 @@
+"""
+相似思考检索模块
+
+把思考内容表示为哈希字符 n-gram 向量，跨会话查找与给定文本最相似的思考步骤。
+关键特性:
+- 向量化：字符 2/3-gram 按哈希映射到固定维度（带符号哈希，次线性词频，L2 归一化），
+  中英文统一处理，不依赖外部模型和网络
+- 存储：向量以 float16 行存储在 vectors.f16 中，查询时内存映射；行号和思考步骤的对应关系保存在 rows.db
+- 查询：按块做矩阵乘法计算余弦相似度，多个查询合并为一次矩阵乘法，逐块保留 top-k
+- 增量维护：新增思考步骤追加一行，更新思考步骤就地覆盖，删除会话把对应行清零；
+  清零的行超过一半时压缩文件
+- 多个工作进程可共享索引（写入持有 SQLite 写锁，查询时按文件状态重新映射）
+
+需要可选依赖 numpy（pip install "DeepThinking[similarity]"）。numpy 在首次向量化、
+打开或查询索引时才导入，不增加服务器启动耗时。
+"""
+
+import contextlib
+import importlib.util
+import logging
+import os
+import sqlite3
+import threading
+import unicodedata
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from deep_thinking.models.thinking_session import ThinkingSession
+
+# numpy 为可选依赖，未安装时相似检索不可用（只检查是否安装，使用时再导入）
+_HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+logger = logging.getLogger(__name__)
+
+# 相似检索是否可用
+SIMILARITY_AVAILABLE = _HAS_NUMPY
+
+# 索引目录相对数据目录的路径
+SIMILARITY_INDEX_DIR = Path("similarity")
+
+# 默认向量维度
+DEFAULT_SIMILARITY_DIM = 256
+
+# 字符 n-gram 长度
+_NGRAM_SIZES = (2, 3)
+
+# 每次矩阵乘法处理的行数（限制临时内存）
+_QUERY_CHUNK_ROWS = 65536
+
+# 清零的行超过此数且多于有效行时压缩
+_COMPACT_MIN_DELETED = 1024
+
+# 等待其他进程释放写锁的时间（秒）
+_BUSY_TIMEOUT = 5.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS rows (
+    row INTEGER PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    thought_number INTEGER NOT NULL,
+    UNIQUE (session_id, thought_number)
+);
+"""
+
+
+def get_similarity_dim() -> int:
+    """
+    获取向量维度
+
+    由环境变量 DEEP_THINKING_SIMILARITY_DIM 设置（最小 16），无效值回退为默认值。
+    修改维度后索引在下次查询时重建。
+
+    Returns:
+        向量维度
+    """
+    value = os.getenv("DEEP_THINKING_SIMILARITY_DIM", str(DEFAULT_SIMILARITY_DIM))
+    try:
+        return max(16, int(value))
+    except ValueError:
+        logger.warning(f"无效的 DEEP_THINKING_SIMILARITY_DIM: {value}，使用默认值")
+        return DEFAULT_SIMILARITY_DIM
+
+
+def _require_numpy() -> None:
+    """
+    检查 numpy 是否可用
+
+    Raises:
+        ValueError: 未安装 numpy
+    """
+    if not _HAS_NUMPY:
+        raise ValueError('相似检索需要安装 numpy: pip install "DeepThinking[similarity]"')
+
+
+def _hash_ngrams(codes: Any, n: int) -> Any:
+    """计算所有长度为 n 的字符 n-gram 的 64 位哈希"""
+    import numpy as np
+
+    count = len(codes) - n + 1
+    hashes = np.full(count, n, dtype=np.uint64)
+    for k in range(n):
+        hashes = (hashes * np.uint64(0x100000001B3)) ^ codes[k : k + count]
+    hashes ^= hashes >> np.uint64(33)
+    hashes *= np.uint64(0xFF51AFD7ED558CCD)
+    hashes ^= hashes >> np.uint64(33)
+    return hashes
+
+
+def vectorize(texts: Sequence[str], dim: int = DEFAULT_SIMILARITY_DIM) -> Any:
+    """
+    把文本转换为归一化的哈希 n-gram 向量
+
+    Args:
+        texts: 文本列表
+        dim: 向量维度
+
+    Returns:
+        形状为 (len(texts), dim) 的 float32 数组（没有 n-gram 的文本为零向量）
+
+    Raises:
+        ValueError: 未安装 numpy
+    """
+    _require_numpy()
+    import numpy as np
+
+    vectors = np.zeros((len(texts), dim), dtype=np.float32)
+    for i, text in enumerate(texts):
+        normalized = " ".join(unicodedata.normalize("NFKC", text).lower().split())
+        codes = np.frombuffer(normalized.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        for n in _NGRAM_SIZES:
+            if len(codes) < n:
+                continue
+            hashes = _hash_ngrams(codes, n)
+            signs = np.where(hashes >> np.uint64(63), -1.0, 1.0)
+            vectors[i] += np.bincount(
+                (hashes % np.uint64(dim)).astype(np.intp), weights=signs, minlength=dim
+            )
+
+    vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    np.divide(vectors, norms, out=vectors, where=norms > 0)
+    return vectors.astype(np.float32)
+
+
+@dataclass
+class SimilarHit:
+    """
+    相似检索结果中的一个思考步骤
+
+    Attributes:
+        session_id: 会话ID
+        thought_number: 思考步骤编号
+        score: 余弦相似度（-1 到 1）
+    """
+
+    session_id: str
+    thought_number: int
+    score: float
+
+
+class SimilarityIndex:
+    """
+    相似思考检索索引
+
+    首次使用时打开（或创建）索引文件；同一实例可在多个线程中使用。
+
+    Attributes:
+        base_dir: 索引目录
+        dim: 向量维度
+    """
+
+    def __init__(self, base_dir: str | Path, dim: int | None = None):
+        """
+        初始化索引（不访问文件系统）
+
+        Args:
+            base_dir: 索引目录
+            dim: 向量维度（默认读取 DEEP_THINKING_SIMILARITY_DIM）
+        """
+        self.base_dir = Path(base_dir)
+        self.dim = get_similarity_dim() if dim is None else dim
+        self.vectors_path = self.base_dir / "vectors.f16"
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.RLock()
+        # 当前映射：(行数, 文件 inode, memmap)
+        self._mapped: tuple[int, int, Any] | None = None
+
+    @property
+    def _row_bytes(self) -> int:
+        return self.dim * 2
+
+    def _connect(self) -> sqlite3.Connection:
+        """打开行号表并检查维度（在锁内调用；维度变化时清空索引）"""
+        _require_numpy()
+        if self._conn is None:
+            self.base_dir.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                self.base_dir / "rows.db",
+                timeout=_BUSY_TIMEOUT,
+                check_same_thread=False,
+                isolation_level=None,
+            )
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+            if self._meta("dim") not in (None, str(self.dim)):
+                logger.info(f"相似检索向量维度变为 {self.dim}，清空索引")
+                self.clear()
+        return self._conn
+
+    def _meta(self, key: str) -> str | None:
+        assert self._conn is not None
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else str(row[0])
+
+    def _set_meta(self, key: str, value: Any) -> None:
+        assert self._conn is not None
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value))
+        )
+
+    def _next_row(self) -> int:
+        return int(self._meta("next_row") or 0)
+
+    def close(self) -> None:
+        """关闭索引文件"""
+        with self._lock:
+            self._mapped = None
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @contextlib.contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """跨进程写事务（持有实例锁和 SQLite 写锁，退出时提交或回滚）"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def is_built(self) -> bool:
+        """
+        检查索引是否已包含全部会话
+
+        Returns:
+            索引是否完整
+        """
+        with self._lock:
+            self._connect()
+            return self._meta("built") == "1"
+
+    def mark_built(self, built: bool) -> None:
+        """
+        设置索引完整标记
+
+        Args:
+            built: 索引是否完整
+        """
+        with self._transaction():
+            self._set_meta("built", "1" if built else "0")
+
+    def count(self) -> int:
+        """
+        获取已索引的思考步骤数
+
+        Returns:
+            有效行数
+        """
+        with self._lock:
+            return int(self._connect().execute("SELECT COUNT(*) FROM rows").fetchone()[0])
+
+    def add_vectors(self, keys: Sequence[tuple[str, int]], vectors: Any) -> None:
+        """
+        写入向量（已索引的思考步骤就地覆盖，其余追加）
+
+        Args:
+            keys: (会话ID, 思考步骤编号) 列表
+            vectors: 形状为 (len(keys), dim) 的数组
+        """
+        if not keys:
+            return
+        import numpy as np
+
+        data = np.ascontiguousarray(vectors, dtype=np.float16)
+        with self._transaction() as conn:
+            next_row = self._next_row()
+            first_new = next_row
+            rows: list[int] = []
+            for session_id, thought_number in keys:
+                existing = conn.execute(
+                    "SELECT row FROM rows WHERE session_id = ? AND thought_number = ?",
+                    (session_id, thought_number),
+                ).fetchone()
+                if existing is not None:
+                    rows.append(int(existing[0]))
+                    continue
+                conn.execute(
+                    "INSERT INTO rows (row, session_id, thought_number) VALUES (?, ?, ?)",
+                    (next_row, session_id, thought_number),
+                )
+                rows.append(next_row)
+                next_row += 1
+
+            fd = os.open(self.vectors_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if rows == list(range(first_new, next_row)):
+                    os.pwrite(fd, data.tobytes(), first_new * self._row_bytes)
+                else:
+                    for i, row in enumerate(rows):
+                        os.pwrite(fd, data[i].tobytes(), row * self._row_bytes)
+            finally:
+                os.close(fd)
+            self._set_meta("next_row", next_row)
+            self._set_meta("dim", self.dim)
+
+    def index_session(
+        self, session: ThinkingSession, thought_numbers: Iterable[int] | None = None
+    ) -> int:
+        """
+        索引会话的思考步骤
+
+        Args:
+            session: 会话对象
+            thought_numbers: 要索引的思考步骤编号（默认全部）
+
+        Returns:
+            索引的思考步骤数
+        """
+        wanted = None if thought_numbers is None else set(thought_numbers)
+        thoughts = [
+            thought
+            for thought in session.thoughts
+            if wanted is None or thought.thought_number in wanted
+        ]
+        self.add_vectors(
+            [(session.session_id, thought.thought_number) for thought in thoughts],
+            vectorize([thought.content for thought in thoughts], self.dim),
+        )
+        return len(thoughts)
+
+    def update_session(self, session: ThinkingSession) -> None:
+        """会话信息变化不影响向量（与搜索索引保持相同的接口）"""
+
+    def remove_session(self, session_id: str) -> None:
+        """
+        删除会话的向量（对应行清零，清零的行过多时压缩）
+
+        Args:
+            session_id: 会话ID
+        """
+        with self._transaction() as conn:
+            rows = [
+                int(row[0])
+                for row in conn.execute("SELECT row FROM rows WHERE session_id = ?", (session_id,))
+            ]
+            if not rows:
+                return
+            zeros = bytes(self._row_bytes)
+            fd = os.open(self.vectors_path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                for row in rows:
+                    os.pwrite(fd, zeros, row * self._row_bytes)
+            finally:
+                os.close(fd)
+            conn.execute("DELETE FROM rows WHERE session_id = ?", (session_id,))
+
+            live = int(conn.execute("SELECT COUNT(*) FROM rows").fetchone()[0])
+            deleted = self._next_row() - live
+            if deleted > max(live, _COMPACT_MIN_DELETED):
+                self._compact(conn)
+
+    def _compact(self, conn: sqlite3.Connection) -> None:
+        """按行号顺序重写有效行（在写事务内调用）"""
+        rows = [int(row[0]) for row in conn.execute("SELECT row FROM rows ORDER BY row")]
+        temp_path = self.vectors_path.with_suffix(".tmp")
+        with open(self.vectors_path, "rb") as src, open(temp_path, "wb") as dst:
+            for new_row, old_row in enumerate(rows):
+                src.seek(old_row * self._row_bytes)
+                dst.write(src.read(self._row_bytes))
+                if new_row != old_row:
+                    conn.execute("UPDATE rows SET row = ? WHERE row = ?", (new_row, old_row))
+        os.replace(temp_path, self.vectors_path)
+        self._set_meta("next_row", len(rows))
+        logger.info(f"压缩相似检索索引: {len(rows)} 行")
+
+    def clear(self) -> None:
+        """
+        清空索引（同时清除完整标记）
+
+        向量文件替换为新的空文件而不是就地截断：其他进程可能仍映射着旧文件，
+        访问超出截断后长度的页会触发 SIGBUS。
+        """
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM rows")
+            conn.execute("DELETE FROM meta")
+            self._set_meta("dim", self.dim)
+            if self.vectors_path.exists():
+                temp_path = self.vectors_path.with_suffix(".tmp")
+                temp_path.write_bytes(b"")
+                os.replace(temp_path, self.vectors_path)
+
+    def _matrix(self) -> Any:
+        """当前向量矩阵的只读内存映射（文件变化时重新映射，在锁内调用）"""
+        rows = self._next_row()
+        if rows == 0 or not self.vectors_path.exists():
+            return None
+        inode = self.vectors_path.stat().st_ino
+        if self._mapped is None or self._mapped[:2] != (rows, inode):
+            import numpy as np
+
+            matrix = np.memmap(
+                self.vectors_path, dtype=np.float16, mode="r", shape=(rows, self.dim)
+            )
+            self._mapped = (rows, inode, matrix)
+        return self._mapped[2]
+
+    def query(
+        self,
+        texts: Sequence[str],
+        top_k: int = 5,
+        exclude_sessions: Iterable[str] = (),
+        exclude_thoughts: Iterable[tuple[str, int]] = (),
+        min_score: float = 0.0,
+    ) -> list[list[SimilarHit]]:
+        """
+        批量查找最相似的思考步骤
+
+        Args:
+            texts: 查询文本列表
+            top_k: 每个查询返回的最大条数
+            exclude_sessions: 排除的会话ID
+            exclude_thoughts: 排除的 (会话ID, 思考步骤编号)
+            min_score: 只返回相似度大于此值的结果
+
+        Returns:
+            每个查询的结果（按相似度降序）
+
+        Raises:
+            ValueError: 未安装 numpy
+        """
+        queries = vectorize(texts, self.dim)
+        if not texts or top_k < 1:
+            return [[] for _ in texts]
+
+        with self._lock:
+            conn = self._connect()
+            matrix = self._matrix()
+            if matrix is None:
+                return [[] for _ in texts]
+
+            excluded: list[int] = []
+            for session_id in set(exclude_sessions):
+                excluded.extend(
+                    int(row[0])
+                    for row in conn.execute(
+                        "SELECT row FROM rows WHERE session_id = ?", (session_id,)
+                    )
+                )
+            for key in set(exclude_thoughts):
+                found = conn.execute(
+                    "SELECT row FROM rows WHERE session_id = ? AND thought_number = ?", key
+                ).fetchone()
+                if found is not None:
+                    excluded.append(int(found[0]))
+
+            best_rows, best_scores = _top_k(matrix, queries, top_k, excluded)
+
+            candidates = {int(row) for row in best_rows.ravel() if row >= 0}
+            keys: dict[int, tuple[str, int]] = {}
+            for row, session_id, thought_number in conn.execute(
+                f"SELECT row, session_id, thought_number FROM rows "
+                f"WHERE row IN ({','.join('?' * len(candidates))})",
+                sorted(candidates),
+            ):
+                keys[int(row)] = (session_id, int(thought_number))
+
+        results: list[list[SimilarHit]] = []
+        for rows, scores in zip(best_rows, best_scores, strict=True):
+            hits = []
+            for row, score in zip(rows, scores, strict=True):
+                found = keys.get(int(row))
+                if found is None or not score > min_score:
+                    continue
+                hits.append(SimilarHit(found[0], found[1], round(float(score), 4)))
+            results.append(hits)
+        return results
+
+
+def _top_k(matrix: Any, queries: Any, k: int, excluded: Sequence[int]) -> tuple[Any, Any]:
+    """
+    逐块计算相似度并保留每个查询的前 k 个行
+
+    Returns:
+        (行号数组, 相似度数组)，形状均为 (查询数, k)，按相似度降序；不足 k 个时行号为 -1
+    """
+    import numpy as np
+
+    excluded_rows = np.array(excluded, dtype=np.int64)
+    count = queries.shape[0]
+    best_scores = np.full((count, k), -np.inf, dtype=np.float32)
+    best_rows = np.full((count, k), -1, dtype=np.int64)
+
+    for start in range(0, matrix.shape[0], _QUERY_CHUNK_ROWS):
+        chunk = np.asarray(matrix[start : start + _QUERY_CHUNK_ROWS], dtype=np.float32)
+        scores = queries @ chunk.T
+        if excluded_rows.size:
+            inside = excluded_rows[
+                (excluded_rows >= start) & (excluded_rows < start + chunk.shape[0])
+            ]
+            scores[:, inside - start] = -np.inf
+
+        merged_scores = np.concatenate([best_scores, scores], axis=1)
+        chunk_rows = np.broadcast_to(np.arange(start, start + chunk.shape[0]), scores.shape)
+        merged_rows = np.concatenate([best_rows, chunk_rows], axis=1)
+        if merged_scores.shape[1] > k:
+            keep = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+        else:
+            keep = np.broadcast_to(np.arange(merged_scores.shape[1]), merged_scores.shape)
+        best_scores = np.take_along_axis(merged_scores, keep, axis=1)
+        best_rows = np.take_along_axis(merged_rows, keep, axis=1)
+
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    best_scores = np.take_along_axis(best_scores, order, axis=1)
+    best_rows = np.take_along_axis(best_rows, order, axis=1)
+    best_rows[~np.isfinite(best_scores)] = -1
+    return best_rows, best_scores
+
+
+__all__ = [
+    "DEFAULT_SIMILARITY_DIM",
+    "SIMILARITY_AVAILABLE",
+    "SimilarHit",
+    "SimilarityIndex",
+    "get_similarity_dim",
+    "vectorize",
+]
@@ -6,20 +6,106 @@
 - 会话CRUD操作
 - 索引管理
 - 备份恢复
+- 思考步骤索引：增量维护全文搜索索引、相似检索索引和统计汇总表（可在后台线程中批量更新）
+- 跨进程一致性：会话读-改-写和索引更新持有文件锁，多个工作进程可共享数据目录
 """
 
+import contextlib
+import json
 import logging
+import os
 import shutil
-from datetime import datetime, timezone
+import tempfile
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Iterator
+from datetime import date, datetime, timezone
 from pathlib import Path
 from typing import Any, cast
 
 from deep_thinking.models.thinking_session import ThinkingSession
 from deep_thinking.models.thought import Thought
-from deep_thinking.storage.json_file_store import JsonFileStore
+from deep_thinking.storage.analytics_index import (
+    ANALYTICS_INDEX_PATH,
+    AnalyticsIndex,
+    AnalyticsReport,
+)
+from deep_thinking.storage.blob_store import BlobStore, encode_blob, get_blob_threshold
+from deep_thinking.storage.json_file_store import (
+    JsonFileStore,
+    RangeReader,
+    get_compress_threshold,
+)
+from deep_thinking.storage.search_index import SEARCH_INDEX_PATH, SearchHit, SearchIndex
+from deep_thinking.storage.similarity_index import (
+    SIMILARITY_AVAILABLE,
+    SIMILARITY_INDEX_DIR,
+    SimilarHit,
+    SimilarityIndex,
+)
+from deep_thinking.utils.metrics import metrics
+from deep_thinking.utils.tracing import span, traced
 
 logger = logging.getLogger(__name__)
 
+# 随会话写入增量维护的索引（全文搜索、相似检索、统计汇总）
+ThoughtIndex = SearchIndex | SimilarityIndex | AnalyticsIndex
+
+# 会话索引锁的键名（锁文件位于 sessions/.locks/）
+INDEX_LOCK_KEY = ".index"
+
+# 会话文件中记录元素偏移的列表字段 -> 元素键名（用于分页读取）
+SESSION_INDEXED_FIELDS: dict[str, str | None] = {
+    "thoughts": "thought_number",
+    "tool_call_history": "thought_number",
+}
+
+
+# 可以合并的会话级索引操作
+_SESSION_INDEX_METHODS = ("index_session", "update_session")
+
+
+def _coalesce_index_updates(
+    batch: list[tuple[str, tuple[Any, ...]]],
+) -> list[tuple[str, tuple[Any, ...]]]:
+    """
+    合并同一会话相邻的索引操作
+
+    相邻的 index_session/update_session 合并为一次操作（使用最后的会话对象，
+    思考步骤编号取并集，任一操作索引整个会话时合并为整个会话）；
+    其他操作（如 remove_session）保持原有顺序。
+    """
+    merged: list[tuple[str, tuple[Any, ...]]] = []
+    for method, args in batch:
+        last = merged[-1] if merged else None
+        if (
+            last is None
+            or method not in _SESSION_INDEX_METHODS
+            or last[0] not in _SESSION_INDEX_METHODS
+            or last[1][0].session_id != args[0].session_id
+        ):
+            merged.append((method, args))
+            continue
+
+        session = args[0]
+        numbers: set[int] = set()
+        whole = False
+        for item_method, item_args in (last, (method, args)):
+            if item_method != "index_session":
+                continue
+            if len(item_args) < 2 or item_args[1] is None:
+                whole = True
+            else:
+                numbers.update(item_args[1])
+        if whole:
+            merged[-1] = ("index_session", (session,))
+        elif numbers:
+            merged[-1] = ("index_session", (session, sorted(numbers)))
+        else:
+            merged[-1] = ("update_session", (session,))
+    return merged
+
 
 class StorageManager:
     """
@@ -33,75 +119,261 @@ class StorageManager:
         index_path: 索引文件路径
     """
 
-    def __init__(self, data_dir: str | Path):
+    def __init__(
+        self,
+        data_dir: str | Path,
+        prepare: bool = True,
+        compress_threshold: int | None = None,
+        blob_threshold: int | None = None,
+    ):
         """
         初始化存储管理器
 
+        已归档的会话总是压缩保存，其余会话文件超过阈值时压缩保存。
+        序列化后超过移出阈值的工具调用结果保存到内容寻址存储（data_dir/blobs），
+        会话文件中只保留哈希。
+        思考步骤的全文搜索索引（data_dir/search/thoughts.db）和相似检索索引
+        （data_dir/similarity/，需要 numpy）随会话写入增量更新。
+
         Args:
             data_dir: 数据存储目录
+            prepare: 是否创建目录并初始化索引（数据目录已就绪时可跳过，不访问文件系统）
+            compress_threshold: 会话文件自动压缩阈值（字节，0 表示不按大小压缩；
+                默认读取 DEEP_THINKING_COMPRESS_THRESHOLD）
+            blob_threshold: 工具调用结果移出阈值（字节，0 表示不移出；
+                默认读取 DEEP_THINKING_BLOB_THRESHOLD）
         """
         self.data_dir = Path(data_dir)
         self.sessions_dir = self.data_dir / "sessions"
-        self.sessions_dir.mkdir(parents=True, exist_ok=True)
+        if prepare:
+            self.sessions_dir.mkdir(parents=True, exist_ok=True)
 
         # 创建JSON文件存储实例
         self.store = JsonFileStore(
             self.sessions_dir,
             backup_dir=self.data_dir / ".backups" / "sessions",
             enable_backup=True,
+            indexed_fields=SESSION_INDEXED_FIELDS,
+            create_dirs=prepare,
+            compress_threshold=(
+                get_compress_threshold() if compress_threshold is None else compress_threshold
+            ),
         )
 
+        # 工具调用结果的内容寻址存储
+        self.blobs_dir = self.data_dir / "blobs"
+        self.blobs = BlobStore(self.blobs_dir, create_dirs=prepare)
+        self.blob_threshold = get_blob_threshold() if blob_threshold is None else blob_threshold
+
         # 索引文件路径
         self.index_path = self.data_dir / "sessions" / ".index.json"
 
+        # 思考步骤全文搜索索引、相似检索索引和统计汇总表（首次使用时打开）
+        self.search_index = SearchIndex(self.data_dir / SEARCH_INDEX_PATH)
+        self.similarity_index = (
+            SimilarityIndex(self.data_dir / SIMILARITY_INDEX_DIR) if SIMILARITY_AVAILABLE else None
+        )
+        self.analytics_index = AnalyticsIndex(self.data_dir / ANALYTICS_INDEX_PATH)
+        self._thought_indexes: list[ThoughtIndex] = [self.search_index, self.analytics_index]
+        if self.similarity_index is not None:
+            self._thought_indexes.append(self.similarity_index)
+
+        # 待更新的思考步骤索引操作（启用后台更新时由后台任务批量执行）
+        self._index_queue: deque[tuple[str, tuple[Any, ...]]] = deque()
+        self._index_queue_lock = threading.Lock()
+        self._index_drain_lock = threading.Lock()
+        self._index_submit: Callable[[Callable[[], None]], Any] | None = None
+        self._index_scheduled = False
+
+        # 会话变更监听器（如渲染缓存失效）
+        self._change_listeners: list[Callable[[str], None]] = []
+
         # 初始化索引
-        self._init_index()
+        if prepare:
+            self._init_index()
+
+    def add_change_listener(self, listener: Callable[[str], None]) -> None:
+        """
+        注册会话变更监听器
+
+        会话更新或删除后以会话ID调用监听器。
+
+        Args:
+            listener: 监听回调
+        """
+        self._change_listeners.append(listener)
+
+    def _notify_change(self, session_id: str) -> None:
+        """通知会话变更（监听器异常只记录日志）"""
+        for listener in self._change_listeners:
+            try:
+                listener(session_id)
+            except Exception as e:
+                logger.warning(f"会话变更监听器执行失败: {e}")
 
     def _init_index(self) -> None:
         """初始化索引文件"""
-        if not self.index_path.exists():
-            self._write_index({})
+        with self.store.lock(INDEX_LOCK_KEY):
+            if not self.index_path.exists():
+                self._write_index({})
 
+    @traced("storage.read_index")
     def _read_index(self) -> dict[str, Any]:
         """读取索引"""
         if not self.index_path.exists():
             return {}
 
         try:
-            import json
-
             with open(self.index_path, encoding="utf-8") as f:
                 return cast(dict[str, Any], json.load(f))
         except Exception as e:
             logger.error(f"读取索引失败: {e}")
             return {}
 
+    @traced("storage.write_index")
     def _write_index(self, index: dict[str, Any]) -> None:
-        """写入索引"""
+        """写入索引（原子替换，其他进程不会读到写了一半的文件）"""
         try:
-            import json
-
-            with open(self.index_path, "w", encoding="utf-8") as f:
-                json.dump(index, f, ensure_ascii=False, indent=2)
+            temp_fd, temp_path = tempfile.mkstemp(
+                dir=self.index_path.parent, prefix=".index_", suffix=".tmp"
+            )
+            try:
+                with os.fdopen(temp_fd, "w", encoding="utf-8") as f:
+                    json.dump(index, f, ensure_ascii=False, indent=2)
+                os.replace(temp_path, self.index_path)
+            except BaseException:
+                with contextlib.suppress(OSError):
+                    os.unlink(temp_path)
+                raise
         except Exception as e:
             logger.error(f"写入索引失败: {e}")
 
-    def _update_index_entry(self, session_id: str, name: str, status: str, updated_at: str) -> None:
-        """更新索引条目"""
-        index = self._read_index()
-        index[session_id] = {
-            "name": name,
-            "status": status,
-            "updated_at": updated_at,
-        }
-        self._write_index(index)
+    def _update_index_entry(
+        self,
+        session_id: str,
+        name: str,
+        status: str,
+        updated_at: str,
+        blobs: list[str] | None = None,
+    ) -> None:
+        """更新索引条目（同时按引用的内容变化更新引用计数）"""
+        with self.store.lock(INDEX_LOCK_KEY):
+            index = self._read_index()
+            previous = index.get(session_id, {}).get("blobs", [])
+            index[session_id] = {
+                "name": name,
+                "status": status,
+                "updated_at": updated_at,
+            }
+            if blobs:
+                index[session_id]["blobs"] = blobs
+            self._write_index(index)
+            self._update_blob_refs(previous, blobs or [])
 
     def _remove_index_entry(self, session_id: str) -> None:
-        """移除索引条目"""
-        index = self._read_index()
-        if session_id in index:
-            del index[session_id]
-            self._write_index(index)
+        """移除索引条目（同时释放会话引用的内容）"""
+        with self.store.lock(INDEX_LOCK_KEY):
+            index = self._read_index()
+            if session_id in index:
+                entry = index.pop(session_id)
+                self._write_index(index)
+                self._update_blob_refs(entry.get("blobs", []), [])
+
+    def defer_thought_indexes(self, submit: Callable[[Callable[[], None]], Any] | None) -> None:
+        """
+        在后台更新思考步骤索引
+
+        启用后会话写入只把索引操作放入队列，由 submit 提交的后台任务批量执行，
+        写入路径不再等待索引更新。查询索引前会先执行队列中的操作（读到自己的写入）。
+
+        Args:
+            submit: 提交后台任务的函数（如 TaskExecutor.submit），None 表示在写入时同步更新
+        """
+        self._index_submit = submit
+        if submit is None:
+            # 已提交但被取消的后台任务不会再执行，在当前线程执行剩余操作
+            self.flush_thought_indexes()
+            with self._index_queue_lock:
+                self._index_scheduled = False
+
+    def flush_thought_indexes(self) -> None:
+        """执行队列中全部待更新的索引操作（后台任务正在执行时等待其完成）"""
+        with self._index_drain_lock:
+            while True:
+                with self._index_queue_lock:
+                    if not self._index_queue:
+                        return
+                    batch = list(self._index_queue)
+                    self._index_queue.clear()
+                for method, args in _coalesce_index_updates(batch):
+                    self._apply_thought_indexes(method, *args)
+
+    def _drain_thought_indexes(self) -> None:
+        """后台任务：批量执行队列中的索引操作"""
+        with self._index_queue_lock:
+            self._index_scheduled = False
+        self.flush_thought_indexes()
+
+    def _update_thought_indexes(self, method: str, *args: Any) -> None:
+        """
+        以相同参数调用每个思考步骤索引的方法
+
+        启用后台更新时放入队列，否则立即执行。
+        """
+        submit = self._index_submit
+        if submit is None:
+            self._apply_thought_indexes(method, *args)
+            return
+
+        with self._index_queue_lock:
+            self._index_queue.append((method, args))
+            if self._index_scheduled:
+                return
+            self._index_scheduled = True
+        try:
+            submit(self._drain_thought_indexes)
+        except Exception as e:
+            # 执行器已关闭等情况下在当前线程执行
+            logger.debug(f"提交索引更新任务失败，同步执行: {e}")
+            self._drain_thought_indexes()
+
+    def _apply_thought_indexes(self, method: str, *args: Any) -> None:
+        """
+        执行一个索引操作
+
+        更新失败不影响会话写入：记录警告并清除该索引的完整标记，下次查询时重建。
+        """
+        for index in self._thought_indexes:
+            try:
+                with span("storage.thought_index"):
+                    getattr(index, method)(*args)
+            except Exception as e:
+                logger.warning(f"更新{type(index).__name__}失败: {e}")
+                with contextlib.suppress(Exception):
+                    index.mark_built(False)
+
+    def _update_blob_refs(self, previous: list[str], current: list[str]) -> None:
+        """按会话引用的内容变化更新引用计数（在索引锁内调用）"""
+        old, new = set(previous), set(current)
+        if old != new:
+            self.blobs.update_refs(added=new - old, removed=old - new)
+
+    @contextlib.contextmanager
+    def session_lock(self, session_id: str) -> Iterator[None]:
+        """
+        持有会话的跨进程独占锁
+
+        读取会话、修改后再写回的操作应在锁内完成，
+        避免多个工作进程并发写入同一会话时丢失更新。同一线程内可重入。
+
+        Args:
+            session_id: 会话ID
+
+        Yields:
+            None
+        """
+        with self.store.lock(session_id):
+            yield
 
     def create_session(
         self,
@@ -109,6 +381,7 @@ class StorageManager:
         description: str = "",
         metadata: dict[str, Any] | None = None,
         session_id: str | None = None,
+        thoughts: list[Thought] | None = None,
     ) -> ThinkingSession:
         """
         创建新会话
@@ -118,44 +391,90 @@ class StorageManager:
             description: 会话描述
             metadata: 元数据
             session_id: 会话ID（可选，不提供则自动生成UUID）
+            thoughts: 初始思考步骤（可选，与会话一起写入）
 
         Returns:
             创建的会话对象
         """
+        fields: dict[str, Any] = {
+            "name": name,
+            "description": description,
+            "metadata": metadata or {},
+        }
         if session_id is not None:
-            session = ThinkingSession(
-                name=name,
-                description=description,
-                metadata=metadata or {},
-                session_id=session_id,
-            )
-        else:
-            session = ThinkingSession(
-                name=name,
-                description=description,
-                metadata=metadata or {},
-            )
+            fields["session_id"] = session_id
+        if thoughts:
+            fields["thoughts"] = thoughts
 
-        # 保存会话
-        self._save_session(session)
+        return self.create_sessions([ThinkingSession(**fields)])[0]
 
-        # 更新索引
-        self._update_index_entry(
-            session.session_id,
-            session.name,
-            session.status,
-            session.updated_at.isoformat(),
-        )
+    @traced("storage.create_sessions")
+    def create_sessions(self, sessions: list[ThinkingSession]) -> list[ThinkingSession]:
+        """
+        保存一批新会话
 
-        logger.info(f"创建会话: {session.session_id}")
-        return session
+        每个会话文件只写入一次，索引只读写一次。
+        任一会话写入失败时删除本批已写入的会话文件和新移入内容寻址存储的工具调用结果
+        （结果放回会话对象，重试时重新移出），索引和引用计数不变。
+
+        Args:
+            sessions: 新会话列表
+
+        Returns:
+            保存的会话列表
+
+        Raises:
+            OSError: 写入失败
+            TypeError: 数据不可序列化
+        """
+        written: list[str] = []
+        blobs: dict[str, list[str]] = {}
+        created: dict[str, int] = {}
+        try:
+            for session in sessions:
+                blobs[session.session_id] = self._save_session(session, created)
+                written.append(session.session_id)
+        except Exception:
+            for session_id in written:
+                self.store.delete(session_id)
+            if created:
+                self._discard_blobs(sessions, created)
+            raise
+
+        with self.store.lock(INDEX_LOCK_KEY):
+            index = self._read_index()
+            added: list[str] = []
+            removed: list[str] = []
+            for session in sessions:
+                old = set(index.get(session.session_id, {}).get("blobs", []))
+                new = set(blobs[session.session_id])
+                added.extend(new - old)
+                removed.extend(old - new)
+                index[session.session_id] = {
+                    "name": session.name,
+                    "status": session.status,
+                    "updated_at": session.updated_at.isoformat(),
+                }
+                if blobs[session.session_id]:
+                    index[session.session_id]["blobs"] = blobs[session.session_id]
+            self._write_index(index)
+            self.blobs.update_refs(added, removed)
+
+        for session in sessions:
+            self._update_thought_indexes("index_session", session)
+            logger.info(f"创建会话: {session.session_id}")
+        return sessions
 
-    def get_session(self, session_id: str) -> ThinkingSession | None:
+    @traced("storage.get_session")
+    def get_session(
+        self, session_id: str, load_tool_results: bool = False
+    ) -> ThinkingSession | None:
         """
         获取会话
 
         Args:
             session_id: 会话ID
+            load_tool_results: 是否加载已移入内容寻址存储的工具调用结果（渲染结果内容时使用）
 
         Returns:
             会话对象，如果不存在则返回None
@@ -164,18 +483,83 @@ class StorageManager:
         if data is None:
             return None
 
-        # 重建思考步骤对象
-        thoughts = []
-        for thought_data in data.get("thoughts", []):
-            thoughts.append(Thought(**thought_data))
+        started = time.perf_counter() if metrics.enabled else 0.0
+
+        with span("storage.validate"):
+            # 重建思考步骤对象
+            thoughts = []
+            for thought_data in data.get("thoughts", []):
+                thoughts.append(Thought(**thought_data))
 
-        # 重建会话对象
-        session_data = data.copy()
-        session_data["thoughts"] = thoughts
-        session = ThinkingSession(**session_data)
+            # 重建会话对象
+            session_data = data.copy()
+            session_data["thoughts"] = thoughts
+            session = ThinkingSession(**session_data)
 
+        if metrics.enabled:
+            metrics.observe_validation(time.perf_counter() - started)
+
+        if load_tool_results:
+            self.load_tool_results(session)
         return session
 
+    @traced("storage.load_tool_results")
+    def load_tool_results(self, session: ThinkingSession) -> int:
+        """
+        加载已移入内容寻址存储的工具调用结果（原地替换为结果内容）
+
+        内容缺失或损坏时记录警告，该结果保持为哈希引用。
+
+        Args:
+            session: 会话对象
+
+        Returns:
+            加载的结果数
+        """
+        loaded = 0
+        for record in session.tool_call_history:
+            result_data = record.result_data
+            if result_data is None or result_data.result_blob is None:
+                continue
+            try:
+                result_data.result = self.blobs.get(result_data.result_blob)
+            except ValueError as e:
+                logger.warning(f"加载工具调用结果失败 {record.record_id}: {e}")
+                continue
+            result_data.result_blob = None
+            loaded += 1
+        return loaded
+
+    def get_session_revision(self, session_id: str) -> str | None:
+        """
+        获取会话修订标记（会话文件内容的摘要，通常从偏移索引读取，不解析会话）
+
+        Args:
+            session_id: 会话ID
+
+        Returns:
+            修订标记，会话不存在时返回None
+        """
+        return self.store.revision(session_id)
+
+    @contextlib.contextmanager
+    def open_session_range(self, session_id: str) -> Iterator[RangeReader | None]:
+        """
+        打开会话的区间读取器
+
+        按下标读取思考步骤或工具调用记录，读取成本与页大小成正比，
+        而不是与会话大小成正比。
+
+        Args:
+            session_id: 会话ID
+
+        Yields:
+            区间读取器，会话不存在时为None
+        """
+        with self.store.open_range(session_id) as reader:
+            yield reader
+
+    @traced("storage.update_session")
     def update_session(self, session: ThinkingSession) -> bool:
         """
         更新会话
@@ -186,12 +570,16 @@ class StorageManager:
         Returns:
             是否成功更新
         """
+        return self._write_session(session, "update_session", session)
+
+    def _write_session(self, session: ThinkingSession, method: str, *args: Any) -> bool:
+        """保存已存在的会话和会话索引条目，再以 method(*args) 更新思考步骤索引（每次写入一次）"""
         # 检查会话是否存在
         if not self.store.exists(session.session_id):
             return False
 
         # 保存会话
-        self._save_session(session)
+        blobs = self._save_session(session)
 
         # 更新索引
         self._update_index_entry(
@@ -199,11 +587,15 @@ class StorageManager:
             session.name,
             session.status,
             session.updated_at.isoformat(),
+            blobs,
         )
+        self._update_thought_indexes(method, *args)
 
+        self._notify_change(session.session_id)
         logger.debug(f"更新会话: {session.session_id}")
         return True
 
+    @traced("storage.delete_session")
     def delete_session(self, session_id: str) -> bool:
         """
         删除会话
@@ -220,10 +612,13 @@ class StorageManager:
         if result:
             # 移除索引条目
             self._remove_index_entry(session_id)
+            self._update_thought_indexes("remove_session", session_id)
+            self._notify_change(session_id)
             logger.info(f"删除会话: {session_id}")
 
         return result
 
+    @traced("storage.list_sessions")
     def list_sessions(self, status: str | None = None, limit: int = 100) -> list[dict[str, Any]]:
         """
         列出会话
@@ -255,6 +650,47 @@ class StorageManager:
 
         return sessions
 
+    def find_session_ids(
+        self,
+        status: str | None = None,
+        updated_after: datetime | None = None,
+        updated_before: datetime | None = None,
+    ) -> list[str]:
+        """
+        按索引条件查找会话ID（不加载会话文件）
+
+        Args:
+            status: 过滤状态（active/completed/archived）
+            updated_after: 仅包含在此时间之后（含）更新的会话
+            updated_before: 仅包含在此时间之前（含）更新的会话
+
+        Returns:
+            匹配的会话ID列表（按更新时间升序）
+        """
+        matched: list[tuple[datetime, str]] = []
+
+        for session_id, info in self._read_index().items():
+            if status and info.get("status") != status:
+                continue
+
+            try:
+                updated_at = datetime.fromisoformat(info.get("updated_at", ""))
+            except ValueError:
+                logger.warning(f"索引条目时间格式无效: {session_id}")
+                continue
+            if updated_at.tzinfo is None:
+                updated_at = updated_at.replace(tzinfo=timezone.utc)
+
+            if updated_after and updated_at < updated_after:
+                continue
+            if updated_before and updated_at > updated_before:
+                continue
+
+            matched.append((updated_at, session_id))
+
+        matched.sort()
+        return [session_id for _, session_id in matched]
+
     def add_thought(self, session_id: str, thought: Thought) -> bool:
         """
         添加思考步骤到会话
@@ -266,12 +702,13 @@ class StorageManager:
         Returns:
             是否成功添加
         """
-        session = self.get_session(session_id)
-        if session is None:
-            return False
+        with self.session_lock(session_id):
+            session = self.get_session(session_id)
+            if session is None:
+                return False
 
-        session.add_thought(thought)
-        return self.update_session(session)
+            session.add_thought(thought)
+            return self._save_thought(session, thought.thought_number)
 
     def update_thought(self, session_id: str, thought: Thought) -> bool:
         """
@@ -284,19 +721,175 @@ class StorageManager:
         Returns:
             是否成功更新
         """
-        session = self.get_session(session_id)
-        if session is None:
-            return False
+        with self.session_lock(session_id):
+            session = self.get_session(session_id)
+            if session is None:
+                return False
+
+            # 查找并更新思考步骤
+            for i, existing_thought in enumerate(session.thoughts):
+                if existing_thought.thought_number == thought.thought_number:
+                    session.thoughts[i] = thought
+                    return self._save_thought(session, thought.thought_number)
 
-        # 查找并更新思考步骤
-        for i, existing_thought in enumerate(session.thoughts):
-            if existing_thought.thought_number == thought.thought_number:
-                session.thoughts[i] = thought
-                return self.update_session(session)
+            # 如果没找到，添加新的思考步骤
+            session.add_thought(thought)
+            return self._save_thought(session, thought.thought_number)
 
-        # 如果没找到，添加新的思考步骤
-        session.add_thought(thought)
-        return self.update_session(session)
+    def _save_thought(self, session: ThinkingSession, thought_number: int) -> bool:
+        """保存会话并更新该思考步骤的索引（在会话锁内调用）"""
+        return self._write_session(session, "index_session", session, [thought_number])
+
+    @traced("storage.search_thoughts")
+    def search_thoughts(
+        self,
+        query: str,
+        status: str | None = None,
+        thought_type: str | None = None,
+        phase: str | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> tuple[list[SearchHit], int]:
+        """
+        跨会话搜索思考步骤
+
+        索引不完整时（首次使用、从备份恢复或更新失败后）先重建索引。
+
+        Args:
+            query: 搜索词（多个词时全部匹配）
+            status: 会话状态过滤（可选）
+            thought_type: 思考类型过滤（可选）
+            phase: 执行阶段过滤（可选）
+            since: 仅包含此时间之后（含）的思考步骤（可选）
+            until: 仅包含此时间之前（含）的思考步骤（可选）
+            limit: 返回的最大条数
+            offset: 跳过的条数
+
+        Returns:
+            (按相关度降序的结果, 匹配总数)
+
+        Raises:
+            ValueError: 搜索词中没有可搜索的内容
+        """
+        self.flush_thought_indexes()
+        if not self.search_index.is_built():
+            self._rebuild_thought_index(self.search_index)
+
+        return self.search_index.search(
+            query,
+            status=status,
+            thought_type=thought_type,
+            phase=phase,
+            since=since,
+            until=until,
+            limit=limit,
+            offset=offset,
+        )
+
+    @traced("storage.find_similar_thoughts")
+    def find_similar_thoughts(
+        self,
+        texts: list[str],
+        top_k: int = 5,
+        exclude_sessions: list[str] | None = None,
+        exclude_thoughts: list[tuple[str, int]] | None = None,
+        min_score: float = 0.0,
+    ) -> list[list[SimilarHit]]:
+        """
+        跨会话查找与给定文本最相似的思考步骤（多个文本合并为一次批量查询）
+
+        索引不完整时（首次使用、从备份恢复或更新失败后）先重建索引。
+
+        Args:
+            texts: 查询文本列表
+            top_k: 每个查询返回的最大条数
+            exclude_sessions: 排除的会话ID（可选）
+            exclude_thoughts: 排除的 (会话ID, 思考步骤编号)（可选）
+            min_score: 只返回相似度大于此值的结果
+
+        Returns:
+            每个查询的结果（按相似度降序）
+
+        Raises:
+            ValueError: 未安装 numpy
+        """
+        if self.similarity_index is None:
+            raise ValueError('相似检索需要安装 numpy: pip install "DeepThinking[similarity]"')
+        self.flush_thought_indexes()
+        if not self.similarity_index.is_built():
+            self._rebuild_thought_index(self.similarity_index)
+
+        return self.similarity_index.query(
+            texts,
+            top_k=top_k,
+            exclude_sessions=exclude_sessions or [],
+            exclude_thoughts=exclude_thoughts or [],
+            min_score=min_score,
+        )
+
+    @traced("storage.get_analytics")
+    def get_analytics(
+        self,
+        max_thoughts: int,
+        since: date | None = None,
+        until: date | None = None,
+        template_id: str | None = None,
+        status: str | None = None,
+        top: int = 10,
+    ) -> AnalyticsReport:
+        """
+        跨会话统计思考步骤和工具调用
+
+        汇总表不完整时（首次使用、从备份恢复或更新失败后）先重建。
+
+        Args:
+            max_thoughts: 思考步骤数达到此值的会话计为达到上限
+            since: 起始日期（UTC，可选）
+            until: 结束日期（UTC，可选）
+            template_id: 模板ID过滤（空字符串表示未使用模板的会话，可选）
+            status: 会话状态过滤（可选）
+            top: 工具统计和每日统计的最大条数
+
+        Returns:
+            统计报告
+        """
+        self.flush_thought_indexes()
+        if not self.analytics_index.is_built():
+            self._rebuild_thought_index(self.analytics_index)
+
+        return self.analytics_index.report(
+            max_thoughts,
+            since=since,
+            until=until,
+            template_id=template_id,
+            status=status,
+            top=top,
+        )
+
+    def rebuild_search_index(self) -> int:
+        """
+        按会话索引重建全文搜索索引
+
+        Returns:
+            索引的思考步骤数
+        """
+        return self._rebuild_thought_index(self.search_index)
+
+    @traced("storage.rebuild_thought_index")
+    def _rebuild_thought_index(self, index: ThoughtIndex) -> int:
+        """清空并按会话索引重建一个思考步骤索引"""
+        self.flush_thought_indexes()
+        index.clear()
+        count = 0
+        for session_id in self._read_index():
+            session = self.get_session(session_id)
+            if session is not None:
+                count += index.index_session(session)
+        index.mark_built(True)
+        logger.info(f"重建{type(index).__name__}: {count} 个思考步骤")
+        return count
 
     def get_latest_thought(self, session_id: str) -> Thought | None:
         """
@@ -338,6 +931,10 @@ class StorageManager:
             if self.index_path.exists():
                 shutil.copy2(self.index_path, backup_dir / "index.json")
 
+            # 备份会话引用的工具调用结果
+            if self.blobs_dir.exists():
+                shutil.copytree(self.blobs_dir, backup_dir / "blobs")
+
             logger.info(f"创建备份: {backup_dir}")
             return str(backup_dir)
 
@@ -374,6 +971,18 @@ class StorageManager:
             if index_backup.exists():
                 shutil.copy2(index_backup, self.index_path)
 
+            # 恢复工具调用结果（与现有内容合并），按恢复后的索引重建引用计数
+            blobs_backup = backup_dir / "blobs"
+            if blobs_backup.exists():
+                shutil.copytree(blobs_backup, self.blobs_dir, dirs_exist_ok=True)
+            with self.store.lock(INDEX_LOCK_KEY):
+                self.blobs.rebuild_refs(
+                    entry.get("blobs", []) for entry in self._read_index().values()
+                )
+
+            # 思考步骤索引和统计汇总表在下次查询时重建
+            self._update_thought_indexes("mark_built", False)
+
             logger.info(f"从备份恢复: {backup_name}")
             return True
 
@@ -410,16 +1019,117 @@ class StorageManager:
 
         return backups
 
-    def _save_session(self, session: ThinkingSession) -> None:
-        """保存会话到文件"""
-        data = session.to_dict()
+    def prune_snapshots(self, keep: int) -> tuple[int, int]:
+        """
+        只保留最新的若干个完整备份（create_backup 创建的 backups/ 下的目录）
 
-        # 转换思考步骤为可序列化格式
-        data["thoughts"] = [thought.to_dict() for thought in session.thoughts]
+        Args:
+            keep: 保留的备份个数
 
-        # 使用JSON文件存储写入
-        self.store.write(session.session_id, data)
+        Returns:
+            (删除的备份数, 释放的字节数)
+        """
+        backups_dir = self.data_dir / "backups"
+        if not backups_dir.exists():
+            return 0, 0
+
+        snapshots = sorted(
+            (path for path in backups_dir.iterdir() if path.is_dir()),
+            key=lambda path: path.stat().st_mtime,
+            reverse=True,
+        )
+
+        removed = 0
+        freed = 0
+        for path in snapshots[keep:]:
+            size = sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+            try:
+                shutil.rmtree(path)
+            except OSError as e:
+                logger.warning(f"删除备份失败 {path}: {e}")
+                continue
+            removed += 1
+            freed += size
+            logger.info(f"删除旧备份: {path.name}")
+
+        return removed, freed
+
+    def _offload_tool_results(
+        self, session: ThinkingSession, created: dict[str, int] | None = None
+    ) -> list[str]:
+        """
+        把超过移出阈值的工具调用结果移入内容寻址存储
+
+        会话中的结果原地替换为哈希引用，之后重写会话时不再序列化结果内容。
+
+        Args:
+            session: 会话
+            created: 传入时记录新写入的内容（见 BlobStore.put）
+
+        Returns:
+            会话引用的内容哈希（升序）
+        """
+        digests: set[str] = set()
+        for record in session.tool_call_history:
+            result_data = record.result_data
+            if result_data is None:
+                continue
+            if (
+                result_data.result_blob is None
+                and result_data.result is not None
+                and self.blob_threshold > 0
+            ):
+                payload = encode_blob(result_data.result)
+                if len(payload) >= self.blob_threshold:
+                    result_data.result_blob = self.blobs.put(payload, created)
+                    result_data.result = None
+            if result_data.result_blob is not None:
+                digests.add(result_data.result_blob)
+        return sorted(digests)
+
+    def _save_session(
+        self, session: ThinkingSession, created: dict[str, int] | None = None
+    ) -> list[str]:
+        """
+        保存会话到文件
 
+        Args:
+            session: 会话
+            created: 传入时记录新写入的内容（见 BlobStore.put）
+
+        Returns:
+            会话引用的内容哈希
+        """
+        with span("storage.offload"):
+            blobs = self._offload_tool_results(session, created)
+
+        with span("storage.serialize"):
+            data = session.to_dict()
+
+            # 转换思考步骤为可序列化格式
+            data["thoughts"] = [thought.to_dict() for thought in session.thoughts]
+
+        # 使用JSON文件存储写入（已归档的会话很少读取，总是压缩）
+        if session.status == "archived":
+            self.store.write(session.session_id, data, compress=True)
+        else:
+            self.store.write(session.session_id, data)
+        return blobs
+
+    def _discard_blobs(self, sessions: list[ThinkingSession], created: dict[str, int]) -> None:
+        """撤销批量写入时新移出的工具调用结果（失败只记录警告，由垃圾回收按宽限期回收）"""
+        try:
+            for session in sessions:
+                for record in session.tool_call_history:
+                    result_data = record.result_data
+                    if result_data is not None and result_data.result_blob in created:
+                        result_data.result = self.blobs.get(result_data.result_blob)
+                        result_data.result_blob = None
+            self.blobs.discard(created)
+        except (OSError, ValueError) as e:
+            logger.warning(f"撤销写入的工具调用结果失败: {e}")
+
+    @traced("storage.get_stats")
     def get_stats(self) -> dict[str, Any]:
         """
         获取存储统计信息
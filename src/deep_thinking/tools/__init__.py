@@ -5,7 +5,10 @@ MCP工具模块
 """
 
 from deep_thinking.tools import (
+    analytics,
+    diagnostics,
     export,
+    search,
     sequential_thinking,
     session_manager,
     task_manager,
@@ -14,7 +17,10 @@ from deep_thinking.tools import (
 )
 
 __all__ = [
+    "analytics",
+    "diagnostics",
     "export",
+    "search",
     "sequential_thinking",
     "session_manager",
     "task_manager",
@@ -0,0 +1,229 @@
+"""
+统计工具
+
+提供跨会话统计思考步骤和工具调用的 MCP 工具。
+"""
+
+from datetime import date, timezone
+
+from deep_thinking.models.config import get_global_config
+from deep_thinking.server import app, get_storage_manager, get_task_executor
+from deep_thinking.storage.analytics_index import AnalyticsReport
+from deep_thinking.storage.storage_manager import StorageManager
+from deep_thinking.tools.export import _parse_datetime
+from deep_thinking.utils.executor import run_io
+
+# 有效的会话状态过滤值
+_STATUSES = ("active", "completed", "archived")
+
+# 未使用模板的会话在报告中的名称
+_NO_TEMPLATE = "（无模板）"
+
+
+def _parse_date(value: str | None, field_name: str) -> date | None:
+    """
+    解析日期参数（ISO 8601 日期或时间，按 UTC 取日期）
+
+    Raises:
+        ValueError: 格式无效
+    """
+    parsed = _parse_datetime(value, field_name)
+    return None if parsed is None else parsed.astimezone(timezone.utc).date()
+
+
+def _percent(part: int, total: int) -> str:
+    """百分比文本"""
+    return f"{part / total:.1%}" if total else "0.0%"
+
+
+def _phase_text(phases: dict[str, int], total: int) -> str:
+    """执行阶段分布文本（按数量降序）"""
+    ordered = sorted(phases.items(), key=lambda item: -item[1])
+    return ", ".join(f"{phase} {count}（{_percent(count, total)}）" for phase, count in ordered)
+
+
+def format_analytics_report(report: AnalyticsReport, filters: dict[str, str] | None = None) -> str:
+    """
+    把统计报告格式化为 Markdown
+
+    Args:
+        report: 统计报告
+        filters: 生效的过滤条件（可选，用于展示）
+
+    Returns:
+        Markdown 文本
+    """
+    parts = ["## 📊 跨会话统计", ""]
+    if filters:
+        parts.append(f"**过滤条件**: {', '.join(f'{k}={v}' for k, v in filters.items())}")
+        parts.append("")
+
+    if not report.sessions and not report.thoughts and not report.tool_calls:
+        parts.append("暂无统计数据")
+        return "\n".join(parts)
+
+    parts.extend(
+        [
+            "### 概览",
+            "",
+            f"- **会话数**: {report.sessions}（思考步骤数达到上限 {report.max_thoughts} 的会话: "
+            f"{report.max_thoughts_sessions}）",
+            f"- **思考步骤数**: {report.thoughts}（平均长度 {report.avg_thought_length:.1f} 字符）",
+            f"- **工具调用**: {report.tool_calls}（失败 {report.failures}，"
+            f"失败率 {_percent(report.failures, report.tool_calls)}）",
+        ]
+    )
+    if report.phases:
+        parts.append(f"- **执行阶段分布**: {_phase_text(report.phases, report.thoughts)}")
+
+    if report.templates:
+        parts.extend(
+            [
+                "",
+                "### 按模板",
+                "",
+                "| 模板 | 会话数 | 达到上限 | 思考步骤 | 平均长度 | 执行阶段分布 |",
+                "|------|-------|---------|---------|---------|-------------|",
+            ]
+        )
+        for stats in report.templates:
+            parts.append(
+                f"| {stats.template_id or _NO_TEMPLATE} | {stats.sessions} | "
+                f"{stats.max_thoughts_sessions} | {stats.thoughts} | "
+                f"{stats.avg_thought_length:.1f} | {_phase_text(stats.phases, stats.thoughts)} |"
+            )
+
+    if report.tools:
+        parts.extend(
+            [
+                "",
+                "### 工具调用（按失败次数）",
+                "",
+                "| 工具 | 调用 | 失败 | 失败率 | 缓存命中 | 平均耗时(ms) |",
+                "|------|-----|-----|-------|---------|-------------|",
+            ]
+        )
+        for tool in report.tools:
+            parts.append(
+                f"| {tool.tool_name} | {tool.calls} | {tool.failures} | "
+                f"{tool.failure_rate:.1%} | {tool.cached} | {tool.avg_ms:.1f} |"
+            )
+
+    if report.days:
+        parts.extend(
+            [
+                "",
+                "### 每日统计（UTC）",
+                "",
+                "| 日期 | 新会话 | 思考步骤 | 工具调用 | 失败 |",
+                "|------|-------|---------|---------|-----|",
+            ]
+        )
+        for day in report.days:
+            parts.append(
+                f"| {day.day} | {day.sessions} | {day.thoughts} | {day.tool_calls} | "
+                f"{day.failures} |"
+            )
+
+    return "\n".join(parts)
+
+
+def load_analytics(
+    manager: StorageManager,
+    since: str | None = None,
+    until: str | None = None,
+    template_id: str | None = None,
+    status: str | None = None,
+    top: int = 10,
+    max_thoughts: int | None = None,
+) -> tuple[AnalyticsReport, dict[str, str]]:
+    """
+    验证参数并生成统计报告（get_analytics 工具和 analytics 子命令共用）
+
+    Args:
+        manager: 存储管理器
+        since: 起始日期（ISO 8601，可选）
+        until: 结束日期（ISO 8601，可选）
+        template_id: 模板ID过滤（"none" 表示未使用模板的会话，可选）
+        status: 会话状态过滤（可选）
+        top: 工具统计和每日统计的最大条数
+        max_thoughts: 思考步骤上限（默认使用全局配置的 max_thoughts）
+
+    Returns:
+        (统计报告, 生效的过滤条件)
+
+    Raises:
+        ValueError: 参数无效
+    """
+    if top < 1:
+        raise ValueError(f"top 必须大于0，当前值: {top}")
+    if max_thoughts is None:
+        max_thoughts = get_global_config().max_thoughts
+    elif max_thoughts < 1:
+        raise ValueError(f"max_thoughts 必须大于0，当前值: {max_thoughts}")
+    if status is not None:
+        status = status.lower().strip()
+        if status not in _STATUSES:
+            raise ValueError(f"无效的状态值: {status}。有效值为: {', '.join(_STATUSES)}")
+    since_date = _parse_date(since, "since")
+    until_date = _parse_date(until, "until")
+
+    filters = {
+        "since": since_date.isoformat() if since_date else None,
+        "until": until_date.isoformat() if until_date else None,
+        "template_id": template_id,
+        "status": status,
+    }
+    report = manager.get_analytics(
+        max_thoughts,
+        since=since_date,
+        until=until_date,
+        template_id="" if template_id == "none" else template_id,
+        status=status,
+        top=top,
+    )
+    return report, {name: value for name, value in filters.items() if value is not None}
+
+
+@app.tool()
+async def get_analytics(
+    since: str | None = None,
+    until: str | None = None,
+    template_id: str | None = None,
+    status: str | None = None,
+    top: int = 10,
+    max_thoughts: int | None = None,
+) -> str:
+    """
+    跨会话统计思考步骤和工具调用
+
+    不读取会话文件，直接汇总随会话写入增量维护的统计表：会话数和思考步骤数达到上限的会话数、
+    各模板的执行阶段分布和平均思考长度、各工具的调用/失败次数和平均耗时、每日统计。
+
+    Args:
+        since: 起始日期（ISO 8601，按 UTC 日期，可选）
+        until: 结束日期（ISO 8601，按 UTC 日期，含当天，可选）
+        template_id: 模板ID过滤（"none" 表示未使用模板的会话，可选）
+        status: 会话状态过滤（active/completed/archived，可选）
+        top: 工具统计和每日统计的最大条数（默认10）
+        max_thoughts: 思考步骤数达到此值的会话计为达到上限（默认使用服务器配置）
+
+    Returns:
+        统计报告
+
+    Raises:
+        ValueError: 参数无效
+    """
+    manager = get_storage_manager()
+    report, filters = await run_io(
+        get_task_executor(),
+        lambda: load_analytics(manager, since, until, template_id, status, top, max_thoughts),
+    )
+    return format_analytics_report(report, filters)
+
+
+__all__ = [
+    "format_analytics_report",
+    "get_analytics",
+    "load_analytics",
+]
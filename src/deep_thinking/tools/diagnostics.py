@@ -0,0 +1,217 @@
+"""
+诊断工具
+
+提供服务器运行指标查询、运行时性能分析和数据维护的 MCP 工具。
+"""
+
+import asyncio
+
+from deep_thinking.server import app, get_profiles_dir, get_retention_service
+from deep_thinking.utils.metrics import metrics
+from deep_thinking.utils.profiler import profiler
+
+
+def _format_bytes(count: int) -> str:
+    """格式化字节数"""
+    size = float(count)
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+@app.tool()
+def get_server_metrics(format: str = "markdown") -> str:
+    """
+    获取服务器运行指标
+
+    包括每个工具的调用次数和耗时分布、存储操作次数和读写字节数、
+    fsync 耗时、缓存命中率和会话反序列化的模型验证耗时。
+    指标为当前进程自启动以来的累计值（多工作进程模式下只包含处理本次请求的工作进程）。
+
+    Args:
+        format: 输出格式（markdown 或 prometheus）
+
+    Returns:
+        运行指标
+
+    Raises:
+        ValueError: 输出格式无效
+    """
+    format_type = format.lower().strip()
+    if format_type == "prometheus":
+        return metrics.format_prometheus()
+    if format_type != "markdown":
+        raise ValueError(f"无效的输出格式: {format}（支持: markdown, prometheus）")
+
+    snapshot = metrics.snapshot()
+    parts = ["## 📊 服务器运行指标", ""]
+    if not snapshot["enabled"]:
+        parts.append("⚠️ 指标已禁用（DEEP_THINKING_METRICS=0），以下为禁用前的累计值")
+        parts.append("")
+
+    parts.append("### 工具调用")
+    parts.append("")
+    if snapshot["tools"]:
+        parts.append("| 工具 | 调用 | 失败 | 平均(ms) | P50(ms) | P95(ms) | 最大(ms) |")
+        parts.append("|------|------|------|----------|---------|---------|----------|")
+        for tool, stats in snapshot["tools"].items():
+            parts.append(
+                f"| {tool} | {stats['calls']} | {stats['errors']} | {stats['avg_ms']:.1f} "
+                f"| {stats['p50_ms']:.1f} | {stats['p95_ms']:.1f} | {stats['max_ms']:.1f} |"
+            )
+    else:
+        parts.append("暂无工具调用记录")
+
+    storage = snapshot["storage"]
+    operations = ", ".join(f"{op} {count}" for op, count in storage["operations"].items())
+    parts.extend(
+        [
+            "",
+            "### 存储",
+            "",
+            f"**操作次数**: {operations or '无'}",
+            f"**读取**: {_format_bytes(storage['bytes_read'])}",
+            f"**写入**: {_format_bytes(storage['bytes_written'])}",
+            f"**fsync**: {storage['fsync_count']} 次，共 {storage['fsync_total_ms']:.1f} ms，"
+            f"最长 {storage['fsync_max_ms']:.1f} ms",
+            f"**模型验证**: {snapshot['validation']['count']} 次，"
+            f"共 {snapshot['validation']['total_ms']:.1f} ms",
+        ]
+    )
+
+    if snapshot["cache"]:
+        parts.extend(["", "### 缓存", ""])
+        for name, stats in snapshot["cache"].items():
+            parts.append(
+                f"- **{name}**: 命中率 {stats['hit_ratio']:.1%}（内存命中 {stats.get('hit', 0)}，"
+                f"磁盘命中 {stats.get('disk_hit', 0)}，未命中 {stats.get('miss', 0)}）"
+            )
+
+    return "\n".join(parts)
+
+
+@app.tool()
+def profile_server(
+    action: str = "status",
+    mode: str = "cprofile",
+    calls: int | None = None,
+    seconds: float | None = None,
+) -> str:
+    """
+    控制运行时性能分析
+
+    开始后对接下来的工具调用做性能分析，在 calls 次工具调用完成后、seconds 秒后或手动停止时
+    把结果写入数据目录的 profiles/ 下。cprofile 模式输出 .pstats 文件（只分析事件循环线程），
+    sampling 模式采样所有线程的调用栈，输出可生成火焰图的 .folded 文件。
+
+    Args:
+        action: 动作（start/stop/status）
+        mode: 分析模式（cprofile/sampling，start 时使用）
+        calls: 在接下来的 N 次工具调用完成后停止（start 时使用）
+        seconds: 在 T 秒后停止（start 时使用）
+
+    Returns:
+        分析状态
+
+    Raises:
+        ValueError: 动作或参数无效，或已有分析在进行中
+    """
+    status = profiler.control(
+        action.lower().strip(),
+        get_profiles_dir(),
+        mode=mode.lower().strip(),
+        calls=calls,
+        seconds=seconds,
+    )
+
+    parts = ["## ⏱️ 性能分析", ""]
+    if status.get("stopped_output"):
+        parts.append(f"**已停止，结果文件**: {status['stopped_output']}")
+    if status["active"]:
+        limits = []
+        if status["calls_limit"] is not None:
+            limits.append(f"{status['calls_limit']} 次工具调用后")
+        if status["seconds"] is not None:
+            limits.append(f"{status['seconds']:g} 秒后")
+        parts.extend(
+            [
+                f"**状态**: 进行中（{status['mode']}）",
+                f"**结果文件**: {status['output']}",
+                f"**已完成调用**: {status['calls']}",
+                f"**已运行**: {status['elapsed']:.1f} 秒",
+                f"**停止条件**: {'、'.join(limits) if limits else '手动停止'}",
+            ]
+        )
+    else:
+        parts.append("**状态**: 未在分析")
+        if status["last_output"] and not status.get("stopped_output"):
+            parts.append(f"**上次结果文件**: {status['last_output']}")
+
+    return "\n".join(parts)
+
+
+@app.tool()
+async def run_maintenance() -> str:
+    """
+    立即执行一轮数据维护
+
+    按保留策略归档长期未更新的已完成会话、压缩已归档的会话、清理过期和超出总大小上限的备份、
+    只保留最新的若干个完整备份，以及回收没有会话引用的工具调用结果，返回回收的空间。服务器也会按 DEEP_THINKING_MAINTENANCE_INTERVAL
+    定期在后台执行。
+
+    Returns:
+        回收报告
+    """
+    service = get_retention_service()
+    report = await asyncio.to_thread(service.run_once)
+    policy = service.policy
+
+    parts = [
+        "## 🧹 数据维护",
+        "",
+        f"**归档会话**: {report.archived}",
+        f"**压缩会话**: {report.compressed}（节省 {_format_bytes(report.compressed_bytes_saved)}）",
+        f"**删除备份文件**: {report.backups_removed}（释放 {_format_bytes(report.backup_bytes_freed)}）",
+        f"**删除完整备份**: {report.snapshots_removed}"
+        f"（释放 {_format_bytes(report.snapshot_bytes_freed)}）",
+        f"**回收工具调用结果**: {report.blobs_removed}"
+        f"（释放 {_format_bytes(report.blob_bytes_freed)}）",
+        f"**共回收**: {_format_bytes(report.reclaimed_bytes)}",
+        f"**耗时**: {report.elapsed_seconds:.2f} 秒",
+    ]
+    if report.stopped:
+        parts.append("⚠️ 服务器正在关闭，维护提前结束")
+    if report.errors:
+        parts.extend(["", "### 失败项目", ""])
+        parts.extend(f"- {item}: {error}" for item, error in report.errors.items())
+
+    parts.extend(
+        [
+            "",
+            "### 保留策略",
+            "",
+            f"- 已完成会话 {policy.archive_after_days:g} 天未更新后归档"
+            if policy.archive_after_days > 0
+            else "- 不自动归档",
+            f"- 压缩已归档会话: {'是' if policy.compress_archived else '否'}",
+            f"- 备份文件保留 {policy.backup_max_age_days:g} 天"
+            if policy.backup_max_age_days > 0
+            else "- 备份文件不按时间清理",
+            f"- 备份文件总大小上限 {_format_bytes(policy.backup_max_bytes)}"
+            if policy.backup_max_bytes > 0
+            else "- 备份文件总大小不限",
+            f"- 保留最新 {policy.snapshot_keep} 个完整备份"
+            if policy.snapshot_keep > 0
+            else "- 完整备份全部保留",
+        ]
+    )
+    return "\n".join(parts)
+
+
+__all__ = [
+    "get_server_metrics",
+    "profile_server",
+    "run_maintenance",
+]
@@ -4,11 +4,18 @@
 提供思考会话的导出功能，支持多种格式输出。
 """
 
+import asyncio
+import json
 import logging
+from datetime import datetime, timezone
 from pathlib import Path
 
-from deep_thinking.server import app, get_storage_manager
-from deep_thinking.utils.formatters import export_session_to_file
+from mcp.server.fastmcp import Context
+
+from deep_thinking.models.thinking_session import ThinkingSession
+from deep_thinking.server import app, get_render_cache, get_storage_manager, get_task_executor
+from deep_thinking.utils.executor import run_io, run_render
+from deep_thinking.utils.render_cache import render_with_cache_async
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +25,7 @@ async def export_session(
     session_id: str,
     format_type: str = "markdown",
     output_path: str = "",
+    external_css: bool = False,
 ) -> str:
     """
     导出思考会话为指定格式
@@ -36,6 +44,8 @@ async def export_session(
                      - 如果指定路径，使用指定路径
                      - 支持相对路径和绝对路径
                      - 支持波浪号(~)展开
+        external_css: HTML 格式时将样式表写入同目录的 deepthinking.css 并以 <link> 引用，
+                      减小文档体积（默认False，内联样式）
 
     Returns:
         导出结果信息，包含文件路径
@@ -53,45 +63,55 @@ async def export_session(
         >>> # 使用相对路径
         >>> await export_session("abc-123", "markdown", "./exports/session.md")
     """
-    manager = get_storage_manager()
-
-    # 获取会话
-    session = manager.get_session(session_id)
-    if session is None:
-        raise ValueError(f"会话不存在: {session_id}")
+    # 渲染和写入模块在首次调用时导入
+    from deep_thinking.utils.formatters import TOOL_RESULT_FORMATS, write_export_file
+    from deep_thinking.utils.html_template import HTML_STYLESHEET, HTML_STYLESHEET_NAME
 
-    # 标准化格式类型
-    format_normalized = _normalize_format(format_type)
+    manager = get_storage_manager()
+    executor = get_task_executor()
+    css_href = HTML_STYLESHEET_NAME if external_css else None
+
+    async def render() -> str:
+        # 会话在I/O线程中加载，快照交给渲染进程
+        session = await run_io(
+            executor, manager.get_session, session_id, format_type.lower() in TOOL_RESULT_FORMATS
+        )
+        if session is None:
+            raise ValueError(f"会话不存在: {session_id}")
+        return await run_render(
+            executor, "export_session", _render_export, session, format_type, css_href
+        )
+
+    # 渲染结果（含会话摘要）按会话修订缓存
+    artifact = json.loads(
+        await render_with_cache_async(
+            get_render_cache(),
+            manager,
+            session_id,
+            f"export.{format_type.lower()}{'.css' if external_css else ''}",
+            render,
+            executor,
+        )
+    )
+    format_normalized = artifact["format"]
 
     # 确定输出路径
     output_file: Path
     if not output_path:
-        # 自动生成路径: ~/exports/{session_name}.{ext}
+        # 自动生成路径: ~/exports/{session_name}_{id前8位}.{ext}
         export_dir = Path.home() / "exports"
         export_dir.mkdir(parents=True, exist_ok=True)
-
-        # 文件扩展名映射
-        ext_map = {
-            "json": "json",
-            "markdown": "md",
-            "md": "md",
-            "html": "html",
-            "text": "txt",
-            "txt": "txt",
-        }
-
-        ext = ext_map.get(format_normalized, "txt")
-        # 清理文件名（移除非法字符）
-        safe_name = _sanitize_filename(session.name)
-        output_file = export_dir / f"{safe_name}_{session.session_id[:8]}.{ext}"
+        output_file = export_dir / artifact["filename"]
     else:
         output_file = Path(output_path)
 
     # 执行导出
     try:
-        exported_path = export_session_to_file(session, format_normalized, output_file)
-    except ValueError as e:
-        raise ValueError(f"导出失败: {e}") from e
+        exported_path = await run_io(executor, write_export_file, artifact["content"], output_file)
+        if css_href is not None and format_normalized == "html":
+            await run_io(
+                executor, write_export_file, HTML_STYLESHEET, Path(exported_path).parent / css_href
+            )
     except Exception as e:
         logger.error(f"导出会话 {session_id} 失败: {e}")
         raise ValueError(f"导出失败: {e}") from e
@@ -99,11 +119,11 @@ async def export_session(
     # 返回结果
     return f"""## 会话已导出
 
-**会话名称**: {session.name}
-**会话ID**: {session.session_id}
+**会话名称**: {artifact["name"]}
+**会话ID**: {session_id}
 **导出格式**: {format_normalized}
 **文件路径**: `{exported_path}`
-**思考步骤数**: {session.thought_count()}
+**思考步骤数**: {artifact["thought_count"]}
 
 ---
 会话已成功导出。您可以使用以下命令查看文件：
@@ -115,6 +135,205 @@ cat {exported_path}
 或者在支持的编辑器中打开。"""
 
 
+@app.tool()
+async def export_sessions(
+    format_type: str = "markdown",
+    output_path: str = "",
+    archive: str = "dir",
+    status: str | None = None,
+    updated_after: str | None = None,
+    updated_before: str | None = None,
+    session_ids: list[str] | None = None,
+    workers: int = 0,
+    resume: bool = True,
+    external_css: bool = False,
+    ctx: Context | None = None,
+) -> str:
+    """
+    批量导出多个思考会话
+
+    在多进程工作池中并行渲染，输出为文件目录或单个 ZIP/TAR 归档。
+    中断后使用相同参数重新调用即可从检查点续传。
+
+    Args:
+        format_type: 导出格式（json/markdown/html/text），默认为markdown
+        output_path: 输出目录或归档文件路径（可选）
+                     - 如果为空，按导出参数生成到用户主目录的 exports/ 目录，
+                       相同参数重新调用时使用同一路径
+        archive: 输出模式（dir/zip/tar），默认为dir
+        status: 按状态过滤（active/completed/archived，可选）
+        updated_after: 仅导出在此时间之后更新的会话（ISO 8601，可选）
+        updated_before: 仅导出在此时间之前更新的会话（ISO 8601，可选）
+        session_ids: 显式指定要导出的会话ID列表（可选）
+        workers: 工作进程数（0 表示使用 CPU 核心数）
+        resume: 是否从检查点续传，默认为True
+        external_css: HTML 格式时写出共享样式表 deepthinking.css，文档以 <link> 引用
+
+    Returns:
+        批量导出结果摘要
+
+    Raises:
+        ValueError: 参数验证失败
+
+    Examples:
+        >>> # 导出所有已完成会话为 ZIP 归档
+        >>> await export_sessions("html", archive="zip", status="completed")
+        >>> # 导出指定时间范围内的会话
+        >>> await export_sessions(updated_after="2026-01-01", updated_before="2026-02-01")
+    """
+    from deep_thinking.utils.bulk_export import (
+        ARCHIVE_MODES,
+        default_output_path,
+        export_sessions_bulk,
+        select_sessions,
+    )
+
+    manager = get_storage_manager()
+
+    format_normalized = _normalize_format(format_type)
+    archive_mode = archive.lower()
+    if archive_mode not in ARCHIVE_MODES:
+        raise ValueError(f"不支持的输出模式: {archive}。支持的模式: {', '.join(ARCHIVE_MODES)}")
+
+    if status is not None and status not in ("active", "completed", "archived"):
+        raise ValueError(f"无效的状态值: {status}。有效值为: active, completed, archived")
+
+    after = _parse_datetime(updated_after, "updated_after")
+    before = _parse_datetime(updated_before, "updated_before")
+    selected = select_sessions(
+        manager,
+        status=status,
+        updated_after=after,
+        updated_before=before,
+        session_ids=session_ids,
+    )
+
+    # 确定输出路径（默认路径由导出参数决定，重新调用时能找到检查点）
+    if output_path:
+        output = Path(output_path)
+    else:
+        output = default_output_path(
+            format_normalized, archive_mode, status, after, before, session_ids, external_css
+        )
+
+    # 在线程中运行，避免阻塞事件循环；进度通过 MCP 进度通知上报
+    loop = asyncio.get_running_loop()
+
+    def report(done: int, total: int) -> None:
+        if ctx is not None:
+            asyncio.run_coroutine_threadsafe(ctx.report_progress(done, total), loop)
+
+    try:
+        result = await asyncio.to_thread(
+            export_sessions_bulk,
+            manager.data_dir,
+            selected,
+            format_normalized,
+            output,
+            archive_mode,
+            workers,
+            resume,
+            report,
+            external_css,
+        )
+    except Exception as e:
+        logger.error(f"批量导出失败: {e}")
+        raise ValueError(f"批量导出失败: {e}") from e
+
+    parts = [
+        "## 批量导出完成",
+        "",
+        f"**导出格式**: {format_normalized}",
+        f"**输出模式**: {archive_mode}",
+        f"**输出路径**: `{result.output}`",
+        f"**选中会话数**: {result.total}",
+        f"**本次导出**: {result.exported}",
+        f"**检查点跳过**: {result.skipped}",
+        f"**失败**: {len(result.failed)}",
+        f"**耗时**: {result.elapsed_seconds:.2f}s",
+    ]
+
+    if result.failed:
+        parts.append("")
+        parts.append("### 失败的会话")
+        parts.append("")
+        for session_id, error in result.failed.items():
+            parts.append(f"- `{session_id}`: {error}")
+        parts.append("")
+        parts.append("使用相同参数重新调用即可从检查点续传。")
+
+    return "\n".join(parts)
+
+
+def _render_export(
+    session: ThinkingSession,
+    format_type: str,
+    css_href: str | None = None,
+) -> str:
+    """
+    渲染单个会话的导出内容（可在渲染进程中执行）
+
+    Args:
+        session: 会话快照
+        format_type: 导出格式
+        css_href: HTML 外部样式表地址（None 表示内联样式）
+
+    Returns:
+        JSON字符串，包含导出内容、默认文件名和会话摘要
+
+    Raises:
+        ValueError: 格式不支持或渲染失败
+    """
+    from deep_thinking.utils.formatters import export_filename, render_session
+
+    # 标准化格式类型
+    format_normalized = _normalize_format(format_type)
+
+    try:
+        content = render_session(session, format_normalized, css_href)
+    except Exception as e:
+        logger.error(f"导出会话 {session.session_id} 失败: {e}")
+        raise ValueError(f"导出失败: {e}") from e
+
+    return json.dumps(
+        {
+            "format": format_normalized,
+            "name": session.name,
+            "thought_count": session.thought_count(),
+            "filename": export_filename(session, format_normalized),
+            "content": content,
+        },
+        ensure_ascii=False,
+    )
+
+
+def _parse_datetime(value: str | None, field_name: str) -> datetime | None:
+    """
+    解析 ISO 8601 时间参数（无时区时视为UTC）
+
+    Args:
+        value: 时间字符串
+        field_name: 参数名（用于错误信息）
+
+    Returns:
+        datetime对象，value为空时返回None
+
+    Raises:
+        ValueError: 时间格式无效
+    """
+    if not value:
+        return None
+
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError as e:
+        raise ValueError(f"{field_name} 时间格式无效（需要ISO 8601）: {value}") from e
+
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
 def _normalize_format(format_type: str) -> str:
     """
     标准化格式类型
@@ -155,26 +374,13 @@ def _sanitize_filename(name: str) -> str:
     Returns:
         清理后的文件名
     """
-    # 移除或替换非法字符
-    invalid_chars = '<>:"/\\|?*'
-    for char in invalid_chars:
-        name = name.replace(char, "_")
-
-    # 移除前后空格
-    name = name.strip()
-
-    # 限制长度（保留名称和扩展名空间）
-    if len(name) > 50:
-        name = name[:50]
-
-    # 确保不为空
-    if not name:
-        name = "session"
+    from deep_thinking.utils.formatters import sanitize_filename
 
-    return name
+    return sanitize_filename(name)
 
 
 # 注册工具
 __all__ = [
     "export_session",
+    "export_sessions",
 ]
@@ -0,0 +1,306 @@
+"""
+搜索工具
+
+提供跨会话全文搜索和相似思考检索的 MCP 工具。
+"""
+
+import re
+from typing import Any
+
+from deep_thinking.server import app, get_storage_manager, get_task_executor
+from deep_thinking.storage.similarity_index import SimilarHit
+from deep_thinking.storage.storage_manager import StorageManager
+from deep_thinking.tools.export import _parse_datetime
+from deep_thinking.utils.executor import run_io
+from deep_thinking.utils.pagination import decode_cursor, encode_cursor
+
+# 有效的过滤值
+_STATUSES = ("active", "completed", "archived")
+_THOUGHT_TYPES = ("regular", "revision", "branch", "comparison", "reverse", "hypothetical")
+_PHASES = ("thinking", "tool_call", "analysis")
+
+# 结果摘要的字符数
+_SNIPPET_CHARS = 160
+
+# 相似检索默认的最低相似度（低于此值的结果通常没有共同的表述）
+_DEFAULT_MIN_SIMILARITY = 0.2
+
+
+def _validate_choice(value: str | None, choices: tuple[str, ...], field_name: str) -> str | None:
+    """
+    验证过滤值
+
+    Raises:
+        ValueError: 值不在有效值中
+    """
+    if value is None:
+        return None
+    normalized = value.lower().strip()
+    if normalized not in choices:
+        raise ValueError(f"无效的{field_name}: {value}。有效值为: {', '.join(choices)}")
+    return normalized
+
+
+def make_snippet(content: str, query: str, max_chars: int = _SNIPPET_CHARS) -> str:
+    """
+    截取内容中第一个匹配词附近的片段
+
+    Args:
+        content: 思考内容
+        query: 搜索词
+        max_chars: 片段字符数
+
+    Returns:
+        单行片段（前后被截断时加省略号）
+    """
+    text = " ".join(content.split())
+    lowered = text.lower()
+    positions = [lowered.find(term) for term in query.lower().split() if term in lowered]
+    start = max(min(positions) - max_chars // 4, 0) if positions else 0
+    snippet = text[start : start + max_chars]
+    if start > 0:
+        snippet = "…" + snippet
+    if start + max_chars < len(text):
+        snippet += "…"
+    return snippet
+
+
+@app.tool()
+async def search_thoughts(
+    query: str,
+    status: str | None = None,
+    thought_type: str | None = None,
+    phase: str | None = None,
+    since: str | None = None,
+    until: str | None = None,
+    limit: int = 10,
+    cursor: str | None = None,
+) -> str:
+    """
+    跨会话搜索思考步骤
+
+    在所有会话的思考内容、对比/逆向/假设字段和关联的工具名称中全文搜索，
+    按相关度排序分页返回。支持中文（按相邻字符匹配）和英文（按单词匹配，不区分大小写），
+    多个搜索词以空格分隔时需要全部匹配。
+
+    Args:
+        query: 搜索词
+        status: 会话状态过滤（active/completed/archived，可选）
+        thought_type: 思考类型过滤（regular/revision/branch/comparison/reverse/hypothetical，可选）
+        phase: 执行阶段过滤（thinking/tool_call/analysis，可选）
+        since: 仅包含此时间之后的思考步骤（ISO 8601，可选）
+        until: 仅包含此时间之前的思考步骤（ISO 8601，可选）
+        limit: 每页结果数（默认10）
+        cursor: 分页游标（来自上一页结果，可选）
+
+    Returns:
+        搜索结果
+
+    Raises:
+        ValueError: 参数无效或搜索词中没有可搜索的内容
+    """
+    if limit < 1:
+        raise ValueError(f"limit 必须大于0，当前值: {limit}")
+    offset = decode_cursor(cursor)
+    status = _validate_choice(status, _STATUSES, "状态值")
+    thought_type = _validate_choice(thought_type, _THOUGHT_TYPES, "思考类型")
+    phase = _validate_choice(phase, _PHASES, "执行阶段")
+    since_time = _parse_datetime(since, "since")
+    until_time = _parse_datetime(until, "until")
+
+    manager = get_storage_manager()
+    hits, total = await run_io(
+        get_task_executor(),
+        lambda: manager.search_thoughts(
+            query,
+            status=status,
+            thought_type=thought_type,
+            phase=phase,
+            since=since_time,
+            until=until_time,
+            limit=limit,
+            offset=offset,
+        ),
+    )
+
+    parts = ["## 🔍 搜索结果", "", f"**搜索词**: {query}"]
+    filters = {
+        "status": status,
+        "thought_type": thought_type,
+        "phase": phase,
+        "since": since_time and since_time.isoformat(),
+        "until": until_time and until_time.isoformat(),
+    }
+    active_filters = [f"{name}={value}" for name, value in filters.items() if value is not None]
+    if active_filters:
+        parts.append(f"**过滤条件**: {', '.join(active_filters)}")
+    parts.extend([f"**匹配数**: {total}", ""])
+
+    if not hits:
+        parts.append("没有匹配的思考步骤")
+        return "\n".join(parts)
+
+    terms = " ".join(re.findall(r"\w+", query))
+    for i, hit in enumerate(hits, offset + 1):
+        parts.extend(
+            [
+                f"### {i}. {hit.session_name} · 步骤 {hit.thought_number}",
+                f"- **会话ID**: {hit.session_id}（{hit.session_status}）",
+                f"- **类型**: {hit.type} · **阶段**: {hit.phase} · "
+                f"**时间**: {hit.timestamp.isoformat()}",
+                f"- **相关度**: {hit.score:.3g}",
+                f"> {make_snippet(hit.content, terms)}",
+                "",
+            ]
+        )
+
+    next_offset = offset + len(hits)
+    parts.append(f"**本页**: 第 {offset + 1}-{next_offset} 个（共 {total} 个）")
+    if next_offset < total:
+        parts.append(f"**下一页游标**: `{encode_cursor(next_offset)}`")
+
+    return "\n".join(parts)
+
+
+def _read_thought(manager: StorageManager, session_id: str, thought_number: int) -> str:
+    """
+    读取思考步骤内容
+
+    Raises:
+        ValueError: 会话或思考步骤不存在
+    """
+    with manager.open_session_range(session_id) as reader:
+        if reader is None:
+            raise ValueError(f"会话不存在: {session_id}")
+        numbers = reader.item_keys("thoughts")
+        if thought_number not in numbers:
+            raise ValueError(f"思考步骤不存在: {session_id} #{thought_number}")
+        items = reader.read_items("thoughts", [numbers.index(thought_number)])
+    return str(items[0].get("content", "")) if items else ""
+
+
+def _describe_hits(
+    manager: StorageManager, hits: list[SimilarHit]
+) -> list[tuple[SimilarHit, dict[str, Any], dict[str, Any]]]:
+    """
+    读取结果所在会话的信息和思考步骤（每个会话打开一次，只读取命中的步骤）
+
+    Returns:
+        (结果, 会话字段, 思考步骤) 列表，会话或步骤已删除的结果被忽略
+    """
+    by_session: dict[str, list[SimilarHit]] = {}
+    for hit in hits:
+        by_session.setdefault(hit.session_id, []).append(hit)
+
+    details: dict[tuple[str, int], tuple[dict[str, Any], dict[str, Any]]] = {}
+    for session_id, session_hits in by_session.items():
+        with manager.open_session_range(session_id) as reader:
+            if reader is None:
+                continue
+            header = reader.read_fields(["name", "status"])
+            positions = {number: i for i, number in enumerate(reader.item_keys("thoughts"))}
+            wanted = sorted(
+                positions[hit.thought_number]
+                for hit in session_hits
+                if hit.thought_number in positions
+            )
+            for thought in reader.read_items("thoughts", wanted):
+                details[(session_id, thought.get("thought_number"))] = (header, thought)
+
+    return [
+        (hit, *details[(hit.session_id, hit.thought_number)])
+        for hit in hits
+        if (hit.session_id, hit.thought_number) in details
+    ]
+
+
+@app.tool()
+async def find_similar_thoughts(
+    text: str | None = None,
+    session_id: str | None = None,
+    thought_number: int | None = None,
+    top_k: int = 5,
+    exclude_same_session: bool = False,
+    min_score: float = _DEFAULT_MIN_SIMILARITY,
+) -> str:
+    """
+    跨会话查找与给定内容最相似的思考步骤
+
+    按字符 n-gram 的余弦相似度检索，不依赖外部模型和网络（需要安装 numpy）。
+    查询内容为 text，或 session_id 与 thought_number 指定的已有思考步骤（结果中不包含该步骤本身）。
+
+    Args:
+        text: 查询文本（与 session_id/thought_number 二选一）
+        session_id: 已有思考步骤所在的会话ID
+        thought_number: 已有思考步骤的编号
+        top_k: 返回的最大条数（默认5）
+        exclude_same_session: 是否排除 session_id 所在会话中的其他步骤
+        min_score: 最低相似度（默认0.2）
+
+    Returns:
+        相似的思考步骤
+
+    Raises:
+        ValueError: 参数无效、思考步骤不存在或未安装 numpy
+    """
+    if top_k < 1:
+        raise ValueError(f"top_k 必须大于0，当前值: {top_k}")
+    if (text is None) == (session_id is None or thought_number is None):
+        raise ValueError("需要提供 text，或同时提供 session_id 和 thought_number（二选一）")
+
+    manager = get_storage_manager()
+    executor = get_task_executor()
+
+    exclude_thoughts: list[tuple[str, int]] = []
+    exclude_sessions: list[str] = []
+    if text is None:
+        assert session_id is not None and thought_number is not None
+        text = await run_io(executor, _read_thought, manager, session_id, thought_number)
+        exclude_thoughts.append((session_id, thought_number))
+        if exclude_same_session:
+            exclude_sessions.append(session_id)
+
+    query_text = text
+    results = await run_io(
+        executor,
+        lambda: manager.find_similar_thoughts(
+            [query_text],
+            top_k=top_k,
+            exclude_sessions=exclude_sessions,
+            exclude_thoughts=exclude_thoughts,
+            min_score=min_score,
+        ),
+    )
+    described = await run_io(executor, _describe_hits, manager, results[0])
+
+    parts = ["## 🧭 相似思考", ""]
+    if exclude_thoughts:
+        parts.append(f"**参考步骤**: {session_id} · 步骤 {thought_number}")
+    parts.append(f"**查询内容**: {make_snippet(text, '', max_chars=80)}")
+    parts.extend([f"**结果数**: {len(described)}", ""])
+
+    if not described:
+        parts.append("没有相似的思考步骤")
+        return "\n".join(parts)
+
+    for i, (hit, header, thought) in enumerate(described, 1):
+        parts.extend(
+            [
+                f"### {i}. {header.get('name')} · 步骤 {hit.thought_number}",
+                f"- **会话ID**: {hit.session_id}（{header.get('status')}）",
+                f"- **类型**: {thought.get('type', 'regular')} · "
+                f"**阶段**: {thought.get('phase', 'thinking')}",
+                f"- **相似度**: {hit.score:.3f}",
+                f"> {make_snippet(str(thought.get('content', '')), '')}",
+                "",
+            ]
+        )
+
+    return "\n".join(parts)
+
+
+__all__ = [
+    "find_similar_thoughts",
+    "make_snippet",
+    "search_thoughts",
+]
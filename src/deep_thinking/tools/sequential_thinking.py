@@ -15,7 +15,10 @@ Interleaved Thinking 扩展：
 - 资源控制和统计
 """
 
+import functools
+import inspect
 import logging
+from collections.abc import Callable
 from datetime import datetime, timezone
 from typing import Any, Literal
 
@@ -32,7 +35,26 @@ from deep_thinking.tools.phase_inference import infer_phase_from_lists
 logger = logging.getLogger(__name__)
 
 
+def _serialized_per_session(func: Callable[..., str]) -> Callable[..., str]:
+    """
+    同一会话的思考步骤串行处理
+
+    一次思考步骤包含多次会话读-改-写，整个调用持有会话锁（跨进程、可重入），
+    多个工作进程同时写入同一会话时不会丢失步骤或工具调用记录。
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> str:
+        session_id = signature.bind_partial(*args, **kwargs).arguments.get("session_id", "default")
+        with get_storage_manager().session_lock(session_id):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
 @app.tool()
+@_serialized_per_session
 def sequential_thinking(
     thought: str,
     nextThoughtNeeded: bool,
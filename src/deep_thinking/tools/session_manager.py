@@ -4,14 +4,50 @@
 提供思考会话的CRUD操作工具。
 """
 
+import hashlib
 import json
 import logging
+from datetime import datetime
 from typing import Any
 
-from deep_thinking.server import app, get_storage_manager
+from pydantic import TypeAdapter, ValidationError
+
+from deep_thinking.models.tool_call import ToolCallRecord
+from deep_thinking.server import app, get_render_cache, get_storage_manager
+from deep_thinking.storage.storage_manager import StorageManager
+from deep_thinking.utils.pagination import (
+    DEFAULT_MAX_CONTENT_CHARS,
+    DEFAULT_PAGE_SIZE,
+    ResponseBudget,
+    decode_cursor,
+    encode_cursor,
+    get_max_response_bytes,
+    shorten_content,
+    truncate_bytes,
+    validate_page_params,
+)
+from deep_thinking.utils.render_cache import render_with_cache
 
 logger = logging.getLogger(__name__)
 
+# 分页时每次区间读取的条目数
+_READ_BATCH_SIZE = 16
+
+# 按会话模型的规则解析会话文件中的时间字段
+_DATETIME_ADAPTER: TypeAdapter[datetime] = TypeAdapter(datetime)
+
+
+def _format_timestamp(value: Any) -> str:
+    """
+    把会话文件中的时间字段格式化为 ISO 8601（与加载完整会话后输出的格式一致）
+
+    无法解析时原样输出。
+    """
+    try:
+        return _DATETIME_ADAPTER.validate_python(value).isoformat()
+    except ValidationError:
+        return str(value)
+
 
 @app.tool()
 def create_session(
@@ -69,54 +105,197 @@ def create_session(
 
 
 @app.tool()
-def get_session(session_id: str) -> str:
+def get_session(
+    session_id: str,
+    cursor: str | None = None,
+    start_thought: int | None = None,
+    end_thought: int | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    content_mode: str = "full",
+    max_content_chars: int = DEFAULT_MAX_CONTENT_CHARS,
+    max_bytes: int | None = None,
+) -> str:
     """
     获取会话详情
 
+    思考步骤分页返回：每页最多 limit 个，且响应不超过字节预算。
+    还有更多步骤时结果末尾给出下一页游标。
+
     Args:
         session_id: 会话ID
+        cursor: 分页游标（来自上一页结果，可选）
+        start_thought: 仅返回编号不小于此值的思考步骤（可选）
+        end_thought: 仅返回编号不大于此值的思考步骤（可选）
+        limit: 每页最多思考步骤数（默认50）
+        content_mode: 内容模式（full/truncate/summary），默认为full
+        max_content_chars: truncate 模式下每个步骤保留的字符数（默认500）
+        max_bytes: 响应字节预算（可选，默认取 DEEP_THINKING_MAX_RESPONSE_BYTES，0 表示不限制）
 
     Returns:
         会话详细信息
 
     Raises:
-        ValueError: 会话不存在
+        ValueError: 会话不存在或分页参数无效
     """
-    manager = get_storage_manager()
+    validate_page_params(limit, content_mode)
+    offset = decode_cursor(cursor)
+    budget = get_max_response_bytes() if max_bytes is None else max(max_bytes, 0)
 
-    session = manager.get_session(session_id)
-    if session is None:
-        raise ValueError(f"会话不存在: {session_id}")
+    manager = get_storage_manager()
 
-    # 构建返回结果
-    description = session.description or "无"
-    parts = [
-        "## 会话详情",
-        "",
-        f"**会话ID**: {session.session_id}",
-        f"**名称**: {session.name}",
-        f"**描述**: {description}",
-        f"**状态**: {session.status}",
-        f"**创建时间**: {session.created_at.isoformat()}",
-        f"**更新时间**: {session.updated_at.isoformat()}",
-        f"**思考步骤数**: {session.thought_count()}",
-        "",
+    page_params = [
+        offset,
+        start_thought,
+        end_thought,
+        limit,
+        content_mode,
+        max_content_chars,
+        budget,
     ]
+    digest = hashlib.sha1(json.dumps(page_params).encode()).hexdigest()[:16]
+
+    return render_with_cache(
+        get_render_cache(),
+        manager,
+        session_id,
+        f"session.detail.{digest}",
+        lambda: _build_session_detail(
+            manager,
+            session_id,
+            offset=offset,
+            start_thought=start_thought,
+            end_thought=end_thought,
+            limit=limit,
+            content_mode=content_mode,
+            max_content_chars=max_content_chars,
+            max_bytes=budget,
+        ),
+    )
 
-    # 思考步骤列表
-    if session.thoughts:
-        parts.append("### 思考步骤")
+
+def _build_session_detail(
+    manager: StorageManager,
+    session_id: str,
+    offset: int = 0,
+    start_thought: int | None = None,
+    end_thought: int | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    content_mode: str = "full",
+    max_content_chars: int = DEFAULT_MAX_CONTENT_CHARS,
+    max_bytes: int = 0,
+) -> str:
+    """
+    渲染会话详情的一页
+
+    通过区间读取只解析本页的思考步骤。
+
+    Args:
+        manager: 存储管理器
+        session_id: 会话ID
+        offset: 本页在匹配步骤中的起始位置
+        start_thought: 最小思考步骤编号（可选）
+        end_thought: 最大思考步骤编号（可选）
+        limit: 每页最多思考步骤数
+        content_mode: 内容模式
+        max_content_chars: truncate 模式下保留的字符数
+        max_bytes: 响应字节预算（0 表示不限制）
+
+    Returns:
+        会话详细信息
+
+    Raises:
+        ValueError: 会话不存在
+    """
+    with manager.open_session_range(session_id) as reader:
+        if reader is None:
+            raise ValueError(f"会话不存在: {session_id}")
+
+        header = reader.read_fields(
+            ["session_id", "name", "description", "status", "created_at", "updated_at"]
+        )
+        numbers = reader.item_keys("thoughts")
+
+        # 按编号范围筛选思考步骤下标
+        selected = [
+            i
+            for i, number in enumerate(numbers)
+            if (start_thought is None or (number is not None and number >= start_thought))
+            and (end_thought is None or (number is not None and number <= end_thought))
+        ]
+
+        # 构建返回结果
+        description = header.get("description") or "无"
+        parts = [
+            "## 会话详情",
+            "",
+            f"**会话ID**: {header.get('session_id', session_id)}",
+            f"**名称**: {header.get('name')}",
+            f"**描述**: {description}",
+            f"**状态**: {header.get('status')}",
+            f"**创建时间**: {_format_timestamp(header.get('created_at'))}",
+            f"**更新时间**: {_format_timestamp(header.get('updated_at'))}",
+            f"**思考步骤数**: {len(numbers)}",
+        ]
+        if start_thought is not None or end_thought is not None:
+            low = start_thought if start_thought is not None else "开始"
+            high = end_thought if end_thought is not None else "结束"
+            parts.append(f"**步骤范围**: {low} - {high}（匹配 {len(selected)} 个）")
         parts.append("")
-        for thought in session.thoughts:
-            type_emoji = {
-                "regular": "💭",
-                "revision": "🔄",
-                "branch": "🌿",
-            }.get(thought.type, "💭")
-
-            parts.append(f"{type_emoji} **步骤 {thought.thought_number}**")
-            parts.append(f"{thought.content}")
+
+        budget = ResponseBudget(max_bytes)
+        budget.add(parts)
+
+        page = selected[offset : offset + limit]
+        shown = 0
+
+        # 思考步骤列表（分批读取，字节预算用完即停止）
+        if page:
+            parts.append("### 思考步骤")
             parts.append("")
+            budget.add(parts[-2:])
+
+            for batch_start in range(0, len(page), _READ_BATCH_SIZE):
+                batch = page[batch_start : batch_start + _READ_BATCH_SIZE]
+                stop = False
+                for thought in reader.read_items("thoughts", batch):
+                    type_emoji = {
+                        "regular": "💭",
+                        "revision": "🔄",
+                        "branch": "🌿",
+                    }.get(thought.get("type", "regular"), "💭")
+
+                    content = shorten_content(
+                        thought.get("content", ""), content_mode, max_content_chars
+                    )
+                    lines = [f"{type_emoji} **步骤 {thought.get('thought_number')}**", content, ""]
+
+                    if not budget.fits(lines):
+                        if shown:
+                            stop = True
+                            break
+                        # 单个步骤超过预算时截断内容，保证每页至少一个步骤
+                        remaining = budget.remaining or 0
+                        lines[1] = truncate_bytes(content, remaining - len(lines[0]) - 64) + (
+                            f"…（已截断，共 {len(thought.get('content', ''))} 字）"
+                        )
+
+                    parts.extend(lines)
+                    budget.add(lines)
+                    shown += 1
+                if stop:
+                    break
+
+    # 分页信息
+    next_offset = offset + shown
+    if offset or next_offset < len(selected):
+        parts.append(
+            f"**本页**: 第 {offset + 1}-{next_offset} 个（共 {len(selected)} 个）"
+            if shown
+            else f"**本页**: 无（共 {len(selected)} 个）"
+        )
+        if next_offset < len(selected):
+            parts.append(f"**下一页游标**: `{encode_cursor(next_offset)}`")
+        parts.append("")
 
     return "\n".join(parts)
 
@@ -247,21 +426,22 @@ def update_session_status(
     if new_status is None:
         raise ValueError(f"无效的状态值: {status}。有效值为: active, completed, archived")
 
-    # 获取会话
-    session = manager.get_session(session_id)
-    if session is None:
-        raise ValueError(f"会话不存在: {session_id}")
+    # 读取、修改、保存在会话锁内完成（多个工作进程共享数据目录）
+    with manager.session_lock(session_id):
+        session = manager.get_session(session_id)
+        if session is None:
+            raise ValueError(f"会话不存在: {session_id}")
 
-    # 更新状态
-    if new_status == "completed":
-        session.mark_completed()
-    elif new_status == "archived":
-        session.mark_archived()
-    elif new_status == "active":
-        session.mark_active()
+        # 更新状态
+        if new_status == "completed":
+            session.mark_completed()
+        elif new_status == "archived":
+            session.mark_archived()
+        elif new_status == "active":
+            session.mark_active()
 
-    # 保存更新
-    result = manager.update_session(session)
+        # 保存更新
+        result = manager.update_session(session)
 
     if result:
         return f"""## 会话状态已更新
@@ -395,101 +575,146 @@ def get_tool_call_history(
     session_id: str,
     thought_number: int | None = None,
     limit: int = 50,
+    cursor: str | None = None,
+    max_bytes: int | None = None,
 ) -> str:
     """
     获取会话的工具调用历史（Interleaved Thinking）
 
     查询会话中的工具调用记录，支持按思考步骤过滤。
+    记录分页返回，还有更多记录时结果末尾给出下一页游标。
 
     Args:
         session_id: 会话ID
         thought_number: 过滤特定思考步骤的工具调用（可选，为空则返回全部）
-        limit: 最大返回数量（默认50）
+        limit: 每页最大返回数量（默认50）
+        cursor: 分页游标（来自上一页结果，可选）
+        max_bytes: 响应字节预算（可选，默认取 DEEP_THINKING_MAX_RESPONSE_BYTES，0 表示不限制）
 
     Returns:
         工具调用历史记录
 
     Raises:
-        ValueError: 会话不存在
+        ValueError: 会话不存在或分页参数无效
     """
+    validate_page_params(limit)
+    offset = decode_cursor(cursor)
+    budget = ResponseBudget(get_max_response_bytes() if max_bytes is None else max(max_bytes, 0))
+
     manager = get_storage_manager()
 
-    # 获取会话
-    session = manager.get_session(session_id)
-    if session is None:
-        raise ValueError(f"会话不存在: {session_id}")
+    with manager.open_session_range(session_id) as reader:
+        if reader is None:
+            raise ValueError(f"会话不存在: {session_id}")
+
+        # 按记录的思考步骤编号过滤，只读取本页记录
+        numbers = reader.item_keys("tool_call_history")
+        if thought_number is not None:
+            matched = [i for i, number in enumerate(numbers) if number == thought_number]
+        else:
+            matched = list(range(len(numbers)))
+        page = matched[offset : offset + limit]
+
+        # 构建返回结果
+        parts = [
+            "## 工具调用历史",
+            "",
+            f"**会话ID**: {session_id}",
+            f"**总记录数**: {len(numbers)}",
+        ]
 
-    # 过滤工具调用记录
-    if thought_number is not None:
-        records = [r for r in session.tool_call_history if r.thought_number == thought_number]
-    else:
-        records = session.tool_call_history
+        if thought_number is not None:
+            parts.append(f"**过滤条件**: 思考步骤 {thought_number}")
 
-    # 限制数量
-    records = records[:limit]
+        parts.append("")
+        budget.add(parts)
+
+        if not page:
+            parts.append("暂无工具调用记录")
+            return "\n".join(parts)
+
+        # 工具调用记录列表（分批读取，字节预算用完即停止）
+        shown = 0
+        for batch_start in range(0, len(page), _READ_BATCH_SIZE):
+            batch = page[batch_start : batch_start + _READ_BATCH_SIZE]
+            stop = False
+            for record_data in reader.read_items("tool_call_history", batch):
+                lines = _format_tool_call_record(ToolCallRecord(**record_data))
+                if shown and not budget.fits(lines):
+                    stop = True
+                    break
+                parts.extend(lines)
+                budget.add(lines)
+                shown += 1
+            if stop:
+                break
+
+    # 分页信息
+    next_offset = offset + shown
+    if offset or next_offset < len(matched):
+        parts.append(f"**本页**: 第 {offset + 1}-{next_offset} 条（共 {len(matched)} 条）")
+        if next_offset < len(matched):
+            parts.append(f"**下一页游标**: `{encode_cursor(next_offset)}`")
+        parts.append("")
 
-    # 构建返回结果
-    parts = [
-        "## 工具调用历史",
-        "",
-        f"**会话ID**: {session_id}",
-        f"**总记录数**: {len(session.tool_call_history)}",
-    ]
+    return "\n".join(parts)
 
-    if thought_number is not None:
-        parts.append(f"**过滤条件**: 思考步骤 {thought_number}")
 
-    parts.append("")
+# 工具调用状态图标映射
+_STATUS_ICONS = {
+    "pending": "⏳",
+    "running": "🔄",
+    "completed": "✅",
+    "failed": "❌",
+    "timeout": "⏱️",
+    "cancelled": "🚫",
+}
 
-    if not records:
-        parts.append("暂无工具调用记录")
-        return "\n".join(parts)
 
-    # 状态图标映射
-    status_icons = {
-        "pending": "⏳",
-        "running": "🔄",
-        "completed": "✅",
-        "failed": "❌",
-        "timeout": "⏱️",
-        "cancelled": "🚫",
-    }
+def _format_tool_call_record(record: ToolCallRecord) -> list[str]:
+    """
+    渲染单条工具调用记录
 
-    # 工具调用记录列表
-    for record in records:
-        icon = status_icons.get(record.status, "❓")
-        parts.append(f"### {icon} {record.call_data.tool_name}")
-        parts.append(f"- **记录ID**: {record.record_id}")
-        parts.append(f"- **思考步骤**: {record.thought_number}")
-        parts.append(f"- **状态**: {record.status}")
-        parts.append(f"- **调用时间**: {record.call_data.timestamp.strftime('%Y-%m-%d %H:%M:%S')}")
-
-        # 参数（如果有）
-        if record.call_data.arguments:
-            args_str = json.dumps(record.call_data.arguments, ensure_ascii=False)
-            if len(args_str) > 100:
-                args_str = args_str[:100] + "..."
-            parts.append(f"- **参数**: `{args_str}`")
-
-        # 结果信息（如果有）
-        if record.result_data:
-            parts.append(f"- **成功**: {'是' if record.result_data.success else '否'}")
-            if record.result_data.execution_time_ms:
-                parts.append(f"- **执行时间**: {record.result_data.execution_time_ms:.2f}ms")
-            if record.result_data.from_cache:
-                parts.append("- **缓存命中**: 是")
-
-            # 错误信息（如果有）
-            if record.result_data.error:
-                parts.append(f"- **错误类型**: {record.result_data.error.error_type}")
-                error_msg = record.result_data.error.error_message
-                if len(error_msg) > 100:
-                    error_msg = error_msg[:100] + "..."
-                parts.append(f"- **错误信息**: {error_msg}")
+    Args:
+        record: 工具调用记录
 
-        parts.append("")
+    Returns:
+        Markdown 行列表（以空行结尾）
+    """
+    icon = _STATUS_ICONS.get(record.status, "❓")
+    parts = [
+        f"### {icon} {record.call_data.tool_name}",
+        f"- **记录ID**: {record.record_id}",
+        f"- **思考步骤**: {record.thought_number}",
+        f"- **状态**: {record.status}",
+        f"- **调用时间**: {record.call_data.timestamp.strftime('%Y-%m-%d %H:%M:%S')}",
+    ]
 
-    return "\n".join(parts)
+    # 参数（如果有）
+    if record.call_data.arguments:
+        args_str = json.dumps(record.call_data.arguments, ensure_ascii=False)
+        if len(args_str) > 100:
+            args_str = args_str[:100] + "..."
+        parts.append(f"- **参数**: `{args_str}`")
+
+    # 结果信息（如果有）
+    if record.result_data:
+        parts.append(f"- **成功**: {'是' if record.result_data.success else '否'}")
+        if record.result_data.execution_time_ms:
+            parts.append(f"- **执行时间**: {record.result_data.execution_time_ms:.2f}ms")
+        if record.result_data.from_cache:
+            parts.append("- **缓存命中**: 是")
+
+        # 错误信息（如果有）
+        if record.result_data.error:
+            parts.append(f"- **错误类型**: {record.result_data.error.error_type}")
+            error_msg = record.result_data.error.error_message
+            if len(error_msg) > 100:
+                error_msg = error_msg[:100] + "..."
+            parts.append(f"- **错误信息**: {error_msg}")
+
+    parts.append("")
+    return parts
 
 
 @app.tool()
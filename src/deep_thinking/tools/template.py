@@ -5,15 +5,72 @@
 """
 
 import logging
+from datetime import datetime, timezone
+from typing import Any
 from uuid import uuid4
 
+from deep_thinking.models.thinking_session import ThinkingSession
 from deep_thinking.models.thought import Thought
-from deep_thinking.server import app, get_storage_manager
-from deep_thinking.utils.template_loader import TemplateLoader
+from deep_thinking.server import app, get_storage_manager, get_template_registry
+
+# apply_template_batch 单次最多创建的会话数
+MAX_BATCH_SESSIONS = 100
 
 logger = logging.getLogger(__name__)
 
 
+def _load_template(template_id: str) -> tuple[dict[str, Any], tuple[Thought, ...]]:
+    """
+    从模板注册表获取模板数据和思考步骤原型（已解析和验证）
+
+    Raises:
+        ValueError: 模板不存在（附可用模板列表）或格式无效
+    """
+    registry = get_template_registry()
+    try:
+        return registry.get_template(template_id), registry.get_thoughts(template_id)
+    except FileNotFoundError as e:
+        # 提供可用模板列表
+        available = registry.list_template_ids()
+        raise ValueError(
+            f"{str(e)}\n\n可用模板:\n" + "\n".join(f"  - {tid}" for tid in available)
+        ) from e
+
+
+def _session_fields(
+    template_id: str, template: dict[str, Any], context: str, session_name: str | None
+) -> dict[str, Any]:
+    """应用模板创建的会话的名称、描述和元数据"""
+    return {
+        "name": session_name or f"{template['name']} - {str(uuid4())[:8]}",
+        "description": f"使用 {template['name']} 处理: {context or '自定义思考'}",
+        "metadata": {
+            "template_id": template_id,
+            "template_name": template["name"],
+            "context": context,
+        },
+    }
+
+
+def _instantiate_thoughts(prototypes: tuple[Thought, ...], context: str) -> list[Thought]:
+    """
+    复制思考步骤原型
+
+    原型已通过验证，复制时不再重新验证；只有插入上下文的第1步重新验证（内容长度）。
+    """
+    now = datetime.now(timezone.utc)
+    thoughts = []
+    for prototype in prototypes:
+        if context and prototype.thought_number == 1:
+            # 在第一步插入上下文
+            data = prototype.model_dump()
+            data.update(content=f"{prototype.content}\n\n当前上下文: {context}", timestamp=now)
+            thoughts.append(Thought.model_validate(data))
+        else:
+            thoughts.append(prototype.model_copy(update={"timestamp": now, "tool_calls": []}))
+    return thoughts
+
+
 @app.tool()
 async def apply_template(
     template_id: str,
@@ -48,58 +105,15 @@ async def apply_template(
         >>> await apply_template("decision_making", "选择哪个技术方案")
     """
     manager = get_storage_manager()
+    template, prototypes = _load_template(template_id)
 
-    # 加载模板
-    loader = TemplateLoader()
-    try:
-        template = loader.load_template(template_id)
-    except FileNotFoundError as e:
-        # 提供可用模板列表
-        available = loader.list_available_templates()
-        raise ValueError(
-            f"{str(e)}\n\n可用模板:\n" + "\n".join(f"  - {tid}" for tid in available)
-        ) from e
-
-    # 生成会话名称
-    if not session_name:
-        session_name = f"{template['name']} - {str(uuid4())[:8]}"
-
-    # 创建会话
+    # 会话和思考步骤一次写入
     session = manager.create_session(
-        name=session_name,
-        description=f"使用 {template['name']} 处理: {context or '自定义思考'}",
-        metadata={
-            "template_id": template_id,
-            "template_name": template["name"],
-            "context": context,
-        },
+        **_session_fields(template_id, template, context, session_name),
+        thoughts=_instantiate_thoughts(prototypes, context),
     )
-
-    # 获取模板步骤
     steps = template.get("structure", {}).get("steps", [])
 
-    # 将模板步骤转换为思考步骤
-    for step_data in steps:
-        # 根据上下文定制提示词
-        prompt = step_data["prompt"]
-        if context and step_data["step_number"] == 1:
-            # 在第一步插入上下文
-            prompt = f"{prompt}\n\n当前上下文: {context}"
-
-        thought = Thought(
-            thought_number=step_data["step_number"],
-            content=prompt,
-            type=step_data.get("type", "regular"),
-            is_revision=step_data.get("type") == "revision",
-            revises_thought=step_data.get("revises_thought"),
-            branch_from_thought=step_data.get("branch_from_thought"),
-            branch_id=step_data.get("branch_id"),
-        )
-        session.add_thought(thought)
-
-    # 保存会话
-    manager.update_session(session)
-
     # 构建返回结果
     parts = [
         f"## 📋 {template['name']} 已应用",
@@ -135,6 +149,73 @@ async def apply_template(
     return "\n".join(parts)
 
 
+@app.tool()
+async def apply_template_batch(
+    template_id: str,
+    contexts: list[str],
+    session_name_prefix: str | None = None,
+) -> str:
+    """
+    用同一个模板批量创建会话
+
+    每个上下文创建一个会话。全部会话一起保存：会话文件各写入一次，索引只更新一次；
+    任一会话保存失败时本批会话都不会创建。
+
+    Args:
+        template_id: 模板ID（如 problem_solving, decision_making, analysis）
+        contexts: 上下文列表，每个上下文对应一个会话（最多100个）
+        session_name_prefix: 会话名称前缀（可选，会话名称为"前缀 序号"，默认使用模板名称）
+
+    Returns:
+        创建的会话列表
+
+    Raises:
+        ValueError: 模板不存在、上下文列表为空或超出数量限制
+
+    Examples:
+        >>> await apply_template_batch("analysis", ["分析方案A", "分析方案B"])
+    """
+    if not contexts:
+        raise ValueError("上下文列表不能为空")
+    if len(contexts) > MAX_BATCH_SESSIONS:
+        raise ValueError(f"单次最多创建 {MAX_BATCH_SESSIONS} 个会话，当前 {len(contexts)} 个")
+
+    manager = get_storage_manager()
+    template, prototypes = _load_template(template_id)
+
+    sessions = []
+    for number, context in enumerate(contexts, 1):
+        session_name = f"{session_name_prefix} {number}" if session_name_prefix else None
+        sessions.append(
+            ThinkingSession(
+                **_session_fields(template_id, template, context, session_name),
+                thoughts=_instantiate_thoughts(prototypes, context),
+            )
+        )
+    manager.create_sessions(sessions)
+
+    parts = [
+        f"## 📋 {template['name']} 已批量应用",
+        "",
+        f"**模板描述**: {template['description']}",
+        f"**会话数**: {len(sessions)}",
+        f"**每个会话步骤数**: {len(prototypes)}",
+        "",
+        "### 🗂️ 已创建的会话",
+        "",
+    ]
+    for number, (session, context) in enumerate(zip(sessions, contexts, strict=True), 1):
+        parts.append(f"{number}. **{session.name}** - `{session.session_id}`")
+        if context:
+            parts.append(f"   - 上下文: {context}")
+
+    parts.append("")
+    parts.append("---")
+    parts.append("使用 `sequential_thinking` 工具并指定会话ID继续思考。")
+
+    return "\n".join(parts)
+
+
 @app.tool()
 async def list_templates(
     category: str | None = None,
@@ -154,9 +235,7 @@ async def list_templates(
         >>> # 只列决策类模板
         >>> await list_templates("decision")
     """
-    loader = TemplateLoader()
-
-    templates = loader.list_templates()
+    templates = get_template_registry().list_templates()
 
     # 按类别过滤
     if category:
@@ -219,6 +298,38 @@ async def list_templates(
     return "\n".join(parts)
 
 
+@app.tool()
+async def reload_templates() -> str:
+    """
+    重新加载思考模板
+
+    模板在修改后会自动重新加载（按文件修改时间检测，间隔数秒），
+    需要立即生效时可以调用此工具。
+
+    Returns:
+        重新加载结果（模板数和格式无效的模板）
+    """
+    registry = get_template_registry()
+    count = registry.reload()
+
+    parts = [
+        "## 🔄 模板已重新加载",
+        "",
+        f"**模板数**: {count}",
+        f"**模板目录**: {', '.join(str(d) for d in registry.template_dirs)}",
+    ]
+
+    errors = registry.errors
+    if errors:
+        parts.append("")
+        parts.append("### ⚠️ 格式无效的模板")
+        parts.append("")
+        for template_id, error in sorted(errors.items()):
+            parts.append(f"- `{template_id}`: {error}")
+
+    return "\n".join(parts)
+
+
 def _normalize_format(format_type: str) -> str:
     """
     标准化格式类型（用于其他工具）
@@ -252,5 +363,7 @@ def _normalize_format(format_type: str) -> str:
 # 注册工具
 __all__ = [
     "apply_template",
+    "apply_template_batch",
     "list_templates",
+    "reload_templates",
 ]
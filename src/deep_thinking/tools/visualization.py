@@ -6,8 +6,11 @@
 
 import logging
 
-from deep_thinking.server import app, get_storage_manager
-from deep_thinking.utils.formatters import Visualizer
+from deep_thinking.models.thinking_session import ThinkingSession
+from deep_thinking.server import app, get_render_cache, get_storage_manager, get_task_executor
+from deep_thinking.storage.storage_manager import StorageManager
+from deep_thinking.utils.executor import run_io
+from deep_thinking.utils.render_cache import render_with_cache_async
 
 logger = logging.getLogger(__name__)
 
@@ -45,10 +48,56 @@ async def visualize_session(
     """
     manager = get_storage_manager()
 
-    # 获取会话
-    session = manager.get_session(session_id)
+    async def render() -> str:
+        session = await _load_session(manager, session_id)
+        # 增量渲染状态保存在本进程，在I/O线程池中渲染（不发送到渲染进程池）
+        return await run_io(get_task_executor(), _build_visualization, session, format_type)
+
+    return await render_with_cache_async(
+        get_render_cache(),
+        manager,
+        session_id,
+        f"visualize.{format_type.lower()}",
+        render,
+        get_task_executor(),
+    )
+
+
+async def _load_session(manager: StorageManager, session_id: str) -> ThinkingSession:
+    """
+    在I/O线程池中加载会话快照
+
+    Args:
+        manager: 存储管理器
+        session_id: 会话ID
+
+    Returns:
+        会话对象
+
+    Raises:
+        ValueError: 会话不存在
+    """
+    session = await run_io(get_task_executor(), manager.get_session, session_id)
     if session is None:
         raise ValueError(f"会话不存在: {session_id}")
+    return session
+
+
+def _build_visualization(session: ThinkingSession, format_type: str) -> str:
+    """
+    渲染 visualize_session 的完整输出（在服务器进程中执行，复用增量渲染状态）
+
+    Args:
+        session: 会话快照
+        format_type: 可视化格式
+
+    Returns:
+        带说明文字的可视化结果
+
+    Raises:
+        ValueError: 格式不支持或渲染失败
+    """
+    from deep_thinking.utils.incremental_visualizer import incremental_visualizer
 
     # 标准化格式类型
     format_normalized = _normalize_format(format_type)
@@ -56,25 +105,25 @@ async def visualize_session(
     # 生成可视化
     try:
         if format_normalized == "mermaid":
-            result = Visualizer.to_mermaid(session)
+            result = incremental_visualizer.to_mermaid(session)
             format_desc = "Mermaid 流程图"
             usage_hint = """您可以将以下代码复制到 Mermaid 编辑器中查看：
 https://mermaid.live
 
 或者直接在支持 Mermaid 的 Markdown 编辑器中使用。"""
         elif format_normalized == "ascii":
-            result = Visualizer.to_ascii(session)
+            result = incremental_visualizer.to_ascii(session)
             format_desc = "ASCII 流程图"
             usage_hint = "此图使用纯文本字符绘制，可在任何终端中正确显示。"
         elif format_normalized == "tree":
-            result = Visualizer.to_tree(session)
+            result = incremental_visualizer.to_tree(session)
             format_desc = "树状结构"
             usage_hint = "树状结构清晰地展示了思考步骤的层次关系。"
         else:
             raise ValueError(f"不支持的格式: {format_normalized}")
 
     except Exception as e:
-        logger.error(f"可视化会话 {session_id} 失败: {e}")
+        logger.error(f"可视化会话 {session.session_id} 失败: {e}")
         raise ValueError(f"可视化失败: {e}") from e
 
     # 返回结果
@@ -123,21 +172,46 @@ async def visualize_session_simple(
     """
     manager = get_storage_manager()
 
-    # 获取会话
-    session = manager.get_session(session_id)
-    if session is None:
-        raise ValueError(f"会话不存在: {session_id}")
+    async def render() -> str:
+        session = await _load_session(manager, session_id)
+        return await run_io(get_task_executor(), _build_visualization_simple, session, format_type)
+
+    return await render_with_cache_async(
+        get_render_cache(),
+        manager,
+        session_id,
+        f"visual.{format_type.lower()}",
+        render,
+        get_task_executor(),
+    )
+
+
+def _build_visualization_simple(session: ThinkingSession, format_type: str) -> str:
+    """
+    渲染纯可视化内容（在服务器进程中执行，复用增量渲染状态）
+
+    Args:
+        session: 会话快照
+        format_type: 可视化格式
+
+    Returns:
+        纯可视化内容
+
+    Raises:
+        ValueError: 格式不支持
+    """
+    from deep_thinking.utils.incremental_visualizer import incremental_visualizer
 
     # 标准化格式类型
     format_normalized = _normalize_format(format_type)
 
     # 生成可视化
     if format_normalized == "mermaid":
-        return Visualizer.to_mermaid(session)
+        return incremental_visualizer.to_mermaid(session)
     elif format_normalized == "ascii":
-        return Visualizer.to_ascii(session)
+        return incremental_visualizer.to_ascii(session)
     elif format_normalized == "tree":
-        return Visualizer.to_tree(session)
+        return incremental_visualizer.to_tree(session)
     else:
         raise ValueError(f"不支持的格式: {format_normalized}")
 
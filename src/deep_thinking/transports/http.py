@@ -0,0 +1,550 @@
+"""
+Streamable HTTP传输模块
+
+基于aiohttp的普通HTTP传输，适用于不便维持事件流长连接的远程部署。
+
+关键特性:
+- POST /mcp 发送JSON-RPC消息，响应直接作为HTTP响应体返回（无状态，不需要会话ID）
+- GET /sessions/{session_id}/export 边渲染边以分块传输返回导出内容（加载和渲染在线程中执行，不阻塞事件循环）
+- 大响应分块写出，按请求的 Accept-Encoding 协商 gzip/deflate 压缩
+- HTTP/1.1 keep-alive 连接复用
+- 支持Bearer Token认证
+- 支持API Key认证
+"""
+
+import asyncio
+import contextlib
+import itertools
+import logging
+import threading
+from collections.abc import AsyncGenerator, Iterable
+from urllib.parse import quote
+
+import anyio
+from aiohttp import web
+from aiohttp.web_response import ContentCoding
+from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
+from mcp import types
+from mcp.server import FastMCP
+from mcp.shared.message import SessionMessage
+from pydantic import ValidationError
+
+from deep_thinking.server import get_storage_manager, get_task_executor
+from deep_thinking.transports.sse import create_auth_middleware
+from deep_thinking.utils.executor import run_io
+from deep_thinking.utils.formatters import (
+    TOOL_RESULT_FORMATS,
+    export_filename,
+    iter_render_session,
+)
+
+logger = logging.getLogger(__name__)
+
+# MCP消息端点
+MCP_PATH = "/mcp"
+
+# 会话导出端点
+EXPORT_PATH = "/sessions/{session_id}/export"
+
+# keep-alive 空闲连接保持时间（秒）
+KEEPALIVE_TIMEOUT = 75.0
+
+# 响应体超过该字节数时分块写出
+RESPONSE_CHUNK_SIZE = 64 * 1024
+
+# 响应体达到该字节数才压缩（小响应压缩收益低于开销）
+COMPRESSION_MIN_SIZE = 1024
+
+# 导出内容在线程中生成时最多缓冲的块数（写出跟不上时生成线程等待）
+EXPORT_QUEUE_SIZE = 16
+
+# 服务器会话消息流缓冲区大小
+STREAM_BUFFER_SIZE = 256
+
+# 导出格式对应的Content-Type
+EXPORT_CONTENT_TYPES = {
+    "json": "application/json",
+    "markdown": "text/markdown",
+    "md": "text/markdown",
+    "html": "text/html",
+    "text": "text/plain",
+    "txt": "text/plain",
+}
+
+
+def negotiate_encoding(accept_encoding: str) -> ContentCoding | None:
+    """
+    根据 Accept-Encoding 协商压缩方式
+
+    只支持 gzip 和 deflate，q=0 表示客户端拒绝该编码；
+    同等权重时优先 gzip。
+
+    Args:
+        accept_encoding: 请求的 Accept-Encoding 头部
+
+    Returns:
+        压缩方式，不压缩时返回None
+    """
+    best: ContentCoding | None = None
+    best_q = 0.0
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                continue
+
+        coding = {"gzip": ContentCoding.gzip, "deflate": ContentCoding.deflate}.get(name.strip())
+        if coding is None or q <= 0:
+            continue
+        if q > best_q or (q == best_q and coding is ContentCoding.gzip):
+            best, best_q = coding, q
+
+    return best
+
+
+async def _iter_in_thread(chunks: Iterable[bytes]) -> AsyncGenerator[bytes, None]:
+    """
+    在线程中消费同步生成器，通过有界队列把块交给事件循环
+
+    队列满时生成线程等待（写出速度决定渲染速度）；迭代器关闭后生成线程在下一块时停止。
+    生成器抛出的异常在事件循环一侧重新抛出。
+
+    Args:
+        chunks: 同步生成的响应体块
+
+    Yields:
+        响应体块
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue[bytes | Exception | None] = asyncio.Queue(EXPORT_QUEUE_SIZE)
+    stopped = threading.Event()
+
+    def put(item: bytes | Exception | None) -> None:
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    def produce() -> None:
+        try:
+            for chunk in chunks:
+                if stopped.is_set():
+                    return
+                put(chunk)
+            put(None)
+        except Exception as e:
+            if not stopped.is_set():
+                put(e)
+
+    producer = asyncio.ensure_future(asyncio.to_thread(produce))
+    try:
+        while (item := await queue.get()) is not None:
+            if isinstance(item, Exception):
+                raise item
+            yield item
+        await producer
+    finally:
+        # 清空队列，唤醒等待写入的生成线程
+        stopped.set()
+        while not queue.empty():
+            queue.get_nowait()
+
+
+class HTTPTransport:
+    """Streamable HTTP传输处理器"""
+
+    def __init__(
+        self,
+        app: FastMCP,
+        auth_token: str | None = None,
+        api_key: str | None = None,
+        keepalive_timeout: float = KEEPALIVE_TIMEOUT,
+    ):
+        """
+        初始化HTTP传输
+
+        Args:
+            app: FastMCP服务器实例
+            auth_token: Bearer Token用于认证
+            api_key: API Key用于认证
+            keepalive_timeout: keep-alive 空闲连接保持时间（秒）
+        """
+        self.app = app
+        self.auth_token = auth_token
+        self.api_key = api_key
+        self.keepalive_timeout = keepalive_timeout
+        self.web_app: web.Application | None = None
+        self.runner: web.AppRunner | None = None
+
+        # 所有HTTP请求共用一个无状态服务器会话，请求ID改写为内部ID以避免客户端之间冲突
+        self._request_ids = itertools.count(1)
+        self._pending: dict[int, asyncio.Future[types.JSONRPCResponse | types.JSONRPCError]] = {}
+        # (客户端标识, 客户端请求ID) -> 进行中的内部请求ID，用于改写取消通知
+        self._client_requests: dict[tuple[str, str | int], list[int]] = {}
+        self._to_server: MemoryObjectSendStream[SessionMessage | Exception] | None = None
+        self._tasks: list[asyncio.Task[None]] = []
+        self._lifespan: contextlib.AsyncExitStack | None = None
+
+    def create_web_app(self) -> web.Application:
+        """
+        创建aiohttp应用（含认证中间件和路由）
+
+        Returns:
+            aiohttp应用
+        """
+        web_app = web.Application()
+
+        # 添加认证中间件（如果配置了）
+        middleware = create_auth_middleware(self.auth_token, self.api_key)
+        if middleware is not None:
+            web_app.middlewares.append(middleware)
+
+        # 添加路由
+        web_app.router.add_post(MCP_PATH, self._mcp_handler)
+        web_app.router.add_get(EXPORT_PATH, self._export_handler)
+        web_app.router.add_get("/health", self._health_handler)
+
+        return web_app
+
+    async def _mcp_handler(self, request: web.Request) -> web.StreamResponse:
+        """
+        MCP消息端点处理器
+
+        请求等待服务器响应后返回JSON-RPC响应；
+        通知只需投递，立即返回202（取消通知中的请求ID改写为内部ID，无法对应时丢弃）。
+        """
+        if self._to_server is None:
+            return web.Response(status=503, text="Server not ready")
+
+        body = await request.read()
+        try:
+            message = types.JSONRPCMessage.model_validate_json(body)
+        except ValidationError as e:
+            logger.warning(f"无法解析MCP消息: {e}")
+            error = types.JSONRPCError(
+                jsonrpc="2.0",
+                id="server-error",
+                error=types.ErrorData(code=types.PARSE_ERROR, message="Parse error"),
+            )
+            return web.Response(
+                status=400, body=self._serialize(error), content_type="application/json"
+            )
+
+        root = message.root
+        client = self._client_key(request)
+        if not isinstance(root, types.JSONRPCRequest):
+            notification = self._map_notification(client, root)
+            if notification is not None:
+                await self._to_server.send(SessionMessage(types.JSONRPCMessage(notification)))
+            return web.Response(status=202, text="Accepted")
+
+        logger.debug(f"收到MCP请求: {root.method}")
+        internal_id = next(self._request_ids)
+        future: asyncio.Future[types.JSONRPCResponse | types.JSONRPCError] = (
+            asyncio.get_running_loop().create_future()
+        )
+        self._pending[internal_id] = future
+        client_request = (client, root.id)
+        self._client_requests.setdefault(client_request, []).append(internal_id)
+
+        try:
+            forwarded = root.model_copy(update={"id": internal_id})
+            await self._to_server.send(SessionMessage(types.JSONRPCMessage(forwarded)))
+            result = await future
+        except asyncio.CancelledError:
+            # 客户端断开：通知服务器取消仍在执行的请求
+            await self._cancel_request(internal_id)
+            raise
+        finally:
+            self._pending.pop(internal_id, None)
+            in_flight = self._client_requests.get(client_request, [])
+            if internal_id in in_flight:
+                in_flight.remove(internal_id)
+            if not in_flight:
+                self._client_requests.pop(client_request, None)
+
+        data = self._serialize(result, root.id)
+        if len(data) < COMPRESSION_MIN_SIZE:
+            return web.Response(body=data, content_type="application/json")
+        return await self._write_streamed(request, [data], "application/json")
+
+    @staticmethod
+    def _client_key(request: web.Request) -> str:
+        """客户端标识：客户端提供的 Mcp-Session-Id 头部，否则为对端地址"""
+        return request.headers.get("Mcp-Session-Id") or request.remote or ""
+
+    def _map_notification(
+        self,
+        client: str,
+        root: types.JSONRPCNotification | types.JSONRPCResponse | types.JSONRPCError,
+    ) -> types.JSONRPCNotification | None:
+        """
+        把客户端通知转换为共享服务器会话中的通知
+
+        服务器会话中的请求ID是内部ID，取消通知中的 requestId 改写为该客户端进行中请求的内部ID；
+        无法唯一对应（请求已结束、不属于该客户端或同一客户端有多个相同ID的请求）时丢弃。
+        无状态会话中服务器不会向客户端发送请求，客户端响应同样丢弃。
+
+        Args:
+            client: 客户端标识
+            root: 客户端消息
+
+        Returns:
+            要投递的通知，丢弃时返回None
+        """
+        if not isinstance(root, types.JSONRPCNotification):
+            logger.debug("丢弃客户端响应：无状态会话不向客户端发送请求")
+            return None
+        if root.method != "notifications/cancelled":
+            return root
+
+        params = dict(root.params or {})
+        request_id = params.get("requestId")
+        in_flight = (
+            self._client_requests.get((client, request_id))
+            if isinstance(request_id, str | int)
+            else None
+        )
+        if not in_flight or len(in_flight) != 1:
+            logger.debug(f"丢弃无法对应到进行中请求的取消通知: {request_id}")
+            return None
+        params["requestId"] = in_flight[0]
+        return root.model_copy(update={"params": params})
+
+    @staticmethod
+    def _serialize(
+        message: types.JSONRPCResponse | types.JSONRPCError,
+        request_id: types.RequestId | None = None,
+    ) -> bytes:
+        """序列化JSON-RPC响应（request_id 不为None时恢复客户端原始请求ID）"""
+        if request_id is not None:
+            message = message.model_copy(update={"id": request_id})
+        payload = types.JSONRPCMessage(message).model_dump_json(by_alias=True, exclude_none=True)
+        return payload.encode("utf-8")
+
+    async def _cancel_request(self, internal_id: int) -> None:
+        """向服务器发送取消通知"""
+        if self._to_server is None:
+            return
+        notification = types.JSONRPCNotification(
+            jsonrpc="2.0",
+            method="notifications/cancelled",
+            params={"requestId": internal_id, "reason": "HTTP client disconnected"},
+        )
+        with contextlib.suppress(anyio.ClosedResourceError, anyio.BrokenResourceError):
+            await self._to_server.send(SessionMessage(types.JSONRPCMessage(notification)))
+
+    async def _export_handler(self, request: web.Request) -> web.StreamResponse:
+        """
+        会话导出端点处理器
+
+        查询参数 format 指定导出格式（默认markdown），
+        文档头部渲染完成即开始发送，后续内容边渲染边分块写出。
+        """
+        session_id = request.match_info["session_id"]
+        format_type = request.query.get("format", "markdown").lower()
+        content_type = EXPORT_CONTENT_TYPES.get(format_type)
+        if content_type is None:
+            supported = ", ".join(EXPORT_CONTENT_TYPES)
+            return web.Response(status=400, text=f"Unsupported format: {format_type} ({supported})")
+
+        session = await run_io(
+            get_task_executor(),
+            get_storage_manager().get_session,
+            session_id,
+            format_type in TOOL_RESULT_FORMATS,
+        )
+        if session is None:
+            return web.Response(status=404, text=f"Session not found: {session_id}")
+
+        filename = quote(export_filename(session, format_type))
+        headers = {"Content-Disposition": f"inline; filename*=UTF-8''{filename}"}
+
+        chunks = (chunk.encode("utf-8") for chunk in iter_render_session(session, format_type))
+        return await self._write_streamed(request, _iter_in_thread(chunks), content_type, headers)
+
+    async def _write_streamed(
+        self,
+        request: web.Request,
+        chunks: Iterable[bytes] | AsyncGenerator[bytes, None],
+        content_type: str,
+        headers: dict[str, str] | None = None,
+    ) -> web.StreamResponse:
+        """
+        以分块传输写出响应体，按请求协商压缩
+
+        Args:
+            request: HTTP请求
+            chunks: 响应体块（可为在线程中边渲染边产生的异步迭代器）
+            content_type: 响应类型
+            headers: 额外响应头部
+
+        Returns:
+            已完成写出的流式响应
+        """
+        response = web.StreamResponse(status=200, headers=headers)
+        response.content_type = content_type
+        response.charset = "utf-8"
+        response.enable_chunked_encoding()
+
+        coding = negotiate_encoding(request.headers.get("Accept-Encoding", ""))
+        if coding is not None:
+            response.enable_compression(coding)
+
+        await response.prepare(request)
+        if isinstance(chunks, Iterable):
+            for chunk in chunks:
+                await self._write_chunk(response, chunk)
+        else:
+            # 客户端断开时关闭迭代器，通知生成线程停止
+            async with contextlib.aclosing(chunks):
+                async for chunk in chunks:
+                    await self._write_chunk(response, chunk)
+        await response.write_eof()
+        return response
+
+    @staticmethod
+    async def _write_chunk(response: web.StreamResponse, chunk: bytes) -> None:
+        """按 RESPONSE_CHUNK_SIZE 拆分写出一块响应体"""
+        for start in range(0, len(chunk), RESPONSE_CHUNK_SIZE):
+            await response.write(chunk[start : start + RESPONSE_CHUNK_SIZE])
+
+    async def _health_handler(self, _request: web.Request) -> web.Response:
+        """健康检查端点"""
+        return web.Response(status=200, text="OK")
+
+    async def _run_session(
+        self,
+        read_stream: MemoryObjectReceiveStream[SessionMessage | Exception],
+        write_stream: MemoryObjectSendStream[SessionMessage],
+    ) -> None:
+        """运行无状态MCP服务器会话（请求由服务器并发处理）"""
+        server = self.app._mcp_server
+        await server.run(
+            read_stream, write_stream, server.create_initialization_options(), stateless=True
+        )
+
+    async def _dispatch_responses(self, stream: MemoryObjectReceiveStream[SessionMessage]) -> None:
+        """把服务器响应交给等待中的HTTP请求（服务器通知没有接收方，直接丢弃）"""
+        async for session_message in stream:
+            root = session_message.message.root
+            if not isinstance(root, types.JSONRPCResponse | types.JSONRPCError):
+                continue
+            future = self._pending.get(root.id) if isinstance(root.id, int) else None
+            if future is not None and not future.done():
+                future.set_result(root)
+
+    async def _start_session(self) -> None:
+        """进入服务器生命周期并启动共享的无状态服务器会话"""
+        # 会话运行时复用生命周期，不会重复初始化
+        self._lifespan = contextlib.AsyncExitStack()
+        server = self.app._mcp_server
+        await self._lifespan.enter_async_context(server.lifespan(server))
+
+        to_server_send, to_server_recv = anyio.create_memory_object_stream[
+            SessionMessage | Exception
+        ](STREAM_BUFFER_SIZE)
+        from_server_send, from_server_recv = anyio.create_memory_object_stream[SessionMessage](
+            STREAM_BUFFER_SIZE
+        )
+        self._to_server = to_server_send
+        self._tasks = [
+            asyncio.create_task(self._run_session(to_server_recv, from_server_send)),
+            asyncio.create_task(self._dispatch_responses(from_server_recv)),
+        ]
+
+    async def start(
+        self, host: str = "localhost", port: int = 8000, reuse_port: bool = False
+    ) -> None:
+        """
+        启动HTTP服务器
+
+        Args:
+            host: 监听地址
+            port: 监听端口
+            reuse_port: 是否设置 SO_REUSEPORT（多工作进程共享端口）
+        """
+        await self._start_session()
+
+        # 创建aiohttp应用
+        self.web_app = self.create_web_app()
+
+        # 创建并启动runner（客户端断开时取消处理器，及时取消服务器端请求）
+        self.runner = web.AppRunner(
+            self.web_app, handler_cancellation=True, keepalive_timeout=self.keepalive_timeout
+        )
+        await self.runner.setup()
+
+        site = web.TCPSite(self.runner, host, port, reuse_port=reuse_port)
+        await site.start()
+
+        logger.info(f"HTTP服务器已启动: http://{host}:{port}")
+        logger.info(f"MCP端点: http://{host}:{port}{MCP_PATH}")
+        logger.info(f"导出端点: http://{host}:{port}{EXPORT_PATH}")
+        logger.info(f"健康检查: http://{host}:{port}/health")
+
+        if self.auth_token or self.api_key:
+            logger.info("认证已启用")
+
+    async def stop(self) -> None:
+        """停止HTTP服务器"""
+        try:
+            if self.runner:
+                await self.runner.cleanup()
+                logger.info("HTTP服务器已停止")
+        finally:
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks = []
+            self._to_server = None
+
+            for future in self._pending.values():
+                future.cancel()
+            self._pending.clear()
+
+            if self._lifespan is not None:
+                await self._lifespan.aclose()
+                self._lifespan = None
+
+
+async def run_http(
+    app: FastMCP,
+    host: str = "localhost",
+    port: int = 8000,
+    auth_token: str | None = None,
+    api_key: str | None = None,
+    reuse_port: bool = False,
+) -> None:
+    """
+    使用Streamable HTTP传输运行MCP服务器
+
+    Args:
+        app: FastMCP服务器实例
+        host: 监听地址
+        port: 监听端口
+        auth_token: Bearer Token用于认证
+        api_key: API Key用于认证
+        reuse_port: 是否设置 SO_REUSEPORT（多工作进程共享端口）
+
+    Example:
+        # 启动HTTP服务器（无认证）
+        await run_http(app, host="0.0.0.0", port=8000)
+
+        # 启动带Bearer Token认证的服务器
+        await run_http(app, host="0.0.0.0", port=8000, auth_token="your-token")
+    """
+    logger.info("启动HTTP传输模式")
+
+    transport = HTTPTransport(app, auth_token=auth_token, api_key=api_key)
+
+    try:
+        await transport.start(host=host, port=port, reuse_port=reuse_port)
+
+        # 保持运行
+        stop_event = asyncio.Event()
+        await stop_event.wait()
+
+    finally:
+        await transport.stop()
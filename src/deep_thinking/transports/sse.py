@@ -4,26 +4,163 @@ SSE传输模块
 使用HTTP Server-Sent Events进行远程通信，适用于远程服务器部署。
 
 关键特性:
-- HTTP POST + Server-Sent Events
+- GET /sse 建立长连接事件流，每个客户端一个MCP会话
+- POST /messages/?session_id=... 发送JSON-RPC消息，响应通过事件流推送
+- 同一会话内的多个请求并发处理（按JSON-RPC id多路复用）
+- 多工作进程模式下，其他工作进程收到的消息经Unix套接字转发到会话所在进程
+- 全部连接共用一个心跳定时器，只向间隔内没有写入的连接发送心跳
+- 关闭空闲连接，超出最大连接数时返回503，断开写缓冲区持续超出高水位的慢速消费者
+- GET /metrics 以Prometheus文本格式输出连接数、发送字节数、断开的客户端数和进程内运行指标
+- GET/POST /admin/profile 查询或控制运行时性能分析（仅在启用认证时提供）
 - 支持Bearer Token认证
 - 支持API Key认证
 - 可通过网络从任何位置访问
 """
 
 import asyncio
-import json
+import contextlib
 import logging
+from typing import Any
+from uuid import uuid4
 
+import aiohttp
+import anyio
 from aiohttp import web
+from aiohttp.typedefs import Middleware
+from anyio.streams.memory import MemoryObjectReceiveStream, MemoryObjectSendStream
+from mcp import types
 from mcp.server import FastMCP
+from mcp.shared.message import SessionMessage
+from pydantic import ValidationError
+
+from deep_thinking.transports.workers import get_worker_id, get_worker_socket
+from deep_thinking.utils.metrics import metrics
+from deep_thinking.utils.profiler import profiler
 
 logger = logging.getLogger(__name__)
 
+# 事件流端点
+SSE_PATH = "/sse"
+
+# 消息端点（客户端从 endpoint 事件获取完整地址）
+MESSAGES_PATH = "/messages/"
+
+# 性能分析管理端点（仅在启用认证时注册）
+PROFILE_PATH = "/admin/profile"
+
+# 默认心跳间隔（秒）：连接在该时间内没有写入时发送心跳，用于保持连接和检测断开的客户端
+DEFAULT_HEARTBEAT_INTERVAL = 15.0
+
+# 默认空闲超时（秒）：该时间内既没有收到消息也没有推送消息的连接被关闭，0 表示不限制
+DEFAULT_IDLE_TIMEOUT = 1800.0
+
+# 默认最大连接数，0 表示不限制
+DEFAULT_MAX_CONNECTIONS = 1000
+
+# 默认写缓冲区高水位（字节）：连续两次心跳检查都超出时视为慢速消费者并断开
+DEFAULT_WRITE_BUFFER_LIMIT = 1024 * 1024
+
+# 超出最大连接数时建议客户端重试的等待时间（秒）
+RETRY_AFTER_SECONDS = 5
+
+# 心跳注释
+HEARTBEAT = b": heartbeat\n\n"
+
+# 断开客户端的原因
+DROP_IDLE = "idle"
+DROP_SLOW = "slow"
+
+# 会话消息流缓冲区大小
+STREAM_BUFFER_SIZE = 32
+
+
+def _format_event(event: str, data: str) -> bytes:
+    """格式化SSE事件"""
+    return f"event: {event}\ndata: {data}\n\n".encode()
+
+
+def _session_owner(session_id: str) -> str | None:
+    """从会话ID解析所属工作进程编号（单进程模式的会话ID不含编号）"""
+    owner, sep, _ = session_id.partition(".")
+    return owner if sep else None
+
+
+def create_auth_middleware(
+    auth_token: str | None = None, api_key: str | None = None
+) -> Middleware | None:
+    """
+    创建认证中间件（SSE和HTTP传输共用）
+
+    Args:
+        auth_token: Bearer Token（为None时不检查）
+        api_key: API Key（为None时不检查）
+
+    Returns:
+        认证中间件，未配置任何认证信息时返回None
+    """
+    if not (auth_token or api_key):
+        return None
+
+    @web.middleware
+    async def auth(request: web.Request, handler):  # type: ignore[no-untyped-def]
+        """检查认证信息"""
+        # 检查Bearer Token
+        if auth_token:
+            auth_header = request.headers.get("Authorization", "")
+            if not auth_header.startswith("Bearer "):
+                return web.Response(status=401, text="Missing Bearer token")
+            token = auth_header[7:]  # 去掉"Bearer "前缀
+            if token != auth_token:
+                return web.Response(status=403, text="Invalid Bearer token")
+
+        # 检查API Key
+        if api_key:
+            api_key_header = request.headers.get("X-API-Key", "")
+            if api_key_header != api_key:
+                return web.Response(status=403, text="Invalid API Key")
+
+        return await handler(request)
+
+    return auth
+
+
+class _SSEConnection:
+    """单个SSE连接的写入状态"""
+
+    def __init__(self, session_id: str, request: web.Request, response: web.StreamResponse):
+        now = asyncio.get_running_loop().time()
+        self.session_id = session_id
+        self.request = request
+        self.response = response
+        # 推送任务和心跳共用同一响应，写入需串行
+        self.write_lock = asyncio.Lock()
+        # 最近一次写入（含心跳）和最近一次收发消息的时间
+        self.last_write = now
+        self.last_activity = now
+        # 上次心跳检查时写缓冲区是否超出高水位
+        self.over_limit = False
+        # 连接需要结束（被断开或写入失败）
+        self.closed = asyncio.Event()
+
+    def buffered_bytes(self) -> int:
+        """传输层写缓冲区中尚未发出的字节数"""
+        transport = self.request.transport
+        return transport.get_write_buffer_size() if transport is not None else 0
+
 
 class SSETransport:
     """SSE传输处理器"""
 
-    def __init__(self, app: FastMCP, auth_token: str | None = None, api_key: str | None = None):
+    def __init__(
+        self,
+        app: FastMCP,
+        auth_token: str | None = None,
+        api_key: str | None = None,
+        heartbeat_interval: float = DEFAULT_HEARTBEAT_INTERVAL,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        write_buffer_limit: int = DEFAULT_WRITE_BUFFER_LIMIT,
+    ):
         """
         初始化SSE传输
 
@@ -31,47 +168,130 @@ class SSETransport:
             app: FastMCP服务器实例
             auth_token: Bearer Token用于认证
             api_key: API Key用于认证
+            heartbeat_interval: 心跳间隔（秒）
+            idle_timeout: 空闲连接超时（秒），0 表示不限制
+            max_connections: 最大连接数，0 表示不限制
+            write_buffer_limit: 写缓冲区高水位（字节）
+
+        Raises:
+            ValueError: 心跳间隔或写缓冲区高水位不是正数
         """
+        if heartbeat_interval <= 0:
+            raise ValueError(f"心跳间隔必须大于0: {heartbeat_interval}")
+        if write_buffer_limit <= 0:
+            raise ValueError(f"写缓冲区高水位必须大于0: {write_buffer_limit}")
+
         self.app = app
         self.auth_token = auth_token
         self.api_key = api_key
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = max(idle_timeout, 0.0)
+        self.max_connections = max(max_connections, 0)
+        self.write_buffer_limit = write_buffer_limit
         self.web_app: web.Application | None = None
         self.runner: web.AppRunner | None = None
 
+        # 活跃会话: 会话ID -> 发往服务器的消息流
+        self._sessions: dict[str, MemoryObjectSendStream[SessionMessage | Exception]] = {}
+        # 活跃连接: 会话ID -> 事件流写入状态
+        self._connections: dict[str, _SSEConnection] = {}
+        self._lifespan: contextlib.AsyncExitStack | None = None
+
+        # 共享心跳定时器，以及进行中的心跳写入
+        self._heartbeat_task: asyncio.Task[None] | None = None
+        self._heartbeat_writes: set[asyncio.Task[None]] = set()
+
+        # 指标
+        self.bytes_sent = 0
+        self.rejected_connections = 0
+        self.dropped_clients: dict[str, int] = {DROP_IDLE: 0, DROP_SLOW: 0}
+
+        # 多工作进程模式：本进程编号，以及转发消息到其他工作进程的客户端
+        self.worker_id = get_worker_id()
+        self._forwarders: dict[str, aiohttp.ClientSession] = {}
+
+    @property
+    def session_count(self) -> int:
+        """当前活跃的SSE会话数"""
+        return len(self._sessions)
+
+    @property
+    def metrics(self) -> dict[str, Any]:
+        """连接指标（当前连接数、发送字节数、拒绝和断开的客户端数）"""
+        return {
+            "connections": len(self._connections),
+            "max_connections": self.max_connections,
+            "bytes_sent": self.bytes_sent,
+            "rejected_connections": self.rejected_connections,
+            "dropped_clients": dict(self.dropped_clients),
+        }
+
     def _setup_auth(self, app: web.Application) -> None:
         """设置认证中间件"""
-        if not (self.auth_token or self.api_key):
-            return
+        middleware = create_auth_middleware(self.auth_token, self.api_key)
+        if middleware is not None:
+            app.middlewares.append(middleware)
 
-        @web.middleware
-        async def auth(request: web.Request, handler):  # type: ignore[no-untyped-def]
-            """检查认证信息"""
-            # 检查Bearer Token
-            if self.auth_token:
-                auth_header = request.headers.get("Authorization", "")
-                if not auth_header.startswith("Bearer "):
-                    return web.Response(status=401, text="Missing Bearer token")
-                token = auth_header[7:]  # 去掉"Bearer "前缀
-                if token != self.auth_token:
-                    return web.Response(status=403, text="Invalid Bearer token")
+    def create_web_app(self) -> web.Application:
+        """
+        创建aiohttp应用（含认证中间件和路由）
 
-            # 检查API Key
-            if self.api_key:
-                api_key_header = request.headers.get("X-API-Key", "")
-                if api_key_header != self.api_key:
-                    return web.Response(status=403, text="Invalid API Key")
+        Returns:
+            aiohttp应用
+        """
+        web_app = web.Application()
+
+        # 添加认证中间件（如果配置了）
+        self._setup_auth(web_app)
+
+        # 添加路由
+        web_app.router.add_get(SSE_PATH, self._sse_handler)
+        web_app.router.add_post(MESSAGES_PATH, self._message_handler)
+        web_app.router.add_post(MESSAGES_PATH.rstrip("/"), self._message_handler)
+        web_app.router.add_get("/health", self._health_handler)
+        web_app.router.add_get("/metrics", self._metrics_handler)
+
+        # 管理路由可以在数据目录写入文件，只在启用认证时提供
+        if self.auth_token or self.api_key:
+            web_app.router.add_get(PROFILE_PATH, self._profile_handler)
+            web_app.router.add_post(PROFILE_PATH, self._profile_handler)
 
-            return await handler(request)
+        # 共享心跳定时器随应用启动和清理
+        web_app.on_startup.append(self._start_heartbeat)
+        web_app.on_cleanup.append(self._stop_heartbeat)
 
-        app.middlewares.append(auth)
+        return web_app
 
-    async def _sse_handler(self, request: web.Request) -> web.Response:
+    async def _sse_handler(self, request: web.Request) -> web.StreamResponse:
         """
-        SSE端点处理器
+        SSE事件流端点处理器
 
-        处理MCP的JSON-RPC请求并返回SSE响应
+        为客户端创建MCP会话：先发送 endpoint 事件告知消息端点，
+        之后把服务器发出的JSON-RPC消息作为 message 事件推送，
+        空闲时由共享心跳定时器发送心跳注释。客户端断开或连接被断开后结束会话。
+        超出最大连接数时返回503。
         """
-        logger.debug("收到SSE连接请求")
+        if self.max_connections and len(self._connections) >= self.max_connections:
+            self.rejected_connections += 1
+            logger.warning(f"SSE连接数已达上限 {self.max_connections}，拒绝新连接")
+            return web.Response(
+                status=503,
+                text="Too many connections",
+                headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+            )
+
+        session_id = uuid4().hex
+        if self.worker_id is not None:
+            # 会话ID带上工作进程编号，其他工作进程据此转发消息
+            session_id = f"{self.worker_id}.{session_id}"
+        logger.debug(f"收到SSE连接请求: {session_id}")
+
+        to_server_send, to_server_recv = anyio.create_memory_object_stream[
+            SessionMessage | Exception
+        ](STREAM_BUFFER_SIZE)
+        from_server_send, from_server_recv = anyio.create_memory_object_stream[SessionMessage](
+            STREAM_BUFFER_SIZE
+        )
 
         # 设置SSE响应头
         response = web.StreamResponse(
@@ -83,78 +303,321 @@ class SSETransport:
                 "Access-Control-Allow-Origin": "*",
             },
         )
-        await response.prepare(request)
 
-        # 发送连接建立消息
-        await response.write(b"event: connected\n")
-        await response.write(b'data: {"status":"connected"}\n\n')
+        connection = _SSEConnection(session_id, request, response)
 
+        tasks: list[asyncio.Task[Any]] = []
         try:
-            # 读取请求体
-            request_data = await request.json()
-            logger.info(f"收到MCP请求: {request_data.get('method', 'unknown')}")
-
-            # 基础JSON-RPC响应
-            # 注意：完整的MCP协议处理由FastMCP框架在更高层实现。
-            # SSE传输层负责建立连接和传输数据，具体的工具调用和响应处理
-            # 由FastMCP的内部机制处理。
-            response_data = {
-                "jsonrpc": "2.0",
-                "id": request_data.get("id"),
-                "result": {"status": "ok"},
-            }
-
-            # 发送响应
-            await response.write(b"event: message\n")
-            await response.write(f"data: {json.dumps(response_data)}\n\n".encode())
-
-            # 保持连接
-            while True:
-                await asyncio.sleep(1)
-                # 发送心跳
-                await response.write(b": heartbeat\n\n")
-
-        except asyncio.CancelledError:
-            logger.debug("SSE连接被取消")
-        except Exception as e:
-            logger.error(f"SSE处理错误: {e}", exc_info=True)
+            await response.prepare(request)
+            if request.transport is not None:
+                # 暂停写入的阈值与慢速消费者检测的高水位一致
+                request.transport.set_write_buffer_limits(high=self.write_buffer_limit)
+
+            self._sessions[session_id] = to_server_send
+            self._connections[session_id] = connection
+            await self._send(
+                connection, _format_event("endpoint", f"{MESSAGES_PATH}?session_id={session_id}")
+            )
+            logger.info(f"SSE会话已建立: {session_id}（活跃会话 {len(self._sessions)}）")
+
+            tasks = [
+                asyncio.create_task(self._run_session(to_server_recv, from_server_send)),
+                asyncio.create_task(self._pump_messages(from_server_recv, connection)),
+                asyncio.create_task(connection.closed.wait()),
+            ]
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                error = task.exception()
+                if error is not None and not isinstance(error, ConnectionError):
+                    logger.error(f"SSE会话异常结束: {error}", exc_info=error)
+
+        except (asyncio.CancelledError, ConnectionError):
+            logger.debug(f"SSE连接被取消: {session_id}")
         finally:
-            logger.debug("SSE连接已关闭")
+            self._sessions.pop(session_id, None)
+            self._connections.pop(session_id, None)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for stream in (to_server_send, to_server_recv, from_server_send, from_server_recv):
+                await stream.aclose()
+            logger.debug(f"SSE连接已关闭: {session_id}")
+
+        return response
+
+    async def _run_session(
+        self,
+        read_stream: MemoryObjectReceiveStream[SessionMessage | Exception],
+        write_stream: MemoryObjectSendStream[SessionMessage],
+    ) -> None:
+        """运行MCP服务器会话（会话内的请求由服务器并发处理）"""
+        server = self.app._mcp_server
+        await server.run(read_stream, write_stream, server.create_initialization_options())
+
+    async def _send(self, connection: _SSEConnection, chunk: bytes) -> None:
+        """写入事件流并记录发送字节数"""
+        async with connection.write_lock:
+            await connection.response.write(chunk)
+        connection.last_write = asyncio.get_running_loop().time()
+        self.bytes_sent += len(chunk)
+
+    async def _pump_messages(
+        self, stream: MemoryObjectReceiveStream[SessionMessage], connection: _SSEConnection
+    ) -> None:
+        """把服务器发出的消息推送到事件流"""
+        async for session_message in stream:
+            data = session_message.message.model_dump_json(by_alias=True, exclude_none=True)
+            connection.last_activity = asyncio.get_running_loop().time()
+            await self._send(connection, _format_event("message", data))
+
+    async def _start_heartbeat(self, _web_app: web.Application) -> None:
+        """启动共享心跳定时器"""
+        if self._heartbeat_task is None:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop())
+
+    async def _stop_heartbeat(self, _web_app: web.Application) -> None:
+        """停止共享心跳定时器和进行中的心跳写入"""
+        tasks = list(self._heartbeat_writes)
+        if self._heartbeat_task is not None:
+            tasks.append(self._heartbeat_task)
+            self._heartbeat_task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _heartbeat_loop(self) -> None:
+        """按心跳间隔检查全部连接"""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            self._check_connections()
+
+    def _check_connections(self) -> None:
+        """
+        检查全部连接：断开空闲连接和慢速消费者，向间隔内没有写入的连接发送心跳
+
+        心跳写入在独立任务中进行，单个连接写入阻塞不影响其他连接。
+        """
+        now = asyncio.get_running_loop().time()
+        for connection in list(self._connections.values()):
+            if connection.closed.is_set():
+                continue
+
+            if self.idle_timeout and now - connection.last_activity >= self.idle_timeout:
+                self._drop(connection, DROP_IDLE)
+                continue
+
+            if connection.buffered_bytes() > self.write_buffer_limit:
+                if connection.over_limit:
+                    self._drop(connection, DROP_SLOW)
+                else:
+                    # 缓冲区已满时不再追加心跳，下次检查仍超出则断开
+                    connection.over_limit = True
+                continue
+            connection.over_limit = False
+
+            if (
+                now - connection.last_write >= self.heartbeat_interval
+                and not connection.write_lock.locked()
+            ):
+                task = asyncio.create_task(self._send_heartbeat(connection))
+                self._heartbeat_writes.add(task)
+                task.add_done_callback(self._heartbeat_writes.discard)
+
+    async def _send_heartbeat(self, connection: _SSEConnection) -> None:
+        """发送心跳（客户端断开时写入失败，结束会话）"""
+        try:
+            await self._send(connection, HEARTBEAT)
+        except (ConnectionError, RuntimeError):
+            connection.closed.set()
+
+    def _drop(self, connection: _SSEConnection, reason: str) -> None:
+        """
+        断开客户端
+
+        空闲连接正常结束事件流；慢速消费者的缓冲数据无法送达，直接中止连接。
+        """
+        self.dropped_clients[reason] += 1
+        if reason == DROP_SLOW:
+            logger.warning(
+                f"SSE客户端读取过慢，断开连接: {connection.session_id}"
+                f"（写缓冲区 {connection.buffered_bytes()} 字节）"
+            )
+            if connection.request.transport is not None:
+                connection.request.transport.abort()
+        else:
+            logger.info(f"SSE连接空闲超时，断开连接: {connection.session_id}")
+        connection.closed.set()
+
+    async def _message_handler(self, request: web.Request) -> web.Response:
+        """
+        消息端点处理器
 
-        # SSE连接不会正常返回，始终通过异常结束
-        raise NotImplementedError("SSE handler should never return")  # pragma: no cover
+        把JSON-RPC消息投递到对应会话，立即返回202；
+        响应通过该会话的事件流推送。
+        """
+        session_id = request.query.get("session_id")
+        if not session_id:
+            return web.Response(status=400, text="session_id is required")
+
+        writer = self._sessions.get(session_id)
+        connection = self._connections.get(session_id)
+        if writer is None or connection is None:
+            owner = _session_owner(session_id)
+            if owner is not None and owner != self.worker_id:
+                return await self._forward_message(request, owner)
+            return web.Response(status=404, text="Could not find session")
+
+        body = await request.read()
+        try:
+            message = types.JSONRPCMessage.model_validate_json(body)
+        except ValidationError as e:
+            logger.warning(f"无法解析MCP消息: {e}")
+            return web.Response(status=400, text="Could not parse message")
+
+        method = getattr(message.root, "method", None)
+        if method:
+            logger.debug(f"收到MCP消息: {method}")
+
+        connection.last_activity = asyncio.get_running_loop().time()
+        try:
+            await writer.send(SessionMessage(message))
+        except (anyio.ClosedResourceError, anyio.BrokenResourceError):
+            return web.Response(status=404, text="Could not find session")
+
+        return web.Response(status=202, text="Accepted")
+
+    async def _forward_message(self, request: web.Request, owner: str) -> web.Response:
+        """
+        把消息转发到会话所在的工作进程
+
+        请求原样发往目标进程的Unix套接字（保留认证头），返回其响应状态。
+        """
+        socket_path = get_worker_socket(owner)
+        if socket_path is None or not socket_path.exists():
+            return web.Response(status=404, text="Could not find session")
+
+        forwarder = self._forwarders.get(owner)
+        if forwarder is None or forwarder.closed:
+            forwarder = aiohttp.ClientSession(
+                connector=aiohttp.UnixConnector(path=str(socket_path))
+            )
+            self._forwarders[owner] = forwarder
+
+        headers = {
+            name: value
+            for name in ("Authorization", "X-API-Key", "Content-Type")
+            if (value := request.headers.get(name)) is not None
+        }
+        try:
+            async with forwarder.post(
+                f"http://worker-{owner}{MESSAGES_PATH}",
+                params=request.query,
+                data=await request.read(),
+                headers=headers,
+            ) as response:
+                return web.Response(status=response.status, text=await response.text())
+        except aiohttp.ClientError as e:
+            logger.warning(f"转发消息到工作进程 {owner} 失败: {e}")
+            return web.Response(status=404, text="Could not find session")
 
     async def _health_handler(self, _request: web.Request) -> web.Response:
         """健康检查端点"""
         return web.Response(status=200, text="OK")
 
-    async def start(self, host: str = "localhost", port: int = 8000) -> None:
+    async def _metrics_handler(self, _request: web.Request) -> web.Response:
+        """指标端点（Prometheus文本格式）"""
+        return web.Response(text=self._format_metrics(), content_type="text/plain")
+
+    async def _profile_handler(self, request: web.Request) -> web.Response:
+        """
+        性能分析管理端点
+
+        GET 返回分析状态；POST 的JSON请求体为 {"action": "start|stop|status", "mode": ...,
+        "calls": ..., "seconds": ...}，返回动作执行后的状态。
+        多工作进程模式下只作用于处理本次请求的工作进程。
+        """
+        params: Any = {}
+        if request.method == "POST" and request.can_read_body:
+            try:
+                params = await request.json()
+            except ValueError:
+                return web.json_response({"error": "请求体不是有效的JSON"}, status=400)
+            if not isinstance(params, dict):
+                return web.json_response({"error": "请求体必须是JSON对象"}, status=400)
+
+        # 服务器模块在首次调用时导入（传输模块不依赖服务器实例）
+        from deep_thinking.server import get_profiles_dir
+
+        try:
+            status = profiler.control(
+                str(params.get("action", "status")),
+                get_profiles_dir(),
+                mode=str(params.get("mode", "cprofile")),
+                calls=params.get("calls"),
+                seconds=params.get("seconds"),
+            )
+        except (TypeError, ValueError) as e:
+            return web.json_response({"error": str(e)}, status=400)
+        return web.json_response({**status, "worker_id": self.worker_id})
+
+    def _format_metrics(self) -> str:
+        """把连接指标和进程内运行指标格式化为Prometheus文本格式"""
+        lines = [
+            "# HELP deepthinking_sse_connections 当前SSE连接数",
+            "# TYPE deepthinking_sse_connections gauge",
+            f"deepthinking_sse_connections {len(self._connections)}",
+            "# HELP deepthinking_sse_bytes_sent_total 事件流已发送字节数",
+            "# TYPE deepthinking_sse_bytes_sent_total counter",
+            f"deepthinking_sse_bytes_sent_total {self.bytes_sent}",
+            "# HELP deepthinking_sse_rejected_connections_total 超出最大连接数被拒绝的连接数",
+            "# TYPE deepthinking_sse_rejected_connections_total counter",
+            f"deepthinking_sse_rejected_connections_total {self.rejected_connections}",
+            "# HELP deepthinking_sse_dropped_clients_total 被断开的客户端数",
+            "# TYPE deepthinking_sse_dropped_clients_total counter",
+        ]
+        for reason, count in self.dropped_clients.items():
+            lines.append(f'deepthinking_sse_dropped_clients_total{{reason="{reason}"}} {count}')
+        return "\n".join(lines) + "\n" + metrics.format_prometheus()
+
+    async def start(
+        self, host: str = "localhost", port: int = 8000, reuse_port: bool = False
+    ) -> None:
         """
         启动SSE服务器
 
+        服务器运行期间持有生命周期上下文，各会话共享存储等资源。
+
         Args:
             host: 监听地址
             port: 监听端口
+            reuse_port: 是否设置 SO_REUSEPORT（多工作进程共享端口）
         """
-        # 创建aiohttp应用
-        self.web_app = web.Application()
-
-        # 添加认证中间件（如果配置了）
-        self._setup_auth(self.web_app)
+        # 进入服务器生命周期（会话运行时复用，不会重复初始化）
+        self._lifespan = contextlib.AsyncExitStack()
+        server = self.app._mcp_server
+        await self._lifespan.enter_async_context(server.lifespan(server))
 
-        # 添加路由
-        self.web_app.router.add_post("/sse", self._sse_handler)
-        self.web_app.router.add_get("/health", self._health_handler)
+        # 创建aiohttp应用
+        self.web_app = self.create_web_app()
 
-        # 创建并启动runner
-        self.runner = web.AppRunner(self.web_app)
+        # 创建并启动runner（客户端断开时取消处理器，及时结束会话）
+        self.runner = web.AppRunner(self.web_app, handler_cancellation=True)
         await self.runner.setup()
 
-        site = web.TCPSite(self.runner, host, port)
+        site = web.TCPSite(self.runner, host, port, reuse_port=reuse_port)
         await site.start()
 
+        # 多工作进程模式：额外监听Unix套接字，接收其他工作进程转发的消息
+        if self.worker_id is not None:
+            socket_path = get_worker_socket(self.worker_id)
+            if socket_path is not None:
+                await web.UnixSite(self.runner, str(socket_path)).start()
+                logger.info(f"工作进程 {self.worker_id} 转发套接字: {socket_path}")
+
         logger.info(f"SSE服务器已启动: http://{host}:{port}")
-        logger.info(f"SSE端点: http://{host}:{port}/sse")
+        logger.info(f"SSE端点: http://{host}:{port}{SSE_PATH}")
+        logger.info(f"消息端点: http://{host}:{port}{MESSAGES_PATH}")
         logger.info(f"健康检查: http://{host}:{port}/health")
 
         if self.auth_token or self.api_key:
@@ -162,9 +625,17 @@ class SSETransport:
 
     async def stop(self) -> None:
         """停止SSE服务器"""
-        if self.runner:
-            await self.runner.cleanup()
-            logger.info("SSE服务器已停止")
+        try:
+            for forwarder in self._forwarders.values():
+                await forwarder.close()
+            self._forwarders.clear()
+            if self.runner:
+                await self.runner.cleanup()
+                logger.info("SSE服务器已停止")
+        finally:
+            if self._lifespan is not None:
+                await self._lifespan.aclose()
+                self._lifespan = None
 
 
 async def run_sse(
@@ -173,6 +644,11 @@ async def run_sse(
     port: int = 8000,
     auth_token: str | None = None,
     api_key: str | None = None,
+    reuse_port: bool = False,
+    heartbeat_interval: float = DEFAULT_HEARTBEAT_INTERVAL,
+    idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+    max_connections: int = DEFAULT_MAX_CONNECTIONS,
+    write_buffer_limit: int = DEFAULT_WRITE_BUFFER_LIMIT,
 ) -> None:
     """
     使用SSE传输运行MCP服务器
@@ -183,6 +659,11 @@ async def run_sse(
         port: 监听端口
         auth_token: Bearer Token用于认证
         api_key: API Key用于认证
+        reuse_port: 是否设置 SO_REUSEPORT（多工作进程共享端口）
+        heartbeat_interval: 心跳间隔（秒）
+        idle_timeout: 空闲连接超时（秒），0 表示不限制
+        max_connections: 最大连接数，0 表示不限制
+        write_buffer_limit: 写缓冲区高水位（字节）
 
     Example:
         # 启动SSE服务器（无认证）
@@ -193,10 +674,18 @@ async def run_sse(
     """
     logger.info("启动SSE传输模式")
 
-    transport = SSETransport(app, auth_token=auth_token, api_key=api_key)
+    transport = SSETransport(
+        app,
+        auth_token=auth_token,
+        api_key=api_key,
+        heartbeat_interval=heartbeat_interval,
+        idle_timeout=idle_timeout,
+        max_connections=max_connections,
+        write_buffer_limit=write_buffer_limit,
+    )
 
     try:
-        await transport.start(host=host, port=port)
+        await transport.start(host=host, port=port, reuse_port=reuse_port)
 
         # 保持运行
         stop_event = asyncio.Event()
@@ -0,0 +1,187 @@
+"""
+多工作进程模块
+
+SSE/HTTP模式指定 --workers N（N > 1）时，主进程作为监督进程启动 N 个服务器工作进程，
+工作进程通过 SO_REUSEPORT 监听同一端口，由内核在进程间分发连接。
+
+关键特性:
+- 每个工作进程拥有独立的事件循环和存储管理器，共享同一数据目录
+- 跨进程一致性由存储层的文件锁和原子索引写入保证
+- 工作进程异常退出时自动重启；启动后立即退出则停止全部进程
+- SSE会话属于建立事件流的工作进程，落到其他进程的消息经Unix套接字转发
+"""
+
+import asyncio
+import contextlib
+import logging
+import os
+import signal
+import socket
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# 工作进程编号（由监督进程设置，单进程模式下不存在）
+WORKER_ID_ENV = "DEEP_THINKING_WORKER_ID"
+
+# 工作进程之间转发消息的Unix套接字目录（由监督进程创建和清理）
+WORKER_DIR_ENV = "DEEP_THINKING_WORKER_DIR"
+
+# 运行时间短于此值（秒）即退出的工作进程视为启动失败，不再重启
+MIN_UPTIME = 5.0
+
+# 停止时等待工作进程退出的时间（秒），超时后强制结束
+STOP_TIMEOUT = 10.0
+
+
+def reuse_port_supported() -> bool:
+    """
+    检查当前平台是否支持 SO_REUSEPORT
+
+    Returns:
+        支持时返回True
+    """
+    if not hasattr(socket, "SO_REUSEPORT"):
+        return False
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    except OSError:
+        return False
+    return True
+
+
+def get_worker_id() -> str | None:
+    """
+    获取当前工作进程编号
+
+    Returns:
+        工作进程编号，不是由监督进程启动时返回None
+    """
+    return os.getenv(WORKER_ID_ENV) or None
+
+
+def get_worker_socket(worker_id: str) -> Path | None:
+    """
+    获取工作进程的Unix套接字路径
+
+    Args:
+        worker_id: 工作进程编号
+
+    Returns:
+        套接字路径，不在多工作进程模式下时返回None
+    """
+    worker_dir = os.getenv(WORKER_DIR_ENV)
+    if not worker_dir:
+        return None
+    return Path(worker_dir) / f"worker-{worker_id}.sock"
+
+
+async def _spawn(worker_id: int, argv: list[str], worker_dir: str) -> asyncio.subprocess.Process:
+    """以相同命令行参数启动一个工作进程"""
+    env = {**os.environ, WORKER_ID_ENV: str(worker_id), WORKER_DIR_ENV: worker_dir}
+    # 工作进程使用独立的进程组，终端中断信号只发给监督进程，由其统一停止
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-m", "deep_thinking", *argv, env=env, start_new_session=True
+    )
+    logger.info(f"工作进程 {worker_id} 已启动（PID {process.pid}）")
+    return process
+
+
+async def _terminate(processes: list[asyncio.subprocess.Process]) -> None:
+    """先发送SIGTERM，超时后强制结束"""
+    running = [p for p in processes if p.returncode is None]
+    for process in running:
+        with contextlib.suppress(ProcessLookupError):
+            process.terminate()
+    try:
+        await asyncio.wait_for(asyncio.gather(*(p.wait() for p in running)), timeout=STOP_TIMEOUT)
+    except asyncio.TimeoutError:
+        for process in running:
+            if process.returncode is None:
+                logger.warning(f"工作进程 PID {process.pid} 未按时退出，强制结束")
+                with contextlib.suppress(ProcessLookupError):
+                    process.kill()
+        await asyncio.gather(*(p.wait() for p in running))
+
+
+async def run_workers(workers: int, argv: list[str]) -> int:
+    """
+    作为监督进程运行多个服务器工作进程
+
+    工作进程以相同的命令行参数重新启动本程序，并通过环境变量获得编号；
+    收到 SIGTERM/SIGINT 时停止全部工作进程。
+
+    Args:
+        workers: 工作进程数
+        argv: 传给工作进程的命令行参数（不含程序名）
+
+    Returns:
+        退出码: 0表示正常停止，1表示工作进程启动失败
+
+    Raises:
+        ValueError: 工作进程数小于1
+    """
+    if workers < 1:
+        raise ValueError(f"工作进程数必须大于0，当前值: {workers}")
+
+    loop = asyncio.get_running_loop()
+    stop_event = asyncio.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        with contextlib.suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stop_event.set)
+
+    exit_code = 0
+    processes: dict[int, asyncio.subprocess.Process] = {}
+    try:
+        with tempfile.TemporaryDirectory(prefix="deepthinking-workers-") as worker_dir:
+            started: dict[int, float] = {}
+            waiters: dict[asyncio.Task[int], int] = {}
+
+            async def start(worker_id: int) -> None:
+                processes[worker_id] = await _spawn(worker_id, argv, worker_dir)
+                started[worker_id] = time.monotonic()
+                waiters[asyncio.create_task(processes[worker_id].wait())] = worker_id
+
+            try:
+                for worker_id in range(workers):
+                    await start(worker_id)
+                logger.info(f"监督进程已启动 {workers} 个工作进程")
+
+                stop_task = asyncio.create_task(stop_event.wait())
+                while not stop_event.is_set():
+                    done, _ = await asyncio.wait(
+                        [stop_task, *waiters], return_when=asyncio.FIRST_COMPLETED
+                    )
+                    if stop_event.is_set():
+                        break
+                    for task in done:
+                        worker_id = waiters.pop(task)
+                        uptime = time.monotonic() - started[worker_id]
+                        if uptime < MIN_UPTIME:
+                            logger.error(
+                                f"工作进程 {worker_id} 启动后立即退出"
+                                f"（退出码 {task.result()}），停止全部工作进程"
+                            )
+                            exit_code = 1
+                            stop_event.set()
+                            break
+                        logger.warning(
+                            f"工作进程 {worker_id} 异常退出（退出码 {task.result()}），正在重启"
+                        )
+                        await start(worker_id)
+                stop_task.cancel()
+            finally:
+                for task in waiters:
+                    task.cancel()
+                await _terminate(list(processes.values()))
+                logger.info("全部工作进程已停止")
+    finally:
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            with contextlib.suppress(NotImplementedError):
+                loop.remove_signal_handler(sig)
+
+    return exit_code
@@ -0,0 +1,494 @@
+"""
+批量导出模块
+
+在多进程工作池中并行渲染多个会话，并输出为文件目录或单个归档文件。
+关键特性:
+- 会话筛选：按状态、更新时间范围或会话ID列表
+- 并行渲染：ProcessPoolExecutor，每个工作进程持有独立的存储管理器
+- 输出模式：目录（dir）、ZIP 归档（zip）、TAR 归档（tar）
+- 断点续传：定期写入检查点文件，中断后重新运行会跳过已完成的会话
+- 进度回调：每完成一个会话回调一次
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tarfile
+import time
+import zipfile
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from deep_thinking.storage.storage_manager import StorageManager
+
+logger = logging.getLogger(__name__)
+
+# 支持的输出模式
+ARCHIVE_MODES = ("dir", "zip", "tar")
+
+# 目录模式下的检查点文件名
+CHECKPOINT_FILENAME = ".export_checkpoint.json"
+
+# 每完成多少个会话写一次检查点
+CHECKPOINT_INTERVAL = 50
+
+# 进度回调类型：(已处理数, 总数)
+ProgressCallback = Callable[[int, int], None]
+
+# 工作进程内的存储管理器（由进程池 initializer 创建）
+_worker_manager: StorageManager | None = None
+
+
+@dataclass
+class BulkExportResult:
+    """
+    批量导出结果
+
+    Attributes:
+        output: 输出目录或归档文件路径
+        archive: 输出模式（dir/zip/tar）
+        total: 本次选中的会话总数
+        exported: 本次成功导出的会话数
+        skipped: 因检查点已完成而跳过的会话数
+        failed: 导出失败的会话（会话ID -> 错误信息）
+        elapsed_seconds: 耗时（秒）
+    """
+
+    output: str
+    archive: str
+    total: int = 0
+    exported: int = 0
+    skipped: int = 0
+    failed: dict[str, str] = field(default_factory=dict)
+    elapsed_seconds: float = 0.0
+
+    def to_dict(self) -> dict[str, Any]:
+        """
+        转换为字典格式
+
+        Returns:
+            包含所有字段的字典
+        """
+        return {
+            "output": self.output,
+            "archive": self.archive,
+            "total": self.total,
+            "exported": self.exported,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "elapsed_seconds": self.elapsed_seconds,
+        }
+
+
+def _init_worker(data_dir: str) -> None:
+    """工作进程初始化：创建进程内的存储管理器"""
+    global _worker_manager
+    _worker_manager = StorageManager(data_dir)
+
+
+def _render_one(
+    session_id: str, format_type: str, css_href: str | None = None
+) -> tuple[str, str, bytes]:
+    """
+    在工作进程中渲染单个会话
+
+    Args:
+        session_id: 会话ID
+        format_type: 导出格式
+        css_href: HTML 外部样式表地址（None 表示内联样式）
+
+    Returns:
+        (会话ID, 文件名, UTF-8编码的内容)
+
+    Raises:
+        ValueError: 会话不存在或格式不支持
+    """
+    from deep_thinking.utils.formatters import (
+        TOOL_RESULT_FORMATS,
+        export_filename,
+        render_session,
+    )
+
+    if _worker_manager is None:
+        raise RuntimeError("工作进程未初始化")
+
+    session = _worker_manager.get_session(
+        session_id, load_tool_results=format_type in TOOL_RESULT_FORMATS
+    )
+    if session is None:
+        raise ValueError(f"会话不存在: {session_id}")
+
+    content = render_session(session, format_type, css_href)
+    return session_id, export_filename(session, format_type), content.encode("utf-8")
+
+
+def select_sessions(
+    manager: StorageManager,
+    status: str | None = None,
+    updated_after: datetime | None = None,
+    updated_before: datetime | None = None,
+    session_ids: list[str] | None = None,
+) -> list[str]:
+    """
+    选择要导出的会话
+
+    指定 session_ids 时按给定顺序导出（忽略不存在的ID），
+    否则按索引中的状态和更新时间筛选。
+
+    Args:
+        manager: 存储管理器
+        status: 过滤状态
+        updated_after: 更新时间下限
+        updated_before: 更新时间上限
+        session_ids: 显式指定的会话ID列表
+
+    Returns:
+        会话ID列表
+    """
+    if session_ids:
+        candidates = set(manager.find_session_ids(status, updated_after, updated_before))
+        return [sid for sid in dict.fromkeys(session_ids) if sid in candidates]
+
+    return manager.find_session_ids(status, updated_after, updated_before)
+
+
+def default_output_path(
+    format_type: str,
+    archive: str,
+    status: str | None = None,
+    updated_after: datetime | None = None,
+    updated_before: datetime | None = None,
+    session_ids: list[str] | None = None,
+    external_css: bool = False,
+) -> Path:
+    """
+    生成默认输出路径（~/exports/sessions_<格式>_<参数摘要>[.zip|.tar]）
+
+    路径只由导出参数决定，相同参数的重新运行落到同一路径，从而能够读取检查点续传。
+
+    Args:
+        format_type: 导出格式
+        archive: 输出模式
+        status: 过滤状态
+        updated_after: 更新时间下限
+        updated_before: 更新时间上限
+        session_ids: 显式指定的会话ID列表
+        external_css: 是否使用外部样式表
+
+    Returns:
+        输出目录或归档文件路径
+    """
+    key = json.dumps(
+        [
+            format_type,
+            archive,
+            status,
+            updated_after.isoformat() if updated_after else None,
+            updated_before.isoformat() if updated_before else None,
+            sorted(set(session_ids)) if session_ids else None,
+            external_css,
+        ]
+    )
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+    suffix = "" if archive == "dir" else f".{archive}"
+    return Path.home() / "exports" / f"sessions_{format_type}_{digest}{suffix}"
+
+
+class _ExportSink:
+    """
+    导出写入端：统一目录、ZIP 和 TAR 三种输出
+
+    归档模式下导出文件先写入暂存目录，close() 时一次性打包为归档（写入临时文件后原子替换）。
+    中断后暂存目录保留，续传时继续写入，重复渲染的会话覆盖同名文件，不会向半截归档追加。
+    """
+
+    def __init__(self, output: Path, archive: str, append: bool):
+        self.output = output
+        self.archive = archive
+
+        if archive == "dir":
+            self.directory = output
+        else:
+            self.directory = staging_path(output)
+            # 不续传时丢弃上次留下的暂存文件
+            if not append and self.directory.exists():
+                shutil.rmtree(self.directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def write(self, filename: str, content: bytes) -> None:
+        """写入一个导出文件"""
+        if self.archive == "dir":
+            (self.output / filename).write_bytes(content)
+            return
+        # 暂存文件原子写入，中断时不会留下半截内容
+        temp_path = self.directory / f".tmp_{filename}"
+        temp_path.write_bytes(content)
+        os.replace(temp_path, self.directory / filename)
+
+    def close(self) -> None:
+        """关闭写入端（归档模式下把暂存文件打包为归档）"""
+        if self.archive == "dir":
+            return
+
+        members = sorted(
+            path
+            for path in self.directory.iterdir()
+            if path.is_file() and not path.name.startswith(".tmp_")
+        )
+        temp_path = self.output.with_name(f".tmp_{self.output.name}")
+        if self.archive == "zip":
+            with zipfile.ZipFile(temp_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+                for path in members:
+                    zf.write(path, arcname=path.name)
+        else:
+            with tarfile.open(temp_path, "w") as tf:
+                for path in members:
+                    tf.add(path, arcname=path.name)
+        os.replace(temp_path, self.output)
+
+    def cleanup(self) -> None:
+        """删除归档模式的暂存目录（全部会话导出完成后调用）"""
+        if self.archive != "dir":
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def staging_path(output: Path) -> Path:
+    """
+    获取归档模式的暂存目录路径
+
+    Args:
+        output: 归档文件路径
+
+    Returns:
+        暂存目录路径
+    """
+    return output.with_name(f".{output.name}.parts")
+
+
+def checkpoint_path(output: Path, archive: str) -> Path:
+    """
+    获取检查点文件路径
+
+    Args:
+        output: 输出目录或归档文件路径
+        archive: 输出模式
+
+    Returns:
+        检查点文件路径
+    """
+    if archive == "dir":
+        return output / CHECKPOINT_FILENAME
+    return output.with_name(f"{output.name}.checkpoint.json")
+
+
+def _load_checkpoint(path: Path, format_type: str) -> set[str]:
+    """读取检查点中已完成的会话ID（格式不一致时忽略检查点）"""
+    if not path.exists():
+        return set()
+
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"读取导出检查点失败，将重新导出: {e}")
+        return set()
+
+    if data.get("format") != format_type:
+        logger.warning("检查点的导出格式不一致，将重新导出")
+        return set()
+
+    return set(data.get("completed", []))
+
+
+def _save_checkpoint(path: Path, format_type: str, completed: set[str]) -> None:
+    """原子写入检查点"""
+    temp_path = path.with_name(f".tmp_{path.name}")
+    temp_path.write_text(
+        json.dumps(
+            {
+                "format": format_type,
+                "completed": sorted(completed),
+                "updated_at": datetime.now().isoformat(),
+            },
+            ensure_ascii=False,
+        ),
+        encoding="utf-8",
+    )
+    os.replace(temp_path, path)
+
+
+def export_sessions_bulk(
+    data_dir: str | Path,
+    session_ids: list[str],
+    format_type: str,
+    output: str | Path,
+    archive: str = "dir",
+    workers: int = 0,
+    resume: bool = True,
+    progress: ProgressCallback | None = None,
+    external_css: bool = False,
+) -> BulkExportResult:
+    """
+    并行批量导出会话
+
+    渲染在工作进程中完成，写入在当前进程中串行执行。ZIP/TAR 模式先写入暂存目录，
+    处理完全部会话后一次性打包为归档，中断（包括进程被杀死）后续传不会产生重复或损坏的成员。
+
+    Args:
+        data_dir: 数据存储目录（工作进程据此创建存储管理器）
+        session_ids: 要导出的会话ID列表
+        format_type: 导出格式（json/markdown/html/text）
+        output: 输出目录（dir 模式）或归档文件路径（zip/tar 模式）
+        archive: 输出模式（dir/zip/tar）
+        workers: 工作进程数（0 表示使用 CPU 核心数，1 表示在当前进程内渲染）
+        resume: 是否从检查点续传
+        progress: 进度回调，参数为 (已处理数, 总数)
+        external_css: HTML 格式时在输出根目录写入共享样式表，文档以 <link> 引用
+
+    Returns:
+        批量导出结果
+
+    Raises:
+        ValueError: 输出模式不支持
+    """
+    if archive not in ARCHIVE_MODES:
+        raise ValueError(f"不支持的输出模式: {archive}。支持的模式: {', '.join(ARCHIVE_MODES)}")
+
+    from deep_thinking.utils.html_template import HTML_STYLESHEET, HTML_STYLESHEET_NAME
+
+    start_time = time.perf_counter()
+    output_path = Path(output).expanduser().absolute()
+    result = BulkExportResult(output=str(output_path), archive=archive, total=len(session_ids))
+
+    ckpt_path = checkpoint_path(output_path, archive)
+    completed = _load_checkpoint(ckpt_path, format_type) if resume else set()
+    pending = [sid for sid in session_ids if sid not in completed]
+    result.skipped = len(session_ids) - len(pending)
+
+    if result.skipped:
+        logger.info(f"从检查点恢复，跳过 {result.skipped} 个已导出会话")
+
+    sink = _ExportSink(output_path, archive, append=bool(completed))
+    css_href = HTML_STYLESHEET_NAME if external_css and format_type == "html" else None
+    if css_href is not None and not completed:
+        sink.write(css_href, HTML_STYLESHEET.encode("utf-8"))
+    done = result.skipped
+    since_checkpoint = 0
+
+    def handle(session_id: str, outcome: tuple[str, str, bytes] | None, error: str | None) -> None:
+        nonlocal done, since_checkpoint
+        if outcome is not None:
+            _, filename, content = outcome
+            sink.write(filename, content)
+            completed.add(session_id)
+            result.exported += 1
+            since_checkpoint += 1
+        else:
+            result.failed[session_id] = error or "未知错误"
+            logger.warning(f"导出会话 {session_id} 失败: {error}")
+
+        done += 1
+        if since_checkpoint >= CHECKPOINT_INTERVAL:
+            _save_checkpoint(ckpt_path, format_type, completed)
+            since_checkpoint = 0
+        if progress is not None:
+            progress(done, result.total)
+
+    worker_count = workers if workers > 0 else (os.cpu_count() or 1)
+    worker_count = min(worker_count, max(len(pending), 1))
+
+    packed = False
+    try:
+        if worker_count == 1:
+            # 单进程模式：避免进程池的启动开销
+            _init_worker(str(data_dir))
+            for session_id in pending:
+                try:
+                    outcome = _render_one(session_id, format_type, css_href)
+                except Exception as e:
+                    handle(session_id, None, str(e))
+                else:
+                    handle(session_id, outcome, None)
+        else:
+            _run_pool(str(data_dir), pending, format_type, css_href, worker_count, handle)
+        # 处理完全部会话后才打包归档；中途异常时保留暂存文件和检查点供续传
+        sink.close()
+        packed = True
+    finally:
+        if not packed or result.failed or result.exported + result.skipped < result.total:
+            _save_checkpoint(ckpt_path, format_type, completed)
+        else:
+            # 全部完成后移除检查点和暂存文件，下次运行会重新导出
+            if ckpt_path.exists():
+                ckpt_path.unlink()
+            sink.cleanup()
+
+    result.elapsed_seconds = time.perf_counter() - start_time
+    logger.info(
+        f"批量导出完成: 导出 {result.exported}，跳过 {result.skipped}，"
+        f"失败 {len(result.failed)}，耗时 {result.elapsed_seconds:.2f}s"
+    )
+    return result
+
+
+def _run_pool(
+    data_dir: str,
+    pending: list[str],
+    format_type: str,
+    css_href: str | None,
+    worker_count: int,
+    handle: Callable[[str, tuple[str, str, bytes] | None, str | None], None],
+) -> None:
+    """在进程池中渲染，限制在途任务数量以控制内存占用"""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    max_in_flight = worker_count * 4
+    queue = iter(pending)
+
+    # 服务器进程中有事件循环、I/O线程和索引连接，CLI 中有日志线程，使用 spawn 避免 fork 继承锁状态
+    with ProcessPoolExecutor(
+        max_workers=worker_count,
+        initializer=_init_worker,
+        initargs=(data_dir,),
+        mp_context=multiprocessing.get_context("spawn"),
+    ) as executor:
+        in_flight: dict[Future[tuple[str, str, bytes]], str] = {}
+
+        def submit_next() -> bool:
+            session_id = next(queue, None)
+            if session_id is None:
+                return False
+            in_flight[executor.submit(_render_one, session_id, format_type, css_href)] = session_id
+            return True
+
+        while len(in_flight) < max_in_flight and submit_next():
+            pass
+
+        while in_flight:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                session_id = in_flight.pop(future)
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    handle(session_id, None, str(e))
+                else:
+                    handle(session_id, outcome, None)
+                submit_next()
+
+
+__all__ = [
+    "ARCHIVE_MODES",
+    "BulkExportResult",
+    "checkpoint_path",
+    "default_output_path",
+    "export_sessions_bulk",
+    "select_sessions",
+    "staging_path",
+]
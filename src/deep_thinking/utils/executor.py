@@ -0,0 +1,375 @@
+"""
+任务执行器模块
+
+把 CPU 密集的渲染放到进程池、阻塞 I/O 放到线程池执行，避免阻塞事件循环。
+关键特性:
+- 进程池（spawn 启动方式）渲染会话快照：会话在主进程加载后以 pickle 传给工作进程
+- 线程池执行会话加载、文件写入等阻塞 I/O（复制调用方的上下文变量，追踪 span 随之传递），
+  也执行不需要等待结果的后台任务（submit）
+- 按工具设置超时；等待中的请求被取消时，尚未开始执行的渲染任务随之取消
+- 渲染超时或工作进程崩溃后替换进程池，旧进程池执行完已提交的任务后退出
+- 事件循环延迟探针：测量回调的调度延迟，用于验证事件循环保持响应
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+import os
+import threading
+from collections.abc import Callable
+from concurrent.futures import BrokenExecutor, Executor, Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, TypeVar
+
+from deep_thinking.utils.tracing import span
+
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# 默认渲染超时（秒），0 表示不限制
+DEFAULT_RENDER_TIMEOUT = 60.0
+
+# 默认I/O线程数
+DEFAULT_IO_THREADS = 8
+
+# 默认渲染进程数上限
+MAX_DEFAULT_RENDER_WORKERS = 4
+
+
+def default_render_workers() -> int:
+    """默认渲染进程数：CPU核心数，最多4个"""
+    return min(os.cpu_count() or 1, MAX_DEFAULT_RENDER_WORKERS)
+
+
+def parse_tool_timeouts(value: str) -> dict[str, float]:
+    """
+    解析按工具设置的超时配置
+
+    Args:
+        value: 逗号分隔的 工具名=秒数，例如 "export_session=120"
+
+    Returns:
+        工具名到超时秒数的映射
+
+    Raises:
+        ValueError: 配置格式错误
+    """
+    timeouts: dict[str, float] = {}
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        tool, sep, seconds = item.partition("=")
+        try:
+            if not sep or not tool.strip():
+                raise ValueError
+            timeouts[tool.strip()] = float(seconds)
+        except ValueError:
+            raise ValueError(f"无效的工具超时配置: {item}（格式: 工具名=秒数）") from None
+    return timeouts
+
+
+class TaskExecutor:
+    """
+    渲染进程池和I/O线程池
+
+    两个池都在首次使用时创建。render_workers 为 0 时不使用进程池，
+    渲染在I/O线程池中执行（仍然不阻塞事件循环，但受GIL限制）。
+
+    Attributes:
+        render_workers: 渲染进程数
+        io_threads: I/O线程数
+        render_timeout: 默认渲染超时（秒），0 表示不限制
+        tool_timeouts: 按工具名覆盖的渲染超时
+    """
+
+    def __init__(
+        self,
+        render_workers: int | None = None,
+        io_threads: int = DEFAULT_IO_THREADS,
+        render_timeout: float = DEFAULT_RENDER_TIMEOUT,
+        tool_timeouts: dict[str, float] | None = None,
+    ):
+        """
+        初始化任务执行器
+
+        Args:
+            render_workers: 渲染进程数（None 表示默认值，0 表示不使用进程池）
+            io_threads: I/O线程数
+            render_timeout: 默认渲染超时（秒），0 表示不限制
+            tool_timeouts: 按工具名覆盖的渲染超时
+        """
+        self.render_workers = (
+            default_render_workers() if render_workers is None else max(render_workers, 0)
+        )
+        self.io_threads = max(io_threads, 1)
+        self.render_timeout = render_timeout
+        self.tool_timeouts = dict(tool_timeouts or {})
+
+        self._process_pool: ProcessPoolExecutor | None = None
+        self._thread_pool: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    def timeout_for(self, tool: str) -> float | None:
+        """
+        获取工具的渲染超时
+
+        Args:
+            tool: 工具名
+
+        Returns:
+            超时秒数，不限制时返回None
+        """
+        timeout = self.tool_timeouts.get(tool, self.render_timeout)
+        return timeout if timeout > 0 else None
+
+    def _get_thread_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._thread_pool is None:
+                self._thread_pool = ThreadPoolExecutor(
+                    max_workers=self.io_threads, thread_name_prefix="deepthinking-io"
+                )
+            return self._thread_pool
+
+    def _get_process_pool(self) -> "ProcessPoolExecutor | None":
+        if self.render_workers == 0:
+            return None
+        with self._lock:
+            if self._process_pool is None:
+                # 进程池相关模块在首次渲染时才导入，不影响启动时间
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+
+                # 服务器进程中有事件循环和I/O线程，使用 spawn 避免 fork 继承锁状态
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.render_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                logger.info(f"渲染进程池已创建: {self.render_workers} 个进程")
+            return self._process_pool
+
+    def _retire_process_pool(self, pool: "ProcessPoolExecutor") -> None:
+        """替换进程池：新任务使用新进程池，旧进程池执行完已提交的任务后退出"""
+        with self._lock:
+            if self._process_pool is pool:
+                self._process_pool = None
+        pool.shutdown(wait=False)
+
+    async def run_io(self, func: Callable[..., T], *args: Any) -> T:
+        """
+        在I/O线程池中执行阻塞调用（在调用方上下文变量的副本中执行）
+
+        Args:
+            func: 阻塞函数
+            *args: 函数参数
+
+        Returns:
+            函数返回值
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(self._get_thread_pool(), context.run, func, *args)
+
+    def submit(self, func: Callable[..., T], *args: Any) -> "Future[T]":
+        """
+        在I/O线程池中提交后台任务（不等待结果，如思考步骤索引的批量更新）
+
+        Args:
+            func: 阻塞函数
+            *args: 函数参数
+
+        Returns:
+            任务的 Future
+
+        Raises:
+            RuntimeError: 执行器已关闭
+        """
+        context = contextvars.copy_context()
+        return self._get_thread_pool().submit(context.run, func, *args)
+
+    async def run_render(self, tool: str, func: Callable[..., T], *args: Any) -> T:
+        """
+        在渲染进程池中执行CPU密集的渲染
+
+        函数和参数需要可以 pickle（模块级函数、会话快照等）。
+        等待期间被取消时，尚未开始执行的任务随之取消。
+
+        Args:
+            tool: 工具名（用于确定超时）
+            func: 渲染函数
+            *args: 函数参数
+
+        Returns:
+            函数返回值
+
+        Raises:
+            ValueError: 渲染超时或渲染进程异常退出
+        """
+        pool = self._get_process_pool()
+        executor: Executor = pool if pool is not None else self._get_thread_pool()
+        timeout = self.timeout_for(tool)
+
+        loop = asyncio.get_running_loop()
+        try:
+            with span("executor.render", tool=tool, process_pool=pool is not None):
+                if pool is None:
+                    # 线程池中渲染时传递上下文变量，渲染函数的 span 记录在当前追踪中
+                    future = loop.run_in_executor(
+                        executor, contextvars.copy_context().run, func, *args
+                    )
+                else:
+                    future = loop.run_in_executor(executor, func, *args)
+                return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{tool} 渲染超时（{timeout:g} 秒）")
+            if pool is not None:
+                self._retire_process_pool(pool)
+            raise ValueError(f"渲染超时（{timeout:g} 秒）: {tool}") from None
+        except BrokenExecutor as e:
+            logger.error(f"{tool} 渲染进程异常退出: {e}")
+            if pool is not None:
+                self._retire_process_pool(pool)
+            raise ValueError(f"渲染进程异常退出: {tool}") from e
+
+    def shutdown(self) -> None:
+        """关闭进程池和线程池（取消尚未开始的任务，不等待执行中的任务）"""
+        with self._lock:
+            pools: list[Executor] = [p for p in (self._process_pool, self._thread_pool) if p]
+            self._process_pool = None
+            self._thread_pool = None
+        for pool in pools:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_io(executor: TaskExecutor | None, func: Callable[..., T], *args: Any) -> T:
+    """
+    在I/O线程池中执行阻塞调用（执行器为None时直接调用）
+
+    Args:
+        executor: 任务执行器（None 表示未启用）
+        func: 阻塞函数
+        *args: 函数参数
+
+    Returns:
+        函数返回值
+    """
+    if executor is None:
+        return func(*args)
+    return await executor.run_io(func, *args)
+
+
+async def run_render(
+    executor: TaskExecutor | None, tool: str, func: Callable[..., T], *args: Any
+) -> T:
+    """
+    在渲染进程池中执行渲染（执行器为None时直接调用）
+
+    Args:
+        executor: 任务执行器（None 表示未启用）
+        tool: 工具名（用于确定超时）
+        func: 渲染函数
+        *args: 函数参数
+
+    Returns:
+        函数返回值
+
+    Raises:
+        ValueError: 渲染超时或渲染进程异常退出
+    """
+    if executor is None:
+        return func(*args)
+    return await executor.run_render(tool, func, *args)
+
+
+class LoopLagProbe:
+    """
+    事件循环延迟探针
+
+    以固定间隔休眠，记录实际唤醒时间比预期晚了多少。
+    事件循环被同步代码阻塞时，延迟随之增大。
+
+    Example:
+        async with LoopLagProbe() as probe:
+            await asyncio.gather(*exports)
+        print(probe.max_lag)
+    """
+
+    def __init__(self, interval: float = 0.01):
+        """
+        初始化探针
+
+        Args:
+            interval: 采样间隔（秒）
+        """
+        self.interval = interval
+        self.samples: list[float] = []
+        self._task: asyncio.Task[None] | None = None
+        self._sleep_started: float | None = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            self._sleep_started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(loop.time() - self._sleep_started - self.interval, 0.0))
+
+    def start(self) -> None:
+        """开始采样"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止采样（事件循环一直被阻塞、探针未能唤醒时，记录截至停止时的延迟）"""
+        if self._task is not None:
+            if self._sleep_started is not None:
+                overdue = asyncio.get_running_loop().time() - self._sleep_started - self.interval
+                if overdue > 0:
+                    self.samples.append(overdue)
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def __aenter__(self) -> "LoopLagProbe":
+        self.start()
+        return self
+
+    async def __aexit__(self, *_exc: object) -> None:
+        await self.stop()
+
+    @property
+    def max_lag(self) -> float:
+        """最大延迟（秒）"""
+        return max(self.samples, default=0.0)
+
+    def percentile(self, pct: float) -> float:
+        """
+        延迟分位数（最近秩法）
+
+        Args:
+            pct: 百分位（0-100）
+
+        Returns:
+            延迟秒数
+        """
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+
+__all__ = [
+    "DEFAULT_IO_THREADS",
+    "DEFAULT_RENDER_TIMEOUT",
+    "LoopLagProbe",
+    "TaskExecutor",
+    "default_render_workers",
+    "parse_tool_timeouts",
+    "run_io",
+    "run_render",
+]
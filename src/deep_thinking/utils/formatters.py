@@ -5,12 +5,31 @@
 """
 
 import json
-from collections.abc import Callable
+from collections.abc import Callable, Iterator
 from datetime import datetime
 from pathlib import Path
 from typing import Any
 
 from deep_thinking.models.thinking_session import ThinkingSession
+from deep_thinking.utils.html_template import (
+    BRANCH_OPEN,
+    CONTENT_CLOSE,
+    CONTENT_OPEN,
+    DOCUMENT_END,
+    META_OPEN,
+    PARAGRAPH_CLOSE,
+    REVISION_OPEN,
+    THOUGHT_CLOSE,
+    THOUGHT_OPEN,
+    TOOL_CALL_ITEM_CLOSE,
+    TOOL_CALL_ITEM_OPEN,
+    TOOL_CALLS_CLOSE,
+    TOOL_CALLS_OPEN,
+    document_head,
+    escape_html,
+    thought_header_tail,
+)
+from deep_thinking.utils.tracing import traced
 
 # 格式化器类型别名
 FormatterFunc = Callable[[ThinkingSession], str]
@@ -68,6 +87,7 @@ class SessionFormatter:
     }
 
     @staticmethod
+    @traced("render.json")
     def to_json(session: ThinkingSession, indent: int = 2) -> str:
         """
         导出为JSON格式
@@ -82,6 +102,7 @@ class SessionFormatter:
         return json.dumps(session.to_dict(), ensure_ascii=False, indent=indent)
 
     @staticmethod
+    @traced("render.markdown")
     def to_markdown(session: ThinkingSession) -> str:
         """
         导出为Markdown格式
@@ -92,65 +113,76 @@ class SessionFormatter:
         Returns:
             Markdown格式的字符串
         """
-        lines: list[str] = []
+        return "\n".join(SessionFormatter.iter_markdown(session))
+
+    @staticmethod
+    def iter_markdown(session: ThinkingSession) -> Iterator[str]:
+        """
+        逐段生成Markdown文档
+
+        各段以换行符连接即为 to_markdown 的结果，供流式输出边渲染边发送。
 
+        Args:
+            session: 思考会话对象
+
+        Yields:
+            文档片段
+        """
         # 标题和元信息
-        lines.append(f"# {session.name}")
-        lines.append("")
+        yield f"# {session.name}"
+        yield ""
 
         if session.description:
-            lines.append(f"> {session.description}")
-            lines.append("")
+            yield f"> {session.description}"
+            yield ""
 
         # 会话信息
-        lines.append("## 会话信息")
-        lines.append("")
-        lines.append(f"- **会话ID**: `{session.session_id}`")
-        lines.append(f"- **状态**: {SessionFormatter._status_badge(session.status)}")
-        lines.append(f"- **创建时间**: {session.created_at.strftime('%Y-%m-%d %H:%M:%S')}")
-        lines.append(f"- **更新时间**: {session.updated_at.strftime('%Y-%m-%d %H:%M:%S')}")
-        lines.append(f"- **思考步骤数**: {session.thought_count()}")
-        lines.append("")
+        yield "## 会话信息"
+        yield ""
+        yield f"- **会话ID**: `{session.session_id}`"
+        yield f"- **状态**: {SessionFormatter._status_badge(session.status)}"
+        yield f"- **创建时间**: {session.created_at.strftime('%Y-%m-%d %H:%M:%S')}"
+        yield f"- **更新时间**: {session.updated_at.strftime('%Y-%m-%d %H:%M:%S')}"
+        yield f"- **思考步骤数**: {session.thought_count()}"
+        yield ""
 
         # 思考步骤
         if session.thoughts:
-            lines.append("## 思考步骤")
-            lines.append("")
+            yield "## 思考步骤"
+            yield ""
 
             for thought in session.thoughts:
-                lines.append(SessionFormatter._thought_to_markdown(thought, session))
-                lines.append("")
+                yield SessionFormatter._thought_to_markdown(thought, session)
+                yield ""
 
         # 工具调用历史 (Interleaved Thinking)
         if session.tool_call_history:
-            lines.append("## 工具调用历史")
-            lines.append("")
-            lines.append(SessionFormatter._tool_calls_to_markdown(session.tool_call_history))
-            lines.append("")
+            yield "## 工具调用历史"
+            yield ""
+            yield SessionFormatter._tool_calls_to_markdown(session.tool_call_history)
+            yield ""
 
         # 统计信息 (Interleaved Thinking)
         if session.statistics.total_thoughts > 0 or session.statistics.total_tool_calls > 0:
-            lines.append("## 统计信息")
-            lines.append("")
-            lines.append(SessionFormatter._statistics_to_markdown(session.statistics))
-            lines.append("")
+            yield "## 统计信息"
+            yield ""
+            yield SessionFormatter._statistics_to_markdown(session.statistics)
+            yield ""
 
         # 元数据
         if session.metadata:
-            lines.append("## 元数据")
-            lines.append("")
-            lines.append("```json")
-            lines.append(json.dumps(session.metadata, ensure_ascii=False, indent=2))
-            lines.append("```")
-            lines.append("")
+            yield "## 元数据"
+            yield ""
+            yield "```json"
+            yield json.dumps(session.metadata, ensure_ascii=False, indent=2)
+            yield "```"
+            yield ""
 
         # 页脚
-        lines.append("---")
-        lines.append(f"*导出时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*")
-        lines.append("")
-        lines.append("*由 DeepThinking-MCP 生成*")
-
-        return "\n".join(lines)
+        yield "---"
+        yield f"*导出时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*"
+        yield ""
+        yield "*由 DeepThinking-MCP 生成*"
 
     @staticmethod
     def _thought_to_markdown(thought: Any, session: ThinkingSession | None = None) -> str:
@@ -333,408 +365,190 @@ class SessionFormatter:
         return badges.get(status, status)
 
     @staticmethod
-    def to_html(session: ThinkingSession) -> str:
+    @traced("render.html")
+    def to_html(session: ThinkingSession, css_href: str | None = None) -> str:
         """
         导出为HTML格式
 
+        静态片段来自预编译模板（html_template），思考步骤片段以列表拼接生成。
+
         Args:
             session: 思考会话对象
+            css_href: 外部样式表地址（默认None，使用内联样式）
 
         Returns:
             HTML格式的字符串
         """
-        html_parts: list[str] = []
-
-        # HTML头部
-        title_escaped = SessionFormatter._escape_html(session.name)
-        html_parts.append(f"""<!DOCTYPE html>
-<html lang="zh-CN">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{title_escaped}</title>
-    <style>
-        * {{
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-        }}
-        body {{
-            font-family:
-                -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto,
-                "Helvetica Neue", Arial, sans-serif;
-            line-height: 1.6;
-            color: #333;
-            background-color: #f5f5f5;
-            padding: 20px;
-        }}
-        .container {{
-            max-width: 800px;
-            margin: 0 auto;
-            background-color: #fff;
-            padding: 40px;
-            border-radius: 8px;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-        }}
-        h1 {{
-            font-size: 2em;
-            margin-bottom: 10px;
-            color: #2c3e50;
-        }}
-        .description {{
-            font-style: italic;
-            color: #7f8c8d;
-            margin-bottom: 30px;
-            padding-left: 15px;
-            border-left: 3px solid #3498db;
-        }}
-        h2 {{
-            font-size: 1.5em;
-            margin-top: 30px;
-            margin-bottom: 15px;
-            color: #34495e;
-            border-bottom: 2px solid #ecf0f1;
-            padding-bottom: 10px;
-        }}
-        .session-info {{
-            background-color: #ecf0f1;
-            padding: 15px;
-            border-radius: 4px;
-            margin-bottom: 20px;
-        }}
-        .session-info p {{
-            margin: 5px 0;
-        }}
-        .thought {{
-            margin: 20px 0;
-            padding: 15px;
-            background-color: #f9f9f9;
-            border-left: 4px solid #3498db;
-            border-radius: 4px;
-        }}
-        .thought-header {{
-            font-weight: bold;
-            margin-bottom: 10px;
-            color: #2c3e50;
-        }}
-        .thought-type {{
-            display: inline-block;
-            padding: 2px 8px;
-            border-radius: 3px;
-            font-size: 0.85em;
-            margin-left: 10px;
-        }}
-        .thought-type.regular {{
-            background-color: #3498db;
-            color: #fff;
-        }}
-        .thought-type.revision {{
-            background-color: #e67e22;
-            color: #fff;
-        }}
-        .thought-type.branch {{
-            background-color: #27ae60;
-            color: #fff;
-        }}
-        .thought-content {{
-            margin: 10px 0;
-            white-space: pre-wrap;
-        }}
-        .thought-meta {{
-            font-size: 0.85em;
-            color: #95a5a6;
-            margin-top: 10px;
-        }}
-        .metadata {{
-            background-color: #f9f9f9;
-            padding: 15px;
-            border-radius: 4px;
-            margin-top: 20px;
-        }}
-        .metadata pre {{
-            background-color: #2c3e50;
-            color: #ecf0f1;
-            padding: 15px;
-            border-radius: 4px;
-            overflow-x: auto;
-        }}
-        .footer {{
-            margin-top: 40px;
-            padding-top: 20px;
-            border-top: 1px solid #ecf0f1;
-            text-align: center;
-            color: #95a5a6;
-            font-size: 0.9em;
-        }}
-        .status {{
-            display: inline-block;
-            padding: 4px 10px;
-            border-radius: 12px;
-            font-size: 0.9em;
-            font-weight: bold;
-        }}
-        .status.active {{
-            background-color: #2ecc71;
-            color: #fff;
-        }}
-        .status.completed {{
-            background-color: #3498db;
-            color: #fff;
-        }}
-        .status.archived {{
-            background-color: #95a5a6;
-            color: #fff;
-        }}
-        /* Interleaved Thinking 样式 */
-        .thought-phase {{
-            display: inline-block;
-            padding: 2px 8px;
-            border-radius: 3px;
-            font-size: 0.85em;
-            margin-left: 10px;
-            background-color: #9b59b6;
-            color: #fff;
-        }}
-        .thought-phase.thinking {{
-            background-color: #3498db;
-        }}
-        .thought-phase.tool_call {{
-            background-color: #e74c3c;
-        }}
-        .thought-phase.analysis {{
-            background-color: #2ecc71;
-        }}
-        .tool-calls {{
-            margin: 10px 0;
-            padding: 10px;
-            background-color: #fff3e0;
-            border-radius: 4px;
-            border: 1px solid #ffcc80;
-        }}
-        .tool-call-item {{
-            padding: 5px 0;
-            border-bottom: 1px dashed #ffcc80;
-        }}
-        .tool-call-item:last-child {{
-            border-bottom: none;
-        }}
-        .tool-call-status {{
-            display: inline-block;
-            padding: 1px 6px;
-            border-radius: 3px;
-            font-size: 0.8em;
-            margin-left: 5px;
-        }}
-        .tool-call-status.completed {{
-            background-color: #27ae60;
-            color: #fff;
-        }}
-        .tool-call-status.failed {{
-            background-color: #e74c3c;
-            color: #fff;
-        }}
-        .tool-call-status.pending {{
-            background-color: #f39c12;
-            color: #fff;
-        }}
-        .tool-call-history {{
-            margin-top: 20px;
-            overflow-x: auto;
-        }}
-        .tool-call-history table {{
-            width: 100%;
-            border-collapse: collapse;
-        }}
-        .tool-call-history th, .tool-call-history td {{
-            padding: 8px;
-            border: 1px solid #ecf0f1;
-            text-align: left;
-        }}
-        .tool-call-history th {{
-            background-color: #34495e;
-            color: #fff;
-        }}
-        .statistics {{
-            background-color: #f9f9f9;
-            padding: 15px;
-            border-radius: 4px;
-            margin-top: 20px;
-        }}
-        .statistics h3 {{
-            margin-bottom: 10px;
-            color: #34495e;
-        }}
-        .statistics-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-            gap: 15px;
-        }}
-        .stat-card {{
-            background-color: #fff;
-            padding: 10px;
-            border-radius: 4px;
-            border: 1px solid #ecf0f1;
-        }}
-        .stat-value {{
-            font-size: 1.5em;
-            font-weight: bold;
-            color: #3498db;
-        }}
-        .stat-label {{
-            color: #7f8c8d;
-            font-size: 0.9em;
-        }}
-    </style>
-</head>
-<body>
-    <div class="container">
-""")
+        return "\n".join(SessionFormatter.iter_html(session, css_href))
+
+    @staticmethod
+    def iter_html(session: ThinkingSession, css_href: str | None = None) -> Iterator[str]:
+        """
+        逐段生成HTML文档
+
+        各段以换行符连接即为 to_html 的结果，供流式输出边渲染边发送。
+
+        Args:
+            session: 思考会话对象
+            css_href: 外部样式表地址（默认None，使用内联样式）
+
+        Yields:
+            文档片段
+        """
+        yield document_head(session.name, css_href)
 
         # 标题
-        html_parts.append(f"        <h1>{SessionFormatter._escape_html(session.name)}</h1>")
-        html_parts.append("")
+        yield f"        <h1>{escape_html(session.name)}</h1>"
+        yield ""
 
         # 描述
         if session.description:
-            escaped_desc = SessionFormatter._escape_html(session.description)
-            html_parts.append(f'        <p class="description">{escaped_desc}</p>')
-            html_parts.append("")
+            escaped_desc = escape_html(session.description)
+            yield f'        <p class="description">{escaped_desc}</p>'
+            yield ""
 
         # 会话信息
-        html_parts.append("        <h2>会话信息</h2>")
-        html_parts.append('        <div class="session-info">')
-        sid = SessionFormatter._escape_html(session.session_id)
-        html_parts.append(f"            <p><strong>会话ID:</strong> <code>{sid}</code></p>")
+        yield "        <h2>会话信息</h2>"
+        yield '        <div class="session-info">'
+        sid = escape_html(session.session_id)
+        yield f"            <p><strong>会话ID:</strong> <code>{sid}</code></p>"
         badge = SessionFormatter._status_badge(session.status).split(" ", 1)[1]
         status_html = f'<span class="status {session.status}">{badge}</span>'
-        html_parts.append(f"            <p><strong>状态:</strong> {status_html}</p>")
+        yield f"            <p><strong>状态:</strong> {status_html}</p>"
         created = session.created_at.strftime("%Y-%m-%d %H:%M:%S")
-        html_parts.append(f"            <p><strong>创建时间:</strong> {created}</p>")
+        yield f"            <p><strong>创建时间:</strong> {created}</p>"
         updated = session.updated_at.strftime("%Y-%m-%d %H:%M:%S")
-        html_parts.append(f"            <p><strong>更新时间:</strong> {updated}</p>")
+        yield f"            <p><strong>更新时间:</strong> {updated}</p>"
         count = session.thought_count()
-        html_parts.append(f"            <p><strong>思考步骤数:</strong> {count}</p>")
-        html_parts.append("        </div>")
-        html_parts.append("")
+        yield f"            <p><strong>思考步骤数:</strong> {count}</p>"
+        yield "        </div>"
+        yield ""
 
         # 思考步骤
         if session.thoughts:
-            html_parts.append("        <h2>思考步骤</h2>")
-            html_parts.append("")
+            yield "        <h2>思考步骤</h2>"
+            yield ""
 
+            records = SessionFormatter._index_tool_call_records(session)
             for thought in session.thoughts:
-                html_parts.append(SessionFormatter._thought_to_html(thought, session))
-                html_parts.append("")
+                yield SessionFormatter._thought_to_html(thought, session, records)
+                yield ""
 
         # 工具调用历史 (Interleaved Thinking)
         if session.tool_call_history:
-            html_parts.append("        <h2>工具调用历史</h2>")
-            html_parts.append(SessionFormatter._tool_calls_to_html(session.tool_call_history))
-            html_parts.append("")
+            yield "        <h2>工具调用历史</h2>"
+            yield SessionFormatter._tool_calls_to_html(session.tool_call_history)
+            yield ""
 
         # 统计信息 (Interleaved Thinking)
         if session.statistics.total_thoughts > 0 or session.statistics.total_tool_calls > 0:
-            html_parts.append("        <h2>统计信息</h2>")
-            html_parts.append(SessionFormatter._statistics_to_html(session.statistics))
-            html_parts.append("")
+            yield "        <h2>统计信息</h2>"
+            yield SessionFormatter._statistics_to_html(session.statistics)
+            yield ""
 
         # 元数据
         if session.metadata:
-            html_parts.append("        <h2>元数据</h2>")
-            html_parts.append('        <div class="metadata">')
+            yield "        <h2>元数据</h2>"
+            yield '        <div class="metadata">'
             metadata_json = json.dumps(session.metadata, ensure_ascii=False, indent=2)
-            html_parts.append(f"            <pre>{metadata_json}</pre>")
-            html_parts.append("        </div>")
-            html_parts.append("")
+            yield f"            <pre>{metadata_json}</pre>"
+            yield "        </div>"
+            yield ""
 
         # 页脚
-        html_parts.append('        <div class="footer">')
+        yield '        <div class="footer">'
         export_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        html_parts.append(f"            <p>导出时间: {export_time}</p>")
-        html_parts.append("            <p>由 DeepThinking-MCP 生成</p>")
-        html_parts.append("        </div>")
+        yield f"            <p>导出时间: {export_time}</p>"
 
         # HTML尾部
-        html_parts.append("    </div>")
-        html_parts.append("</body>")
-        html_parts.append("</html>")
+        yield DOCUMENT_END
+
+    @staticmethod
+    def _index_tool_call_records(session: ThinkingSession) -> dict[str, Any]:
+        """
+        建立工具调用记录索引（记录ID -> 首个匹配的记录）
 
-        return "\n".join(html_parts)
+        Args:
+            session: 会话对象
+
+        Returns:
+            记录索引
+        """
+        records: dict[str, Any] = {}
+        for record in session.tool_call_history:
+            records.setdefault(record.record_id, record)
+        return records
 
     @staticmethod
-    def _thought_to_html(thought: Any, session: ThinkingSession | None = None) -> str:
+    def _thought_to_html(
+        thought: Any,
+        session: ThinkingSession | None = None,
+        records: dict[str, Any] | None = None,
+    ) -> str:
         """
         将单个思考步骤转换为HTML格式
 
         Args:
             thought: 思考步骤对象
             session: 会话对象（用于获取工具调用详情）
+            records: 预先建立的工具调用记录索引（批量渲染时避免重复查找）
 
         Returns:
             HTML格式的字符串
         """
-        emoji = SessionFormatter.TYPE_EMOJI.get(thought.type, "💭")
-
-        lines: list[str] = ['        <div class="thought">']
-        header = f"{emoji} 步骤 {thought.thought_number}"
-        lines.append(f'            <div class="thought-header">{header}')
-
-        # 添加类型标签
-        if thought.type != "regular":
-            type_name = SessionFormatter.TYPE_NAME.get(thought.type, "思考")
-            type_span = f'<span class="thought-type {thought.type}">{type_name}</span>'
-            lines.append(f"                {type_span}")
-
-        # 添加执行阶段标签 (Interleaved Thinking)
-        phase_emoji = SessionFormatter.PHASE_EMOJI.get(thought.phase, "")
-        phase_name = SessionFormatter.PHASE_NAME.get(thought.phase, "思考阶段")
-        phase_span = (
-            f'<span class="thought-phase {thought.phase}">{phase_emoji} {phase_name}</span>'
+        header_tail = thought_header_tail(
+            thought.type,
+            None
+            if thought.type == "regular"
+            else SessionFormatter.TYPE_NAME.get(thought.type, "思考"),
+            thought.phase,
+            SessionFormatter.PHASE_EMOJI.get(thought.phase, ""),
+            SessionFormatter.PHASE_NAME.get(thought.phase, "思考阶段"),
         )
-        lines.append(f"                {phase_span}")
-
-        lines.append("            </div>")
+        parts: list[str] = [
+            THOUGHT_OPEN,
+            SessionFormatter.TYPE_EMOJI.get(thought.type, "💭"),
+            " 步骤 ",
+            str(thought.thought_number),
+            header_tail,
+        ]
 
         # 添加修订/分支信息
         if thought.type == "revision" and thought.revises_thought:
-            rev_info = f"📝 修订步骤 {thought.revises_thought}"
-            lines.append(f'            <p style="color: #e67e22; font-size: 0.9em;">{rev_info}</p>')
+            parts += (REVISION_OPEN, str(thought.revises_thought), PARAGRAPH_CLOSE)
         elif thought.type == "branch" and thought.branch_from_thought:
-            branch_info = f"🔀 分支自步骤 {thought.branch_from_thought}"
-            branch_p = f'<p style="color: #27ae60; font-size: 0.9em;">{branch_info}</p>'
-            lines.append(f"            {branch_p}")
+            parts += (BRANCH_OPEN, str(thought.branch_from_thought), PARAGRAPH_CLOSE)
 
         # 思考内容
-        content = SessionFormatter._escape_html(thought.content)
-        lines.append(f'            <div class="thought-content">{content}</div>')
+        parts += (CONTENT_OPEN, escape_html(thought.content), CONTENT_CLOSE)
 
         # 显示关联的工具调用 (Interleaved Thinking)
         if thought.tool_calls and session:
-            lines.append('            <div class="tool-calls">')
-            lines.append("                <strong>关联工具调用:</strong>")
+            if records is None:
+                records = SessionFormatter._index_tool_call_records(session)
+            parts.append(TOOL_CALLS_OPEN)
             for record_id in thought.tool_calls:
-                record = SessionFormatter._find_tool_call_record(session, record_id)
+                record = records.get(record_id)
                 if record:
                     status_emoji = SessionFormatter.TOOL_STATUS_EMOJI.get(record.status, "❓")
-                    tool_name = SessionFormatter._escape_html(record.call_data.tool_name)
                     status_class = (
                         record.status if record.status in ("completed", "failed", "pending") else ""
                     )
-                    status_span = (
-                        f'<span class="tool-call-status {status_class}">{status_emoji}</span>'
-                    )
-                    lines.append(
-                        f'                <div class="tool-call-item">{status_span} <code>{tool_name}</code></div>'
+                    parts += (
+                        TOOL_CALL_ITEM_OPEN,
+                        status_class,
+                        '">',
+                        status_emoji,
+                        "</span> <code>",
+                        escape_html(record.call_data.tool_name),
+                        TOOL_CALL_ITEM_CLOSE,
                     )
-            lines.append("            </div>")
+            parts.append(TOOL_CALLS_CLOSE)
 
         # 时间戳
-        time_str = thought.timestamp.strftime("%Y-%m-%d %H:%M:%S")
-        lines.append(f'            <div class="thought-meta">🕒 {time_str}</div>')
-
-        lines.append("        </div>")
+        parts += (META_OPEN, thought.timestamp.strftime("%Y-%m-%d %H:%M:%S"), THOUGHT_CLOSE)
 
-        return "\n".join(lines)
+        return "".join(parts)
 
     @staticmethod
     def _tool_calls_to_html(tool_call_history: list[Any]) -> str:
@@ -762,7 +576,7 @@ class SessionFormatter:
 
         for record in tool_call_history:
             status_emoji = SessionFormatter.TOOL_STATUS_EMOJI.get(record.status, "❓")
-            tool_name = SessionFormatter._escape_html(record.call_data.tool_name)
+            tool_name = escape_html(record.call_data.tool_name)
             thought_num = record.thought_number
 
             # 执行时间
@@ -874,15 +688,10 @@ class SessionFormatter:
         Returns:
             转义后的文本
         """
-        return (
-            text.replace("&", "&amp;")
-            .replace("<", "&lt;")
-            .replace(">", "&gt;")
-            .replace('"', "&quot;")
-            .replace("'", "&#x27;")
-        )
+        return escape_html(text)
 
     @staticmethod
+    @traced("render.text")
     def to_text(session: ThinkingSession) -> str:
         """
         导出为纯文本格式
@@ -893,73 +702,84 @@ class SessionFormatter:
         Returns:
             纯文本格式的字符串
         """
-        lines: list[str] = []
+        return "\n".join(SessionFormatter.iter_text(session))
+
+    @staticmethod
+    def iter_text(session: ThinkingSession) -> Iterator[str]:
+        """
+        逐段生成纯文本文档
+
+        各段以换行符连接即为 to_text 的结果，供流式输出边渲染边发送。
+
+        Args:
+            session: 思考会话对象
 
+        Yields:
+            文档片段
+        """
         # 标题
-        lines.append("=" * 60)
-        lines.append(f"  {session.name}")
-        lines.append("=" * 60)
-        lines.append("")
+        yield "=" * 60
+        yield f"  {session.name}"
+        yield "=" * 60
+        yield ""
 
         # 描述
         if session.description:
-            lines.append(f"描述: {session.description}")
-            lines.append("")
+            yield f"描述: {session.description}"
+            yield ""
 
         # 会话信息
-        lines.append("-" * 60)
-        lines.append("会话信息")
-        lines.append("-" * 60)
-        lines.append(f"会话ID: {session.session_id}")
-        lines.append(f"状态: {SessionFormatter._status_text(session.status)}")
-        lines.append(f"创建时间: {session.created_at.strftime('%Y-%m-%d %H:%M:%S')}")
-        lines.append(f"更新时间: {session.updated_at.strftime('%Y-%m-%d %H:%M:%S')}")
-        lines.append(f"思考步骤数: {session.thought_count()}")
-        lines.append("")
+        yield "-" * 60
+        yield "会话信息"
+        yield "-" * 60
+        yield f"会话ID: {session.session_id}"
+        yield f"状态: {SessionFormatter._status_text(session.status)}"
+        yield f"创建时间: {session.created_at.strftime('%Y-%m-%d %H:%M:%S')}"
+        yield f"更新时间: {session.updated_at.strftime('%Y-%m-%d %H:%M:%S')}"
+        yield f"思考步骤数: {session.thought_count()}"
+        yield ""
 
         # 思考步骤
         if session.thoughts:
-            lines.append("-" * 60)
-            lines.append("思考步骤")
-            lines.append("-" * 60)
-            lines.append("")
+            yield "-" * 60
+            yield "思考步骤"
+            yield "-" * 60
+            yield ""
 
             for thought in session.thoughts:
-                lines.append(SessionFormatter._thought_to_text(thought, session))
-                lines.append("")
-                lines.append("")
+                yield SessionFormatter._thought_to_text(thought, session)
+                yield ""
+                yield ""
 
         # 工具调用历史 (Interleaved Thinking)
         if session.tool_call_history:
-            lines.append("-" * 60)
-            lines.append("工具调用历史")
-            lines.append("-" * 60)
-            lines.append(SessionFormatter._tool_calls_to_text(session.tool_call_history))
-            lines.append("")
+            yield "-" * 60
+            yield "工具调用历史"
+            yield "-" * 60
+            yield SessionFormatter._tool_calls_to_text(session.tool_call_history)
+            yield ""
 
         # 统计信息 (Interleaved Thinking)
         if session.statistics.total_thoughts > 0 or session.statistics.total_tool_calls > 0:
-            lines.append("-" * 60)
-            lines.append("统计信息")
-            lines.append("-" * 60)
-            lines.append(SessionFormatter._statistics_to_text(session.statistics))
-            lines.append("")
+            yield "-" * 60
+            yield "统计信息"
+            yield "-" * 60
+            yield SessionFormatter._statistics_to_text(session.statistics)
+            yield ""
 
         # 元数据
         if session.metadata:
-            lines.append("-" * 60)
-            lines.append("元数据")
-            lines.append("-" * 60)
-            lines.append(json.dumps(session.metadata, ensure_ascii=False, indent=2))
-            lines.append("")
+            yield "-" * 60
+            yield "元数据"
+            yield "-" * 60
+            yield json.dumps(session.metadata, ensure_ascii=False, indent=2)
+            yield ""
 
         # 页脚
-        lines.append("-" * 60)
-        lines.append(f"导出时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        lines.append("由 DeepThinking-MCP 生成")
-        lines.append("=" * 60)
-
-        return "\n".join(lines)
+        yield "-" * 60
+        yield f"导出时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
+        yield "由 DeepThinking-MCP 生成"
+        yield "=" * 60
 
     @staticmethod
     def _thought_to_text(thought: Any, session: ThinkingSession | None = None) -> str:
@@ -1113,26 +933,82 @@ class SessionFormatter:
         return status_map.get(status, status)
 
 
-def export_session_to_file(
-    session: ThinkingSession,
-    format_type: str,
-    output_path: Path,
-) -> str:
+# 流式渲染时每块的目标字符数
+STREAM_CHUNK_SIZE = 16 * 1024
+
+# 渲染工具调用结果内容的导出格式（其他格式只渲染调用摘要，无需加载已移出的结果）
+TOOL_RESULT_FORMATS = frozenset({"json"})
+
+# 导出格式到文件扩展名的映射
+EXPORT_EXTENSIONS = {
+    "json": "json",
+    "markdown": "md",
+    "md": "md",
+    "html": "html",
+    "text": "txt",
+    "txt": "txt",
+}
+
+
+def sanitize_filename(name: str) -> str:
     """
-    导出会话到文件
+    清理文件名，移除非法字符
+
+    Args:
+        name: 原始文件名
+
+    Returns:
+        清理后的文件名
+    """
+    # 移除或替换非法字符
+    invalid_chars = '<>:"/\\|?*'
+    for char in invalid_chars:
+        name = name.replace(char, "_")
+
+    # 移除前后空格
+    name = name.strip()
+
+    # 限制长度（保留名称和扩展名空间）
+    if len(name) > 50:
+        name = name[:50]
+
+    # 确保不为空
+    if not name:
+        name = "session"
+
+    return name
+
+
+def export_filename(session: ThinkingSession, format_type: str) -> str:
+    """
+    生成会话的默认导出文件名
+
+    Args:
+        session: 思考会话对象
+        format_type: 导出格式
+
+    Returns:
+        文件名，格式为 {会话名称}_{会话ID前8位}.{扩展名}
+    """
+    ext = EXPORT_EXTENSIONS.get(format_type, "txt")
+    return f"{sanitize_filename(session.name)}_{session.session_id[:8]}.{ext}"
+
+
+def render_session(session: ThinkingSession, format_type: str, css_href: str | None = None) -> str:
+    """
+    将会话渲染为指定格式的字符串
 
     Args:
         session: 思考会话对象
         format_type: 导出格式 (json/markdown/html/text)
-        output_path: 输出文件路径
+        css_href: HTML 外部样式表地址（仅 html 格式有效，默认内联样式）
 
     Returns:
-        导出文件的绝对路径
+        渲染后的内容
 
     Raises:
-        ValueError: 格式不支持或路径无效
+        ValueError: 格式不支持
     """
-    # 支持的格式
     formatters: dict[str, FormatterFunc] = {
         "json": SessionFormatter.to_json,
         "markdown": SessionFormatter.to_markdown,
@@ -1145,14 +1021,108 @@ def export_session_to_file(
     if format_type not in formatters:
         raise ValueError(f"不支持的格式: {format_type}。支持的格式: {', '.join(formatters.keys())}")
 
+    if format_type == "html" and css_href is not None:
+        return SessionFormatter.to_html(session, css_href)
+    return formatters[format_type](session)
+
+
+def iter_render_session(
+    session: ThinkingSession,
+    format_type: str,
+    css_href: str | None = None,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+) -> Iterator[str]:
+    """
+    按块渲染会话，边生成边输出
+
+    各块拼接后与 render_session 的结果一致（导出时间除外），
+    每块约 chunk_size 个字符，第一块在文档头部渲染完成后即产生。
+
+    Args:
+        session: 思考会话对象
+        format_type: 导出格式 (json/markdown/html/text)
+        css_href: HTML 外部样式表地址（仅 html 格式有效，默认内联样式）
+        chunk_size: 每块的目标字符数
+
+    Yields:
+        文档块
+
+    Raises:
+        ValueError: 格式不支持
+    """
+    separator = "\n"
+    pieces: Iterator[str]
+    if format_type == "json":
+        encoder = json.JSONEncoder(ensure_ascii=False, indent=2)
+        pieces = encoder.iterencode(session.to_dict())
+        separator = ""
+    elif format_type in ("markdown", "md"):
+        pieces = SessionFormatter.iter_markdown(session)
+    elif format_type == "html":
+        pieces = SessionFormatter.iter_html(session, css_href)
+    elif format_type in ("text", "txt"):
+        pieces = SessionFormatter.iter_text(session)
+    else:
+        supported = "json, markdown, md, html, text, txt"
+        raise ValueError(f"不支持的格式: {format_type}。支持的格式: {supported}")
+
+    buffer: list[str] = []
+    size = 0
+    for index, piece in enumerate(pieces):
+        if index and separator:
+            buffer.append(separator)
+            size += 1
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield "".join(buffer)
+            buffer.clear()
+            size = 0
+
+    if buffer:
+        yield "".join(buffer)
+
+
+def export_session_to_file(
+    session: ThinkingSession,
+    format_type: str,
+    output_path: Path,
+) -> str:
+    """
+    导出会话到文件
+
+    Args:
+        session: 思考会话对象
+        format_type: 导出格式 (json/markdown/html/text)
+        output_path: 输出文件路径
+
+    Returns:
+        导出文件的绝对路径
+
+    Raises:
+        ValueError: 格式不支持或路径无效
+    """
+    # 格式化内容（格式不支持时抛出 ValueError）
+    content = render_session(session, format_type)
+
+    return write_export_file(content, output_path)
+
+
+def write_export_file(content: str, output_path: Path) -> str:
+    """
+    将已渲染的导出内容写入文件
+
+    Args:
+        content: 导出内容
+        output_path: 输出文件路径
+
+    Returns:
+        导出文件的绝对路径
+    """
     # 确保输出目录存在
     output_path = output_path.expanduser().absolute()
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
-    # 格式化内容
-    formatter = formatters[format_type]
-    content = formatter(session)
-
     # 写入文件
     output_path.write_text(content, encoding="utf-8")
 
@@ -1160,9 +1130,16 @@ def export_session_to_file(
 
 
 __all__ = [
+    "EXPORT_EXTENSIONS",
+    "STREAM_CHUNK_SIZE",
     "SessionFormatter",
     "Visualizer",
+    "export_filename",
     "export_session_to_file",
+    "iter_render_session",
+    "render_session",
+    "sanitize_filename",
+    "write_export_file",
 ]
 
 
@@ -1220,114 +1197,151 @@ classDef analysis_phase fill:#e8f5e9,stroke:#4caf50,stroke-width:3px;
 
         # 添加节点
         for thought in session.thoughts:
-            node_id = Visualizer._mermaid_node_id(thought)
-            node_label = Visualizer._escape_mermaid_label(thought.content)
-            node_class = thought.type
-
-            # 获取阶段信息 (Interleaved Thinking)
-            phase = getattr(thought, "phase", "thinking")
-            phase_emoji = SessionFormatter.PHASE_EMOJI.get(phase, "💭")
-            phase_name = SessionFormatter.PHASE_NAME.get(phase, "思考阶段")
-
-            # 构建节点标签，包含阶段信息
-            if thought.type == "revision":
-                revises = thought.revises_thought or 0
-                label = f"{node_label}<br/><small>(修订步骤{revises})</small><br/><small>{phase_emoji}{phase_name}</small>"
-                lines.append(f'    {node_id}["{label}"]:::{node_class}')
-            elif thought.type == "branch":
-                branch_from = thought.branch_from_thought or 0
-                label = f"{node_label}<br/><small>(分支自步骤{branch_from})</small><br/><small>{phase_emoji}{phase_name}</small>"
-                lines.append(f'    {node_id}["{label}"]:::{node_class}')
-            elif thought.type == "comparison":
-                # 对比思考显示比较项数量
-                items_count = len(thought.comparison_items) if thought.comparison_items else 0
-                label = f"{node_label}<br/><small>(对比{items_count}项)</small><br/><small>{phase_emoji}{phase_name}</small>"
-                lines.append(f'    {node_id}["{label}"]:::{node_class}')
-            elif thought.type == "reverse":
-                # 逆向思考显示反推目标
-                target = thought.reverse_target or "未知目标"
-                target_short = target[:15] + "..." if len(target) > 15 else target
-                label = f"{node_label}<br/><small>(目标:{target_short})</small><br/><small>{phase_emoji}{phase_name}</small>"
-                lines.append(f'    {node_id}["{label}"]:::{node_class}')
-            elif thought.type == "hypothetical":
-                # 假设思考显示假设条件
-                condition = thought.hypothetical_condition or "未知假设"
-                condition_short = condition[:15] + "..." if len(condition) > 15 else condition
-                label = f"{node_label}<br/><small>(假设:{condition_short})</small><br/><small>{phase_emoji}{phase_name}</small>"
-                lines.append(f'    {node_id}["{label}"]:::{node_class}')
-            else:
-                label = f"{node_label}<br/><small>{phase_emoji}{phase_name}</small>"
-                lines.append(f'    {node_id}["{label}"]:::{node_class}')
-
-            # 添加工具调用节点 (Interleaved Thinking)
-            tool_calls = getattr(thought, "tool_calls", None)
-            if tool_calls and session:
-                for idx, record_id in enumerate(tool_calls):
-                    record = SessionFormatter._find_tool_call_record(session, record_id)
-                    if record:
-                        tool_node_id = f"{node_id}_TOOL{idx + 1}"
-                        tool_name = record.call_data.tool_name
-                        status_emoji = SessionFormatter.TOOL_STATUS_EMOJI.get(record.status, "❓")
-                        tool_label = f"🔧 {tool_name} {status_emoji}"
-                        lines.append(f'    {tool_node_id}["{tool_label}"]:::tool_call')
-                        # 连接思考节点到工具调用节点
-                        lines.append(f"    {node_id} -.->|调用| {tool_node_id}")
+            lines.extend(Visualizer._mermaid_node_lines(thought, session))
 
         # 添加连接线
-        for i, thought in enumerate(session.thoughts):
-            current_id = Visualizer._mermaid_node_id(thought)
+        for i in range(len(session.thoughts)):
+            lines.extend(Visualizer._mermaid_edge_lines(session, i))
 
-            # 常规思考连接到下一个
-            if thought.type == "regular" and i + 1 < len(session.thoughts):
-                next_thought = session.thoughts[i + 1]
-                # 只有当下一个也是常规思考或修订时才连接
-                if next_thought.type in ("regular", "revision"):
-                    next_id = Visualizer._mermaid_node_id(next_thought)
-                    lines.append(f"    {current_id} --> {next_id}")
+        # 添加样式
+        lines.append(Visualizer.MERMAID_STYLES.strip())
 
-            # 修订思考连接到被修订的思考
-            if thought.type == "revision" and thought.revises_thought:
-                revises_id = Visualizer._find_node_id(
-                    session, thought.revises_thought, thought.thought_number
-                )
-                if revises_id:
-                    lines.append(f"    {current_id} -.->|修订| {revises_id}")
-                    # 修订后继续
-                    if i + 1 < len(session.thoughts):
-                        next_thought = session.thoughts[i + 1]
-                        if next_thought.type in ("regular", "revision"):
-                            next_id = Visualizer._mermaid_node_id(next_thought)
-                            lines.append(f"    {current_id} --> {next_id}")
-
-            # 分支思考连接到来源思考
-            if thought.type == "branch" and thought.branch_from_thought:
-                branch_from_id = Visualizer._find_node_id(
-                    session, thought.branch_from_thought, thought.thought_number
-                )
-                if branch_from_id:
-                    lines.append(f"    {branch_from_id} -.->|分支| {current_id}")
+        return "\n".join(lines)
 
-                # 分支后的延续连接
+    @staticmethod
+    def _mermaid_node_lines(thought: Any, session: ThinkingSession) -> list[str]:
+        """
+        生成单个思考步骤的 Mermaid 节点行（含关联的工具调用节点）
+
+        Args:
+            thought: 思考步骤对象
+            session: 会话对象（用于获取工具调用详情）
+
+        Returns:
+            节点定义行列表
+        """
+        lines: list[str] = []
+        node_id = Visualizer._mermaid_node_id(thought)
+        node_label = Visualizer._escape_mermaid_label(thought.content)
+        node_class = thought.type
+
+        # 获取阶段信息 (Interleaved Thinking)
+        phase = getattr(thought, "phase", "thinking")
+        phase_emoji = SessionFormatter.PHASE_EMOJI.get(phase, "💭")
+        phase_name = SessionFormatter.PHASE_NAME.get(phase, "思考阶段")
+
+        # 构建节点标签，包含阶段信息
+        if thought.type == "revision":
+            revises = thought.revises_thought or 0
+            label = f"{node_label}<br/><small>(修订步骤{revises})</small><br/><small>{phase_emoji}{phase_name}</small>"
+            lines.append(f'    {node_id}["{label}"]:::{node_class}')
+        elif thought.type == "branch":
+            branch_from = thought.branch_from_thought or 0
+            label = f"{node_label}<br/><small>(分支自步骤{branch_from})</small><br/><small>{phase_emoji}{phase_name}</small>"
+            lines.append(f'    {node_id}["{label}"]:::{node_class}')
+        elif thought.type == "comparison":
+            # 对比思考显示比较项数量
+            items_count = len(thought.comparison_items) if thought.comparison_items else 0
+            label = f"{node_label}<br/><small>(对比{items_count}项)</small><br/><small>{phase_emoji}{phase_name}</small>"
+            lines.append(f'    {node_id}["{label}"]:::{node_class}')
+        elif thought.type == "reverse":
+            # 逆向思考显示反推目标
+            target = thought.reverse_target or "未知目标"
+            target_short = target[:15] + "..." if len(target) > 15 else target
+            label = f"{node_label}<br/><small>(目标:{target_short})</small><br/><small>{phase_emoji}{phase_name}</small>"
+            lines.append(f'    {node_id}["{label}"]:::{node_class}')
+        elif thought.type == "hypothetical":
+            # 假设思考显示假设条件
+            condition = thought.hypothetical_condition or "未知假设"
+            condition_short = condition[:15] + "..." if len(condition) > 15 else condition
+            label = f"{node_label}<br/><small>(假设:{condition_short})</small><br/><small>{phase_emoji}{phase_name}</small>"
+            lines.append(f'    {node_id}["{label}"]:::{node_class}')
+        else:
+            label = f"{node_label}<br/><small>{phase_emoji}{phase_name}</small>"
+            lines.append(f'    {node_id}["{label}"]:::{node_class}')
+
+        # 添加工具调用节点 (Interleaved Thinking)
+        tool_calls = getattr(thought, "tool_calls", None)
+        if tool_calls and session:
+            for idx, record_id in enumerate(tool_calls):
+                record = SessionFormatter._find_tool_call_record(session, record_id)
+                if record:
+                    tool_node_id = f"{node_id}_TOOL{idx + 1}"
+                    tool_name = record.call_data.tool_name
+                    status_emoji = SessionFormatter.TOOL_STATUS_EMOJI.get(record.status, "❓")
+                    tool_label = f"🔧 {tool_name} {status_emoji}"
+                    lines.append(f'    {tool_node_id}["{tool_label}"]:::tool_call')
+                    # 连接思考节点到工具调用节点
+                    lines.append(f"    {node_id} -.->|调用| {tool_node_id}")
+
+        return lines
+
+    @staticmethod
+    def _mermaid_edge_lines(session: ThinkingSession, i: int) -> list[str]:
+        """
+        生成从第 i 个思考步骤出发的 Mermaid 连接线
+
+        连接线取决于下一个思考步骤，因此追加新步骤后需要重新生成上一个步骤的连接线。
+
+        Args:
+            session: 思考会话对象
+            i: 思考步骤在列表中的下标
+
+        Returns:
+            连接线列表
+        """
+        lines: list[str] = []
+        thought = session.thoughts[i]
+        current_id = Visualizer._mermaid_node_id(thought)
+
+        # 常规思考连接到下一个
+        if thought.type == "regular" and i + 1 < len(session.thoughts):
+            next_thought = session.thoughts[i + 1]
+            # 只有当下一个也是常规思考或修订时才连接
+            if next_thought.type in ("regular", "revision"):
+                next_id = Visualizer._mermaid_node_id(next_thought)
+                lines.append(f"    {current_id} --> {next_id}")
+
+        # 修订思考连接到被修订的思考
+        if thought.type == "revision" and thought.revises_thought:
+            revises_id = Visualizer._find_node_id(
+                session, thought.revises_thought, thought.thought_number
+            )
+            if revises_id:
+                lines.append(f"    {current_id} -.->|修订| {revises_id}")
+                # 修订后继续
                 if i + 1 < len(session.thoughts):
                     next_thought = session.thoughts[i + 1]
-                    # 规则1：同分支内的下一个思考
-                    # 规则2：分支后的第一个常规思考（无 branch_id）
-                    should_connect = (
-                        (next_thought.branch_id == thought.branch_id)
-                        or (next_thought.type == "regular" and next_thought.branch_id is None)
-                        or (
-                            next_thought.type == "branch"
-                            and next_thought.branch_from_thought == thought.thought_number
-                        )
-                    )
-                    if should_connect:
+                    if next_thought.type in ("regular", "revision"):
                         next_id = Visualizer._mermaid_node_id(next_thought)
                         lines.append(f"    {current_id} --> {next_id}")
 
-        # 添加样式
-        lines.append(Visualizer.MERMAID_STYLES.strip())
+        # 分支思考连接到来源思考
+        if thought.type == "branch" and thought.branch_from_thought:
+            branch_from_id = Visualizer._find_node_id(
+                session, thought.branch_from_thought, thought.thought_number
+            )
+            if branch_from_id:
+                lines.append(f"    {branch_from_id} -.->|分支| {current_id}")
 
-        return "\n".join(lines)
+            # 分支后的延续连接
+            if i + 1 < len(session.thoughts):
+                next_thought = session.thoughts[i + 1]
+                # 规则1：同分支内的下一个思考
+                # 规则2：分支后的第一个常规思考（无 branch_id）
+                should_connect = (
+                    (next_thought.branch_id == thought.branch_id)
+                    or (next_thought.type == "regular" and next_thought.branch_id is None)
+                    or (
+                        next_thought.type == "branch"
+                        and next_thought.branch_from_thought == thought.thought_number
+                    )
+                )
+                if should_connect:
+                    next_id = Visualizer._mermaid_node_id(next_thought)
+                    lines.append(f"    {current_id} --> {next_id}")
+
+        return lines
 
     @staticmethod
     def _mermaid_node_id(thought: Any) -> str:
@@ -1401,39 +1415,56 @@ classDef analysis_phase fill:#e8f5e9,stroke:#4caf50,stroke-width:3px;
 
         # 为每个思考步骤生成 ASCII 表示
         for i, thought in enumerate(session.thoughts):
-            block = Visualizer._thought_to_ascii_block(thought, session)
-            lines.append(block)
-
-            # 添加连接线
-            # 规则1：常规思考之间的连接
-            # 规则2：分支思考后的延续连接
-            should_add_connector = False
-            if thought.thought_number < session.thought_count():
-                if thought.type == "regular":
-                    should_add_connector = True
-                elif thought.type == "branch" and i + 1 < len(session.thoughts):
-                    # 分支后检查是否需要连接
-                    next_thought = session.thoughts[i + 1]
-                    # 同分支内的下一个思考或分支后的延续
-                    should_add_connector = (
-                        (next_thought.branch_id == thought.branch_id)
-                        or (next_thought.type == "regular" and next_thought.branch_id is None)
-                        or (
-                            next_thought.type == "branch"
-                            and next_thought.branch_from_thought == thought.thought_number
-                        )
+            lines.append(Visualizer._thought_to_ascii_block(thought, session))
+            lines.extend(Visualizer._ascii_connector_lines(session, i))
+
+        return "\n".join(lines)
+
+    @staticmethod
+    def _ascii_connector_lines(session: ThinkingSession, i: int) -> list[str]:
+        """
+        生成第 i 个思考步骤之后的 ASCII 连接线
+
+        Args:
+            session: 思考会话对象
+            i: 思考步骤在列表中的下标
+
+        Returns:
+            连接线列表（不需要连接时为空）
+        """
+        lines: list[str] = []
+        thought = session.thoughts[i]
+
+        # 添加连接线
+        # 规则1：常规思考之间的连接
+        # 规则2：分支思考后的延续连接
+        should_add_connector = False
+        if thought.thought_number < session.thought_count():
+            if thought.type == "regular":
+                should_add_connector = True
+            elif thought.type == "branch" and i + 1 < len(session.thoughts):
+                # 分支后检查是否需要连接
+                next_thought = session.thoughts[i + 1]
+                # 同分支内的下一个思考或分支后的延续
+                should_add_connector = (
+                    (next_thought.branch_id == thought.branch_id)
+                    or (next_thought.type == "regular" and next_thought.branch_id is None)
+                    or (
+                        next_thought.type == "branch"
+                        and next_thought.branch_from_thought == thought.thought_number
                     )
+                )
 
-            if should_add_connector:
-                if thought.type == "branch":
-                    # 分支思考使用特殊连接线样式
-                    lines.append("           ║")
-                    lines.append("           ║")
-                else:
-                    lines.append("           │")
-                    lines.append("           ▼")
+        if should_add_connector:
+            if thought.type == "branch":
+                # 分支思考使用特殊连接线样式
+                lines.append("           ║")
+                lines.append("           ║")
+            else:
+                lines.append("           │")
+                lines.append("           ▼")
 
-        return "\n".join(lines)
+        return lines
 
     @staticmethod
     def _thought_to_ascii_block(thought: Any, session: ThinkingSession | None = None) -> str:
@@ -1585,118 +1616,163 @@ classDef analysis_phase fill:#e8f5e9,stroke:#4caf50,stroke-width:3px;
 
         # 跟踪分支层级（branch_id -> indent_level）
         branch_levels: dict[str, int] = {}
-        current_level = 0
 
         # 构建思考步骤树
         for i, thought in enumerate(session.thoughts):
-            # 计算缩进层级
-            if thought.type == "branch" and thought.branch_id:
-                # 新分支，增加缩进
-                if thought.branch_from_thought:
-                    # 从某个步骤分支出来
-                    current_level = branch_levels.get(thought.branch_id.rsplit("-", 1)[0], 0) + 1
-                else:
-                    current_level = 1
-                branch_levels[thought.branch_id] = current_level
-            elif thought.branch_id and thought.branch_id in branch_levels:
-                # 延续在某个分支内
-                current_level = branch_levels[thought.branch_id]
-            else:
-                # 主流程
-                current_level = 0
-
-            # 生成缩进前缀
-            indent = "    " * current_level
-            # 确定前缀符号
-            is_last = i == len(session.thoughts) - 1
-            # 检查是否是当前层级的最后一个
-            is_last_in_level = is_last
-            if not is_last and current_level > 0:
-                # 检查下一个是否还是同一分支
-                next_thought = session.thoughts[i + 1]
-                if next_thought.branch_id != thought.branch_id:
-                    is_last_in_level = True
-
-            prefix = f"{indent}└──" if is_last or is_last_in_level else f"{indent}├──"
-            sub_prefix = f"{indent}    " if is_last or is_last_in_level else f"{indent}│   "
-
-            # 根据类型选择 emoji
-            emoji = SessionFormatter.TYPE_EMOJI.get(thought.type, "💭")
-
-            # 获取阶段信息 (Interleaved Thinking)
-            phase = getattr(thought, "phase", "thinking")
-            phase_emoji = SessionFormatter.PHASE_EMOJI.get(phase, "💭")
-            phase_name = SessionFormatter.PHASE_NAME.get(phase, "思考阶段")
-
-            # 格式化行
-            line = f"{prefix} {emoji} 步骤 {thought.thought_number}: {thought.content[:50]}"
-            if len(thought.content) > 50:
-                line += "..."
-
-            lines.append(line)
-
-            # 添加阶段信息 (Interleaved Thinking)
-            lines.append(f"{sub_prefix}├─ {phase_emoji} {phase_name}")
-
-            # 添加修订/分支/对比/逆向/假设信息
-            if thought.type == "revision" and thought.revises_thought:
-                lines.append(f"{sub_prefix}├─ 📝 修订步骤 {thought.revises_thought}")
-            elif thought.type == "branch" and thought.branch_from_thought:
-                lines.append(f"{sub_prefix}├─ 🔀 分支自步骤 {thought.branch_from_thought}")
-            elif thought.type == "comparison":
-                # 对比思考显示比较项
-                if thought.comparison_items:
-                    items_str = " vs ".join(thought.comparison_items[:3])
-                    if len(thought.comparison_items) > 3:
-                        items_str += "..."
-                    lines.append(f"{sub_prefix}├─ ⚖️ 对比: {items_str[:40]}")
-                if thought.comparison_result:
-                    result = (
-                        thought.comparison_result[:35] + "..."
-                        if len(thought.comparison_result) > 35
-                        else thought.comparison_result
-                    )
-                    lines.append(f"{sub_prefix}├─ 📊 结论: {result}")
-            elif thought.type == "reverse":
-                # 逆向思考显示反推目标
-                if thought.reverse_target:
-                    target = (
-                        thought.reverse_target[:40] + "..."
-                        if len(thought.reverse_target) > 40
-                        else thought.reverse_target
-                    )
-                    lines.append(f"{sub_prefix}├─ 🔙 目标: {target}")
-                if thought.reverse_steps:
-                    lines.append(f"{sub_prefix}├─ 📝 反推步骤: {len(thought.reverse_steps)} 步")
-            elif thought.type == "hypothetical":
-                # 假设思考显示假设条件
-                if thought.hypothetical_condition:
-                    condition = (
-                        thought.hypothetical_condition[:35] + "..."
-                        if len(thought.hypothetical_condition) > 35
-                        else thought.hypothetical_condition
-                    )
-                    lines.append(f"{sub_prefix}├─ 🤔 假设: {condition}")
-                if thought.hypothetical_probability:
-                    lines.append(f"{sub_prefix}├─ 📈 可能性: {thought.hypothetical_probability}")
-                if thought.hypothetical_impact:
-                    impact = (
-                        thought.hypothetical_impact[:35] + "..."
-                        if len(thought.hypothetical_impact) > 35
-                        else thought.hypothetical_impact
-                    )
-                    lines.append(f"{sub_prefix}├─ 💥 影响: {impact}")
-
-            # 添加工具调用信息 (Interleaved Thinking)
-            tool_calls = getattr(thought, "tool_calls", None)
-            if tool_calls and session:
-                for idx, record_id in enumerate(tool_calls):
-                    record = SessionFormatter._find_tool_call_record(session, record_id)
-                    if record:
-                        status_emoji = SessionFormatter.TOOL_STATUS_EMOJI.get(record.status, "❓")
-                        tool_name = record.call_data.tool_name
-                        # 最后一个工具调用使用 └─，否则使用 ├─
-                        tool_prefix = "└─" if idx == len(tool_calls) - 1 else "├─"
-                        lines.append(f"{sub_prefix}{tool_prefix} 🔧 {tool_name} {status_emoji}")
+            level = Visualizer._tree_level(thought, branch_levels)
+            last_in_level = Visualizer._tree_is_last_in_level(session.thoughts, i, level)
+            lines.extend(Visualizer._thought_to_tree_lines(thought, level, last_in_level, session))
 
         return "\n".join(lines)
+
+    @staticmethod
+    def _tree_level(thought: Any, branch_levels: dict[str, int]) -> int:
+        """
+        计算思考步骤在树中的缩进层级
+
+        Args:
+            thought: 思考步骤对象
+            branch_levels: 分支层级表（branch_id -> indent_level），新分支会写入此表
+
+        Returns:
+            缩进层级
+        """
+        if thought.type == "branch" and thought.branch_id:
+            # 新分支，增加缩进
+            if thought.branch_from_thought:
+                # 从某个步骤分支出来
+                level = branch_levels.get(thought.branch_id.rsplit("-", 1)[0], 0) + 1
+            else:
+                level = 1
+            branch_levels[thought.branch_id] = level
+            return level
+        if thought.branch_id and thought.branch_id in branch_levels:
+            # 延续在某个分支内
+            return branch_levels[thought.branch_id]
+        # 主流程
+        return 0
+
+    @staticmethod
+    def _tree_is_last_in_level(thoughts: list[Any], i: int, level: int) -> bool:
+        """
+        判断第 i 个思考步骤是否为当前层级的最后一个
+
+        Args:
+            thoughts: 思考步骤列表
+            i: 思考步骤下标
+            level: 缩进层级
+
+        Returns:
+            是否使用结束符号（└──）
+        """
+        if i == len(thoughts) - 1:
+            return True
+        # 分支内：下一个不再属于同一分支
+        return level > 0 and thoughts[i + 1].branch_id != thoughts[i].branch_id
+
+    @staticmethod
+    def _thought_to_tree_lines(
+        thought: Any,
+        level: int,
+        last_in_level: bool,
+        session: ThinkingSession | None = None,
+    ) -> list[str]:
+        """
+        将思考步骤转换为树状结构行
+
+        Args:
+            thought: 思考步骤对象
+            level: 缩进层级
+            last_in_level: 是否为当前层级的最后一个
+            session: 会话对象（用于获取工具调用详情）
+
+        Returns:
+            树状结构行列表
+        """
+        lines: list[str] = []
+
+        # 生成缩进前缀
+        indent = "    " * level
+        prefix = f"{indent}└──" if last_in_level else f"{indent}├──"
+        sub_prefix = f"{indent}    " if last_in_level else f"{indent}│   "
+
+        # 根据类型选择 emoji
+        emoji = SessionFormatter.TYPE_EMOJI.get(thought.type, "💭")
+
+        # 获取阶段信息 (Interleaved Thinking)
+        phase = getattr(thought, "phase", "thinking")
+        phase_emoji = SessionFormatter.PHASE_EMOJI.get(phase, "💭")
+        phase_name = SessionFormatter.PHASE_NAME.get(phase, "思考阶段")
+
+        # 格式化行
+        line = f"{prefix} {emoji} 步骤 {thought.thought_number}: {thought.content[:50]}"
+        if len(thought.content) > 50:
+            line += "..."
+
+        lines.append(line)
+
+        # 添加阶段信息 (Interleaved Thinking)
+        lines.append(f"{sub_prefix}├─ {phase_emoji} {phase_name}")
+
+        # 添加修订/分支/对比/逆向/假设信息
+        if thought.type == "revision" and thought.revises_thought:
+            lines.append(f"{sub_prefix}├─ 📝 修订步骤 {thought.revises_thought}")
+        elif thought.type == "branch" and thought.branch_from_thought:
+            lines.append(f"{sub_prefix}├─ 🔀 分支自步骤 {thought.branch_from_thought}")
+        elif thought.type == "comparison":
+            # 对比思考显示比较项
+            if thought.comparison_items:
+                items_str = " vs ".join(thought.comparison_items[:3])
+                if len(thought.comparison_items) > 3:
+                    items_str += "..."
+                lines.append(f"{sub_prefix}├─ ⚖️ 对比: {items_str[:40]}")
+            if thought.comparison_result:
+                result = (
+                    thought.comparison_result[:35] + "..."
+                    if len(thought.comparison_result) > 35
+                    else thought.comparison_result
+                )
+                lines.append(f"{sub_prefix}├─ 📊 结论: {result}")
+        elif thought.type == "reverse":
+            # 逆向思考显示反推目标
+            if thought.reverse_target:
+                target = (
+                    thought.reverse_target[:40] + "..."
+                    if len(thought.reverse_target) > 40
+                    else thought.reverse_target
+                )
+                lines.append(f"{sub_prefix}├─ 🔙 目标: {target}")
+            if thought.reverse_steps:
+                lines.append(f"{sub_prefix}├─ 📝 反推步骤: {len(thought.reverse_steps)} 步")
+        elif thought.type == "hypothetical":
+            # 假设思考显示假设条件
+            if thought.hypothetical_condition:
+                condition = (
+                    thought.hypothetical_condition[:35] + "..."
+                    if len(thought.hypothetical_condition) > 35
+                    else thought.hypothetical_condition
+                )
+                lines.append(f"{sub_prefix}├─ 🤔 假设: {condition}")
+            if thought.hypothetical_probability:
+                lines.append(f"{sub_prefix}├─ 📈 可能性: {thought.hypothetical_probability}")
+            if thought.hypothetical_impact:
+                impact = (
+                    thought.hypothetical_impact[:35] + "..."
+                    if len(thought.hypothetical_impact) > 35
+                    else thought.hypothetical_impact
+                )
+                lines.append(f"{sub_prefix}├─ 💥 影响: {impact}")
+
+        # 添加工具调用信息 (Interleaved Thinking)
+        tool_calls = getattr(thought, "tool_calls", None)
+        if tool_calls and session:
+            for idx, record_id in enumerate(tool_calls):
+                record = SessionFormatter._find_tool_call_record(session, record_id)
+                if record:
+                    status_emoji = SessionFormatter.TOOL_STATUS_EMOJI.get(record.status, "❓")
+                    tool_name = record.call_data.tool_name
+                    # 最后一个工具调用使用 └─，否则使用 ├─
+                    tool_prefix = "└─" if idx == len(tool_calls) - 1 else "├─"
+                    lines.append(f"{sub_prefix}{tool_prefix} 🔧 {tool_name} {status_emoji}")
+
+        return lines
@@ -0,0 +1,387 @@
+"""
+HTML 模板模块
+
+SessionFormatter.to_html 使用的预编译模板。
+关键特性:
+- 静态片段（文档头部、样式表、页脚）在导入时构建一次
+- 按 (思考类型, 执行阶段) 缓存思考步骤标题片段
+- 快速转义：不含特殊字符的文本直接返回
+- 外部样式表模式：文档只包含 <link>，样式表单独写入 deepthinking.css
+"""
+
+import textwrap
+from functools import lru_cache
+
+# 外部样式表的默认文件名
+HTML_STYLESHEET_NAME = "deepthinking.css"
+
+# 导出文档的样式表（外部样式表模式下原样写入文件）
+HTML_STYLESHEET = """* {
+    margin: 0;
+    padding: 0;
+    box-sizing: border-box;
+}
+body {
+    font-family:
+        -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto,
+        "Helvetica Neue", Arial, sans-serif;
+    line-height: 1.6;
+    color: #333;
+    background-color: #f5f5f5;
+    padding: 20px;
+}
+.container {
+    max-width: 800px;
+    margin: 0 auto;
+    background-color: #fff;
+    padding: 40px;
+    border-radius: 8px;
+    box-shadow: 0 2px 8px rgba(0,0,0,0.1);
+}
+h1 {
+    font-size: 2em;
+    margin-bottom: 10px;
+    color: #2c3e50;
+}
+.description {
+    font-style: italic;
+    color: #7f8c8d;
+    margin-bottom: 30px;
+    padding-left: 15px;
+    border-left: 3px solid #3498db;
+}
+h2 {
+    font-size: 1.5em;
+    margin-top: 30px;
+    margin-bottom: 15px;
+    color: #34495e;
+    border-bottom: 2px solid #ecf0f1;
+    padding-bottom: 10px;
+}
+.session-info {
+    background-color: #ecf0f1;
+    padding: 15px;
+    border-radius: 4px;
+    margin-bottom: 20px;
+}
+.session-info p {
+    margin: 5px 0;
+}
+.thought {
+    margin: 20px 0;
+    padding: 15px;
+    background-color: #f9f9f9;
+    border-left: 4px solid #3498db;
+    border-radius: 4px;
+}
+.thought-header {
+    font-weight: bold;
+    margin-bottom: 10px;
+    color: #2c3e50;
+}
+.thought-type {
+    display: inline-block;
+    padding: 2px 8px;
+    border-radius: 3px;
+    font-size: 0.85em;
+    margin-left: 10px;
+}
+.thought-type.regular {
+    background-color: #3498db;
+    color: #fff;
+}
+.thought-type.revision {
+    background-color: #e67e22;
+    color: #fff;
+}
+.thought-type.branch {
+    background-color: #27ae60;
+    color: #fff;
+}
+.thought-content {
+    margin: 10px 0;
+    white-space: pre-wrap;
+}
+.thought-meta {
+    font-size: 0.85em;
+    color: #95a5a6;
+    margin-top: 10px;
+}
+.metadata {
+    background-color: #f9f9f9;
+    padding: 15px;
+    border-radius: 4px;
+    margin-top: 20px;
+}
+.metadata pre {
+    background-color: #2c3e50;
+    color: #ecf0f1;
+    padding: 15px;
+    border-radius: 4px;
+    overflow-x: auto;
+}
+.footer {
+    margin-top: 40px;
+    padding-top: 20px;
+    border-top: 1px solid #ecf0f1;
+    text-align: center;
+    color: #95a5a6;
+    font-size: 0.9em;
+}
+.status {
+    display: inline-block;
+    padding: 4px 10px;
+    border-radius: 12px;
+    font-size: 0.9em;
+    font-weight: bold;
+}
+.status.active {
+    background-color: #2ecc71;
+    color: #fff;
+}
+.status.completed {
+    background-color: #3498db;
+    color: #fff;
+}
+.status.archived {
+    background-color: #95a5a6;
+    color: #fff;
+}
+/* Interleaved Thinking 样式 */
+.thought-phase {
+    display: inline-block;
+    padding: 2px 8px;
+    border-radius: 3px;
+    font-size: 0.85em;
+    margin-left: 10px;
+    background-color: #9b59b6;
+    color: #fff;
+}
+.thought-phase.thinking {
+    background-color: #3498db;
+}
+.thought-phase.tool_call {
+    background-color: #e74c3c;
+}
+.thought-phase.analysis {
+    background-color: #2ecc71;
+}
+.tool-calls {
+    margin: 10px 0;
+    padding: 10px;
+    background-color: #fff3e0;
+    border-radius: 4px;
+    border: 1px solid #ffcc80;
+}
+.tool-call-item {
+    padding: 5px 0;
+    border-bottom: 1px dashed #ffcc80;
+}
+.tool-call-item:last-child {
+    border-bottom: none;
+}
+.tool-call-status {
+    display: inline-block;
+    padding: 1px 6px;
+    border-radius: 3px;
+    font-size: 0.8em;
+    margin-left: 5px;
+}
+.tool-call-status.completed {
+    background-color: #27ae60;
+    color: #fff;
+}
+.tool-call-status.failed {
+    background-color: #e74c3c;
+    color: #fff;
+}
+.tool-call-status.pending {
+    background-color: #f39c12;
+    color: #fff;
+}
+.tool-call-history {
+    margin-top: 20px;
+    overflow-x: auto;
+}
+.tool-call-history table {
+    width: 100%;
+    border-collapse: collapse;
+}
+.tool-call-history th, .tool-call-history td {
+    padding: 8px;
+    border: 1px solid #ecf0f1;
+    text-align: left;
+}
+.tool-call-history th {
+    background-color: #34495e;
+    color: #fff;
+}
+.statistics {
+    background-color: #f9f9f9;
+    padding: 15px;
+    border-radius: 4px;
+    margin-top: 20px;
+}
+.statistics h3 {
+    margin-bottom: 10px;
+    color: #34495e;
+}
+.statistics-grid {
+    display: grid;
+    grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
+    gap: 15px;
+}
+.stat-card {
+    background-color: #fff;
+    padding: 10px;
+    border-radius: 4px;
+    border: 1px solid #ecf0f1;
+}
+.stat-value {
+    font-size: 1.5em;
+    font-weight: bold;
+    color: #3498db;
+}
+.stat-label {
+    color: #7f8c8d;
+    font-size: 0.9em;
+}
+"""
+
+# 内联样式块（缩进与文档结构一致）
+_INLINE_STYLE = "    <style>\n" + textwrap.indent(HTML_STYLESHEET, "        ") + "    </style>\n"
+
+_HEAD_OPEN = """<!DOCTYPE html>
+<html lang="zh-CN">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>"""
+
+_HEAD_TITLE_CLOSE = "</title>\n"
+
+_BODY_OPEN = """</head>
+<body>
+    <div class="container">
+"""
+
+# 文档尾部（页脚中的导出时间之后）
+DOCUMENT_END = """            <p>由 DeepThinking-MCP 生成</p>
+        </div>
+    </div>
+</body>
+</html>"""
+
+# 需要转义的字符
+_HTML_SPECIAL = ("&", "<", ">", '"', "'")
+
+
+def escape_html(text: str) -> str:
+    """
+    转义HTML特殊字符
+
+    绝大多数思考内容不含特殊字符，先做包含检查可跳过五次替换。
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        转义后的文本
+    """
+    if not any(char in text for char in _HTML_SPECIAL):
+        return text
+    return (
+        text.replace("&", "&amp;")
+        .replace("<", "&lt;")
+        .replace(">", "&gt;")
+        .replace('"', "&quot;")
+        .replace("'", "&#x27;")
+    )
+
+
+def document_head(title: str, css_href: str | None = None) -> str:
+    """
+    生成文档头部（到 <div class="container"> 为止）
+
+    Args:
+        title: 文档标题（未转义）
+        css_href: 外部样式表地址（None 表示内联样式）
+
+    Returns:
+        文档头部HTML
+    """
+    if css_href is None:
+        style = _INLINE_STYLE
+    else:
+        style = f'    <link rel="stylesheet" href="{escape_html(css_href)}">\n'
+    return "".join((_HEAD_OPEN, escape_html(title), _HEAD_TITLE_CLOSE, style, _BODY_OPEN))
+
+
+@lru_cache(maxsize=128)
+def thought_header_tail(
+    thought_type: str, type_name: str | None, phase: str, phase_emoji: str, phase_name: str
+) -> str:
+    """
+    生成思考步骤标题中编号之后的固定部分（类型标签、阶段标签、结束标签）
+
+    该片段只取决于思考类型和执行阶段，按参数缓存。
+
+    Args:
+        thought_type: 思考类型
+        type_name: 类型名称（常规思考为None，不显示类型标签）
+        phase: 执行阶段
+        phase_emoji: 阶段图标
+        phase_name: 阶段名称
+
+    Returns:
+        HTML片段（以换行开头）
+    """
+    parts: list[str] = []
+    if type_name is not None:
+        parts.append(
+            f'\n                <span class="thought-type {thought_type}">{type_name}</span>'
+        )
+    parts.append(
+        f'\n                <span class="thought-phase {phase}">{phase_emoji} {phase_name}</span>'
+    )
+    parts.append("\n            </div>")
+    return "".join(parts)
+
+
+# 思考步骤片段中的固定部分
+THOUGHT_OPEN = '        <div class="thought">\n            <div class="thought-header">'
+REVISION_OPEN = '\n            <p style="color: #e67e22; font-size: 0.9em;">📝 修订步骤 '
+BRANCH_OPEN = '\n            <p style="color: #27ae60; font-size: 0.9em;">🔀 分支自步骤 '
+PARAGRAPH_CLOSE = "</p>"
+CONTENT_OPEN = '\n            <div class="thought-content">'
+CONTENT_CLOSE = "</div>"
+TOOL_CALLS_OPEN = (
+    '\n            <div class="tool-calls">\n                <strong>关联工具调用:</strong>'
+)
+TOOL_CALL_ITEM_OPEN = '\n                <div class="tool-call-item"><span class="tool-call-status '
+TOOL_CALL_ITEM_CLOSE = "</code></div>"
+TOOL_CALLS_CLOSE = "\n            </div>"
+META_OPEN = '\n            <div class="thought-meta">🕒 '
+THOUGHT_CLOSE = "</div>\n        </div>"
+
+
+__all__ = [
+    "BRANCH_OPEN",
+    "CONTENT_CLOSE",
+    "CONTENT_OPEN",
+    "DOCUMENT_END",
+    "HTML_STYLESHEET",
+    "HTML_STYLESHEET_NAME",
+    "META_OPEN",
+    "PARAGRAPH_CLOSE",
+    "REVISION_OPEN",
+    "THOUGHT_CLOSE",
+    "THOUGHT_OPEN",
+    "TOOL_CALLS_CLOSE",
+    "TOOL_CALLS_OPEN",
+    "TOOL_CALL_ITEM_CLOSE",
+    "TOOL_CALL_ITEM_OPEN",
+    "document_head",
+    "escape_html",
+    "thought_header_tail",
+]
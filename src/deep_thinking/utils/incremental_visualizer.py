@@ -0,0 +1,317 @@
+"""
+增量可视化模块
+
+会话通常只在末尾追加思考步骤，此时图表的绝大部分输出不变。
+增量可视化器为每个会话保存渲染状态（节点行、连接线、分支缩进层级），
+追加步骤时只生成新步骤的节点和连接线，并重算受影响的上一步骤。
+
+以下情况回退为完整重建:
+- 已渲染的思考步骤被修改或删除（修订、分支变更等）
+- 已有工具调用记录发生变化，或新记录补全了此前找不到的引用
+- 新步骤补全了此前找不到的修订/分支目标（仅 Mermaid）
+
+所有片段都由 Visualizer 的同一组辅助方法生成，输出与完整渲染逐字节一致。
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import Any
+
+from deep_thinking.models.thinking_session import ThinkingSession
+from deep_thinking.utils.formatters import Visualizer
+
+# 默认保留渲染状态的会话数
+DEFAULT_MAX_SESSIONS = 128
+
+# 支持的可视化格式
+FORMATS = ("mermaid", "ascii", "tree")
+
+
+@dataclass
+class _RenderState:
+    """单个会话单种格式的渲染状态"""
+
+    # 已渲染的思考步骤和工具调用记录快照
+    thoughts: list[Any] = field(default_factory=list)
+    records: list[Any] = field(default_factory=list)
+    # 已渲染步骤中找不到的工具调用记录ID
+    missing_records: set[str] = field(default_factory=set)
+    # 每个步骤的片段（Mermaid 节点行 / ASCII 块 / 树状结构行）
+    blocks: list[list[str]] = field(default_factory=list)
+    # 每个步骤之后的连接线（Mermaid / ASCII）
+    links: list[list[str]] = field(default_factory=list)
+    # Mermaid: 找不到的修订/分支目标编号
+    missing_targets: set[int] = field(default_factory=set)
+    # 树状结构: 每个步骤的缩进层级和分支层级表
+    levels: list[int] = field(default_factory=list)
+    branch_levels: dict[str, int] = field(default_factory=dict)
+
+
+class IncrementalVisualizer:
+    """
+    增量可视化器
+
+    接口与 Visualizer 的 to_mermaid/to_ascii/to_tree 相同，
+    按会话ID保存渲染状态，LRU 淘汰。
+
+    Attributes:
+        max_sessions: 保留渲染状态的最大会话数
+        full_rebuilds: 完整重建次数
+        incremental_updates: 增量更新次数
+    """
+
+    def __init__(self, max_sessions: int = DEFAULT_MAX_SESSIONS):
+        """
+        初始化增量可视化器
+
+        Args:
+            max_sessions: 保留渲染状态的最大会话数
+        """
+        self.max_sessions = max(max_sessions, 1)
+        self.full_rebuilds = 0
+        self.incremental_updates = 0
+
+        self._states: OrderedDict[tuple[str, str], _RenderState] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def to_mermaid(self, session: ThinkingSession) -> str:
+        """增量生成 Mermaid 流程图（输出与 Visualizer.to_mermaid 一致）"""
+        return self.render(session, "mermaid")
+
+    def to_ascii(self, session: ThinkingSession) -> str:
+        """增量生成 ASCII 流程图（输出与 Visualizer.to_ascii 一致）"""
+        return self.render(session, "ascii")
+
+    def to_tree(self, session: ThinkingSession) -> str:
+        """增量生成树状结构（输出与 Visualizer.to_tree 一致）"""
+        return self.render(session, "tree")
+
+    def render(self, session: ThinkingSession, format_type: str) -> str:
+        """
+        增量渲染会话
+
+        Args:
+            session: 思考会话对象
+            format_type: 可视化格式（mermaid/ascii/tree）
+
+        Returns:
+            可视化结果
+
+        Raises:
+            ValueError: 格式不支持
+        """
+        if format_type not in FORMATS:
+            raise ValueError(f"不支持的格式: {format_type}。支持的格式: {', '.join(FORMATS)}")
+
+        key = (session.session_id, format_type)
+
+        if not session.thoughts:
+            with self._lock:
+                self._states.pop(key, None)
+            return _FULL_RENDERERS[format_type](session)
+
+        with self._lock:
+            state = self._states.get(key)
+            start = self._appended_from(state, session, format_type) if state else None
+
+            if state is None or start is None:
+                state = _RenderState()
+                start = 0
+                self.full_rebuilds += 1
+            else:
+                self.incremental_updates += 1
+
+            _UPDATERS[format_type](state, session, start)
+            self._snapshot(state, session, start)
+
+            self._states[key] = state
+            self._states.move_to_end(key)
+            while len(self._states) > self.max_sessions:
+                self._states.popitem(last=False)
+
+            return _ASSEMBLERS[format_type](state)
+
+    def forget(self, session_id: str) -> None:
+        """
+        丢弃会话的渲染状态
+
+        Args:
+            session_id: 会话ID
+        """
+        with self._lock:
+            for key in [key for key in self._states if key[0] == session_id]:
+                del self._states[key]
+
+    @staticmethod
+    def _appended_from(
+        state: _RenderState, session: ThinkingSession, format_type: str
+    ) -> int | None:
+        """
+        判断会话是否只在末尾追加了步骤
+
+        Returns:
+            第一个新步骤的下标；需要完整重建时返回None
+        """
+        old_count = len(state.thoughts)
+        thoughts = session.thoughts
+        records = session.tool_call_history
+
+        if len(thoughts) < old_count or len(records) < len(state.records):
+            return None
+        if thoughts[:old_count] != state.thoughts:
+            return None
+        if records[: len(state.records)] != state.records:
+            return None
+
+        new_records = records[len(state.records) :]
+        if state.missing_records and any(
+            record.record_id in state.missing_records for record in new_records
+        ):
+            return None
+
+        new_thoughts = thoughts[old_count:]
+        if (
+            format_type == "mermaid"
+            and state.missing_targets
+            and any(thought.thought_number in state.missing_targets for thought in new_thoughts)
+        ):
+            return None
+
+        return old_count
+
+    @staticmethod
+    def _snapshot(state: _RenderState, session: ThinkingSession, start: int) -> None:
+        """保存已渲染步骤和记录的快照（深拷贝，避免调用方原地修改）"""
+        new_thoughts = session.thoughts[start:]
+        state.thoughts.extend(thought.model_copy(deep=True) for thought in new_thoughts)
+
+        record_count = len(state.records)
+        state.records.extend(
+            record.model_copy(deep=True) for record in session.tool_call_history[record_count:]
+        )
+
+        # 记录新步骤中找不到的工具调用引用
+        known = {record.record_id for record in session.tool_call_history}
+        for thought in new_thoughts:
+            for record_id in getattr(thought, "tool_calls", None) or []:
+                if record_id not in known:
+                    state.missing_records.add(record_id)
+
+
+def _update_mermaid(state: _RenderState, session: ThinkingSession, start: int) -> None:
+    """更新 Mermaid 片段：新步骤的节点与连接线，以及上一步骤的连接线"""
+    thoughts = session.thoughts
+
+    for thought in thoughts[start:]:
+        state.blocks.append(Visualizer._mermaid_node_lines(thought, session))
+
+    # 上一步骤的连接线取决于下一步骤，需要重算
+    first_link = max(start - 1, 0)
+    del state.links[first_link:]
+    for i in range(first_link, len(thoughts)):
+        state.links.append(Visualizer._mermaid_edge_lines(session, i))
+
+    for thought in thoughts[start:]:
+        target = None
+        if thought.type == "revision" and thought.revises_thought:
+            target = thought.revises_thought
+        elif thought.type == "branch" and thought.branch_from_thought:
+            target = thought.branch_from_thought
+        if target is not None and (
+            Visualizer._find_node_id(session, target, thought.thought_number) is None
+        ):
+            state.missing_targets.add(target)
+
+
+def _assemble_mermaid(state: _RenderState) -> str:
+    """拼接 Mermaid 输出"""
+    return "\n".join(
+        chain(
+            ["graph TD"],
+            chain.from_iterable(state.blocks),
+            chain.from_iterable(state.links),
+            [Visualizer.MERMAID_STYLES.strip()],
+        )
+    )
+
+
+def _update_ascii(state: _RenderState, session: ThinkingSession, start: int) -> None:
+    """更新 ASCII 片段：新步骤的块，以及连接条件可能变化的已有步骤"""
+    thoughts = session.thoughts
+    old_count = start
+
+    for thought in thoughts[start:]:
+        state.blocks.append([Visualizer._thought_to_ascii_block(thought, session)])
+
+    # 连接线取决于下一步骤和步骤总数：重算上一步骤以及编号不小于原步骤数的已有步骤
+    for i in range(old_count):
+        if i == old_count - 1 or thoughts[i].thought_number >= old_count:
+            state.links[i] = Visualizer._ascii_connector_lines(session, i)
+    for i in range(start, len(thoughts)):
+        state.links.append(Visualizer._ascii_connector_lines(session, i))
+
+
+def _assemble_ascii(state: _RenderState) -> str:
+    """拼接 ASCII 输出"""
+    return "\n".join(
+        chain.from_iterable(
+            chain(block, link) for block, link in zip(state.blocks, state.links, strict=True)
+        )
+    )
+
+
+def _update_tree(state: _RenderState, session: ThinkingSession, start: int) -> None:
+    """更新树状结构片段：新步骤的行，以及结束符号可能变化的上一步骤"""
+    thoughts = session.thoughts
+
+    if start > 0:
+        # 上一步骤可能不再是所在层级的最后一个
+        i = start - 1
+        last_in_level = Visualizer._tree_is_last_in_level(thoughts, i, state.levels[i])
+        state.blocks[i] = Visualizer._thought_to_tree_lines(
+            thoughts[i], state.levels[i], last_in_level, session
+        )
+
+    for i in range(start, len(thoughts)):
+        level = Visualizer._tree_level(thoughts[i], state.branch_levels)
+        last_in_level = Visualizer._tree_is_last_in_level(thoughts, i, level)
+        state.levels.append(level)
+        state.blocks.append(
+            Visualizer._thought_to_tree_lines(thoughts[i], level, last_in_level, session)
+        )
+
+
+def _assemble_tree(state: _RenderState) -> str:
+    """拼接树状结构输出"""
+    return "\n".join(chain(["🧠 思考流程树", ""], chain.from_iterable(state.blocks)))
+
+
+_FULL_RENDERERS = {
+    "mermaid": Visualizer.to_mermaid,
+    "ascii": Visualizer.to_ascii,
+    "tree": Visualizer.to_tree,
+}
+
+_UPDATERS = {
+    "mermaid": _update_mermaid,
+    "ascii": _update_ascii,
+    "tree": _update_tree,
+}
+
+_ASSEMBLERS = {
+    "mermaid": _assemble_mermaid,
+    "ascii": _assemble_ascii,
+    "tree": _assemble_tree,
+}
+
+# 全局增量可视化器（可视化工具共用）
+incremental_visualizer = IncrementalVisualizer()
+
+
+__all__ = [
+    "DEFAULT_MAX_SESSIONS",
+    "IncrementalVisualizer",
+    "incremental_visualizer",
+]
@@ -7,6 +7,14 @@
 - STDIO模式: 日志必须输出到stderr，严禁使用print()
 - SSE模式: 日志可以输出到stdout或文件
 
+非阻塞日志:
+- 根logger只挂一个 QueueHandler，日志记录放入有界队列后立即返回
+- 后台 QueueListener 线程负责格式化后写入stderr/stdout和可选的轮转日志文件，
+  事件循环线程不会因为输出管道过慢而阻塞
+- 队列已满时按溢出策略丢弃（drop，默认）或阻塞等待（block）；丢弃的条数在之后以警告记录
+- 支持纯文本和 JSON（每行一个对象）两种格式
+- fork 出的子进程（如批量导出的进程池）改为同步写出
+
 使用示例:
     from deep_thinking.utils.logger import setup_logging
     import logging
@@ -20,66 +28,277 @@
     logger.info("这会输出到stdout")
 """
 
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import os
+import queue
 import sys
-from typing import Literal
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Literal
+
+# 默认日志队列长度（0 表示不使用队列，直接同步写出）
+DEFAULT_LOG_QUEUE_SIZE = 10000
+
+# 队列溢出策略
+LOG_OVERFLOW_POLICIES = ("drop", "block")
+
+# 日志格式
+LOG_FORMATS = ("text", "json")
+
+# 轮转日志文件的默认大小上限和保留个数
+DEFAULT_LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_LOG_FILE_BACKUP_COUNT = 5
+
+_TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 当前的后台日志线程（未使用队列时为None）
+_listener: logging.handlers.QueueListener | None = None
+
+
+class JsonFormatter(logging.Formatter):
+    """JSON 日志格式化器（每条日志一行 JSON 对象）"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data: dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created)
+            .astimezone()
+            .isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exception"] = record.exc_text
+        if record.stack_info:
+            data["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    有界队列日志处理器
+
+    队列已满时按溢出策略丢弃或阻塞；丢弃的条数在下一次成功入队时以一条警告记录。
+
+    Attributes:
+        overflow: 溢出策略（drop/block）
+        dropped: 累计丢弃的日志条数
+    """
+
+    def __init__(self, log_queue: "queue.Queue[Any]", overflow: str = "drop"):
+        super().__init__(log_queue)
+        self._bounded_queue = log_queue
+        self.overflow = overflow
+        self.dropped = 0
+        self._pending_dropped = 0
+        self._lock_dropped = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        在调用线程中合并消息参数并格式化异常
+
+        与默认实现不同，不把格式化后的整行写回 msg，由监听线程中的处理器按各自格式输出。
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.overflow == "block":
+            self._bounded_queue.put(record)
+            return
+
+        try:
+            self._bounded_queue.put_nowait(record)
+        except queue.Full:
+            with self._lock_dropped:
+                self.dropped += 1
+                self._pending_dropped += 1
+            return
+
+        if self._pending_dropped:
+            with self._lock_dropped:
+                count, self._pending_dropped = self._pending_dropped, 0
+            warning = logging.LogRecord(
+                __name__,
+                logging.WARNING,
+                __file__,
+                0,
+                f"日志队列已满，丢弃了 {count} 条日志",
+                None,
+                None,
+            )
+            try:
+                self._bounded_queue.put_nowait(warning)
+            except queue.Full:
+                with self._lock_dropped:
+                    self._pending_dropped += count
+
+
+def shutdown_logging() -> None:
+    """停止后台日志线程，写出队列中剩余的日志（可重复调用）"""
+    global _listener
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+def _after_fork_in_child() -> None:
+    """
+    fork 出的子进程中没有后台日志线程，改为直接挂处理器同步写出
+
+    否则子进程的日志会留在无人读取的队列中，block 策略下队列写满后会一直阻塞。
+    """
+    global _listener
+    listener, _listener = _listener, None
+    if listener is None:
+        return
+    root_logger = logging.getLogger()
+    for handler in root_logger.handlers[:]:
+        if isinstance(handler, BoundedQueueHandler):
+            root_logger.removeHandler(handler)
+    for handler in listener.handlers:
+        root_logger.addHandler(handler)
+
+
+atexit.register(shutdown_logging)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
 
 
 def setup_logging(
-    transport_mode: Literal["stdio", "sse"] = "stdio", level: int = logging.INFO
+    transport_mode: Literal["stdio", "sse", "http"] = "stdio",
+    level: int = logging.INFO,
+    log_format: str = "text",
+    log_file: str | Path | None = None,
+    queue_size: int = DEFAULT_LOG_QUEUE_SIZE,
+    overflow: str = "drop",
+    max_bytes: int = DEFAULT_LOG_FILE_MAX_BYTES,
+    backup_count: int = DEFAULT_LOG_FILE_BACKUP_COUNT,
 ) -> logging.Logger:
     """
     配置传输感知的日志系统
 
     Args:
-        transport_mode: 传输模式，"stdio" 或 "sse"
+        transport_mode: 传输模式，"stdio"、"sse" 或 "http"
         level: 日志级别
+        log_format: 日志格式，"text" 或 "json"
+        log_file: 轮转日志文件路径（同时写入控制台和文件；None 表示不写文件）
+        queue_size: 日志队列长度，0 表示不使用队列（在调用线程中同步写出）
+        overflow: 队列已满时的策略，"drop"（丢弃并计数）或 "block"（阻塞等待）
+        max_bytes: 日志文件轮转大小
+        backup_count: 保留的轮转文件个数
 
     Returns:
         配置好的根logger实例
 
+    Raises:
+        ValueError: 日志格式、溢出策略或队列长度无效
+
     注意:
         STDIO模式: 日志输出到stderr（stdout用于JSON-RPC）
-        SSE模式: 日志输出到stdout（或可配置到文件）
+        SSE/HTTP模式: 日志输出到stdout（或可配置到文件）
 
     严禁:
         - 在STDIO模式下使用print()函数
         - 任何模式下将日志输出到stdio模式的stdout
     """
+    if log_format not in LOG_FORMATS:
+        raise ValueError(f"无效的日志格式: {log_format}（支持: {', '.join(LOG_FORMATS)}）")
+    if overflow not in LOG_OVERFLOW_POLICIES:
+        raise ValueError(
+            f"无效的日志队列溢出策略: {overflow}（支持: {', '.join(LOG_OVERFLOW_POLICIES)}）"
+        )
+    if queue_size < 0:
+        raise ValueError(f"日志队列长度不能为负数: {queue_size}")
+
     # 获取根logger
     root_logger = logging.getLogger()
     root_logger.setLevel(level)
 
-    # 清除现有handlers
+    # 清除现有handlers，并停止之前的后台日志线程
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
+    shutdown_logging()
 
+    handlers: list[logging.Handler] = []
     if transport_mode == "stdio":
         # STDIO模式：强制输出到stderr
         # stdout用于JSON-RPC通信，任何输出到stdout的内容都会破坏协议
-        handler = logging.StreamHandler(sys.stderr)
-        handler.setLevel(level)
+        handlers.append(logging.StreamHandler(sys.stderr))
         root_logger.info("STDIO模式: 日志输出到stderr，严禁使用print()")
 
     else:
-        # SSE模式：可以使用stdout或文件
+        # SSE/HTTP模式：可以使用stdout或文件
         # 默认使用stdout，方便在终端查看
-        handler = logging.StreamHandler(sys.stdout)
-        handler.setLevel(level)
+        handlers.append(logging.StreamHandler(sys.stdout))
         root_logger.info("SSE模式: 日志输出到stdout")
 
+    if log_file:
+        path = Path(log_file).expanduser()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        handlers.append(
+            logging.handlers.RotatingFileHandler(
+                path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+            )
+        )
+
     # 设置格式化器
-    formatter = logging.Formatter(
-        fmt="%(asctime)s - %(name)s - %(levelname)s - %(message)s", datefmt="%Y-%m-%d %H:%M:%S"
-    )
-    handler.setFormatter(formatter)
+    formatter: logging.Formatter
+    if log_format == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(fmt=_TEXT_FORMAT, datefmt=_DATE_FORMAT)
+    for handler in handlers:
+        handler.setLevel(level)
+        handler.setFormatter(formatter)
 
-    # 添加handler
-    root_logger.addHandler(handler)
+    if queue_size == 0:
+        for handler in handlers:
+            root_logger.addHandler(handler)
+        return root_logger
+
+    # 非阻塞模式：根logger只挂队列处理器，由后台线程写出
+    global _listener
+    log_queue: queue.Queue[Any] = queue.Queue(maxsize=queue_size)
+    queue_handler = BoundedQueueHandler(log_queue, overflow)
+    queue_handler.setLevel(level)
+    root_logger.addHandler(queue_handler)
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
 
     return root_logger
 
 
+def get_log_handlers() -> list[logging.Handler]:
+    """
+    获取实际写出日志的处理器（使用队列时为后台线程中的处理器）
+
+    Returns:
+        处理器列表
+    """
+    if _listener is not None:
+        return list(_listener.handlers)
+    return list(logging.getLogger().handlers)
+
+
 def get_logger(name: str) -> logging.Logger:
     """
     获取命名logger
@@ -127,3 +346,19 @@ class LoggingContext:
         exc_tb: object,
     ) -> None:
         self.logger.setLevel(self.old_level)
+
+
+__all__ = [
+    "DEFAULT_LOG_FILE_BACKUP_COUNT",
+    "DEFAULT_LOG_FILE_MAX_BYTES",
+    "DEFAULT_LOG_QUEUE_SIZE",
+    "LOG_FORMATS",
+    "LOG_OVERFLOW_POLICIES",
+    "BoundedQueueHandler",
+    "JsonFormatter",
+    "LoggingContext",
+    "get_log_handlers",
+    "get_logger",
+    "setup_logging",
+    "shutdown_logging",
+]
@@ -0,0 +1,311 @@
+"""
+运行指标模块
+
+进程内的性能指标，用于定位工具调用的耗时分布在哪里。
+关键特性:
+- 每个 MCP 工具的调用耗时直方图和错误数
+- 存储操作次数、读写字节数和 fsync 耗时
+- 缓存命中率（渲染缓存、偏移布局缓存）
+- 会话反序列化时的 pydantic 验证耗时
+- 以 Prometheus 文本格式或字典快照输出
+
+指标默认启用，环境变量 DEEP_THINKING_METRICS=0 禁用。禁用后各埋点只做一次属性检查。
+多工作进程模式下每个工作进程各自统计。
+"""
+
+import bisect
+import os
+import threading
+from typing import Any
+
+# 工具调用耗时直方图的桶上限（秒）
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# fsync 耗时直方图的桶上限（秒）
+FSYNC_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5)
+
+# 缓存查找结果中计为命中的结果
+CACHE_HIT_RESULTS = ("hit", "disk_hit")
+
+
+def metrics_enabled_from_env() -> bool:
+    """读取环境变量 DEEP_THINKING_METRICS（0/false/no/off 表示禁用）"""
+    value = os.getenv("DEEP_THINKING_METRICS", "1").strip().lower()
+    return value not in ("0", "false", "no", "off")
+
+
+class Histogram:
+    """
+    累计直方图（Prometheus 语义：每个桶统计小于等于上限的观测数）
+
+    不加锁，由 Metrics 在锁内调用。
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """记录一次观测值"""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """
+        估算分位数（所在桶内线性插值；落在最后一个桶时返回最大观测值）
+
+        Args:
+            q: 分位（0-1）
+
+        Returns:
+            估算值
+        """
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                if index == len(self.buckets):
+                    return self.max
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index]
+                return min(lower + (upper - lower) * (rank - seen) / bucket_count, self.max)
+            seen += bucket_count
+        return self.max
+
+    def prometheus_lines(self, name: str, labels: str = "") -> list[str]:
+        """输出 _bucket/_sum/_count 样本行"""
+        prefix = f"{labels}," if labels else ""
+        lines = []
+        cumulative = 0
+        for bucket, bucket_count in zip(self.buckets, self.counts, strict=False):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{{{prefix}le="{bucket:g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum:.6f}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+
+class Metrics:
+    """
+    进程内指标
+
+    埋点调用方先检查 enabled，禁用时不计时、不加锁。
+
+    Attributes:
+        enabled: 是否记录指标
+    """
+
+    def __init__(self, enabled: bool = True):
+        """
+        初始化指标
+
+        Args:
+            enabled: 是否记录指标
+        """
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """清空全部指标"""
+        with self._lock:
+            self._tools: dict[str, Histogram] = {}
+            self._tool_errors: dict[str, int] = {}
+            self._storage_ops: dict[str, int] = {}
+            self._bytes_read = 0
+            self._bytes_written = 0
+            self._fsync = Histogram(FSYNC_BUCKETS)
+            self._validation_count = 0
+            self._validation_seconds = 0.0
+            self._cache: dict[str, dict[str, int]] = {}
+
+    def observe_tool(self, tool: str, seconds: float, error: bool = False) -> None:
+        """
+        记录一次工具调用
+
+        Args:
+            tool: 工具名
+            seconds: 耗时（秒）
+            error: 是否失败
+        """
+        with self._lock:
+            histogram = self._tools.get(tool)
+            if histogram is None:
+                histogram = self._tools[tool] = Histogram()
+            histogram.observe(seconds)
+            if error:
+                self._tool_errors[tool] = self._tool_errors.get(tool, 0) + 1
+
+    def count_storage(self, op: str) -> None:
+        """
+        记录一次存储操作
+
+        Args:
+            op: 操作名（read/write/delete/range_read/compress/blob_read/blob_write）
+        """
+        with self._lock:
+            self._storage_ops[op] = self._storage_ops.get(op, 0) + 1
+
+    def add_bytes(self, read: int = 0, written: int = 0) -> None:
+        """
+        记录存储读写字节数
+
+        Args:
+            read: 读取字节数
+            written: 写入字节数
+        """
+        with self._lock:
+            self._bytes_read += read
+            self._bytes_written += written
+
+    def observe_fsync(self, seconds: float) -> None:
+        """记录一次 fsync 耗时"""
+        with self._lock:
+            self._fsync.observe(seconds)
+
+    def observe_validation(self, seconds: float) -> None:
+        """记录一次模型验证耗时"""
+        with self._lock:
+            self._validation_count += 1
+            self._validation_seconds += seconds
+
+    def count_cache(self, cache: str, result: str) -> None:
+        """
+        记录一次缓存查找
+
+        Args:
+            cache: 缓存名
+            result: 查找结果（hit/disk_hit/miss）
+        """
+        with self._lock:
+            results = self._cache.setdefault(cache, {})
+            results[result] = results.get(result, 0) + 1
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        获取指标快照
+
+        Returns:
+            指标字典（耗时单位为毫秒）
+        """
+        with self._lock:
+            tools = {
+                tool: {
+                    "calls": h.count,
+                    "errors": self._tool_errors.get(tool, 0),
+                    "avg_ms": round(h.sum / h.count * 1000, 3) if h.count else 0.0,
+                    "p50_ms": round(h.quantile(0.5) * 1000, 3),
+                    "p95_ms": round(h.quantile(0.95) * 1000, 3),
+                    "max_ms": round(h.max * 1000, 3),
+                }
+                for tool, h in sorted(self._tools.items())
+            }
+            cache = {}
+            for name, results in sorted(self._cache.items()):
+                total = sum(results.values())
+                hits = sum(results.get(r, 0) for r in CACHE_HIT_RESULTS)
+                cache[name] = {**results, "hit_ratio": round(hits / total, 4) if total else 0.0}
+            return {
+                "enabled": self.enabled,
+                "tools": tools,
+                "storage": {
+                    "operations": dict(sorted(self._storage_ops.items())),
+                    "bytes_read": self._bytes_read,
+                    "bytes_written": self._bytes_written,
+                    "fsync_count": self._fsync.count,
+                    "fsync_total_ms": round(self._fsync.sum * 1000, 3),
+                    "fsync_max_ms": round(self._fsync.max * 1000, 3),
+                },
+                "validation": {
+                    "count": self._validation_count,
+                    "total_ms": round(self._validation_seconds * 1000, 3),
+                },
+                "cache": cache,
+            }
+
+    def format_prometheus(self) -> str:
+        """
+        以 Prometheus 文本格式输出指标
+
+        Returns:
+            Prometheus 文本（以换行结尾）
+        """
+        with self._lock:
+            lines = [
+                "# HELP deepthinking_tool_duration_seconds MCP工具调用耗时",
+                "# TYPE deepthinking_tool_duration_seconds histogram",
+            ]
+            for tool, histogram in sorted(self._tools.items()):
+                lines.extend(
+                    histogram.prometheus_lines(
+                        "deepthinking_tool_duration_seconds", f'tool="{tool}"'
+                    )
+                )
+            lines += [
+                "# HELP deepthinking_tool_errors_total MCP工具调用失败次数",
+                "# TYPE deepthinking_tool_errors_total counter",
+            ]
+            for tool, count in sorted(self._tool_errors.items()):
+                lines.append(f'deepthinking_tool_errors_total{{tool="{tool}"}} {count}')
+            lines += [
+                "# HELP deepthinking_storage_operations_total 存储操作次数",
+                "# TYPE deepthinking_storage_operations_total counter",
+            ]
+            for op, count in sorted(self._storage_ops.items()):
+                lines.append(f'deepthinking_storage_operations_total{{op="{op}"}} {count}')
+            lines += [
+                "# HELP deepthinking_storage_read_bytes_total 存储读取字节数",
+                "# TYPE deepthinking_storage_read_bytes_total counter",
+                f"deepthinking_storage_read_bytes_total {self._bytes_read}",
+                "# HELP deepthinking_storage_written_bytes_total 存储写入字节数",
+                "# TYPE deepthinking_storage_written_bytes_total counter",
+                f"deepthinking_storage_written_bytes_total {self._bytes_written}",
+                "# HELP deepthinking_storage_fsync_seconds fsync耗时",
+                "# TYPE deepthinking_storage_fsync_seconds histogram",
+                *self._fsync.prometheus_lines("deepthinking_storage_fsync_seconds"),
+                "# HELP deepthinking_validation_seconds 会话反序列化的模型验证耗时",
+                "# TYPE deepthinking_validation_seconds summary",
+                f"deepthinking_validation_seconds_sum {self._validation_seconds:.6f}",
+                f"deepthinking_validation_seconds_count {self._validation_count}",
+                "# HELP deepthinking_cache_requests_total 缓存查找次数",
+                "# TYPE deepthinking_cache_requests_total counter",
+            ]
+            ratios = []
+            for name, results in sorted(self._cache.items()):
+                for result, count in sorted(results.items()):
+                    lines.append(
+                        f'deepthinking_cache_requests_total{{cache="{name}",result="{result}"}} '
+                        f"{count}"
+                    )
+                total = sum(results.values())
+                hits = sum(results.get(r, 0) for r in CACHE_HIT_RESULTS)
+                ratios.append(f'deepthinking_cache_hit_ratio{{cache="{name}"}} {hits / total:.4f}')
+            lines += [
+                "# HELP deepthinking_cache_hit_ratio 缓存命中率",
+                "# TYPE deepthinking_cache_hit_ratio gauge",
+                *ratios,
+            ]
+        return "\n".join(lines) + "\n"
+
+
+# 全局指标实例
+metrics = Metrics(enabled=metrics_enabled_from_env())
+
+
+__all__ = [
+    "DEFAULT_LATENCY_BUCKETS",
+    "Histogram",
+    "Metrics",
+    "metrics",
+    "metrics_enabled_from_env",
+]
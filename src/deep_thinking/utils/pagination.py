@@ -0,0 +1,214 @@
+"""
+分页模块
+
+会话详情和工具调用历史的分页辅助函数。
+关键特性:
+- 不透明游标：编码下一页在匹配结果中的起始位置
+- 内容模式：full（完整）/ truncate（截断）/ summary（摘要）
+- 响应字节预算：下一项放不下时提前结束当前页，由游标继续
+"""
+
+import base64
+import binascii
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# 默认每页条目数
+DEFAULT_PAGE_SIZE = 50
+
+# 默认响应字节预算（128 KiB）
+DEFAULT_MAX_RESPONSE_BYTES = 128 * 1024
+
+# truncate 模式下每个思考步骤保留的默认字符数
+DEFAULT_MAX_CONTENT_CHARS = 500
+
+# summary 模式下保留的字符数
+SUMMARY_CHARS = 80
+
+# 支持的内容模式
+CONTENT_MODES = ("full", "truncate", "summary")
+
+# 为分页信息预留的字节数
+FOOTER_RESERVE_BYTES = 256
+
+_CURSOR_PREFIX = "o:"
+
+
+def encode_cursor(offset: int) -> str:
+    """
+    编码分页游标
+
+    Args:
+        offset: 下一页在匹配结果中的起始位置
+
+    Returns:
+        不透明的游标字符串
+    """
+    return base64.urlsafe_b64encode(f"{_CURSOR_PREFIX}{offset}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str | None) -> int:
+    """
+    解码分页游标
+
+    Args:
+        cursor: 游标字符串（None 或空字符串表示第一页）
+
+    Returns:
+        起始位置
+
+    Raises:
+        ValueError: 游标无效
+    """
+    if not cursor:
+        return 0
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        text = base64.urlsafe_b64decode(padded.encode()).decode()
+        if not text.startswith(_CURSOR_PREFIX):
+            raise ValueError(text)
+        offset = int(text[len(_CURSOR_PREFIX) :])
+    except (ValueError, binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError(f"无效的分页游标: {cursor}") from e
+
+    if offset < 0:
+        raise ValueError(f"无效的分页游标: {cursor}")
+    return offset
+
+
+def get_max_response_bytes() -> int:
+    """
+    获取默认响应字节预算
+
+    从环境变量 DEEP_THINKING_MAX_RESPONSE_BYTES 读取，0 表示不限制。
+
+    Returns:
+        字节预算
+    """
+    value = os.getenv("DEEP_THINKING_MAX_RESPONSE_BYTES", str(DEFAULT_MAX_RESPONSE_BYTES))
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        logger.warning(f"DEEP_THINKING_MAX_RESPONSE_BYTES 无效: {value}，使用默认值")
+        return DEFAULT_MAX_RESPONSE_BYTES
+
+
+def validate_page_params(limit: int, content_mode: str = "full") -> None:
+    """
+    验证分页参数
+
+    Args:
+        limit: 每页条目数
+        content_mode: 内容模式
+
+    Raises:
+        ValueError: 参数无效
+    """
+    if limit < 1:
+        raise ValueError(f"limit 必须大于0，当前值: {limit}")
+    if content_mode not in CONTENT_MODES:
+        raise ValueError(
+            f"不支持的内容模式: {content_mode}。支持的模式: {', '.join(CONTENT_MODES)}"
+        )
+
+
+def shorten_content(content: str, mode: str, max_chars: int = DEFAULT_MAX_CONTENT_CHARS) -> str:
+    """
+    按内容模式缩短文本
+
+    Args:
+        content: 原始内容
+        mode: 内容模式（full/truncate/summary）
+        max_chars: truncate 模式保留的字符数
+
+    Returns:
+        处理后的内容
+    """
+    if mode == "summary":
+        first_line = content.strip().split("\n", 1)[0]
+        if len(first_line) > SUMMARY_CHARS:
+            first_line = first_line[:SUMMARY_CHARS] + "…"
+        return f"{first_line}（共 {len(content)} 字）"
+
+    if mode == "truncate" and len(content) > max_chars:
+        return f"{content[:max_chars]}…（已截断，共 {len(content)} 字）"
+
+    return content
+
+
+def truncate_bytes(text: str, max_bytes: int) -> str:
+    """
+    按 UTF-8 字节数截断文本（不截断多字节字符）
+
+    Args:
+        text: 原始文本
+        max_bytes: 最大字节数
+
+    Returns:
+        截断后的文本
+    """
+    encoded = text.encode("utf-8")
+    if len(encoded) <= max_bytes:
+        return text
+    return encoded[: max(max_bytes, 0)].decode("utf-8", errors="ignore")
+
+
+class ResponseBudget:
+    """
+    响应字节预算
+
+    按行累计 UTF-8 字节数（含换行符），预算为0表示不限制。
+
+    Attributes:
+        max_bytes: 字节预算
+        used: 已使用字节数
+    """
+
+    def __init__(self, max_bytes: int):
+        """
+        初始化响应字节预算
+
+        Args:
+            max_bytes: 字节预算（0 表示不限制）
+        """
+        self.max_bytes = max_bytes
+        self.used = 0
+
+    @property
+    def remaining(self) -> int | None:
+        """剩余字节数（扣除分页信息预留），不限制时为None"""
+        if not self.max_bytes:
+            return None
+        return self.max_bytes - FOOTER_RESERVE_BYTES - self.used
+
+    def fits(self, lines: list[str]) -> bool:
+        """判断这些行是否放得下"""
+        remaining = self.remaining
+        return remaining is None or _lines_size(lines) <= remaining
+
+    def add(self, lines: list[str]) -> None:
+        """计入这些行"""
+        self.used += _lines_size(lines)
+
+
+def _lines_size(lines: list[str]) -> int:
+    """计算行列表以换行符连接后占用的字节数"""
+    return sum(len(line.encode("utf-8")) + 1 for line in lines)
+
+
+__all__ = [
+    "CONTENT_MODES",
+    "DEFAULT_MAX_CONTENT_CHARS",
+    "DEFAULT_MAX_RESPONSE_BYTES",
+    "DEFAULT_PAGE_SIZE",
+    "ResponseBudget",
+    "decode_cursor",
+    "encode_cursor",
+    "get_max_response_bytes",
+    "shorten_content",
+    "truncate_bytes",
+    "validate_page_params",
+]
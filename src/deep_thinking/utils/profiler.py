@@ -0,0 +1,309 @@
+"""
+运行时性能分析模块
+
+在不重启服务器的情况下对接下来的工具调用做性能分析，结果写入数据目录。
+关键特性:
+- cprofile 模式：cProfile 确定性分析事件循环线程，输出 .pstats 文件（可用 pstats、snakeviz 查看）
+- sampling 模式：后台线程定时采样所有线程的调用栈，输出折叠栈 .folded 文件（可用 flamegraph.pl、speedscope 查看）
+- 在接下来的 N 次工具调用完成后、T 秒后或手动停止时结束，写出结果文件
+- 同一时间只能有一次分析；停止方法可重复调用
+
+cProfile 只分析调用 start() 的线程（服务器中为事件循环线程），I/O 线程池中的存储操作需要用 sampling 模式。
+"""
+
+import asyncio
+import cProfile
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# 分析模式
+PROFILE_MODES = ("cprofile", "sampling")
+
+# 结果文件目录名（位于数据目录下）
+PROFILES_DIR_NAME = "profiles"
+
+# sampling 模式默认采样间隔（秒）
+DEFAULT_SAMPLE_INTERVAL = 0.005
+
+
+class _Capture:
+    """一次分析的状态"""
+
+    def __init__(
+        self,
+        mode: str,
+        output_path: Path,
+        calls_limit: int | None,
+        seconds: float | None,
+    ):
+        self.mode = mode
+        self.output_path = output_path
+        self.calls_limit = calls_limit
+        self.seconds = seconds
+        self.calls = 0
+        self.started = time.perf_counter()
+        self.deadline = None if seconds is None else time.monotonic() + seconds
+        self.profile: cProfile.Profile | None = None
+        self.samples: dict[str, int] = {}
+        self.sampler: threading.Thread | None = None
+        self.stop_event = threading.Event()
+        self.timer: asyncio.TimerHandle | None = None
+
+
+def _frame_stack(frame: Any) -> list[str]:
+    """调用栈（从外到内），每帧为 函数名 (文件名:首行号)"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+
+class Profiler:
+    """
+    运行时性能分析控制器
+
+    Attributes:
+        last_output: 上一次分析的结果文件
+    """
+
+    def __init__(self) -> None:
+        self._capture: _Capture | None = None
+        self._lock = threading.Lock()
+        self.last_output: Path | None = None
+
+    @property
+    def active(self) -> bool:
+        """是否正在分析"""
+        return self._capture is not None
+
+    def start(
+        self,
+        output_dir: Path,
+        mode: str = "cprofile",
+        calls: int | None = None,
+        seconds: float | None = None,
+        interval: float = DEFAULT_SAMPLE_INTERVAL,
+    ) -> Path:
+        """
+        开始分析
+
+        calls 和 seconds 都未指定时持续到手动停止。
+
+        Args:
+            output_dir: 结果文件目录
+            mode: 分析模式（cprofile/sampling）
+            calls: 在接下来的 N 次工具调用完成后停止
+            seconds: 在 T 秒后停止
+            interval: sampling 模式的采样间隔（秒）
+
+        Returns:
+            结果文件路径（停止时写入）
+
+        Raises:
+            ValueError: 参数无效或已有分析在进行中
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"无效的分析模式: {mode}（支持: {', '.join(PROFILE_MODES)}）")
+        if calls is not None and calls < 1:
+            raise ValueError(f"调用次数必须大于 0: {calls}")
+        if seconds is not None and seconds <= 0:
+            raise ValueError(f"分析时长必须大于 0: {seconds}")
+        if interval <= 0:
+            raise ValueError(f"采样间隔必须大于 0: {interval}")
+
+        with self._lock:
+            if self._capture is not None:
+                raise ValueError(f"性能分析已在进行中: {self._capture.output_path}")
+
+            suffix = "pstats" if mode == "cprofile" else "folded"
+            timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            output_path = output_dir / f"profile-{timestamp}-{os.getpid()}.{suffix}"
+            capture = _Capture(mode, output_path, calls, seconds)
+
+            if mode == "cprofile":
+                capture.profile = cProfile.Profile()
+                capture.profile.enable()
+            else:
+                capture.sampler = threading.Thread(
+                    target=self._sample,
+                    args=(capture, interval),
+                    name="deepthinking-profiler",
+                    daemon=True,
+                )
+                capture.sampler.start()
+
+            if seconds is not None:
+                try:
+                    loop = asyncio.get_running_loop()
+                except RuntimeError:
+                    # 没有事件循环时在下次工具调用或查询状态时检查截止时间
+                    pass
+                else:
+                    capture.timer = loop.call_later(seconds, self.stop)
+
+            self._capture = capture
+
+        logger.info(f"性能分析已开始（{mode}）: {output_path}")
+        return output_path
+
+    @staticmethod
+    def _sample(capture: _Capture, interval: float) -> None:
+        """采样线程：记录除自身外所有线程的调用栈"""
+        own_id = threading.get_ident()
+        while not capture.stop_event.wait(interval):
+            if capture.deadline is not None and time.monotonic() >= capture.deadline:
+                break
+            thread_names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                thread_name = thread_names.get(thread_id, str(thread_id))
+                stack = ";".join([thread_name, *_frame_stack(frame)])
+                capture.samples[stack] = capture.samples.get(stack, 0) + 1
+
+    def on_tool_call(self, started: float) -> None:
+        """
+        一次工具调用完成（由工具调用包装器调用）
+
+        只计入分析开始后才开始的调用；达到调用次数或超过截止时间时停止分析。
+
+        Args:
+            started: 调用开始时的 time.perf_counter()
+        """
+        capture = self._capture
+        if capture is None or started < capture.started:
+            return
+        capture.calls += 1
+        if (capture.calls_limit is not None and capture.calls >= capture.calls_limit) or (
+            capture.deadline is not None and time.monotonic() >= capture.deadline
+        ):
+            self.stop()
+
+    def stop(self) -> Path | None:
+        """
+        停止分析并写出结果文件
+
+        Returns:
+            结果文件路径，没有进行中的分析时返回None
+        """
+        with self._lock:
+            capture = self._capture
+            if capture is None:
+                return None
+            self._capture = None
+
+        if capture.timer is not None:
+            capture.timer.cancel()
+
+        if capture.profile is not None:
+            capture.profile.disable()
+        capture.stop_event.set()
+        if capture.sampler is not None:
+            capture.sampler.join()
+
+        try:
+            capture.output_path.parent.mkdir(parents=True, exist_ok=True)
+            if capture.profile is not None:
+                capture.profile.dump_stats(capture.output_path)
+            else:
+                lines = [f"{stack} {count}" for stack, count in sorted(capture.samples.items())]
+                capture.output_path.write_text(
+                    "".join(line + "\n" for line in lines), encoding="utf-8"
+                )
+        except OSError as e:
+            logger.error(f"写入性能分析结果失败: {e}")
+            return None
+
+        self.last_output = capture.output_path
+        logger.info(f"性能分析已结束（{capture.calls} 次工具调用）: {capture.output_path}")
+        return capture.output_path
+
+    def control(
+        self,
+        action: str,
+        output_dir: Path,
+        mode: str = "cprofile",
+        calls: int | None = None,
+        seconds: float | None = None,
+    ) -> dict[str, Any]:
+        """
+        执行分析控制动作（MCP 工具和 SSE 管理路由共用）
+
+        Args:
+            action: 动作（start/stop/status）
+            output_dir: 结果文件目录（start 时使用）
+            mode: 分析模式（start 时使用）
+            calls: 在接下来的 N 次工具调用完成后停止（start 时使用）
+            seconds: 在 T 秒后停止（start 时使用）
+
+        Returns:
+            动作执行后的状态字典（stop 时 stopped_output 为本次结果文件）
+
+        Raises:
+            ValueError: 动作或参数无效
+        """
+        if action == "start":
+            self.start(output_dir, mode=mode, calls=calls, seconds=seconds)
+            return self.status()
+        if action == "stop":
+            output = self.stop()
+            return {**self.status(), "stopped_output": str(output) if output else None}
+        if action == "status":
+            return self.status()
+        raise ValueError(f"无效的分析动作: {action}（支持: start, stop, status）")
+
+    def status(self) -> dict[str, Any]:
+        """
+        获取分析状态（超过截止时间的分析先停止）
+
+        Returns:
+            状态字典
+        """
+        capture = self._capture
+        if (
+            capture is not None
+            and capture.deadline is not None
+            and time.monotonic() >= capture.deadline
+        ):
+            self.stop()
+            capture = self._capture
+
+        if capture is None:
+            return {
+                "active": False,
+                "last_output": str(self.last_output) if self.last_output else None,
+            }
+        return {
+            "active": True,
+            "mode": capture.mode,
+            "output": str(capture.output_path),
+            "calls": capture.calls,
+            "calls_limit": capture.calls_limit,
+            "seconds": capture.seconds,
+            "elapsed": round(time.perf_counter() - capture.started, 3),
+            "last_output": str(self.last_output) if self.last_output else None,
+        }
+
+
+# 全局性能分析控制器
+profiler = Profiler()
+
+
+__all__ = [
+    "DEFAULT_SAMPLE_INTERVAL",
+    "PROFILES_DIR_NAME",
+    "PROFILE_MODES",
+    "Profiler",
+    "profiler",
+]
@@ -0,0 +1,427 @@
+"""
+渲染缓存模块
+
+缓存会话的渲染结果（可视化、导出内容、会话详情），避免会话未变化时重复渲染。
+关键特性:
+- 缓存键：(会话ID, 修订标记, 渲染类型)，修订标记为会话文件内容的摘要
+- 两级缓存：内存 LRU + 磁盘目录，磁盘层在重启后仍可命中
+- 磁盘层有容量上限：超出时按最近使用时间淘汰，启动后在后台清理过期文件
+- 失效：会话更新或删除时由存储管理器通知，清除该会话的全部缓存
+"""
+
+import contextlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any, Protocol
+
+from deep_thinking.utils.executor import TaskExecutor, run_io
+from deep_thinking.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# 默认内存缓存条目数
+DEFAULT_MAX_ENTRIES = 256
+
+# 默认磁盘层容量（字节）
+DEFAULT_MAX_DISK_BYTES = 256 * 1024 * 1024
+
+# 默认磁盘层文件保留时间（秒，按最近使用时间）
+DEFAULT_MAX_DISK_AGE = 7 * 24 * 3600.0
+
+# 磁盘层超出容量时淘汰到容量的该比例，避免之后每次写入都扫描目录
+_DISK_LOW_WATER = 0.8
+
+
+class _RevisionSource(Protocol):
+    """提供会话修订标记的对象（StorageManager）"""
+
+    def get_session_revision(self, session_id: str) -> str | None: ...
+
+
+class RenderCache:
+    """
+    渲染结果缓存
+
+    内存层按 (会话ID, 渲染类型) 存储最新修订的结果，LRU 淘汰；
+    磁盘层每个会话一个目录，每种渲染类型一个文件，首行记录修订标记；
+    命中时更新文件修改时间，超出容量时从最久未使用的文件开始删除。
+    磁盘层总大小在首次扫描（prune_disk 或首次写入）前未知。
+
+    Attributes:
+        cache_dir: 磁盘缓存目录（None 表示仅使用内存）
+        max_entries: 内存缓存最大条目数
+        max_disk_bytes: 磁盘层容量（字节，0 表示不限制）
+        max_disk_age: 磁盘层文件保留时间（秒，0 表示不限制）
+    """
+
+    def __init__(
+        self,
+        cache_dir: str | Path | None = None,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES,
+        max_disk_age: float = DEFAULT_MAX_DISK_AGE,
+    ):
+        """
+        初始化渲染缓存
+
+        Args:
+            cache_dir: 磁盘缓存目录（None 表示仅使用内存）
+            max_entries: 内存缓存最大条目数
+            max_disk_bytes: 磁盘层容量（字节，0 表示不限制）
+            max_disk_age: 磁盘层文件超过该秒数未使用时在扫描时删除（0 表示不限制）
+        """
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.max_entries = max(max_entries, 1)
+        self.max_disk_bytes = max(max_disk_bytes, 0)
+        self.max_disk_age = max(max_disk_age, 0.0)
+
+        self._memory: OrderedDict[tuple[str, str], tuple[str, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._prune_lock = threading.Lock()
+
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        # 磁盘层总大小，扫描前为None（启动时不遍历目录）
+        self._disk_bytes: int | None = None
+        self._disk_evictions = 0
+
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _disk_path(self, session_id: str, kind: str) -> Path | None:
+        """获取磁盘缓存文件路径"""
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / session_id / f"{kind}.cache"
+
+    def get(self, session_id: str, revision: str, kind: str) -> str | None:
+        """
+        查找缓存
+
+        Args:
+            session_id: 会话ID
+            revision: 会话修订标记
+            kind: 渲染类型（如 visualize.mermaid）
+
+        Returns:
+            缓存的渲染结果，未命中时返回None
+        """
+        key = (session_id, kind)
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] == revision:
+                self._memory.move_to_end(key)
+                self._hits += 1
+                if metrics.enabled:
+                    metrics.count_cache("render", "hit")
+                return entry[1]
+
+        content = self._read_disk(session_id, revision, kind)
+
+        with self._lock:
+            if content is None:
+                self._misses += 1
+            else:
+                self._disk_hits += 1
+                self._store_memory(key, revision, content)
+
+        if metrics.enabled:
+            metrics.count_cache("render", "miss" if content is None else "disk_hit")
+
+        return content
+
+    def put(self, session_id: str, revision: str, kind: str, content: str) -> None:
+        """
+        写入缓存
+
+        Args:
+            session_id: 会话ID
+            revision: 会话修订标记
+            kind: 渲染类型
+            content: 渲染结果
+        """
+        with self._lock:
+            self._store_memory((session_id, kind), revision, content)
+
+        self._write_disk(session_id, revision, kind, content)
+
+    def invalidate(self, session_id: str) -> None:
+        """
+        清除会话的全部缓存
+
+        Args:
+            session_id: 会话ID
+        """
+        with self._lock:
+            for key in [key for key in self._memory if key[0] == session_id]:
+                del self._memory[key]
+
+        if self.cache_dir is not None:
+            session_dir = self.cache_dir / session_id
+            freed = 0
+            for path in session_dir.glob("*.cache"):
+                with contextlib.suppress(OSError):
+                    freed += path.stat().st_size
+            shutil.rmtree(session_dir, ignore_errors=True)
+            with self._lock:
+                if self._disk_bytes is not None:
+                    self._disk_bytes = max(self._disk_bytes - freed, 0)
+
+        logger.debug(f"渲染缓存已失效: {session_id}")
+
+    def clear(self) -> None:
+        """清空全部缓存"""
+        with self._lock:
+            self._memory.clear()
+            self._disk_bytes = 0
+
+        if self.cache_dir is not None:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def prune_disk(self) -> None:
+        """
+        扫描磁盘层，删除过期和超出容量的文件并统计总大小
+
+        遍历整个缓存目录，服务器启动后在I/O线程池中执行。
+        """
+        if self.cache_dir is None:
+            return
+        with self._prune_lock:
+            self._prune_disk(self.max_disk_bytes or None)
+
+    def get_stats(self) -> dict[str, Any]:
+        """
+        获取缓存统计信息
+
+        Returns:
+            统计信息字典（disk_bytes 在磁盘层扫描前为None）
+        """
+        with self._lock:
+            return {
+                "entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "disk_bytes": self._disk_bytes,
+                "max_disk_bytes": self.max_disk_bytes,
+                "disk_evictions": self._disk_evictions,
+            }
+
+    def _store_memory(self, key: tuple[str, str], revision: str, content: str) -> None:
+        """写入内存层（调用方需持有锁）"""
+        self._memory[key] = (revision, content)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, session_id: str, revision: str, kind: str) -> str | None:
+        """读取磁盘层（修订标记不一致视为未命中）"""
+        path = self._disk_path(session_id, kind)
+        if path is None:
+            return None
+
+        try:
+            data = path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logger.warning(f"读取渲染缓存失败: {e}")
+            return None
+
+        stored_revision, _, content = data.partition("\n")
+        if stored_revision != revision:
+            return None
+
+        # 记录最近使用时间，容量淘汰时保留常用的结果
+        with contextlib.suppress(OSError):
+            os.utime(path)
+        return content
+
+    def _write_disk(self, session_id: str, revision: str, kind: str, content: str) -> None:
+        """原子写入磁盘层（失败只记录警告）"""
+        path = self._disk_path(session_id, kind)
+        if path is None:
+            return
+
+        temp_path: str | None = None
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp_")
+            with os.fdopen(temp_fd, "w", encoding="utf-8") as f:
+                f.write(f"{revision}\n{content}")
+                f.flush()
+                size = os.fstat(f.fileno()).st_size
+            with contextlib.suppress(FileNotFoundError):
+                size -= path.stat().st_size
+            os.replace(temp_path, path)
+        except OSError as e:
+            logger.warning(f"写入渲染缓存失败: {e}")
+            if temp_path is not None:
+                with contextlib.suppress(OSError):
+                    os.unlink(temp_path)
+            return
+
+        with self._lock:
+            unknown = self._disk_bytes is None
+            over = False
+            if self._disk_bytes is not None:
+                self._disk_bytes += size
+                over = 0 < self.max_disk_bytes < self._disk_bytes
+        # 总大小未知时（后台扫描尚未完成）在首次写入时扫描
+        if (unknown or over) and self._prune_lock.acquire(blocking=False):
+            try:
+                if unknown:
+                    self._prune_disk(self.max_disk_bytes or None)
+                else:
+                    self._prune_disk(int(self.max_disk_bytes * _DISK_LOW_WATER))
+            finally:
+                self._prune_lock.release()
+
+    def _prune_disk(self, limit: int | None) -> None:
+        """
+        扫描磁盘层，删除过期文件并重新统计总大小
+
+        Args:
+            limit: 总大小上限（None 表示只删除过期文件），超出时按修改时间从旧到新删除
+        """
+        assert self.cache_dir is not None
+        cutoff = time.time() - self.max_disk_age if self.max_disk_age else None
+        entries: list[tuple[float, int, Path]] = []
+        expired: list[Path] = []
+        total = 0
+        for path in self.cache_dir.glob("*/*.cache"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if cutoff is not None and stat.st_mtime < cutoff:
+                expired.append(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        if limit is not None and total > limit:
+            entries.sort()
+            for _, size, path in entries:
+                if total <= limit:
+                    break
+                expired.append(path)
+                total -= size
+
+        removed = 0
+        for path in expired:
+            try:
+                path.unlink()
+                removed += 1
+            except OSError:
+                continue
+            # 会话目录为空时一并删除
+            with contextlib.suppress(OSError):
+                path.parent.rmdir()
+
+        with self._lock:
+            self._disk_bytes = total
+            self._disk_evictions += removed
+        if removed:
+            logger.debug(f"渲染缓存磁盘层淘汰 {removed} 个文件，剩余 {total} 字节")
+
+
+def render_with_cache(
+    cache: RenderCache | None,
+    manager: _RevisionSource,
+    session_id: str,
+    kind: str,
+    render: Callable[[], str],
+) -> str:
+    """
+    优先从缓存获取渲染结果，未命中时渲染并写入缓存
+
+    修订标记在渲染前读取：渲染期间会话被更新时，结果会记在旧修订下，
+    下一次请求按新修订查找自然未命中，不会返回过期内容。
+
+    Args:
+        cache: 渲染缓存（None 表示禁用缓存）
+        manager: 存储管理器
+        session_id: 会话ID
+        kind: 渲染类型
+        render: 渲染函数
+
+    Returns:
+        渲染结果
+    """
+    if cache is None:
+        return render()
+
+    revision = manager.get_session_revision(session_id)
+    if revision is None:
+        # 会话不存在，由渲染函数给出错误
+        return render()
+
+    cached = cache.get(session_id, revision, kind)
+    if cached is not None:
+        return cached
+
+    content = render()
+    cache.put(session_id, revision, kind, content)
+    return content
+
+
+async def render_with_cache_async(
+    cache: RenderCache | None,
+    manager: _RevisionSource,
+    session_id: str,
+    kind: str,
+    render: Callable[[], Awaitable[str]],
+    executor: TaskExecutor | None = None,
+) -> str:
+    """
+    render_with_cache 的异步版本（渲染函数为协程，例如在进程池中渲染）
+
+    读取修订标记和读写缓存在I/O线程池中执行，不阻塞事件循环。
+
+    Args:
+        cache: 渲染缓存（None 表示禁用缓存）
+        manager: 存储管理器
+        session_id: 会话ID
+        kind: 渲染类型
+        render: 返回渲染结果的协程函数
+        executor: 任务执行器（None 表示直接调用）
+
+    Returns:
+        渲染结果
+    """
+    if cache is None:
+        return await render()
+
+    revision = await run_io(executor, manager.get_session_revision, session_id)
+    if revision is None:
+        return await render()
+
+    cached = await run_io(executor, cache.get, session_id, revision, kind)
+    if cached is not None:
+        return cached
+
+    content = await render()
+    await run_io(executor, cache.put, session_id, revision, kind, content)
+    return content
+
+
+__all__ = [
+    "DEFAULT_MAX_DISK_AGE",
+    "DEFAULT_MAX_DISK_BYTES",
+    "DEFAULT_MAX_ENTRIES",
+    "RenderCache",
+    "render_with_cache",
+    "render_with_cache_async",
+]
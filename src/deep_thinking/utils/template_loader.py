@@ -13,6 +13,71 @@ from typing import Any
 logger = logging.getLogger(__name__)
 
 
+def validate_template(template_data: dict[str, Any]) -> None:
+    """
+    验证模板格式
+
+    Args:
+        template_data: 模板数据
+
+    Raises:
+        ValueError: 模板格式无效
+    """
+    required_fields = ["template_id", "name", "description", "structure"]
+
+    for field in required_fields:
+        if field not in template_data:
+            raise ValueError(f"模板缺少必需字段: {field}")
+
+    # 验证 structure 格式
+    structure = template_data.get("structure", {})
+    if not isinstance(structure, dict):
+        raise ValueError("template.structure 必须是字典类型")
+
+    steps = structure.get("steps", [])
+    if not isinstance(steps, list):
+        raise ValueError("template.structure.steps 必须是列表类型")
+
+    # 验证每个步骤
+    for i, step in enumerate(steps):
+        if not isinstance(step, dict):
+            raise ValueError(f"步骤 {i} 必须是字典类型")
+
+        if "step_number" not in step:
+            raise ValueError(f"步骤 {i} 缺少 step_number 字段")
+
+        if "prompt" not in step:
+            raise ValueError(f"步骤 {i} 缺少 prompt 字段")
+
+        if "type" not in step:
+            raise ValueError(f"步骤 {i} 缺少 type 字段")
+
+        # 验证 type 值
+        valid_types = ["regular", "revision", "branch"]
+        if step["type"] not in valid_types:
+            raise ValueError(f"步骤 {i} 的 type 必须是: {', '.join(valid_types)}")
+
+
+def template_summary(template: dict[str, Any], template_id: str) -> dict[str, Any]:
+    """
+    提取模板的基本信息
+
+    Args:
+        template: 模板数据
+        template_id: 模板ID（模板数据未指定时使用）
+
+    Returns:
+        模板信息字典（包含 name, description, metadata 等）
+    """
+    return {
+        "template_id": template.get("template_id", template_id),
+        "name": template.get("name", ""),
+        "description": template.get("description", ""),
+        "category": template.get("category", ""),
+        "metadata": template.get("metadata", {}),
+    }
+
+
 class TemplateLoader:
     """
     模板加载器
@@ -102,15 +167,7 @@ class TemplateLoader:
         Raises:
             FileNotFoundError: 模板不存在
         """
-        template = self.load_template(template_id)
-
-        return {
-            "template_id": template.get("template_id", template_id),
-            "name": template.get("name", ""),
-            "description": template.get("description", ""),
-            "category": template.get("category", ""),
-            "metadata": template.get("metadata", {}),
-        }
+        return template_summary(self.load_template(template_id), template_id)
 
     def list_templates(self) -> list[dict[str, Any]]:
         """
@@ -153,41 +210,11 @@ class TemplateLoader:
         Raises:
             ValueError: 模板格式无效
         """
-        required_fields = ["template_id", "name", "description", "structure"]
-
-        for field in required_fields:
-            if field not in template_data:
-                raise ValueError(f"模板缺少必需字段: {field}")
-
-        # 验证 structure 格式
-        structure = template_data.get("structure", {})
-        if not isinstance(structure, dict):
-            raise ValueError("template.structure 必须是字典类型")
-
-        steps = structure.get("steps", [])
-        if not isinstance(steps, list):
-            raise ValueError("template.structure.steps 必须是列表类型")
-
-        # 验证每个步骤
-        for i, step in enumerate(steps):
-            if not isinstance(step, dict):
-                raise ValueError(f"步骤 {i} 必须是字典类型")
-
-            if "step_number" not in step:
-                raise ValueError(f"步骤 {i} 缺少 step_number 字段")
-
-            if "prompt" not in step:
-                raise ValueError(f"步骤 {i} 缺少 prompt 字段")
-
-            if "type" not in step:
-                raise ValueError(f"步骤 {i} 缺少 type 字段")
-
-            # 验证 type 值
-            valid_types = ["regular", "revision", "branch"]
-            if step["type"] not in valid_types:
-                raise ValueError(f"步骤 {i} 的 type 必须是: {', '.join(valid_types)}")
+        validate_template(template_data)
 
 
 __all__ = [
     "TemplateLoader",
+    "template_summary",
+    "validate_template",
 ]
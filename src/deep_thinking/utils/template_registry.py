@@ -0,0 +1,276 @@
+"""
+模板注册表
+
+进程内共享的模板缓存：模板文件只解析和验证一次，模板数据和摘要都保存在内存中。
+关键特性:
+- 支持多个模板目录：包内 templates 目录在前，用户模板目录在后，同名模板以后者为准
+- 模板步骤在加载时编译为已验证的思考步骤原型，应用模板时只需复制
+- 按文件修改时间和大小检测变化，只重新解析变化的文件；两次检查之间至少间隔 check_interval 秒
+- 格式无效的模板记录错误并跳过，不影响其他模板
+- reload() 丢弃缓存并重新加载全部模板
+"""
+
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from deep_thinking.models.thought import Thought
+from deep_thinking.utils.template_loader import template_summary, validate_template
+
+logger = logging.getLogger(__name__)
+
+# 默认变化检查间隔（秒）
+DEFAULT_CHECK_INTERVAL = 2.0
+
+
+def builtin_templates_dir() -> Path:
+    """包内 templates 目录"""
+    import deep_thinking.templates as templates_module
+
+    return Path(templates_module.__file__).parent
+
+
+def compile_thoughts(template: dict[str, Any]) -> tuple[Thought, ...]:
+    """
+    把模板步骤编译为思考步骤原型
+
+    Args:
+        template: 已通过格式验证的模板数据
+
+    Returns:
+        思考步骤原型（按模板步骤顺序）
+
+    Raises:
+        ValueError: 步骤不能构成有效的思考步骤
+    """
+    return tuple(
+        Thought(
+            thought_number=step["step_number"],
+            content=step["prompt"],
+            type=step.get("type", "regular"),
+            is_revision=step.get("type") == "revision",
+            revises_thought=step.get("revises_thought"),
+            branch_from_thought=step.get("branch_from_thought"),
+            branch_id=step.get("branch_id"),
+        )
+        for step in template.get("structure", {}).get("steps", [])
+    )
+
+
+class _TemplateEntry:
+    """一个模板文件的缓存条目"""
+
+    __slots__ = ("path", "signature", "template", "summary", "thoughts", "error")
+
+    def __init__(
+        self,
+        path: Path,
+        signature: tuple[int, int],
+        template: dict[str, Any] | None = None,
+        thoughts: tuple[Thought, ...] = (),
+        error: str | None = None,
+    ):
+        self.path = path
+        self.signature = signature
+        self.template = template
+        self.summary = None if template is None else template_summary(template, path.stem)
+        self.thoughts = thoughts
+        self.error = error
+
+
+class TemplateRegistry:
+    """
+    模板注册表
+
+    模板ID为文件名（不含 .json 扩展名）。返回的模板数据和摘要是缓存对象本身，调用方不应修改。
+
+    Attributes:
+        template_dirs: 模板目录列表（按优先级从低到高）
+        check_interval: 变化检查间隔（秒），0 表示每次访问都检查
+    """
+
+    def __init__(
+        self,
+        template_dirs: list[Path] | None = None,
+        check_interval: float = DEFAULT_CHECK_INTERVAL,
+    ):
+        """
+        初始化模板注册表
+
+        Args:
+            template_dirs: 模板目录列表，默认只包含包内 templates 目录
+            check_interval: 变化检查间隔（秒），0 表示每次访问都检查
+        """
+        self.template_dirs = [Path(d) for d in template_dirs or [builtin_templates_dir()]]
+        self.check_interval = check_interval
+
+        self._entries: dict[str, _TemplateEntry] = {}
+        self._summaries: list[dict[str, Any]] = []
+        self._checked_at: float | None = None
+        self._lock = threading.Lock()
+
+    def _scan(self) -> dict[str, tuple[Path, tuple[int, int]]]:
+        """列出全部模板文件及其（修改时间, 大小），后面的目录覆盖前面的同名模板"""
+        found: dict[str, tuple[Path, tuple[int, int]]] = {}
+        for directory in self.template_dirs:
+            if not directory.is_dir():
+                continue
+            for path in sorted(directory.glob("*.json")):
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                found[path.stem] = (path, (stat.st_mtime_ns, stat.st_size))
+        return found
+
+    @staticmethod
+    def _load(template_id: str, path: Path, signature: tuple[int, int]) -> _TemplateEntry:
+        """解析并验证一个模板文件"""
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                template: dict[str, Any] = json.load(f)
+        except json.JSONDecodeError as e:
+            error = f"模板文件格式错误 ({path}): {e}"
+        except OSError as e:
+            error = f"读取模板文件失败 ({path}): {e}"
+        else:
+            try:
+                validate_template(template)
+                thoughts = compile_thoughts(template)
+            except ValueError as e:
+                error = str(e)
+            else:
+                return _TemplateEntry(path, signature, template, thoughts)
+
+        logger.error(f"加载模板失败 ({template_id}): {error}")
+        return _TemplateEntry(path, signature, error=error)
+
+    def _refresh(self, force: bool = False) -> None:
+        """检查模板文件变化，重新解析新增和修改的文件"""
+        now = time.monotonic()
+        with self._lock:
+            if (
+                not force
+                and self._checked_at is not None
+                and now - self._checked_at < self.check_interval
+            ):
+                return
+            self._checked_at = now
+
+            found = self._scan()
+            entries: dict[str, _TemplateEntry] = {}
+            changed = force or found.keys() != self._entries.keys()
+            for template_id, (path, signature) in found.items():
+                entry = self._entries.get(template_id)
+                if force or entry is None or entry.path != path or entry.signature != signature:
+                    entry = self._load(template_id, path, signature)
+                    changed = True
+                entries[template_id] = entry
+
+            if changed:
+                self._entries = entries
+                self._summaries = [
+                    entry.summary
+                    for _, entry in sorted(entries.items())
+                    if entry.summary is not None
+                ]
+                logger.debug(f"模板注册表已更新: {len(self._summaries)} 个模板")
+
+    def reload(self) -> int:
+        """
+        丢弃缓存并重新加载全部模板
+
+        Returns:
+            加载成功的模板数
+        """
+        self._refresh(force=True)
+        return len(self._summaries)
+
+    def _lookup(self, template_id: str) -> tuple[dict[str, Any], tuple[Thought, ...]]:
+        """获取格式有效的模板数据和思考步骤原型"""
+        self._refresh()
+        entry = self._entries.get(template_id)
+        if entry is None:
+            available = ", ".join(self.list_template_ids())
+            raise FileNotFoundError(f"模板不存在: {template_id}。可用模板: {available}")
+        if entry.template is None:
+            raise ValueError(entry.error)
+        return entry.template, entry.thoughts
+
+    def get_template(self, template_id: str) -> dict[str, Any]:
+        """
+        获取模板数据
+
+        Args:
+            template_id: 模板ID
+
+        Returns:
+            模板数据字典
+
+        Raises:
+            FileNotFoundError: 模板不存在
+            ValueError: 模板格式无效
+        """
+        return self._lookup(template_id)[0]
+
+    def get_thoughts(self, template_id: str) -> tuple[Thought, ...]:
+        """
+        获取模板的思考步骤原型
+
+        原型已通过验证，应用模板时复制后使用，不应直接修改。
+
+        Args:
+            template_id: 模板ID
+
+        Returns:
+            思考步骤原型
+
+        Raises:
+            FileNotFoundError: 模板不存在
+            ValueError: 模板格式无效
+        """
+        return self._lookup(template_id)[1]
+
+    def list_template_ids(self) -> list[str]:
+        """
+        列出所有可用的模板ID（不含格式无效的模板）
+
+        Returns:
+            模板ID列表（已排序）
+        """
+        self._refresh()
+        return [
+            template_id
+            for template_id, entry in sorted(self._entries.items())
+            if entry.template is not None
+        ]
+
+    def list_templates(self) -> list[dict[str, Any]]:
+        """
+        列出所有模板的基本信息
+
+        Returns:
+            模板信息列表（按模板ID排序）
+        """
+        self._refresh()
+        return list(self._summaries)
+
+    @property
+    def errors(self) -> dict[str, str]:
+        """格式无效的模板及错误信息"""
+        return {
+            template_id: entry.error
+            for template_id, entry in self._entries.items()
+            if entry.error is not None
+        }
+
+
+__all__ = [
+    "DEFAULT_CHECK_INTERVAL",
+    "TemplateRegistry",
+    "builtin_templates_dir",
+    "compile_thoughts",
+]
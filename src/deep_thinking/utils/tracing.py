@@ -0,0 +1,347 @@
+"""
+请求追踪模块
+
+轻量的追踪 span，用于查看一次工具调用的耗时分布在验证、索引更新、备份、fsync 还是渲染上。
+关键特性:
+- 每次 MCP 工具调用是一条追踪（trace_id 即请求ID），存储、文件读写和渲染记录为子 span
+- 字段与 OpenTelemetry span 对应（trace_id/span_id/parent_span_id/纳秒时间戳/attributes/status），不依赖 OpenTelemetry
+- 按采样率决定是否追踪一次调用；未采样或不在追踪中时 span 只做一次上下文变量读取
+- 追踪结束时整条追踪以 JSONL 追加写入文件（每行一个 span）
+- fold_spans 把 span 转换为折叠栈格式，可直接交给 flamegraph.pl、speedscope 等工具生成火焰图
+
+上下文通过 contextvars 传递：TaskExecutor 的 I/O 线程池复制调用方上下文，
+渲染进程池中的 span 不会记录，只记录父进程中等待渲染的 span。
+"""
+
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from pathlib import Path
+from typing import Any, TypeVar, cast
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+class Span:
+    """
+    追踪 span
+
+    Attributes:
+        name: 名称
+        trace_id: 追踪ID（32位十六进制）
+        span_id: span ID（16位十六进制）
+        parent_span_id: 父 span ID（根 span 为空字符串）
+        attributes: 属性
+        status: 状态（OK/ERROR）
+    """
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_span_id",
+        "attributes",
+        "status",
+        "start_time_unix_nano",
+        "end_time_unix_nano",
+        "_started",
+        "_spans",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_span_id: str,
+        attributes: dict[str, Any],
+        spans: list["Span"],
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_span_id = parent_span_id
+        self.attributes = attributes
+        self.status = "OK"
+        self.start_time_unix_nano = time.time_ns()
+        self.end_time_unix_nano = 0
+        self._started = time.perf_counter_ns()
+        # 同一追踪内已结束的 span（所有 span 共享一个列表）
+        self._spans = spans
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """设置属性"""
+        self.attributes[key] = value
+
+    def _finish(self, error: BaseException | None) -> None:
+        self.end_time_unix_nano = self.start_time_unix_nano + time.perf_counter_ns() - self._started
+        if error is not None:
+            self.status = "ERROR"
+            self.attributes["error.type"] = type(error).__name__
+        self._spans.append(self)
+
+    def to_dict(self) -> dict[str, Any]:
+        """转换为字典（JSONL 中的一行）"""
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_time_unix_nano,
+            "end_time_unix_nano": self.end_time_unix_nano,
+            "duration_ms": round((self.end_time_unix_nano - self.start_time_unix_nano) / 1e6, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+# 当前 span（不在追踪中时为None）
+_current_span: contextvars.ContextVar[Span | None] = contextvars.ContextVar(
+    "deepthinking_current_span", default=None
+)
+
+
+class Tracer:
+    """
+    追踪器
+
+    Attributes:
+        path: JSONL 输出文件（None 表示禁用）
+        sample_rate: 采样率（0-1）
+    """
+
+    def __init__(self, path: str | Path | None = None, sample_rate: float = 1.0):
+        """
+        初始化追踪器
+
+        Args:
+            path: JSONL 输出文件（None 表示禁用）
+            sample_rate: 采样率（0-1）
+        """
+        self.path: Path | None = None
+        self.sample_rate = 1.0
+        self._lock = threading.Lock()
+        self.configure(path, sample_rate)
+
+    def configure(self, path: str | Path | None, sample_rate: float = 1.0) -> None:
+        """
+        设置输出文件和采样率
+
+        Args:
+            path: JSONL 输出文件（None 或空字符串表示禁用）
+            sample_rate: 采样率（0-1）
+
+        Raises:
+            ValueError: 采样率超出范围
+        """
+        if not 0 <= sample_rate <= 1:
+            raise ValueError(f"追踪采样率必须在 0 到 1 之间: {sample_rate}")
+        self.path = Path(path).expanduser() if path else None
+        self.sample_rate = sample_rate
+
+    @property
+    def enabled(self) -> bool:
+        """是否启用追踪"""
+        return self.path is not None and self.sample_rate > 0
+
+    @contextlib.contextmanager
+    def trace(self, name: str, **attributes: Any) -> Iterator[Span | None]:
+        """
+        开始一条追踪（根 span）
+
+        未启用、未被采样或已在追踪中时不创建新追踪。
+
+        Args:
+            name: 根 span 名称
+            **attributes: 根 span 属性
+
+        Yields:
+            根 span，未追踪时为None
+        """
+        if (
+            not self.enabled
+            or _current_span.get() is not None
+            or random.random() >= self.sample_rate
+        ):
+            yield None
+            return
+
+        spans: list[Span] = []
+        root = Span(name, f"{random.getrandbits(128):032x}", "", attributes, spans)
+        root.attributes["process.pid"] = os.getpid()
+        token = _current_span.set(root)
+        error: BaseException | None = None
+        try:
+            yield root
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            _current_span.reset(token)
+            root._finish(error)
+            self.export(spans)
+
+    def export(self, spans: list[Span]) -> None:
+        """
+        把一条追踪的 span 追加写入 JSONL 文件（写入失败只记录警告）
+
+        Args:
+            spans: 已结束的 span 列表
+        """
+        if self.path is None or not spans:
+            return
+        payload = "".join(
+            json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n" for span in spans
+        )
+        try:
+            with self._lock:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(payload)
+        except OSError as e:
+            logger.warning(f"写入追踪文件失败: {e}")
+
+
+def _env_sample_rate() -> float:
+    """读取环境变量 DEEP_THINKING_TRACE_SAMPLE_RATE（无效时使用 1.0）"""
+    value = os.getenv("DEEP_THINKING_TRACE_SAMPLE_RATE", "1")
+    try:
+        rate = float(value)
+    except ValueError:
+        rate = -1.0
+    if not 0 <= rate <= 1:
+        logger.warning(f"无效的追踪采样率: {value}，使用 1.0")
+        return 1.0
+    return rate
+
+
+# 全局追踪器（DEEP_THINKING_TRACE_FILE 设置输出文件，未设置时禁用）
+tracer = Tracer(os.getenv("DEEP_THINKING_TRACE_FILE") or None, _env_sample_rate())
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span | None]:
+    """
+    在当前追踪中记录一个子 span
+
+    不在追踪中时直接执行，不记录。
+
+    Args:
+        name: span 名称
+        **attributes: span 属性
+
+    Yields:
+        子 span，不在追踪中时为None
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = Span(name, parent.trace_id, parent.span_id, attributes, parent._spans)
+    token = _current_span.set(child)
+    error: BaseException | None = None
+    try:
+        yield child
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current_span.reset(token)
+        child._finish(error)
+
+
+def traced(name: str) -> Callable[[F], F]:
+    """
+    把函数调用记录为子 span 的装饰器（不在追踪中时直接调用）
+
+    Args:
+        name: span 名称
+    """
+
+    def decorator(func: F) -> F:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+
+        return cast(F, wrapper)
+
+    return decorator
+
+
+def fold_spans(records: Iterable[dict[str, Any]]) -> list[str]:
+    """
+    把 span 记录转换为折叠栈格式（"根;子;孙 自身耗时微秒"，每个调用栈一行）
+
+    自身耗时为 span 耗时减去直接子 span 的耗时；相同调用栈的耗时累加。
+
+    Args:
+        records: span 字典（JSONL 中的行）
+
+    Returns:
+        折叠栈行（按调用栈排序）
+    """
+    spans = {(r["trace_id"], r["span_id"]): r for r in records}
+    child_time: dict[tuple[str, str], int] = {}
+    for record in spans.values():
+        if record["parent_span_id"]:
+            key = (record["trace_id"], record["parent_span_id"])
+            duration = record["end_time_unix_nano"] - record["start_time_unix_nano"]
+            child_time[key] = child_time.get(key, 0) + duration
+
+    folded: dict[str, int] = {}
+    for key, record in spans.items():
+        names = [record["name"]]
+        parent = spans.get((record["trace_id"], record["parent_span_id"]))
+        while parent is not None:
+            names.append(parent["name"])
+            parent = spans.get((parent["trace_id"], parent["parent_span_id"]))
+        duration = record["end_time_unix_nano"] - record["start_time_unix_nano"]
+        self_us = max(duration - child_time.get(key, 0), 0) // 1000
+        stack = ";".join(reversed(names))
+        folded[stack] = folded.get(stack, 0) + self_us
+
+    return [f"{stack} {us}" for stack, us in sorted(folded.items())]
+
+
+def read_spans(path: str | Path) -> Iterator[dict[str, Any]]:
+    """
+    读取 JSONL 追踪文件（跳过无法解析的行）
+
+    Args:
+        path: 追踪文件路径
+
+    Yields:
+        span 字典
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"跳过无法解析的追踪记录: {line[:80]}")
+
+
+__all__ = [
+    "Span",
+    "Tracer",
+    "fold_spans",
+    "read_spans",
+    "span",
+    "traced",
+    "tracer",
+]
@@ -52,18 +52,26 @@ def pytest_configure(config):
 
 
 @pytest.fixture(autouse=True)
-def configure_logging_for_tests():
+def configure_logging_for_tests() -> Generator[None, None, None]:
     """
     自动配置测试日志
 
-    所有测试都会使用这个日志配置
+    所有测试都会使用这个日志配置。不使用日志队列：后台日志线程会持有
+    本测试捕获的 stderr，测试结束后 stderr 关闭，再写出时报 I/O 错误。
     """
     # 使用延迟导入的setup_logging
     setup_logging = _get_setup_logging()
     # 使用stderr输出日志，避免干扰测试输出
-    setup_logging("stdio")
+    setup_logging("stdio", queue_size=0)
     logging.getLogger().setLevel(logging.DEBUG)
 
+    yield
+
+    # 停止测试中自行启动的后台日志线程
+    from deep_thinking.utils.logger import shutdown_logging
+
+    shutdown_logging()
+
 
 # =============================================================================
 # 临时目录fixtures
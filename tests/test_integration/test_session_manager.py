@@ -450,6 +450,109 @@ class TestSessionManagerIntegration:
         with pytest.raises(ValueError, match="会话不存在"):
             session_manager.get_tool_call_history("nonexistent-session-id")
 
+    async def test_get_tool_call_history_cursor(self, storage_manager):
+        """测试工具调用历史的游标分页"""
+        import re
+
+        from deep_thinking.models.tool_call import ToolCallData, ToolCallRecord
+
+        session = storage_manager.create_session(name="游标测试会话")
+        for i in range(5):
+            session.tool_call_history.append(
+                ToolCallRecord(
+                    thought_number=1,
+                    call_data=ToolCallData(tool_name=f"tool_{i}", arguments={}),
+                    status="completed",
+                )
+            )
+        storage_manager.update_session(session)
+
+        first = session_manager.get_tool_call_history(session.session_id, limit=3)
+        cursor = re.search(r"\*\*下一页游标\*\*: `([^`]+)`", first).group(1)
+        second = session_manager.get_tool_call_history(session.session_id, limit=3, cursor=cursor)
+
+        assert "tool_3" in second
+        assert "tool_4" in second
+        assert "tool_2" not in second
+        assert "下一页游标" not in second
+
+    # =========================================================================
+    # get_session 分页测试
+    # =========================================================================
+
+    @pytest.fixture
+    def paged_session(self, storage_manager):
+        """包含10个思考步骤的会话"""
+        from deep_thinking.models.thought import Thought
+
+        session = storage_manager.create_session(name="分页会话", session_id="paged-session")
+        for i in range(1, 11):
+            session.add_thought(Thought(thought_number=i, content=f"步骤内容{i:02d}" * 50))
+        storage_manager.update_session(session)
+        return session
+
+    async def test_get_session_walks_all_pages(self, paged_session):
+        """测试按游标遍历全部思考步骤"""
+        import re
+
+        seen = []
+        cursor = None
+        while True:
+            result = session_manager.get_session("paged-session", cursor=cursor, limit=4)
+            seen.extend(int(n) for n in re.findall(r"\*\*步骤 (\d+)\*\*", result))
+            match = re.search(r"\*\*下一页游标\*\*: `([^`]+)`", result)
+            if match is None:
+                break
+            cursor = match.group(1)
+
+        assert seen == list(range(1, 11))
+
+    async def test_get_session_thought_range_and_summary(self, paged_session):
+        """测试步骤范围与摘要模式"""
+        result = session_manager.get_session(
+            "paged-session", start_thought=3, end_thought=5, content_mode="summary"
+        )
+
+        assert "**步骤范围**: 3 - 5（匹配 3 个）" in result
+        assert "**步骤 3**" in result
+        assert "**步骤 6**" not in result
+        assert "（共 300 字）" in result
+        assert "步骤内容03" * 50 not in result
+
+    async def test_get_session_byte_budget(self, paged_session):
+        """测试响应字节预算"""
+        result = session_manager.get_session("paged-session", max_bytes=3000)
+
+        assert len(result.encode("utf-8")) <= 3000
+        assert "**步骤 1**" in result
+        assert "下一页游标" in result
+
+        # 预算小于单个步骤时截断内容
+        tiny = session_manager.get_session("paged-session", max_bytes=800)
+        assert "已截断" in tiny
+        assert len(tiny.encode("utf-8")) <= 800
+
+    async def test_get_session_timestamps(self, storage_manager, paged_session):
+        """测试创建和更新时间按 ISO 8601 输出"""
+        import json
+
+        result = session_manager.get_session("paged-session", limit=1)
+        assert f"**创建时间**: {paged_session.created_at.isoformat()}" in result
+
+        # 外部写入的 UTC 时间（Z 后缀）按会话模型的规则解析
+        path = storage_manager.store._get_file_path("paged-session")
+        data = json.loads(path.read_text(encoding="utf-8"))
+        data["updated_at"] = "2026-03-01T12:00:00Z"
+        path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+
+        result = session_manager.get_session("paged-session", limit=1)
+        assert "**更新时间**: 2026-03-01T12:00:00+00:00" in result
+
+    async def test_get_session_invalid_cursor(self, paged_session):
+        """测试无效游标"""
+        with pytest.raises(ValueError, match="无效的分页游标"):
+            session_manager.get_session("paged-session", cursor="???")
+
     async def test_get_session_statistics_basic(self, storage_manager):
         """测试获取基本会话统计信息"""
         result = session_manager.create_session(name="统计测试会话")
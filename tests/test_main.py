@@ -4,6 +4,8 @@ CLI入口点测试
 测试__main__.py模块的功能。
 """
 
+import subprocess
+import sys
 from unittest.mock import AsyncMock, patch
 
 import pytest
@@ -25,6 +27,14 @@ class TestParseArgs:
             assert args.auth_token is None
             assert args.api_key is None
             assert args.log_level == "INFO"
+            assert args.log_format == "text"
+            assert args.log_file == ""
+            assert args.log_queue_size == 10000
+            assert args.log_overflow == "drop"
+            assert args.workers == 1
+            assert args.sse_heartbeat_interval == 15.0
+            assert args.sse_idle_timeout == 1800.0
+            assert args.sse_max_connections == 1000
 
     def test_parse_args_with_transport(self):
         """测试传输模式参数"""
@@ -32,6 +42,12 @@ class TestParseArgs:
             args = parse_args()
             assert args.transport == "sse"
 
+    def test_parse_args_with_http_transport(self):
+        """测试HTTP传输模式参数"""
+        with patch("sys.argv", ["deep-thinking", "--transport", "http"]):
+            args = parse_args()
+            assert args.transport == "http"
+
     def test_parse_args_with_host(self):
         """测试主机参数"""
         with patch("sys.argv", ["deep-thinking", "--host", "0.0.0.0"]):
@@ -62,6 +78,26 @@ class TestParseArgs:
             args = parse_args()
             assert args.log_level == "DEBUG"
 
+    def test_parse_args_with_log_options(self):
+        """测试日志格式、文件和队列参数"""
+        argv = [
+            "deep-thinking",
+            "--log-format",
+            "json",
+            "--log-file",
+            "/tmp/dt.log",
+            "--log-queue-size",
+            "0",
+            "--log-overflow",
+            "block",
+        ]
+        with patch("sys.argv", argv):
+            args = parse_args()
+            assert args.log_format == "json"
+            assert args.log_file == "/tmp/dt.log"
+            assert args.log_queue_size == 0
+            assert args.log_overflow == "block"
+
     def test_parse_args_invalid_transport(self):
         """测试无效的传输模式"""
         with (
@@ -78,6 +114,40 @@ class TestParseArgs:
         ):
             parse_args()
 
+    def test_parse_args_export_subcommand(self):
+        """测试 export 子命令参数（导出工作进程数不覆盖服务器的 --workers）"""
+        argv = [
+            "deep-thinking",
+            "--workers",
+            "4",
+            "export",
+            "--format",
+            "html",
+            "--archive",
+            "zip",
+            "--ids",
+            "a,b",
+            "--workers",
+            "2",
+            "--no-resume",
+        ]
+        with patch("sys.argv", argv):
+            args = parse_args()
+
+            assert args.command == "export"
+            assert args.format_type == "html"
+            assert args.archive == "zip"
+            assert args.ids == "a,b"
+            assert args.export_workers == 2
+            assert args.workers == 4
+            assert args.no_resume is True
+
+    def test_parse_args_without_subcommand(self):
+        """测试未指定子命令时启动服务器"""
+        with patch("sys.argv", ["deep-thinking"]):
+            args = parse_args()
+            assert args.command is None
+
 
 class TestCreateServer:
     """create_server函数测试"""
@@ -135,6 +205,19 @@ class TestMainAsync:
             # 验证run_sse被调用
             mock_run_sse.assert_called_once()
 
+    @pytest.mark.asyncio
+    async def test_main_async_http_transport(self):
+        """测试HTTP传输模式"""
+        with (
+            patch("deep_thinking.__main__.run_http", new_callable=AsyncMock) as mock_run_http,
+            patch("sys.argv", ["deep-thinking", "--transport", "http", "--port", "9000"]),
+        ):
+            return_code = await main_async()
+
+            assert return_code == 0
+            mock_run_http.assert_called_once()
+            assert mock_run_http.call_args.kwargs["port"] == 9000
+
     @pytest.mark.asyncio
     async def test_main_async_keyboard_interrupt(self):
         """测试键盘中断"""
@@ -199,6 +282,132 @@ class TestMainAsync:
             assert call_args[1]["host"] == "0.0.0.0"
             assert call_args[1]["port"] == 9000
 
+    @pytest.mark.asyncio
+    async def test_main_async_workers_supervisor(self, monkeypatch):
+        """测试 --workers 大于1时作为监督进程运行"""
+        monkeypatch.delenv("DEEP_THINKING_WORKER_ID", raising=False)
+        argv = ["deep-thinking", "--transport", "http", "--workers", "4"]
+        with (
+            patch("deep_thinking.__main__.run_workers", new_callable=AsyncMock) as mock_workers,
+            patch("deep_thinking.__main__.run_http", new_callable=AsyncMock) as mock_run_http,
+            patch("deep_thinking.__main__.reuse_port_supported", return_value=True),
+            patch("sys.argv", argv),
+        ):
+            mock_workers.return_value = 0
+            return_code = await main_async()
+
+            assert return_code == 0
+            mock_workers.assert_called_once_with(4, argv[1:])
+            mock_run_http.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_main_async_worker_process_reuses_port(self, monkeypatch):
+        """测试工作进程直接运行服务器并启用端口复用"""
+        monkeypatch.setenv("DEEP_THINKING_WORKER_ID", "1")
+        with (
+            patch("deep_thinking.__main__.run_workers", new_callable=AsyncMock) as mock_workers,
+            patch("deep_thinking.__main__.run_sse", new_callable=AsyncMock) as mock_run_sse,
+            patch("sys.argv", ["deep-thinking", "--transport", "sse", "--workers", "4"]),
+        ):
+            assert await main_async() == 0
+
+            mock_workers.assert_not_called()
+            assert mock_run_sse.call_args.kwargs["reuse_port"] is True
+
+    @pytest.mark.asyncio
+    async def test_main_async_workers_ignored(self, monkeypatch):
+        """测试STDIO模式或不支持端口复用时以单进程运行"""
+        monkeypatch.delenv("DEEP_THINKING_WORKER_ID", raising=False)
+        with (
+            patch("deep_thinking.__main__.run_workers", new_callable=AsyncMock) as mock_workers,
+            patch("deep_thinking.__main__.run_stdio", new_callable=AsyncMock) as mock_run_stdio,
+            patch("deep_thinking.__main__.run_sse", new_callable=AsyncMock) as mock_run_sse,
+            patch("deep_thinking.__main__.reuse_port_supported", return_value=False),
+        ):
+            with patch("sys.argv", ["deep-thinking", "--workers", "2"]):
+                assert await main_async() == 0
+            with patch("sys.argv", ["deep-thinking", "--transport", "sse", "--workers", "2"]):
+                assert await main_async() == 0
+
+            mock_workers.assert_not_called()
+            mock_run_stdio.assert_called_once()
+            assert mock_run_sse.call_args.kwargs["reuse_port"] is False
+
+
+class TestExportCommand:
+    """export 子命令测试"""
+
+    @pytest.mark.asyncio
+    async def test_main_async_export(self, temp_dir, clean_env, capsys):
+        """测试 export 子命令不启动服务器并导出会话"""
+        from deep_thinking.storage.storage_manager import StorageManager
+
+        data_dir = temp_dir / "data"
+        manager = StorageManager(data_dir)
+        manager.create_session(name="导出会话", session_id="cli-export-1")
+        output = temp_dir / "out"
+
+        argv = [
+            "deep-thinking",
+            "--data-dir",
+            str(data_dir),
+            "export",
+            "--format",
+            "json",
+            "--output",
+            str(output),
+            "--workers",
+            "1",
+        ]
+        with (
+            patch("deep_thinking.__main__.run_stdio", new_callable=AsyncMock) as mock_run_stdio,
+            patch("sys.argv", argv),
+        ):
+            return_code = await main_async()
+
+        assert return_code == 0
+        mock_run_stdio.assert_not_called()
+        assert len(list(output.glob("*.json"))) == 1
+        assert "导出 1" in capsys.readouterr().out
+
+
+class TestMigrateCommand:
+    """migrate 子命令测试"""
+
+    @pytest.mark.asyncio
+    async def test_main_async_migrate(self, temp_dir, clean_env, capsys):
+        """测试 migrate 子命令迁移旧数据并写入存储版本标记"""
+        from deep_thinking.server import prepare_data_dir
+        from deep_thinking.storage.migration import is_store_ready
+
+        old_dir = temp_dir / "old"
+        (old_dir / "sessions").mkdir(parents=True)
+        (old_dir / "sessions" / "legacy.json").write_text("{}", encoding="utf-8")
+        data_dir = temp_dir / "data"
+
+        with (
+            patch("deep_thinking.storage.migration.OLD_DATA_DIR", old_dir),
+            patch("deep_thinking.__main__.run_stdio", new_callable=AsyncMock) as mock_run_stdio,
+        ):
+            # 服务器启动过：数据目录只有空索引，未写入标记
+            assert prepare_data_dir(data_dir) is False
+
+            argv = ["deep-thinking", "--data-dir", str(data_dir), "migrate", "--no-backup"]
+            with patch("sys.argv", argv):
+                assert await main_async() == 0
+
+            # 再次运行没有需要迁移的数据
+            with patch("sys.argv", argv):
+                assert await main_async() == 0
+
+        mock_run_stdio.assert_not_called()
+        assert (data_dir / "sessions" / "legacy.json").exists()
+        assert is_store_ready(data_dir)
+        captured = capsys.readouterr()
+        assert "数据迁移完成" in captured.out
+        assert "没有需要迁移的旧数据" in captured.out
+        assert "迁移进度: 1/1" in captured.err
+
 
 class TestServerLifespan:
     """server_lifespan函数测试"""
@@ -288,3 +497,91 @@ class TestEnvironmentVariables:
             assert args.transport == "sse"
             # CLI参数覆盖端口
             assert args.port == 8080
+
+
+class TestLazyImports:
+    """启动时延迟导入测试"""
+
+    def test_startup_skips_heavy_modules(self):
+        """测试导入入口模块时不加载aiohttp和渲染模块，工具已注册"""
+        script = (
+            "import sys\n"
+            "import deep_thinking.__main__\n"
+            "from deep_thinking.server import app\n"
+            "lazy = ('aiohttp', 'deep_thinking.utils.formatters',"
+            " 'deep_thinking.utils.incremental_visualizer', 'deep_thinking.transports.sse')\n"
+            "print(sorted(m for m in lazy if m in sys.modules))\n"
+            "print(len(app._tool_manager.list_tools()))\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script], capture_output=True, text=True, check=True
+        )
+        loaded, tool_count = result.stdout.splitlines()
+
+        assert loaded == "[]"
+        assert int(tool_count) > 10
+
+
+class TestTraceFoldCommand:
+    """trace-fold 子命令测试"""
+
+    @pytest.mark.asyncio
+    async def test_main_async_trace_fold(self, temp_dir, clean_env, capsys):
+        """测试把追踪文件转换为折叠栈"""
+        trace_file = temp_dir / "trace.jsonl"
+        trace_file.write_text(
+            '{"trace_id": "t", "span_id": "1", "parent_span_id": "", "name": "tool.a",'
+            ' "start_time_unix_nano": 0, "end_time_unix_nano": 3000000}\n',
+            encoding="utf-8",
+        )
+
+        with patch("sys.argv", ["deep-thinking", "trace-fold", str(trace_file)]):
+            assert await main_async() == 0
+        assert capsys.readouterr().out == "tool.a 3000\n"
+
+        with patch("sys.argv", ["deep-thinking", "trace-fold", str(temp_dir / "missing")]):
+            assert await main_async() == 1
+        assert "读取追踪文件失败" in capsys.readouterr().err
+
+
+class TestAnalyticsCommand:
+    """analytics 子命令测试"""
+
+    @pytest.mark.asyncio
+    async def test_main_async_analytics(self, temp_dir, clean_env, capsys):
+        """测试输出 Markdown 和 JSON 统计报告"""
+        import json
+
+        from deep_thinking.models.thought import Thought
+        from deep_thinking.storage.storage_manager import StorageManager
+
+        data_dir = temp_dir / "data"
+        manager = StorageManager(data_dir)
+        manager.create_session(
+            name="统计会话",
+            thoughts=[Thought(thought_number=i, content="内容") for i in range(1, 3)],
+        )
+        base = [
+            "deep-thinking",
+            "--data-dir",
+            str(data_dir),
+            "--min-thoughts",
+            "1",
+            "--max-thoughts",
+            "2",
+            "analytics",
+        ]
+
+        with patch("sys.argv", base):
+            assert await main_async() == 0
+        assert "思考步骤数达到上限 2 的会话: 1" in capsys.readouterr().out
+
+        with patch("sys.argv", [*base, "--json", "--status", "active"]):
+            assert await main_async() == 0
+        data = json.loads(capsys.readouterr().out)
+        assert data["filters"] == {"status": "active"}
+        assert (data["sessions"], data["thoughts"]) == (1, 2)
+
+        with patch("sys.argv", [*base, "--since", "昨天"]):
+            assert await main_async() == 1
+        assert "since 时间格式无效" in capsys.readouterr().err
@@ -219,6 +219,18 @@ class TestToolResultData:
         assert data["execution_time_ms"] == 100.0
         assert data["from_cache"] is True
         assert isinstance(data["timestamp"], str)
+        assert "result_blob" not in data
+
+    def test_tool_result_blob_reference(self):
+        """测试结果移出后的哈希引用"""
+        digest = "a" * 64
+        result = ToolResultData(call_id="call-123", result_blob=digest)
+
+        assert result.result is None
+        assert result.to_dict()["result_blob"] == digest
+
+        with pytest.raises(ValidationError):
+            ToolResultData(call_id="call-123", result_blob="not-a-hash")
 
 
 class TestToolCallRecord:
@@ -2,10 +2,13 @@
 测试 server.py 模块的功能
 """
 
+import asyncio
 import logging
 import os
 from unittest.mock import patch
 
+import pytest
+
 
 class TestGetServerInstructions:
     """测试 get_server_instructions 函数"""
@@ -216,3 +219,279 @@ class TestGetDefaultDataDir:
             # $HOME 应该被扩展
             assert "$HOME" not in str(result)
             assert "test_home" in str(result)
+
+
+class TestServerStartup:
+    """服务器启动时数据目录准备测试"""
+
+    async def test_cold_start_writes_marker(self, temp_dir, monkeypatch):
+        """测试冷启动准备数据目录并写入存储版本标记"""
+        from deep_thinking import server
+        from deep_thinking.storage.migration import is_store_ready
+
+        data_dir = temp_dir / "data"
+        monkeypatch.setenv("DEEP_THINKING_DATA_DIR", str(data_dir))
+
+        async with server.server_lifespan(server.app):
+            server.get_storage_manager().create_session(name="冷启动")
+
+        assert is_store_ready(data_dir)
+        assert (data_dir / ".gitignore").exists()
+        assert (data_dir / "sessions" / ".index.json").exists()
+
+    async def test_warm_start_skips_preparation(self, temp_dir, monkeypatch):
+        """测试热启动不再准备数据目录和检查迁移"""
+        from deep_thinking import server
+
+        data_dir = temp_dir / "data"
+        monkeypatch.setenv("DEEP_THINKING_DATA_DIR", str(data_dir))
+        server.prepare_data_dir(data_dir)
+
+        with (
+            patch("deep_thinking.server.prepare_data_dir") as mock_prepare,
+            patch("deep_thinking.server.should_migrate") as mock_should_migrate,
+        ):
+            async with server.server_lifespan(server.app):
+                session = server.get_storage_manager().create_session(name="热启动")
+
+        mock_prepare.assert_not_called()
+        mock_should_migrate.assert_not_called()
+        assert (data_dir / "sessions" / f"{session.session_id}.json").exists()
+
+    async def test_render_cache_pruned_in_background(self, temp_dir, monkeypatch):
+        """测试启动时渲染缓存磁盘层在I/O线程池中清理"""
+        import threading
+
+        from deep_thinking import server
+
+        monkeypatch.setenv("DEEP_THINKING_DATA_DIR", str(temp_dir / "data"))
+        loop_thread = threading.current_thread()
+        pruned = threading.Event()
+        threads = []
+
+        def fake_prune(cache):
+            threads.append(threading.current_thread())
+            pruned.set()
+
+        with patch("deep_thinking.server.RenderCache.prune_disk", fake_prune):
+            async with server.server_lifespan(server.app):
+                assert pruned.wait(5)
+
+        assert threads and threads[0] is not loop_thread
+
+    def test_pending_migration_not_run_at_startup(self, temp_dir, caplog):
+        """测试存在旧数据时启动不迁移、不写入标记，并提示运行 migrate"""
+        from deep_thinking import server
+        from deep_thinking.storage.migration import is_store_ready
+
+        old_dir = temp_dir / "old"
+        (old_dir / "sessions").mkdir(parents=True)
+        (old_dir / "sessions" / "legacy.json").write_text("{}", encoding="utf-8")
+        data_dir = temp_dir / "data"
+
+        with (
+            patch("deep_thinking.storage.migration.OLD_DATA_DIR", old_dir),
+            caplog.at_level(logging.WARNING),
+        ):
+            assert server.prepare_data_dir(data_dir) is False
+
+        assert not is_store_ready(data_dir)
+        assert not (data_dir / "sessions" / "legacy.json").exists()
+        assert "deep-thinking migrate" in caplog.text
+
+
+class TestRenderCacheConfig:
+    """渲染缓存配置测试"""
+
+    def test_render_cache_from_env(self, temp_dir, monkeypatch):
+        """测试从环境变量读取渲染缓存容量"""
+        from deep_thinking import server
+
+        monkeypatch.setenv("DEEP_THINKING_RENDER_CACHE_SIZE", "8")
+        monkeypatch.setenv("DEEP_THINKING_RENDER_CACHE_DISK_MB", "0.5")
+        monkeypatch.setenv("DEEP_THINKING_RENDER_CACHE_DISK_DAYS", "invalid")
+
+        cache = server.create_render_cache(temp_dir)
+
+        assert cache is not None
+        assert cache.max_entries == 8
+        assert cache.max_disk_bytes == 512 * 1024
+        assert cache.max_disk_age == 7 * 86400
+
+        monkeypatch.setenv("DEEP_THINKING_RENDER_CACHE_SIZE", "0")
+        assert server.create_render_cache(temp_dir) is None
+
+
+class TestMaintenance:
+    """后台数据维护测试"""
+
+    def test_retention_policy_from_env(self, monkeypatch):
+        """测试从环境变量读取保留策略"""
+        from deep_thinking import server
+
+        monkeypatch.setenv("DEEP_THINKING_ARCHIVE_AFTER_DAYS", "7")
+        monkeypatch.setenv("DEEP_THINKING_COMPRESS_ARCHIVED", "0")
+        monkeypatch.setenv("DEEP_THINKING_BACKUP_MAX_BYTES", "1024")
+        monkeypatch.setenv("DEEP_THINKING_SNAPSHOT_KEEP", "invalid")
+
+        policy = server.create_retention_policy()
+
+        assert policy.archive_after_days == 7
+        assert policy.compress_archived is False
+        assert policy.backup_max_bytes == 1024
+        assert policy.snapshot_keep == 0
+
+    def test_retention_policy_defaults_keep_data(self, monkeypatch):
+        """测试未配置时不归档会话，不清理备份"""
+        from deep_thinking import server
+
+        for name in (
+            "DEEP_THINKING_ARCHIVE_AFTER_DAYS",
+            "DEEP_THINKING_BACKUP_MAX_AGE_DAYS",
+            "DEEP_THINKING_BACKUP_MAX_BYTES",
+            "DEEP_THINKING_SNAPSHOT_KEEP",
+        ):
+            monkeypatch.delenv(name, raising=False)
+
+        policy = server.create_retention_policy()
+
+        assert policy.archive_after_days == 0
+        assert policy.backup_max_age_days == 0
+        assert policy.backup_max_bytes == 0
+        assert policy.snapshot_keep == 0
+
+    async def test_lifespan_starts_and_cancels_task(self, temp_dir, monkeypatch):
+        """测试生命周期启动维护任务，退出时取消"""
+        from deep_thinking import server
+
+        monkeypatch.setenv("DEEP_THINKING_DATA_DIR", str(temp_dir / "data"))
+        monkeypatch.delenv("DEEP_THINKING_WORKER_ID", raising=False)
+
+        async with server.server_lifespan(server.app):
+            task = server._maintenance_task
+            service = server.get_retention_service()
+            assert task is not None and not task.done()
+
+        await asyncio.sleep(0)
+        assert task.cancelled()
+        assert service._stop_event.is_set()
+        assert server._maintenance_task is None
+
+    @pytest.mark.parametrize(
+        ("env", "value"),
+        [("DEEP_THINKING_MAINTENANCE_INTERVAL", "0"), ("DEEP_THINKING_WORKER_ID", "1")],
+    )
+    async def test_task_not_started(self, temp_dir, monkeypatch, env, value):
+        """测试间隔为 0 或非 0 号工作进程时不启动维护任务"""
+        from deep_thinking import server
+
+        monkeypatch.setenv("DEEP_THINKING_DATA_DIR", str(temp_dir / "data"))
+        monkeypatch.setenv(env, value)
+
+        async with server.server_lifespan(server.app):
+            assert server._maintenance_task is None
+            assert server.get_retention_service() is not None
+
+
+class TestTemplateRegistry:
+    """全局模板注册表测试"""
+
+    def test_template_dirs(self, temp_dir, monkeypatch):
+        """测试模板目录包含内置目录、数据目录和环境变量指定的目录"""
+        from deep_thinking import server
+        from deep_thinking.utils.template_registry import builtin_templates_dir
+
+        extra = [temp_dir / "a", temp_dir / "b"]
+        monkeypatch.setenv("DEEP_THINKING_TEMPLATE_DIRS", os.pathsep.join(map(str, extra)))
+
+        registry = server.create_template_registry(temp_dir / "data")
+
+        assert registry.template_dirs == [
+            builtin_templates_dir(),
+            temp_dir / "data" / "templates",
+            *extra,
+        ]
+
+
+class TestToolInstrumentation:
+    """工具调用指标和追踪测试"""
+
+    async def test_records_tool_calls(self, temp_dir, monkeypatch):
+        """测试工具调用记录耗时和失败次数，指标禁用时不记录"""
+        from mcp.server.fastmcp.exceptions import ToolError
+
+        from deep_thinking import server
+        from deep_thinking.tools import diagnostics
+        from deep_thinking.utils.metrics import metrics
+
+        # 工具注册在首次导入时创建的服务器实例上（其他测试可能重新加载 server 模块）
+        app = diagnostics.app
+
+        monkeypatch.setenv("DEEP_THINKING_DATA_DIR", str(temp_dir / "data"))
+        monkeypatch.setattr(metrics, "enabled", True)
+        metrics.reset()
+
+        async with server.server_lifespan(app):
+            await app.call_tool("create_session", {"name": "指标"})
+            with pytest.raises(ToolError):
+                await app.call_tool("get_server_metrics", {"format": "xml"})
+            with pytest.raises(ToolError):
+                await app.call_tool("no_such_tool", {})
+
+            monkeypatch.setattr(metrics, "enabled", False)
+            await app.call_tool("create_session", {"name": "未记录"})
+
+        tools = metrics.snapshot()["tools"]
+        assert set(tools) == {"create_session", "get_server_metrics"}
+        assert tools["create_session"]["calls"] == 1
+        assert tools["create_session"]["errors"] == 0
+        assert tools["get_server_metrics"]["errors"] == 1
+        metrics.reset()
+
+    async def test_traces_tool_calls(self, temp_dir, monkeypatch):
+        """测试每次工具调用是一条追踪，存储 span 记录在工具 span 下"""
+        from deep_thinking import server
+        from deep_thinking.tools import diagnostics
+        from deep_thinking.utils.tracing import read_spans, tracer
+
+        app = diagnostics.app
+        trace_file = temp_dir / "trace.jsonl"
+        monkeypatch.setenv("DEEP_THINKING_DATA_DIR", str(temp_dir / "data"))
+        monkeypatch.setattr(tracer, "path", trace_file)
+        monkeypatch.setattr(tracer, "sample_rate", 1.0)
+
+        async with server.server_lifespan(app):
+            await app.call_tool("create_session", {"name": "追踪"})
+            await app.call_tool("list_sessions", {})
+
+        records = list(read_spans(trace_file))
+        roots = [r for r in records if not r["parent_span_id"]]
+        assert [r["name"] for r in roots] == ["tool.create_session", "tool.list_sessions"]
+        create_trace = {r["name"] for r in records if r["trace_id"] == roots[0]["trace_id"]}
+        assert {"storage.create_sessions", "store.write", "store.fsync"} <= create_trace
+
+    async def test_profiles_next_calls(self, temp_dir, monkeypatch):
+        """测试 profile_server 开始后，接下来的工具调用完成时写出分析结果"""
+        import pstats
+
+        from deep_thinking import server
+        from deep_thinking.tools import diagnostics
+        from deep_thinking.utils.profiler import profiler
+
+        app = diagnostics.app
+        monkeypatch.setenv("DEEP_THINKING_DATA_DIR", str(temp_dir / "data"))
+
+        try:
+            async with server.server_lifespan(app):
+                await app.call_tool("profile_server", {"action": "start", "calls": 2})
+                assert profiler.active
+                await app.call_tool("create_session", {"name": "分析"})
+                assert profiler.active
+                await app.call_tool("list_sessions", {})
+                assert not profiler.active
+        finally:
+            profiler.stop()
+
+        (output,) = (temp_dir / "data" / "profiles").glob("profile-*.pstats")
+        stats = pstats.Stats(str(output))
+        assert any(func[2] == "create_sessions" for func in stats.stats)
@@ -0,0 +1,179 @@
+"""
+跨会话统计汇总表测试
+"""
+
+from datetime import date, datetime, timezone
+
+import pytest
+
+from deep_thinking.models.thought import Thought
+from deep_thinking.models.tool_call import ToolCallData, ToolCallRecord, ToolResultData
+from deep_thinking.storage.analytics_index import AnalyticsIndex
+from deep_thinking.storage.storage_manager import StorageManager
+
+DAY_ONE = datetime(2026, 3, 1, 12, tzinfo=timezone.utc)
+DAY_TWO = datetime(2026, 3, 2, 12, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def manager(temp_dir):
+    """创建存储管理器实例"""
+    return StorageManager(temp_dir)
+
+
+def _thoughts(count, phase="thinking", timestamp=DAY_ONE):
+    """生成 count 个内容长度为 10 的思考步骤"""
+    return [
+        Thought(thought_number=i, content="思" * 10, phase=phase, timestamp=timestamp)
+        for i in range(1, count + 1)
+    ]
+
+
+def _record(tool_name, status="completed", execution_time_ms=None, from_cache=False):
+    """生成一条工具调用记录"""
+    call = ToolCallData(tool_name=tool_name, timestamp=DAY_ONE)
+    record = ToolCallRecord(thought_number=1, call_data=call, status=status)
+    if status != "pending":
+        record.result_data = ToolResultData(
+            call_id=call.call_id,
+            success=status == "completed",
+            execution_time_ms=execution_time_ms,
+            from_cache=from_cache,
+        )
+    return record
+
+
+def _build(manager):
+    """两个模板会话和一个普通会话"""
+    # 首次查询时重建（此时没有会话），之后的统计全部来自增量维护
+    manager.get_analytics(max_thoughts=50)
+    assert manager.analytics_index.is_built()
+    first = manager.create_session(
+        name="排查一",
+        metadata={"template_id": "problem_solving"},
+        thoughts=_thoughts(3) + [Thought(thought_number=4, content="分析", phase="analysis")],
+    )
+    manager.create_session(
+        name="排查二", metadata={"template_id": "problem_solving"}, thoughts=_thoughts(2)
+    )
+    plain = manager.create_session(
+        name="普通", thoughts=_thoughts(1, phase="tool_call", timestamp=DAY_TWO)
+    )
+    for record in (
+        _record("search", execution_time_ms=30.0),
+        _record("search", status="failed"),
+        _record("search", execution_time_ms=10.0, from_cache=True),
+        _record("fetch", status="timeout"),
+        _record("fetch", status="pending"),
+    ):
+        first.add_tool_call_record(record)
+    manager.update_session(first)
+    return first, plain
+
+
+class TestAnalyticsIndex:
+    """统计汇总表测试"""
+
+    def test_report(self, manager):
+        """测试按模板、工具和日期汇总"""
+        _build(manager)
+
+        report = manager.get_analytics(max_thoughts=3)
+
+        assert report.sessions == 3
+        assert report.max_thoughts_sessions == 1
+        assert report.thoughts == 7
+        assert report.phases == {"thinking": 5, "analysis": 1, "tool_call": 1}
+        assert report.tool_calls == 5
+        assert report.failures == 2
+
+        solving, plain = report.templates
+        assert solving.template_id == "problem_solving"
+        assert (solving.sessions, solving.thoughts) == (2, 6)
+        assert solving.avg_thought_length == pytest.approx(52 / 6)
+        assert solving.phases == {"thinking": 5, "analysis": 1}
+        assert plain.template_id == ""
+
+        search, fetch = report.tools
+        assert (search.tool_name, search.calls, search.failures, search.cached) == (
+            "search",
+            3,
+            1,
+            1,
+        )
+        assert search.avg_ms == pytest.approx(20.0)
+        assert (fetch.calls, fetch.failures, fetch.failure_rate) == (2, 1, 0.5)
+
+        # 会话按创建日期（今天），思考步骤和工具调用按各自的时间
+        days = {entry.day: entry for entry in report.days}
+        assert days[DAY_TWO.date().isoformat()].thoughts == 1
+        assert days[DAY_ONE.date().isoformat()].tool_calls == 5
+        assert sum(entry.sessions for entry in report.days) == 3
+
+    def test_filters(self, manager):
+        """测试按日期、模板和状态过滤"""
+        _, plain = _build(manager)
+        plain.mark_completed()
+        manager.update_session(plain)
+
+        assert manager.get_analytics(50, template_id="").thoughts == 1
+        assert manager.get_analytics(50, template_id="problem_solving").sessions == 2
+        assert manager.get_analytics(50, status="completed").sessions == 1
+        report = manager.get_analytics(50, since=DAY_TWO.date(), until=DAY_TWO.date())
+        assert (report.thoughts, report.tool_calls) == (1, 0)
+        assert manager.get_analytics(50, until=date(2000, 1, 1)).thoughts == 0
+
+    def test_incremental_updates(self, manager):
+        """测试添加、更新思考步骤和删除会话后只累加差值"""
+        first, plain = _build(manager)
+        manager.add_thought(plain.session_id, Thought(thought_number=2, content="新增"))
+        manager.update_thought(
+            first.session_id, Thought(thought_number=4, content="修订", phase="thinking")
+        )
+
+        report = manager.get_analytics(max_thoughts=50)
+        assert report.thoughts == 8
+        assert report.phases == {"thinking": 7, "tool_call": 1}
+
+        manager.delete_session(first.session_id)
+        report = manager.get_analytics(max_thoughts=50)
+        assert (report.sessions, report.thoughts, report.tool_calls) == (2, 4, 0)
+        assert report.tools == []
+        assert manager.analytics_index.count() == 2
+
+    def test_rebuild_matches_incremental(self, temp_dir):
+        """测试重建后的汇总与增量维护的结果一致"""
+        manager = StorageManager(temp_dir)
+        _build(manager)
+        expected = manager.get_analytics(max_thoughts=3).to_dict()
+        manager.analytics_index.clear()
+
+        reopened = StorageManager(temp_dir)
+        assert not reopened.analytics_index.is_built()
+        assert reopened.get_analytics(max_thoughts=3).to_dict() == expected
+        assert reopened.analytics_index.is_built()
+
+    def test_prunes_empty_rows(self, temp_dir):
+        """测试会话移除后汇总行随之删除"""
+        manager = StorageManager(temp_dir)
+        session = manager.create_session(name="会话", thoughts=_thoughts(2))
+        index = AnalyticsIndex(temp_dir / "rollups.db")
+        index.index_session(session)
+
+        index.remove_session(session.session_id)
+
+        conn = index._connect()
+        for table in ("session_rollups", "thought_rollups", "tool_rollups"):
+            assert conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == 0
+        index.close()
+
+
+def test_report_to_dict(manager):
+    """测试报告转换为字典时包含派生指标"""
+    _build(manager)
+
+    data = manager.get_analytics(max_thoughts=50).to_dict()
+
+    assert data["avg_thought_length"] == pytest.approx(62 / 7)
+    assert data["tools"][0]["failure_rate"] == pytest.approx(1 / 3)
+    assert data["templates"][0]["avg_thought_length"] == pytest.approx(52 / 6)
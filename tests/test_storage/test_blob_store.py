@@ -0,0 +1,133 @@
+"""
+内容寻址存储测试
+"""
+
+import hashlib
+import os
+import time
+
+import pytest
+
+from deep_thinking.storage.blob_store import (
+    DEFAULT_BLOB_THRESHOLD,
+    BlobStore,
+    encode_blob,
+    get_blob_threshold,
+)
+from deep_thinking.storage.json_file_store import detect_compression
+
+
+@pytest.fixture
+def blobs(temp_dir):
+    """创建内容寻址存储实例"""
+    return BlobStore(temp_dir / "blobs")
+
+
+class TestBlobStore:
+    """BlobStore测试"""
+
+    def test_put_and_get(self, blobs):
+        """测试按内容哈希存储和读取，相同内容只存储一份"""
+        value = {"items": [{"title": "搜索结果", "score": 0.9}] * 200, "b": 1, "a": 2}
+        payload = encode_blob(value)
+
+        digest = blobs.put(payload)
+
+        assert digest == hashlib.sha256(payload).hexdigest()
+        assert blobs.exists(digest)
+        assert blobs.get(digest) == value
+        assert list(blobs.get(digest)) == ["items", "b", "a"]
+        assert blobs.put(encode_blob(value)) == digest
+        assert len(list(blobs.base_dir.glob("*/*"))) == 1
+
+    def test_compressed_when_smaller(self, blobs):
+        """测试压缩后更小时以压缩格式存储"""
+        repetitive = blobs.put(encode_blob("重复内容" * 1000))
+        tiny = blobs.put(encode_blob(1))
+
+        assert detect_compression(blobs._get_path(repetitive).read_bytes()) is not None
+        assert detect_compression(blobs._get_path(tiny).read_bytes()) is None
+        assert blobs.get(repetitive) == "重复内容" * 1000
+        assert blobs.get(tiny) == 1
+
+    def test_get_missing(self, blobs):
+        """测试读取不存在的内容"""
+        with pytest.raises(ValueError, match="内容不存在"):
+            blobs.get("0" * 64)
+
+    def test_refs(self, blobs):
+        """测试更新和重建引用计数"""
+        blobs.update_refs(added=["a", "b", "a"])
+        assert (blobs.refcount("a"), blobs.refcount("b")) == (2, 1)
+
+        blobs.update_refs(removed=["a", "b", "c"])
+        assert (blobs.refcount("a"), blobs.refcount("b"), blobs.refcount("c")) == (1, 0, 0)
+
+        blobs.rebuild_refs([["x", "y"], ["x", "x"], []])
+        assert (blobs.refcount("a"), blobs.refcount("x"), blobs.refcount("y")) == (0, 2, 1)
+
+    def test_collect_garbage(self, blobs):
+        """测试只回收没有引用且超过宽限期的内容"""
+        referenced = blobs.put(encode_blob("被引用" * 100))
+        orphan = blobs.put(encode_blob("未引用" * 100))
+        fresh = blobs.put(encode_blob("刚写入" * 100))
+        blobs.update_refs(added=[referenced])
+        old_time = time.time() - 7200
+        for digest in (referenced, orphan):
+            os.utime(blobs._get_path(digest), (old_time, old_time))
+
+        removed, freed = blobs.collect_garbage(grace_seconds=3600)
+
+        assert removed == 1
+        assert freed > 0
+        assert blobs.exists(referenced)
+        assert not blobs.exists(orphan)
+        assert blobs.exists(fresh)
+
+    def test_collect_garbage_missing_dir(self, temp_dir):
+        """测试存储目录不存在时没有可回收的内容"""
+        assert BlobStore(temp_dir / "missing", create_dirs=False).collect_garbage() == (0, 0)
+
+    def test_put_refreshes_existing(self, blobs):
+        """测试重复写入刷新修改时间，重新进入宽限期"""
+        payload = encode_blob("内容" * 100)
+        digest = blobs.put(payload)
+        old_time = time.time() - 7200
+        os.utime(blobs._get_path(digest), (old_time, old_time))
+
+        blobs.put(payload)
+
+        assert blobs.collect_garbage(grace_seconds=3600) == (0, 0)
+
+    def test_discard_created(self, blobs):
+        """测试只撤销本次新写入、没有引用且未被再次写入的内容"""
+        existing = blobs.put(encode_blob("已存在" * 100))
+        created = {}
+        new = blobs.put(encode_blob("新写入" * 100), created)
+        referenced = blobs.put(encode_blob("已引用" * 100), created)
+        rewritten = blobs.put(encode_blob("再次写入" * 100), created)
+        assert blobs.put(encode_blob("已存在" * 100), created) == existing
+        assert set(created) == {new, referenced, rewritten}
+
+        blobs.update_refs(added=[referenced])
+        # 其他会话写入相同内容时刷新修改时间
+        os.utime(blobs._get_path(rewritten), ns=(0, created[rewritten] + 1))
+
+        assert blobs.discard(created) == 1
+        assert not blobs.exists(new)
+        assert all(blobs.exists(d) for d in (existing, referenced, rewritten))
+        assert blobs.discard({}) == 0
+
+
+def test_blob_threshold_env(monkeypatch):
+    """测试从环境变量读取移出阈值"""
+    monkeypatch.setenv("DEEP_THINKING_BLOB_THRESHOLD", "0")
+    assert get_blob_threshold() == 0
+    monkeypatch.setenv("DEEP_THINKING_BLOB_THRESHOLD", "abc")
+    assert get_blob_threshold() == DEFAULT_BLOB_THRESHOLD
+
+
+def test_encode_blob_invalid():
+    """测试不可序列化的数据"""
+    with pytest.raises(TypeError, match="数据序列化失败"):
+        encode_blob({"value": object()})
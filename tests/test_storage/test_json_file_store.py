@@ -10,7 +10,18 @@ from unittest.mock import patch
 
 import pytest
 
-from deep_thinking.storage.json_file_store import JsonFileStore
+from deep_thinking.storage.json_file_store import (
+    DEFAULT_COMPRESS_THRESHOLD,
+    JsonFileStore,
+    detect_compression,
+    dumps_with_layout,
+    get_compress_threshold,
+)
+
+
+def _stored_layout(base_dir, key):
+    """读取偏移索引文件"""
+    return json.loads((base_dir / ".ranges" / f"{key}.json").read_text(encoding="utf-8"))
 
 
 class TestJsonFileStore:
@@ -489,3 +500,281 @@ class TestJsonFileStoreBoundary:
         # 确保备份目录为空
         cleared = store.clear_backups(older_than_days=30)
         assert cleared == 0
+
+
+class TestJsonFileStoreRangeRead:
+    """JsonFileStore区间读取测试"""
+
+    @pytest.fixture
+    def store(self, temp_dir):
+        """记录 items 字段偏移的存储实例"""
+        return JsonFileStore(temp_dir, enable_backup=False, indexed_fields={"items": "n"})
+
+    @pytest.fixture
+    def data(self):
+        """包含多字节字符和嵌套结构的数据"""
+        return {
+            "name": "区间读取",
+            "items": [{"n": i, "text": f"第{i}项\n内容", "tags": [i, {"x": []}]} for i in range(5)],
+            "meta": {},
+        }
+
+    def test_layout_matches_json_dumps(self, data):
+        """测试带偏移的序列化与 json.dumps 逐字节一致"""
+        for value in (data, {}, {"items": []}):
+            text, _ = dumps_with_layout(value, {"items": "n"})
+            assert text == json.dumps(value, ensure_ascii=False, indent=2)
+
+    def test_read_fields_and_items(self, store, data):
+        """测试按字段和下标读取"""
+        store.write("doc", data)
+
+        with store.open_range("doc") as reader:
+            assert reader.ranged
+            assert reader.read_fields(["name", "missing"]) == {"name": "区间读取"}
+            assert reader.item_count("items") == 5
+            assert reader.item_keys("items") == [0, 1, 2, 3, 4]
+            assert reader.read_items("items", [1, 2, 3]) == data["items"][1:4]
+            assert reader.read_items("items", [0, 4, 9]) == [data["items"][0], data["items"][4]]
+
+    def test_layout_written_without_fsync(self, store, data, temp_dir):
+        """测试偏移索引原子写入但不额外 fsync"""
+        with patch("deep_thinking.storage.json_file_store.os.fsync") as mock_fsync:
+            store.write("doc", data)
+
+        assert mock_fsync.call_count == 1
+        assert _stored_layout(temp_dir, "doc")["layout"] is not None
+
+    def test_missing_file(self, store):
+        """测试文件不存在时返回None"""
+        with store.open_range("missing") as reader:
+            assert reader is None
+
+    def test_stale_layout_falls_back(self, store, data, temp_dir):
+        """测试文件被外部修改后回退为完整解析"""
+        store.write("doc", data)
+        data["items"].append({"n": 99, "text": "外部追加"})
+        (temp_dir / "doc.json").write_text(json.dumps(data), encoding="utf-8")
+
+        with store.open_range("doc") as reader:
+            assert not reader.ranged
+            assert reader.item_keys("items")[-1] == 99
+            assert reader.read_items("items", [5]) == [{"n": 99, "text": "外部追加"}]
+
+    def test_layout_rebuilt_for_existing_file(self, temp_dir, data):
+        """测试为旧格式文件重建偏移索引"""
+        JsonFileStore(temp_dir, enable_backup=False).write("doc", data)
+        store = JsonFileStore(temp_dir, enable_backup=False, indexed_fields={"items": "n"})
+
+        with store.open_range("doc") as reader:
+            assert reader.ranged
+        assert (temp_dir / ".ranges" / "doc.json").exists()
+
+    def test_revision_follows_content(self, store, data, temp_dir):
+        """测试文件状态不变时修订标记仍随内容变化"""
+        assert store.revision("doc") is None
+        store.write("doc", data)
+        first = store.revision("doc")
+        assert first == _stored_layout(temp_dir, "doc")["revision"]
+
+        # 模拟 inode 复用且时间戳精度不足：两次写入的文件状态完全相同
+        data["name"] = "区间写入"
+        with patch.object(JsonFileStore, "_stat_token", return_value="same"):
+            store.write("doc", data)
+            assert store.revision("doc") not in (None, first)
+            with store.open_range("doc") as reader:
+                assert reader.ranged
+                assert reader.read_fields(["name"]) == {"name": "区间写入"}
+
+        data["name"] = "区间读取"
+        store.write("doc", data)
+        assert store.revision("doc") == first
+
+    def test_revision_without_layout(self, temp_dir, data):
+        """测试未记录修订标记时读取文件计算摘要"""
+        plain = JsonFileStore(temp_dir, enable_backup=False)
+        plain.write("doc", data)
+        store = JsonFileStore(temp_dir, enable_backup=False, indexed_fields={"items": "n"})
+
+        assert store.revision("doc") == plain.revision("doc")
+        with store.open_range("doc") as reader:
+            assert reader.ranged
+        assert _stored_layout(temp_dir, "doc")["revision"] == plain.revision("doc")
+
+        # 外部修改后文件状态不一致，重新计算摘要
+        before = store.revision("doc")
+        (temp_dir / "doc.json").write_text("{}", encoding="utf-8")
+        assert store.revision("doc") not in (None, before)
+        assert store.revision("doc") == plain.revision("doc")
+
+    def test_delete_removes_layout(self, store, data, temp_dir):
+        """测试删除文件时同时删除偏移索引"""
+        store.write("doc", data)
+        assert (temp_dir / ".ranges" / "doc.json").exists()
+
+        store.delete("doc")
+
+        assert not (temp_dir / ".ranges" / "doc.json").exists()
+        assert store.list_keys() == []
+
+
+class TestJsonFileStoreCompression:
+    """JsonFileStore压缩测试"""
+
+    @pytest.fixture
+    def store(self, temp_dir):
+        """记录 items 字段偏移的存储实例"""
+        return JsonFileStore(temp_dir, indexed_fields={"items": "n"}, compression="gzip")
+
+    @pytest.fixture
+    def data(self):
+        """可压缩的数据"""
+        return {"items": [{"n": i, "text": "重复内容" * 50} for i in range(20)]}
+
+    def test_compress_and_read(self, store, data, temp_dir):
+        """测试压缩后读取和区间读取结果不变"""
+        store.write("doc", data)
+        size = (temp_dir / "doc.json").stat().st_size
+
+        before, after = store.compress("doc")
+
+        assert before == size
+        assert 0 < after < before
+        assert store.is_compressed("doc")
+        assert (temp_dir / "doc.json").read_bytes()[:2] == b"\x1f\x8b"
+        assert _stored_layout(temp_dir, "doc")["layout"] is None
+        assert store.read("doc") == data
+        with store.open_range("doc") as reader:
+            assert not reader.ranged
+            assert reader.read_items("items", [3]) == [data["items"][3]]
+
+        # 已压缩时跳过；再次写入恢复为未压缩格式
+        assert store.compress("doc") == (0, 0)
+        store.write("doc", data)
+        assert not store.is_compressed("doc")
+        with store.open_range("doc") as reader:
+            assert reader.ranged
+
+    def test_compress_missing_or_small(self, store):
+        """测试文件不存在或压缩无收益时保持原样"""
+        assert store.compress("missing") == (0, 0)
+        assert not store.is_compressed("missing")
+
+        store.write("tiny", {"a": 1})
+        assert store.compress("tiny") == (0, 0)
+        assert not store.is_compressed("tiny")
+
+    def test_write_above_threshold(self, temp_dir, data):
+        """测试序列化结果达到阈值时压缩写入"""
+        store = JsonFileStore(
+            temp_dir, indexed_fields={"items": "n"}, compression="gzip", compress_threshold=1000
+        )
+
+        store.write("big", data)
+        store.write("small", {"items": [{"n": 1}]})
+
+        assert store.is_compressed("big")
+        assert _stored_layout(temp_dir, "big")["layout"] is None
+        assert store.read("big") == data
+        assert not store.is_compressed("small")
+        with store.open_range("small") as reader:
+            assert reader.ranged
+
+    def test_write_compress_flag(self, store, data, temp_dir):
+        """测试显式指定是否压缩"""
+        store.write("doc", data, compress=True)
+        assert store.is_compressed("doc")
+        assert store.read("doc") == data
+
+        threshold_store = JsonFileStore(temp_dir, compression="gzip", compress_threshold=1)
+        threshold_store.write("doc", data, compress=False)
+        assert not threshold_store.is_compressed("doc")
+
+        # 压缩无收益时按未压缩写入
+        store.write("tiny", {"a": 1}, compress=True)
+        assert not store.is_compressed("tiny")
+
+    def test_zstd(self, temp_dir, data):
+        """测试 zstd 格式（需要安装 zstandard）"""
+        pytest.importorskip("zstandard")
+        store = JsonFileStore(temp_dir, compression="zstd")
+        store.write("doc", data)
+
+        store.compress("doc")
+
+        raw = (temp_dir / "doc.json").read_bytes()
+        assert detect_compression(raw) == "zstd"
+        assert store.read("doc") == data
+
+        # 其他格式写入的文件同样可以读取
+        gzip_store = JsonFileStore(temp_dir, compression="gzip")
+        gzip_store.write("other", data, compress=True)
+        assert store.read("other") == data
+
+    def test_invalid_compression(self, temp_dir):
+        """测试不可用的压缩格式"""
+        with pytest.raises(ValueError, match="不支持的压缩格式"):
+            JsonFileStore(temp_dir, compression="lz4")
+
+    def test_compress_threshold_env(self, monkeypatch):
+        """测试从环境变量读取自动压缩阈值"""
+        monkeypatch.setenv("DEEP_THINKING_COMPRESS_THRESHOLD", "4096")
+        assert get_compress_threshold() == 4096
+        monkeypatch.setenv("DEEP_THINKING_COMPRESS_THRESHOLD", "abc")
+        assert get_compress_threshold() == DEFAULT_COMPRESS_THRESHOLD
+        monkeypatch.delenv("DEEP_THINKING_COMPRESS_THRESHOLD")
+        assert get_compress_threshold() == DEFAULT_COMPRESS_THRESHOLD
+
+    def test_corrupt_compressed_file(self, store, temp_dir):
+        """测试损坏的压缩文件"""
+        (temp_dir / "bad.json").write_bytes(b"\x1f\x8b\x08\x00broken")
+
+        with pytest.raises(ValueError, match="解压失败"):
+            store.read("bad")
+
+    def test_prune_backups_by_size(self, store):
+        """测试按总大小从旧到新清理备份"""
+        now = time.time()
+        for i in range(4):
+            path = store._get_backup_path(f"doc{i}")
+            path.write_bytes(b"x" * 100)
+            os.utime(path, (now - 100 + i, now - 100 + i))
+
+        removed, freed = store.prune_backups(max_total_bytes=250)
+
+        assert (removed, freed) == (2, 200)
+        assert sorted(p.stem for p in store.backup_dir.glob("*.json")) == ["doc2", "doc3"]
+
+
+class TestJsonFileStoreLock:
+    """跨进程键锁测试"""
+
+    def test_lock_reentrant(self, temp_dir):
+        """测试同一线程可重入，锁文件位于锁目录"""
+        store = JsonFileStore(temp_dir, enable_backup=False)
+
+        with store.lock("doc"), store.lock("doc"):
+            store.write("doc", {"n": 1})
+
+        assert (temp_dir / ".locks" / "doc.lock").exists()
+        assert store.list_keys() == ["doc"]
+
+    def test_lock_excludes_other_threads(self, temp_dir):
+        """测试其他线程在锁释放前阻塞"""
+        import threading
+
+        store = JsonFileStore(temp_dir, enable_backup=False)
+        order = []
+
+        def worker():
+            with store.lock("doc"):
+                order.append("worker")
+
+        with store.lock("doc"):
+            thread = threading.Thread(target=worker)
+            thread.start()
+            thread.join(timeout=0.2)
+            order.append("main")
+        thread.join()
+
+        assert order == ["main", "worker"]
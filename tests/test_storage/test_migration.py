@@ -10,9 +10,14 @@ import pytest
 
 from deep_thinking.storage.migration import (
     MIGRATION_MARKER,
+    STORE_MARKER_PREFIX,
     create_migration_backup,
     detect_old_data,
     get_migration_info,
+    get_store_marker,
+    has_sessions,
+    is_store_ready,
+    mark_store_ready,
     migrate_data,
     rollback_migration,
     should_migrate,
@@ -178,6 +183,19 @@ class TestMigrateData:
             # 验证新数据已迁移
             assert (target_dir / "sessions" / ".index.json").exists()
 
+    def test_migrate_reports_progress(self, temp_old_data_dir: Path, tmp_path: Path):
+        """测试：迁移时逐个文件报告进度"""
+        target_dir = tmp_path / ".deepthinking-progress"
+        calls: list[tuple[int, int]] = []
+
+        with mock.patch("deep_thinking.storage.migration.OLD_DATA_DIR", temp_old_data_dir):
+            assert migrate_data(
+                target_dir, progress=lambda done, total: calls.append((done, total))
+            )
+
+        assert calls == [(1, 2), (2, 2)]
+        assert (target_dir / "sessions" / "test-session-1.json").exists()
+
 
 class TestRollbackMigration:
     """测试迁移回滚功能"""
@@ -264,3 +282,33 @@ class TestShouldMigrate:
 
         with mock.patch("deep_thinking.storage.migration.OLD_DATA_DIR", temp_old_data_dir):
             assert not should_migrate(target_dir)
+
+
+class TestStoreMarker:
+    """测试存储版本标记"""
+
+    def test_mark_store_ready(self, tmp_path: Path):
+        """测试：写入标记后数据目录就绪，旧版本标记被删除"""
+        sessions_dir = tmp_path / "sessions"
+        sessions_dir.mkdir()
+        (sessions_dir / f"{STORE_MARKER_PREFIX}0").write_text("version: 0")
+
+        assert not is_store_ready(tmp_path)
+        marker = mark_store_ready(tmp_path)
+
+        assert marker == get_store_marker(tmp_path)
+        assert is_store_ready(tmp_path)
+        assert [p.name for p in sessions_dir.glob(f"{STORE_MARKER_PREFIX}*")] == [marker.name]
+
+    def test_has_sessions(self, tmp_path: Path):
+        """测试：索引和标记不算会话文件"""
+        sessions_dir = tmp_path / "sessions"
+        assert not has_sessions(tmp_path)
+
+        sessions_dir.mkdir()
+        (sessions_dir / ".index.json").write_text("{}")
+        mark_store_ready(tmp_path)
+        assert not has_sessions(tmp_path)
+
+        (sessions_dir / "abc.json").write_text("{}")
+        assert has_sessions(tmp_path)
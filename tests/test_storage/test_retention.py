@@ -0,0 +1,236 @@
+"""
+数据保留与压缩服务测试
+"""
+
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from deep_thinking.models.thought import Thought
+from deep_thinking.storage.retention import (
+    IoRateLimiter,
+    RetentionPolicy,
+    RetentionReport,
+    RetentionService,
+)
+from deep_thinking.storage.storage_manager import StorageManager
+
+
+@pytest.fixture
+def manager(temp_dir):
+    """创建存储管理器实例"""
+    return StorageManager(temp_dir)
+
+
+def _completed_session(manager, name, days_ago):
+    """创建在 days_ago 天前完成的会话"""
+    session = manager.create_session(
+        name=name,
+        thoughts=[Thought(thought_number=i, content="分析内容" * 100) for i in range(1, 6)],
+    )
+    session.mark_completed()
+    session.updated_at = datetime.now(timezone.utc) - timedelta(days=days_ago)
+    manager.update_session(session)
+    return session.session_id
+
+
+def _uncompressed_archived_session(manager, name):
+    """创建未压缩的已归档会话（如未启用压缩时归档的会话）"""
+    session_id = _completed_session(manager, name, days_ago=60)
+    session = manager.get_session(session_id)
+    session.mark_archived()
+    manager.update_session(session)
+    manager.store.write(session_id, manager.store.read(session_id), compress=False)
+    assert not manager.store.is_compressed(session_id)
+    return session_id
+
+
+class TestRetentionService:
+    """RetentionService测试"""
+
+    def test_archive_and_compress(self, manager):
+        """测试归档长期未更新的已完成会话，压缩未压缩的已归档会话"""
+        old_id = _completed_session(manager, "旧会话", days_ago=40)
+        recent_id = _completed_session(manager, "新会话", days_ago=1)
+        active_id = manager.create_session(name="活跃会话").session_id
+
+        legacy_id = _uncompressed_archived_session(manager, "未压缩的归档会话")
+
+        policy = RetentionPolicy(archive_after_days=30, io_bytes_per_second=0)
+        service = RetentionService(manager, policy)
+        report = service.run_once()
+
+        assert report.archived == 1
+        assert report.compressed == 1
+        assert report.compressed_bytes_saved > 0
+        assert service.last_report is report
+        assert manager.store.is_compressed(legacy_id)
+        assert len(manager.get_session(legacy_id).thoughts) == 5
+
+        old = manager.get_session(old_id)
+        assert old.status == "archived"
+        assert len(old.thoughts) == 5
+        assert manager.store.is_compressed(old_id)
+        assert manager.get_session(recent_id).status == "completed"
+        assert not manager.store.is_compressed(recent_id)
+        assert manager.get_session(active_id).status == "active"
+
+        # 再次运行没有新的回收
+        report = service.run_once()
+        assert (report.archived, report.compressed) == (0, 0)
+
+    def test_default_policy_keeps_data(self, manager):
+        """测试默认策略不归档会话，不删除备份"""
+        old_id = _completed_session(manager, "旧会话", days_ago=400)
+        backup_path = manager.store._get_backup_path(old_id)
+        old_time = time.time() - 400 * 86400
+        os.utime(backup_path, (old_time, old_time))
+        for i in range(3):
+            manager.create_backup(f"snap{i}")
+
+        report = RetentionService(manager).run_once()
+
+        assert (report.archived, report.backups_removed, report.snapshots_removed) == (0, 0, 0)
+        assert manager.get_session(old_id).status == "completed"
+        assert backup_path.exists()
+        assert len(manager.list_backups()) == 3
+
+    def test_archive_rate_limited(self, manager, monkeypatch):
+        """测试归档改写会话文件的字节数计入 I/O 限速"""
+        _completed_session(manager, "旧会话", days_ago=40)
+        consumed = []
+        monkeypatch.setattr(IoRateLimiter, "consume", lambda _self, count: consumed.append(count))
+
+        policy = RetentionPolicy(archive_after_days=30, compress_archived=False)
+        report = RetentionService(manager, policy).run_once()
+
+        assert report.archived == 1
+        assert len(consumed) == 1
+        assert consumed[0] > 0
+
+    def test_disabled_policies(self, manager):
+        """测试禁用归档和压缩"""
+        old_id = _completed_session(manager, "旧会话", days_ago=40)
+        policy = RetentionPolicy(
+            archive_after_days=0,
+            compress_archived=False,
+            backup_max_age_days=0,
+            backup_max_bytes=0,
+            snapshot_keep=0,
+        )
+
+        report = RetentionService(manager, policy).run_once()
+
+        assert report.to_dict()["reclaimed_bytes"] == 0
+        assert report.archived == 0
+        assert manager.get_session(old_id).status == "completed"
+
+    def test_prune_backups_and_snapshots(self, manager):
+        """测试清理过期备份文件和多余的完整备份"""
+        session_id = _completed_session(manager, "会话", days_ago=1)
+        backup_path = manager.store._get_backup_path(session_id)
+        assert backup_path.exists()
+        old_time = time.time() - 40 * 86400
+        os.utime(backup_path, (old_time, old_time))
+
+        for i in range(3):
+            path = manager.create_backup(f"snap{i}")
+            os.utime(path, (time.time() - 100 + i, time.time() - 100 + i))
+
+        policy = RetentionPolicy(backup_max_age_days=30, snapshot_keep=1)
+        report = RetentionService(manager, policy).run_once()
+
+        assert report.backups_removed == 1
+        assert report.backup_bytes_freed > 0
+        assert report.snapshots_removed == 2
+        assert report.snapshot_bytes_freed > 0
+        assert not backup_path.exists()
+        assert [b["name"] for b in manager.list_backups()] == ["snap2"]
+
+    def test_collect_blobs(self, manager):
+        """测试回收没有会话引用的工具调用结果"""
+        from deep_thinking.storage.blob_store import encode_blob
+
+        digest = manager.blobs.put(encode_blob("未引用的结果" * 100))
+        policy = RetentionPolicy(blob_grace_seconds=0)
+
+        report = RetentionService(manager, policy).run_once()
+
+        assert report.blobs_removed == 1
+        assert report.to_dict()["reclaimed_bytes"] == report.blob_bytes_freed > 0
+        assert not manager.blobs.exists(digest)
+
+    def test_stop(self, manager):
+        """测试停止后不再处理"""
+        _completed_session(manager, "旧会话", days_ago=40)
+        service = RetentionService(manager, RetentionPolicy(archive_after_days=30))
+        service.stop()
+
+        report = service.run_once()
+
+        assert report.stopped
+        assert report.archived == 0
+
+    def test_errors_reported(self, manager, monkeypatch):
+        """测试单个会话失败时记录错误并继续"""
+        legacy_id = _uncompressed_archived_session(manager, "未压缩的归档会话")
+        _completed_session(manager, "旧会话", days_ago=40)
+
+        def fail(_key, level=None):
+            raise OSError("磁盘已满")
+
+        monkeypatch.setattr(manager.store, "compress", fail)
+        report = RetentionService(manager, RetentionPolicy(archive_after_days=30)).run_once()
+
+        assert report.archived == 1
+        assert report.errors == {legacy_id: "磁盘已满"}
+
+    async def test_run_forever(self, manager):
+        """测试定期执行，取消任务时停止"""
+        _completed_session(manager, "旧会话", days_ago=40)
+        service = RetentionService(manager, RetentionPolicy(archive_after_days=30))
+
+        task = asyncio.create_task(service.run_forever(60, initial_delay=0))
+        for _ in range(100):
+            if service.last_report is not None:
+                break
+            await asyncio.sleep(0.02)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert service.last_report.archived == 1
+        assert service._stop_event.is_set()
+
+
+class TestIoRateLimiter:
+    """IoRateLimiter测试"""
+
+    def test_limits_rate(self):
+        """测试超出速率时休眠"""
+        limiter = IoRateLimiter(1000)
+        started = time.monotonic()
+        limiter.consume(100)
+
+        assert time.monotonic() - started >= 0.09
+
+    def test_unlimited(self):
+        """测试速率为 0 时不休眠"""
+        limiter = IoRateLimiter(0)
+        started = time.monotonic()
+        limiter.consume(10**9)
+
+        assert time.monotonic() - started < 0.05
+
+
+def test_report_to_dict():
+    """测试报告转换为字典"""
+    report = RetentionReport(compressed_bytes_saved=10, backup_bytes_freed=20)
+
+    data = report.to_dict()
+
+    assert data["reclaimed_bytes"] == 30
+    assert data["errors"] == {}
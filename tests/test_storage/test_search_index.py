@@ -0,0 +1,209 @@
+"""
+全文搜索索引测试
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from deep_thinking.models.thought import Thought
+from deep_thinking.models.tool_call import ToolCallData, ToolCallRecord
+from deep_thinking.storage.search_index import SearchIndex, build_match_query, tokenize
+from deep_thinking.storage.storage_manager import StorageManager
+
+
+@pytest.fixture
+def manager(temp_dir):
+    """创建存储管理器实例"""
+    return StorageManager(temp_dir)
+
+
+def _ids(hits):
+    """结果的 (会话名称, 步骤编号) 列表"""
+    return [(hit.session_name, hit.thought_number) for hit in hits]
+
+
+class TestTokenize:
+    """分词测试"""
+
+    def test_cjk_bigrams(self):
+        """测试中文切分为二元组并追加末尾字符"""
+        assert tokenize("缓存命中") == ["缓存", "存命", "命中", "中"]
+
+    def test_mixed_text(self):
+        """测试拉丁文本按单词切分、转为小写，全角字符统一为半角"""
+        assert tokenize("Cache_Hit 率 P95，ＡＢＣ") == ["cache", "hit", "率", "p95", "abc"]
+
+    def test_match_query(self):
+        """测试搜索词转换为 FTS5 查询"""
+        assert (
+            build_match_query("缓存命中 率 Latency") == '"缓存 存命 命中" AND "率"* AND "latency"'
+        )
+
+    def test_empty_query(self):
+        """测试没有可搜索内容的搜索词"""
+        with pytest.raises(ValueError, match="没有可搜索的内容"):
+            build_match_query(" ，。 ")
+
+
+class TestStorageManagerSearch:
+    """StorageManager 搜索索引维护测试"""
+
+    def test_search_content_and_fields(self, manager):
+        """测试搜索思考内容、对比/假设字段和工具名称"""
+        session = manager.create_session(
+            name="缓存分析",
+            thoughts=[
+                Thought(thought_number=1, content="分析缓存命中率下降的原因"),
+                Thought(
+                    thought_number=2,
+                    content="比较两种方案",
+                    type="comparison",
+                    comparison_items=["Redis 集群", "本地 LRU"],
+                ),
+                Thought(
+                    thought_number=3,
+                    content="如果流量翻倍",
+                    type="hypothetical",
+                    hypothetical_condition="流量翻倍",
+                    hypothetical_impact="延迟上升",
+                ),
+            ],
+        )
+        session.add_tool_call_record(
+            ToolCallRecord(thought_number=1, call_data=ToolCallData(tool_name="query_metrics"))
+        )
+        manager.update_session(session)
+        # 与 sequential_thinking 相同：记录工具调用后更新思考步骤
+        manager.update_thought(session.session_id, session.thoughts[0])
+
+        assert _ids(manager.search_thoughts("命中率")[0]) == [("缓存分析", 1)]
+        assert _ids(manager.search_thoughts("redis")[0]) == [("缓存分析", 2)]
+        assert _ids(manager.search_thoughts("延迟")[0]) == [("缓存分析", 3)]
+        assert _ids(manager.search_thoughts("query_metrics")[0]) == [("缓存分析", 1)]
+        assert manager.search_thoughts("命中 redis")[1] == 0
+
+    def test_incremental_updates(self, manager):
+        """测试添加、更新思考步骤和删除会话后索引随之更新"""
+        session = manager.create_session(name="会话")
+        manager.add_thought(session.session_id, Thought(thought_number=1, content="初始想法"))
+        assert manager.search_thoughts("初始")[1] == 1
+        assert manager.search_index.is_built()
+
+        manager.update_thought(
+            session.session_id, Thought(thought_number=1, content="修订后的想法")
+        )
+        assert manager.search_thoughts("初始")[1] == 0
+        assert manager.search_thoughts("修订")[1] == 1
+        assert manager.search_index.count() == 1
+
+        session = manager.get_session(session.session_id)
+        session.mark_completed()
+        manager.update_session(session)
+        assert manager.search_thoughts("修订", status="completed")[1] == 1
+
+        manager.delete_session(session.session_id)
+        assert manager.search_thoughts("修订")[1] == 0
+        assert manager.search_index.count() == 0
+
+    def test_filters_and_pagination(self, manager):
+        """测试按会话状态、类型、阶段和时间过滤，分页返回"""
+        base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        thoughts = [
+            Thought(
+                thought_number=i,
+                content="性能分析" * i,
+                type="revision" if i % 2 == 0 else "regular",
+                is_revision=i % 2 == 0,
+                revises_thought=1 if i % 2 == 0 else None,
+                phase="analysis" if i > 3 else "thinking",
+                timestamp=base + timedelta(days=i),
+            )
+            for i in range(1, 6)
+        ]
+        manager.create_session(name="活跃", thoughts=thoughts)
+        done = manager.create_session(
+            name="完成", thoughts=[Thought(thought_number=1, content="性能分析")]
+        )
+        done.mark_completed()
+        manager.update_session(done)
+
+        hits, total = manager.search_thoughts("性能", limit=2)
+        assert total == 6
+        assert len(hits) == 2
+        assert hits[0].score >= hits[1].score
+        page_two, _ = manager.search_thoughts("性能", limit=2, offset=2)
+        assert not {(h.session_id, h.thought_number) for h in hits} & {
+            (h.session_id, h.thought_number) for h in page_two
+        }
+
+        assert manager.search_thoughts("性能", status="completed")[1] == 1
+        assert manager.search_thoughts("性能", thought_type="revision")[1] == 2
+        assert manager.search_thoughts("性能", phase="analysis")[1] == 2
+        hits, total = manager.search_thoughts(
+            "性能", since=base + timedelta(days=2), until=base + timedelta(days=3)
+        )
+        assert total == 2
+        assert {hit.thought_number for hit in hits} == {2, 3}
+        assert hits[0].timestamp.tzinfo is not None
+
+    def test_rebuild_existing_sessions(self, temp_dir):
+        """测试已有数据目录首次搜索时重建索引"""
+        manager = StorageManager(temp_dir)
+        manager.create_session(
+            name="旧会话", thoughts=[Thought(thought_number=1, content="历史推理")]
+        )
+        manager.search_index.clear()
+
+        reopened = StorageManager(temp_dir)
+        assert not reopened.search_index.is_built()
+        assert _ids(reopened.search_thoughts("推理")[0]) == [("旧会话", 1)]
+        assert reopened.search_index.is_built()
+
+    def test_failed_update_marks_stale(self, manager, monkeypatch):
+        """测试更新索引失败不影响写入，下次搜索时重建"""
+        manager.search_thoughts("预热")
+        session = manager.create_session(name="会话")
+
+        def fail(*_args, **_kwargs):
+            raise OSError("磁盘已满")
+
+        monkeypatch.setattr(manager.search_index, "index_session", fail)
+        assert manager.add_thought(session.session_id, Thought(thought_number=1, content="新想法"))
+        assert not manager.search_index.is_built()
+
+        monkeypatch.undo()
+        assert manager.search_thoughts("想法")[1] == 1
+
+    def test_restore_backup_rebuilds(self, manager):
+        """测试从备份恢复后重建索引"""
+        manager.create_session(
+            name="备份前", thoughts=[Thought(thought_number=1, content="备份内容")]
+        )
+        manager.create_backup("snap")
+        manager.create_session(
+            name="备份后", thoughts=[Thought(thought_number=1, content="备份内容")]
+        )
+
+        assert manager.restore_backup("snap")
+
+        assert _ids(manager.search_thoughts("备份")[0]) == [("备份前", 1)]
+
+
+def test_search_index_shared_file(temp_dir):
+    """测试两个实例共享同一索引文件"""
+    path = temp_dir / "thoughts.db"
+    manager = StorageManager(temp_dir)
+    session = manager.create_session(
+        name="会话", thoughts=[Thought(thought_number=1, content="共享")]
+    )
+    writer = SearchIndex(path)
+    writer.index_session(session)
+
+    reader = SearchIndex(path)
+    hits, total = reader.search("共享")
+
+    assert total == 1
+    assert hits[0].session_id == session.session_id
+    writer.close()
+    reader.close()
@@ -0,0 +1,209 @@
+"""
+相似思考检索索引测试
+"""
+
+import subprocess
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from deep_thinking.models.thought import Thought  # noqa: E402
+from deep_thinking.storage import similarity_index  # noqa: E402
+from deep_thinking.storage.similarity_index import (  # noqa: E402
+    DEFAULT_SIMILARITY_DIM,
+    SimilarityIndex,
+    get_similarity_dim,
+    vectorize,
+)
+from deep_thinking.storage.storage_manager import StorageManager  # noqa: E402
+
+
+@pytest.fixture
+def manager(temp_dir):
+    """创建存储管理器实例"""
+    return StorageManager(temp_dir)
+
+
+def _keys(hits):
+    """结果的 (会话ID, 步骤编号) 列表"""
+    return [(hit.session_id, hit.thought_number) for hit in hits]
+
+
+class TestVectorize:
+    """向量化测试"""
+
+    def test_normalized_and_deterministic(self):
+        """测试向量归一化且与进程无关"""
+        vectors = vectorize(["数据库连接池耗尽", "数据库连接池耗尽", "x"], dim=64)
+
+        assert vectors.shape == (3, 64)
+        assert vectors.dtype == np.float32
+        assert np.isclose(np.linalg.norm(vectors[0]), 1.0)
+        assert np.array_equal(vectors[0], vectors[1])
+        assert not vectors[2].any()
+
+    def test_similar_texts_score_higher(self):
+        """测试表述相近的文本相似度更高"""
+        base, near, far = vectorize(
+            [
+                "Redis cache hit ratio dropped after deploy",
+                "cache hit ratio dropped after the Redis deploy",
+                "用户界面的配色方案需要调整",
+            ]
+        )
+
+        assert base @ near > 0.5
+        assert base @ near > base @ far
+
+    def test_dim_from_env(self, monkeypatch):
+        """测试从环境变量读取向量维度"""
+        monkeypatch.setenv("DEEP_THINKING_SIMILARITY_DIM", "128")
+        assert get_similarity_dim() == 128
+
+        monkeypatch.setenv("DEEP_THINKING_SIMILARITY_DIM", "abc")
+        assert get_similarity_dim() == DEFAULT_SIMILARITY_DIM
+
+
+class TestSimilarityIndex:
+    """SimilarityIndex测试"""
+
+    def test_incremental_updates(self, manager):
+        """测试添加、更新思考步骤和删除会话后索引随之更新"""
+        session = manager.create_session(name="故障排查")
+        manager.add_thought(
+            session.session_id, Thought(thought_number=1, content="数据库连接池耗尽导致请求超时")
+        )
+        other = manager.create_session(
+            name="另一个会话",
+            thoughts=[Thought(thought_number=1, content="连接池耗尽，请求超时")],
+        )
+
+        hits = manager.find_similar_thoughts(["数据库连接池耗尽"])[0]
+        assert _keys(hits)[0] == (session.session_id, 1)
+        assert set(_keys(hits)) == {(session.session_id, 1), (other.session_id, 1)}
+        assert manager.similarity_index.count() == 2
+
+        manager.update_thought(
+            session.session_id, Thought(thought_number=1, content="界面配色调整")
+        )
+        hits = manager.find_similar_thoughts(["数据库连接池耗尽"])[0]
+        assert _keys(hits) == [(other.session_id, 1)]
+        assert manager.similarity_index.count() == 2
+
+        manager.delete_session(other.session_id)
+        assert manager.find_similar_thoughts(["数据库连接池耗尽"])[0] == []
+        assert manager.similarity_index.count() == 1
+
+    def test_exclusions_and_batch(self, manager):
+        """测试排除会话和思考步骤，多个查询一次完成"""
+        first = manager.create_session(
+            name="A",
+            thoughts=[
+                Thought(thought_number=1, content="缓存命中率下降"),
+                Thought(thought_number=2, content="缓存命中率明显下降"),
+            ],
+        )
+        second = manager.create_session(
+            name="B", thoughts=[Thought(thought_number=1, content="缓存命中率下降的原因")]
+        )
+
+        hits = manager.find_similar_thoughts(
+            ["缓存命中率下降"], exclude_thoughts=[(first.session_id, 1)]
+        )[0]
+        assert (first.session_id, 1) not in _keys(hits)
+        assert len(hits) == 2
+
+        hits = manager.find_similar_thoughts(
+            ["缓存命中率下降"], exclude_sessions=[first.session_id]
+        )[0]
+        assert _keys(hits) == [(second.session_id, 1)]
+
+        batch = manager.find_similar_thoughts(
+            ["缓存命中率", "毫不相关的内容"], top_k=1, min_score=0.2
+        )
+        assert len(batch[0]) == 1
+        assert batch[1] == []
+
+    def test_rebuild_and_dim_change(self, temp_dir):
+        """测试首次查询时重建索引，向量维度变化时重建"""
+        manager = StorageManager(temp_dir)
+        session = manager.create_session(
+            name="旧会话", thoughts=[Thought(thought_number=1, content="历史推理过程")]
+        )
+        manager.similarity_index.clear()
+
+        reopened = StorageManager(temp_dir)
+        assert _keys(reopened.find_similar_thoughts(["历史推理"])[0]) == [(session.session_id, 1)]
+
+        reopened.similarity_index = SimilarityIndex(temp_dir / "similarity", dim=64)
+        reopened._thought_indexes[-1] = reopened.similarity_index
+        assert not reopened.similarity_index.is_built()
+        assert _keys(reopened.find_similar_thoughts(["历史推理"])[0]) == [(session.session_id, 1)]
+        assert reopened.similarity_index.count() == 1
+
+    def test_compact_after_deletes(self, temp_dir, monkeypatch):
+        """测试清零的行多于有效行时压缩文件"""
+        monkeypatch.setattr(similarity_index, "_COMPACT_MIN_DELETED", 0)
+        index = SimilarityIndex(temp_dir / "similarity", dim=32)
+        keys = [("a", i) for i in range(1, 4)] + [("b", 1)]
+        index.add_vectors(keys, vectorize(["甲乙丙", "乙丙丁", "丙丁戊", "丁戊己"], dim=32))
+
+        index.remove_session("a")
+
+        assert index.vectors_path.stat().st_size == 32 * 2
+        hits = index.query(["丁戊己"])[0]
+        assert _keys(hits) == [("b", 1)]
+        assert hits[0].score == pytest.approx(1.0, abs=1e-2)
+
+    def test_clear_keeps_existing_mappings(self, temp_dir):
+        """测试清空时替换向量文件，其他进程已有的映射仍可读取"""
+        index = SimilarityIndex(temp_dir / "similarity", dim=32)
+        index.add_vectors([("s", 1), ("s", 2)], vectorize(["甲乙丙", "乙丙丁"], dim=32))
+        mapped = index._matrix()
+        inode = index.vectors_path.stat().st_ino
+
+        SimilarityIndex(temp_dir / "similarity", dim=32).clear()
+
+        assert index.vectors_path.stat().st_ino != inode
+        assert index.vectors_path.stat().st_size == 0
+        assert np.asarray(mapped[-1], dtype=np.float32).any()
+        assert index.query(["甲乙丙"]) == [[]]
+
+    def test_chunked_top_k(self, temp_dir, monkeypatch):
+        """测试分块计算时跨块合并前 k 个结果"""
+        monkeypatch.setattr(similarity_index, "_QUERY_CHUNK_ROWS", 3)
+        index = SimilarityIndex(temp_dir / "similarity", dim=64)
+        texts = [f"第{i}个方案：{'重试' * i}" for i in range(1, 11)]
+        index.add_vectors([("s", i) for i in range(1, 11)], vectorize(texts, dim=64))
+
+        hits = index.query([texts[6]], top_k=3)[0]
+
+        assert len(hits) == 3
+        assert hits[0].thought_number == 7
+        assert hits[0].score >= hits[1].score >= hits[2].score
+
+
+def test_numpy_missing(temp_dir, monkeypatch):
+    """测试未安装 numpy 时给出安装提示"""
+    monkeypatch.setattr(similarity_index, "_HAS_NUMPY", False)
+
+    with pytest.raises(ValueError, match="需要安装 numpy"):
+        vectorize(["内容"])
+
+    manager = StorageManager(temp_dir)
+    manager.similarity_index = None
+    with pytest.raises(ValueError, match="需要安装 numpy"):
+        manager.find_similar_thoughts(["内容"])
+
+
+def test_numpy_imported_lazily():
+    """测试导入存储管理器时不导入 numpy（不增加启动耗时）"""
+    code = (
+        "import sys\n"
+        "import deep_thinking.storage.storage_manager as m\n"
+        "assert m.SIMILARITY_AVAILABLE\n"
+        "assert 'numpy' not in sys.modules\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
@@ -2,7 +2,9 @@
 存储管理器单元测试
 """
 
+import multiprocessing
 from pathlib import Path
+from unittest.mock import patch
 
 import pytest
 
@@ -41,6 +43,52 @@ class TestStorageManager:
         assert session.metadata == {"key": "value"}
         assert isinstance(session.session_id, str)
 
+    def test_create_session_with_thoughts_writes_once(self, manager):
+        """测试带初始思考步骤创建会话时会话文件只写入一次"""
+        thoughts = [Thought(thought_number=i, content=f"步骤{i}") for i in (1, 2)]
+
+        with patch.object(manager.store, "write", wraps=manager.store.write) as mock_write:
+            session = manager.create_session(name="模板会话", thoughts=thoughts)
+
+        assert mock_write.call_count == 1
+        assert [t.content for t in manager.get_session(session.session_id).thoughts] == [
+            "步骤1",
+            "步骤2",
+        ]
+
+    def test_create_sessions(self, manager):
+        """测试批量创建会话只更新一次索引"""
+        from deep_thinking.models.thinking_session import ThinkingSession
+
+        sessions = [ThinkingSession(name=f"会话{i}") for i in range(3)]
+
+        with patch.object(manager, "_write_index", wraps=manager._write_index) as mock_index:
+            manager.create_sessions(sessions)
+
+        assert mock_index.call_count == 1
+        assert set(manager._read_index()) == {s.session_id for s in sessions}
+
+    def test_create_sessions_rollback(self, manager):
+        """测试批量创建中途失败时删除已写入的会话，索引不变"""
+        from deep_thinking.models.thinking_session import ThinkingSession
+
+        sessions = [ThinkingSession(name=f"会话{i}") for i in range(3)]
+        original_write = manager.store.write
+
+        def failing_write(key, data):
+            if key == sessions[2].session_id:
+                raise OSError("磁盘已满")
+            original_write(key, data)
+
+        with (
+            patch.object(manager.store, "write", side_effect=failing_write),
+            pytest.raises(OSError),
+        ):
+            manager.create_sessions(sessions)
+
+        assert manager._read_index() == {}
+        assert all(manager.get_session(s.session_id) is None for s in sessions)
+
     def test_get_session(self, manager):
         """测试获取会话"""
         created = manager.create_session(name="测试会话")
@@ -90,6 +138,29 @@ class TestStorageManager:
         result = manager.delete_session("nonexistent-id")
         assert result is False
 
+    def test_archived_session_compressed(self, temp_dir):
+        """测试已归档的会话压缩保存，超过阈值的会话压缩保存"""
+        manager = StorageManager(temp_dir, compress_threshold=2000)
+        session = manager.create_session(
+            name="归档会话",
+            thoughts=[Thought(thought_number=1, content="内容" * 10)],
+        )
+        assert not manager.store.is_compressed(session.session_id)
+
+        session.mark_archived()
+        manager.update_session(session)
+
+        assert manager.store.is_compressed(session.session_id)
+        loaded = manager.get_session(session.session_id)
+        assert loaded.status == "archived"
+        assert loaded.thoughts[0].content == "内容" * 10
+
+        large = manager.create_session(
+            name="大会话",
+            thoughts=[Thought(thought_number=1, content="分析" * 2000)],
+        )
+        assert manager.store.is_compressed(large.session_id)
+
     def test_list_sessions_all(self, manager):
         """测试列出所有会话"""
         manager.create_session(name="会话1")
@@ -127,6 +198,22 @@ class TestStorageManager:
         sessions = manager.list_sessions(limit=3)
         assert len(sessions) == 3
 
+    def test_find_session_ids_filters(self, manager):
+        """测试按状态和更新时间查找会话ID"""
+        from datetime import datetime, timedelta, timezone
+
+        s1 = manager.create_session(name="会话1")
+        s2 = manager.create_session(name="会话2")
+        s2.mark_completed()
+        manager.update_session(s2)
+
+        assert manager.find_session_ids() == [s1.session_id, s2.session_id]
+        assert manager.find_session_ids(status="completed") == [s2.session_id]
+
+        future = datetime.now(timezone.utc) + timedelta(days=1)
+        assert manager.find_session_ids(updated_after=future) == []
+        assert len(manager.find_session_ids(updated_before=future)) == 2
+
     def test_list_sessions_sorted_by_updated_at(self, manager):
         """测试按更新时间排序"""
         manager.create_session(name="会话1")
@@ -486,3 +573,305 @@ class TestStorageManager:
         # 验证 Statistics
         assert reloaded.statistics.total_tool_calls == 1
         assert reloaded.statistics.failed_tool_calls == 1
+
+
+class TestStorageManagerToolResultBlobs:
+    """工具调用结果移入内容寻址存储测试"""
+
+    @pytest.fixture
+    def manager(self, temp_dir):
+        """移出阈值为 1 KiB 的存储管理器"""
+        return StorageManager(temp_dir, blob_threshold=1024)
+
+    @staticmethod
+    def _record(result):
+        """创建带结果的工具调用记录"""
+        from deep_thinking.models.tool_call import ToolCallData, ToolCallRecord, ToolResultData
+
+        return ToolCallRecord(
+            thought_number=1,
+            call_data=ToolCallData(tool_name="search"),
+            result_data=ToolResultData(call_id="call-1", result=result),
+            status="completed",
+        )
+
+    def _create(self, manager, *results):
+        """创建带若干工具调用结果的会话"""
+        from deep_thinking.models.thinking_session import ThinkingSession
+
+        session = ThinkingSession(name="工具结果")
+        for result in results:
+            session.add_tool_call_record(self._record(result))
+        return manager.create_sessions([session])[0].session_id
+
+    def test_large_result_offloaded(self, manager):
+        """测试大结果移出、小结果内联，渲染时按需加载"""
+        large = {"hits": [{"title": f"结果 {i}", "body": "内容" * 20} for i in range(50)]}
+        session_id = self._create(manager, large, "小结果")
+
+        session = manager.get_session(session_id)
+        big, small = (record.result_data for record in session.tool_call_history)
+        assert big.result is None
+        assert big.result_blob is not None
+        assert small.result == "小结果"
+        assert small.result_blob is None
+        assert manager.blobs.refcount(big.result_blob) == 1
+        assert manager._read_index()[session_id]["blobs"] == [big.result_blob]
+        assert manager.store._get_file_path(session_id).stat().st_size < 4096
+
+        loaded = manager.get_session(session_id, load_tool_results=True)
+        assert loaded.tool_call_history[0].result_data.result == large
+        assert loaded.tool_call_history[0].result_data.result_blob is None
+
+    def test_rewrite_does_not_serialize_results(self, manager):
+        """测试重写会话时不再序列化已移出的结果"""
+        session_id = self._create(manager, ["大结果" * 1000])
+        session = manager.get_session(session_id)
+        session.description = "更新"
+
+        with patch.object(manager.blobs, "put") as put:
+            assert manager.update_session(session)
+
+        put.assert_not_called()
+        assert manager.blobs.refcount(session.tool_call_history[0].result_data.result_blob) == 1
+
+    def test_dedup_and_refcount(self, manager):
+        """测试跨会话去重，删除会话后引用计数减少"""
+        payload = ["相同结果" * 1000]
+        first = self._create(manager, payload)
+        second = self._create(manager, payload)
+        digest = manager._read_index()[first]["blobs"][0]
+
+        assert manager._read_index()[second]["blobs"] == [digest]
+        assert manager.blobs.refcount(digest) == 2
+
+        manager.delete_session(first)
+        assert manager.blobs.refcount(digest) == 1
+        manager.delete_session(second)
+        assert manager.blobs.refcount(digest) == 0
+        removed, freed = manager.blobs.collect_garbage(grace_seconds=0)
+        assert removed == 1
+        assert freed > 0
+        assert not manager.blobs.exists(digest)
+
+    def test_create_sessions_rollback_discards_blobs(self, manager):
+        """测试批量创建失败时删除新写入的内容，结果放回会话对象"""
+        from deep_thinking.models.thinking_session import ThinkingSession
+
+        shared = ["已有结果" * 1000]
+        session_id = self._create(manager, shared)
+        existing = manager._read_index()[session_id]["blobs"][0]
+        sessions = [ThinkingSession(name=f"会话{i}") for i in range(2)]
+        sessions[0].add_tool_call_record(self._record(["新结果" * 1000]))
+        sessions[0].add_tool_call_record(self._record(shared))
+        sessions[1].add_tool_call_record(self._record(["失败会话的结果" * 1000]))
+        original_write = manager.store.write
+
+        def failing_write(key, data, compress=None):
+            if key == sessions[1].session_id:
+                raise OSError("磁盘已满")
+            original_write(key, data, compress)
+
+        with (
+            patch.object(manager.store, "write", side_effect=failing_write),
+            pytest.raises(OSError),
+        ):
+            manager.create_sessions(sessions)
+
+        stored = manager.blobs.base_dir.glob("[0-9a-f][0-9a-f]/*")
+        assert list(stored) == [manager.blobs._get_path(existing)]
+        assert manager.blobs.refcount(existing) == 1
+        new, kept = (record.result_data for record in sessions[0].tool_call_history)
+        assert (new.result, new.result_blob) == (["新结果" * 1000], None)
+        assert kept.result_blob == existing
+        assert sessions[1].tool_call_history[0].result_data.result == ["失败会话的结果" * 1000]
+
+        # 重试时重新移出
+        manager.create_sessions(sessions)
+        assert manager.blobs.refcount(existing) == 2
+        assert len(list(manager.blobs.base_dir.glob("[0-9a-f][0-9a-f]/*"))) == 3
+
+    def test_missing_blob_keeps_reference(self, manager):
+        """测试内容缺失时保留哈希引用"""
+        session_id = self._create(manager, ["大结果" * 1000])
+        digest = manager._read_index()[session_id]["blobs"][0]
+        manager.blobs._get_path(digest).unlink()
+
+        session = manager.get_session(session_id, load_tool_results=True)
+
+        assert session.tool_call_history[0].result_data.result_blob == digest
+
+    def test_backup_restores_blobs(self, manager):
+        """测试完整备份包含工具调用结果，恢复后重建引用计数"""
+        session_id = self._create(manager, ["大结果" * 1000])
+        digest = manager._read_index()[session_id]["blobs"][0]
+        manager.create_backup("snap")
+
+        manager.delete_session(session_id)
+        manager.blobs.collect_garbage(grace_seconds=0)
+        assert not manager.blobs.exists(digest)
+
+        assert manager.restore_backup("snap")
+        assert manager.blobs.refcount(digest) == 1
+        loaded = manager.get_session(session_id, load_tool_results=True)
+        assert loaded.tool_call_history[0].result_data.result == ["大结果" * 1000]
+
+    def test_disabled(self, temp_dir):
+        """测试移出阈值为 0 时结果保持内联"""
+        manager = StorageManager(temp_dir, blob_threshold=0)
+        session_id = self._create(manager, ["大结果" * 1000])
+
+        record = manager.get_session(session_id).tool_call_history[0]
+        assert record.result_data.result == ["大结果" * 1000]
+        assert "blobs" not in manager._read_index()[session_id]
+
+
+class TestStorageManagerThoughtIndexes:
+    """思考步骤索引更新测试"""
+
+    @pytest.fixture
+    def manager(self, temp_dir):
+        """创建存储管理器实例"""
+        return StorageManager(temp_dir)
+
+    @staticmethod
+    def _spy(manager, monkeypatch):
+        """记录统计汇总表收到的索引操作"""
+        calls = []
+        index = manager.analytics_index
+        for method in ("index_session", "update_session"):
+            original = getattr(index, method)
+
+            def record(*args, _method=method, _original=original):
+                calls.append((_method, *args[1:]))
+                return _original(*args)
+
+            monkeypatch.setattr(index, method, record)
+        return calls
+
+    def test_add_thought_indexes_once(self, manager, monkeypatch):
+        """测试添加思考步骤时每个索引只更新一次"""
+        session = manager.create_session(name="会话")
+        calls = self._spy(manager, monkeypatch)
+
+        manager.add_thought(session.session_id, Thought(thought_number=1, content="想法"))
+
+        assert calls == [("index_session", [1])]
+
+    def test_deferred_updates(self, manager, monkeypatch):
+        """测试后台更新：写入只提交一个后台任务，查询前执行队列中的操作"""
+        jobs = []
+        manager.defer_thought_indexes(jobs.append)
+        session = manager.create_session(name="会话")
+        jobs.pop()()
+        calls = self._spy(manager, monkeypatch)
+
+        manager.add_thought(session.session_id, Thought(thought_number=1, content="第一个想法"))
+        manager.add_thought(session.session_id, Thought(thought_number=2, content="第二个想法"))
+
+        # 写入路径没有更新索引，两次写入共用一个后台任务
+        assert calls == []
+        assert len(jobs) == 1
+        assert manager.search_index.count() == 0
+
+        # 后台任务把同一会话相邻的操作合并为一次
+        jobs.pop()()
+        assert calls == [("index_session", [1, 2])]
+        assert manager.search_thoughts("想法")[1] == 2
+
+        # 查询前先执行尚未执行的操作（读到自己的写入）
+        manager.delete_session(session.session_id)
+        assert len(jobs) == 1
+        assert manager.search_thoughts("想法")[1] == 0
+        assert manager.get_analytics(max_thoughts=50).sessions == 0
+
+    def test_disable_deferred_flushes(self, manager):
+        """测试停止后台更新时执行剩余操作，之后恢复同步更新"""
+        jobs = []
+        manager.defer_thought_indexes(jobs.append)
+        manager.create_session(name="会话", thoughts=[Thought(thought_number=1, content="剩余")])
+
+        manager.defer_thought_indexes(None)
+        assert manager.search_index.count() == 1
+
+        manager.create_session(name="会话", thoughts=[Thought(thought_number=1, content="同步")])
+        assert manager.search_index.count() == 2
+        assert len(jobs) == 1
+
+    def test_submit_failure_updates_inline(self, manager):
+        """测试后台任务提交失败时在当前线程更新"""
+
+        def closed(_job):
+            raise RuntimeError("cannot schedule new futures after shutdown")
+
+        manager.defer_thought_indexes(closed)
+        manager.create_session(name="会话", thoughts=[Thought(thought_number=1, content="内容")])
+
+        assert manager.search_index.count() == 1
+
+    def test_deferred_with_executor(self, manager):
+        """测试由任务执行器的I/O线程池执行后台更新"""
+        from deep_thinking.utils.executor import TaskExecutor
+
+        executor = TaskExecutor(render_workers=0, io_threads=2)
+        manager.defer_thought_indexes(executor.submit)
+        try:
+            session = manager.create_session(name="会话")
+            for number in range(1, 21):
+                manager.add_thought(
+                    session.session_id, Thought(thought_number=number, content=f"步骤{number}")
+                )
+            assert manager.search_thoughts("步骤")[1] == 20
+            assert manager.get_analytics(max_thoughts=50).thoughts == 20
+        finally:
+            manager.defer_thought_indexes(None)
+            executor.shutdown()
+
+
+def _add_thoughts_in_process(data_dir: str, session_id: str, start: int, count: int) -> None:
+    """在独立进程中追加思考步骤（跨进程并发写入测试用）"""
+    manager = StorageManager(Path(data_dir))
+    for number in range(start, start + count):
+        manager.add_thought(session_id, Thought(thought_number=number, content=f"步骤{number}"))
+
+
+class TestStorageManagerMultiProcess:
+    """多进程共享数据目录测试"""
+
+    def test_session_lock_reentrant(self, temp_dir):
+        """测试会话锁可重入（add_thought 可在持锁时调用）"""
+        manager = StorageManager(temp_dir)
+        session = manager.create_session(name="锁测试")
+
+        with manager.session_lock(session.session_id):
+            assert manager.add_thought(
+                session.session_id, Thought(thought_number=1, content="持锁写入")
+            )
+
+        reloaded = manager.get_session(session.session_id)
+        assert reloaded is not None
+        assert reloaded.thought_count() == 1
+
+    def test_concurrent_add_thought_across_processes(self, temp_dir):
+        """测试多个进程同时追加步骤不会丢失更新"""
+        manager = StorageManager(temp_dir)
+        session = manager.create_session(name="多进程会话")
+
+        context = multiprocessing.get_context("spawn")
+        processes = [
+            context.Process(
+                target=_add_thoughts_in_process,
+                args=(str(temp_dir), session.session_id, worker * 10 + 1, 10),
+            )
+            for worker in range(3)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(timeout=60)
+            assert process.exitcode == 0
+
+        reloaded = manager.get_session(session.session_id)
+        assert reloaded is not None
+        assert sorted(t.thought_number for t in reloaded.thoughts) == list(range(1, 31))
+        assert list(manager._read_index()) == [session.session_id]
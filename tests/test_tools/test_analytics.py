@@ -0,0 +1,72 @@
+"""
+统计工具单元测试
+"""
+
+import pytest
+
+from deep_thinking.models.thought import Thought
+from deep_thinking.models.tool_call import ToolCallData, ToolCallRecord
+from deep_thinking.storage.storage_manager import StorageManager
+from deep_thinking.tools import analytics
+
+
+@pytest.fixture
+def manager(temp_dir, monkeypatch):
+    """创建存储管理器并替换工具使用的全局实例"""
+    manager = StorageManager(temp_dir)
+    monkeypatch.setattr(analytics, "get_storage_manager", lambda: manager)
+    monkeypatch.setattr(analytics, "get_task_executor", lambda: None)
+    return manager
+
+
+class TestGetAnalyticsTool:
+    """测试 get_analytics 工具"""
+
+    async def test_report(self, manager):
+        """测试输出概览、模板、工具和每日统计"""
+        session = manager.create_session(
+            name="排查",
+            metadata={"template_id": "problem_solving"},
+            thoughts=[
+                Thought(thought_number=i, content="分析" * 5, phase="analysis") for i in range(1, 4)
+            ],
+        )
+        session.add_tool_call_record(
+            ToolCallRecord(
+                thought_number=1, call_data=ToolCallData(tool_name="search"), status="failed"
+            )
+        )
+        manager.update_session(session)
+
+        result = await analytics.get_analytics(max_thoughts=3, status="Active")
+
+        assert "## 📊 跨会话统计" in result
+        assert "**过滤条件**: status=active" in result
+        assert "- **会话数**: 1（思考步骤数达到上限 3 的会话: 1）" in result
+        assert "- **思考步骤数**: 3（平均长度 10.0 字符）" in result
+        assert "- **工具调用**: 1（失败 1，失败率 100.0%）" in result
+        assert "| problem_solving | 1 | 1 | 3 | 10.0 | analysis 3（100.0%） |" in result
+        assert "| search | 1 | 1 | 100.0% | 0 | 0.0 |" in result
+        assert "### 每日统计（UTC）" in result
+
+    async def test_empty_and_filters(self, manager):
+        """测试没有数据时的输出和过滤条件"""
+        manager.create_session(name="会话", thoughts=[Thought(thought_number=1, content="内容")])
+
+        result = await analytics.get_analytics(
+            since="2000-01-01T08:00:00+09:00", until="2000-01-02", template_id="none"
+        )
+
+        assert "**过滤条件**: since=1999-12-31, until=2000-01-02, template_id=none" in result
+        assert "暂无统计数据" in result
+
+    async def test_invalid_arguments(self, manager):
+        """测试无效参数"""
+        with pytest.raises(ValueError, match="无效的状态值"):
+            await analytics.get_analytics(status="unknown")
+        with pytest.raises(ValueError, match="since 时间格式无效"):
+            await analytics.get_analytics(since="昨天")
+        with pytest.raises(ValueError, match="top 必须大于0"):
+            await analytics.get_analytics(top=0)
+        with pytest.raises(ValueError, match="max_thoughts 必须大于0"):
+            await analytics.get_analytics(max_thoughts=0)
@@ -0,0 +1,121 @@
+"""
+诊断工具单元测试
+"""
+
+import pytest
+
+from deep_thinking.tools import diagnostics
+from deep_thinking.utils.metrics import metrics
+
+
+@pytest.fixture
+def global_metrics(monkeypatch):
+    """启用并清空全局指标"""
+    monkeypatch.setattr(metrics, "enabled", True)
+    metrics.reset()
+    yield metrics
+    metrics.reset()
+
+
+class TestGetServerMetricsTool:
+    """测试 get_server_metrics 工具"""
+
+    def test_markdown(self, global_metrics):
+        """测试Markdown格式输出"""
+        global_metrics.observe_tool("get_session", 0.012)
+        global_metrics.count_storage("read")
+        global_metrics.add_bytes(read=2048)
+        global_metrics.count_cache("render", "hit")
+
+        result = diagnostics.get_server_metrics()
+
+        assert "服务器运行指标" in result
+        assert "| get_session | 1 | 0 | 12.0 |" in result
+        assert "**操作次数**: read 1" in result
+        assert "**读取**: 2.0 KB" in result
+        assert "命中率 100.0%" in result
+
+    def test_empty(self, global_metrics):
+        """测试没有调用记录"""
+        result = diagnostics.get_server_metrics()
+
+        assert "暂无工具调用记录" in result
+        assert "**操作次数**: 无" in result
+
+    def test_disabled(self, global_metrics, monkeypatch):
+        """测试指标禁用时给出提示"""
+        monkeypatch.setattr(global_metrics, "enabled", False)
+
+        assert "指标已禁用" in diagnostics.get_server_metrics()
+
+    def test_prometheus(self, global_metrics):
+        """测试Prometheus格式输出"""
+        global_metrics.observe_tool("get_session", 0.012)
+
+        result = diagnostics.get_server_metrics(format="Prometheus")
+
+        assert 'deepthinking_tool_duration_seconds_count{tool="get_session"} 1' in result
+
+    def test_invalid_format(self, global_metrics):
+        """测试无效格式"""
+        with pytest.raises(ValueError, match="无效的输出格式"):
+            diagnostics.get_server_metrics(format="xml")
+
+
+class TestProfileServerTool:
+    """测试 profile_server 工具"""
+
+    def test_start_status_stop(self, temp_dir, monkeypatch):
+        """测试开始、查询和停止性能分析"""
+        from deep_thinking.utils.profiler import profiler
+
+        monkeypatch.setenv("DEEP_THINKING_DATA_DIR", str(temp_dir))
+        try:
+            result = diagnostics.profile_server(action="start", mode="sampling", calls=5)
+            assert "进行中（sampling）" in result
+            assert "5 次工具调用后" in result
+
+            assert "**已完成调用**: 0" in diagnostics.profile_server()
+
+            result = diagnostics.profile_server(action="stop")
+            assert "已停止，结果文件" in result
+            assert "未在分析" in result
+            assert list((temp_dir / "profiles").glob("profile-*.folded"))
+        finally:
+            profiler.stop()
+
+    def test_invalid_action(self, temp_dir, monkeypatch):
+        """测试无效动作"""
+        monkeypatch.setenv("DEEP_THINKING_DATA_DIR", str(temp_dir))
+        with pytest.raises(ValueError, match="无效的分析动作"):
+            diagnostics.profile_server(action="pause")
+
+
+class TestRunMaintenanceTool:
+    """测试 run_maintenance 工具"""
+
+    async def test_report(self, temp_dir, monkeypatch):
+        """测试执行维护并返回回收报告"""
+        from deep_thinking.models.thought import Thought
+        from deep_thinking.storage.retention import RetentionPolicy, RetentionService
+        from deep_thinking.storage.storage_manager import StorageManager
+
+        manager = StorageManager(temp_dir)
+        thoughts = [Thought(thought_number=1, content="归档内容" * 200)]
+        session = manager.create_session(name="旧会话", thoughts=thoughts)
+        session.mark_archived()
+        manager.update_session(session)
+        # 模拟未启用压缩时归档的会话
+        data = manager.store.read(session.session_id)
+        manager.store.write(session.session_id, data, compress=False)
+        service = RetentionService(manager, RetentionPolicy(archive_after_days=0, snapshot_keep=0))
+        monkeypatch.setattr(diagnostics, "get_retention_service", lambda: service)
+
+        result = await diagnostics.run_maintenance()
+
+        assert "## 🧹 数据维护" in result
+        assert "**压缩会话**: 1" in result
+        assert "**删除备份文件**: 0" in result
+        assert "- 不自动归档" in result
+        assert "- 完整备份全部保留" in result
+        assert service.last_report is not None
@@ -5,6 +5,9 @@
 """
 
 import json
+import os
+from datetime import datetime
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -13,7 +16,12 @@ from deep_thinking.models.thinking_session import ThinkingSession
 from deep_thinking.models.thought import Thought
 from deep_thinking.models.tool_call import ToolCallData, ToolCallRecord, ToolResultData
 from deep_thinking.tools import export
-from deep_thinking.utils.formatters import SessionFormatter, export_session_to_file
+from deep_thinking.utils.formatters import (
+    SessionFormatter,
+    export_session_to_file,
+    iter_render_session,
+    render_session,
+)
 
 # =============================================================================
 # SessionFormatter.to_json 测试
@@ -241,6 +249,47 @@ class TestSessionFormatterToText:
         assert "修订: 步骤 1" in result
 
 
+# =============================================================================
+# iter_render_session 测试
+# =============================================================================
+
+
+class TestIterRenderSession:
+    """测试按块渲染"""
+
+    @pytest.fixture
+    def long_session(self, sample_session_data):
+        session = ThinkingSession(**sample_session_data)
+        for number in range(1, 41):
+            session.add_thought(
+                Thought(thought_number=number, content=f"步骤{number} <内容> " * 20)
+            )
+        return session
+
+    @pytest.mark.parametrize("format_type", ["json", "markdown", "md", "html", "text", "txt"])
+    def test_chunks_join_to_full_render(self, long_session, format_type):
+        """测试各块拼接后与完整渲染一致"""
+        with patch("deep_thinking.utils.formatters.datetime") as mock_datetime:
+            mock_datetime.now.return_value = datetime(2026, 1, 1, 12, 0, 0)
+            chunks = list(iter_render_session(long_session, format_type, chunk_size=1024))
+            expected = render_session(long_session, format_type)
+
+        assert len(chunks) > 1
+        assert "".join(chunks) == expected
+
+    def test_first_chunk_contains_document_head(self, long_session):
+        """测试第一块在文档头部渲染后即产生"""
+        first = next(iter_render_session(long_session, "html", chunk_size=512))
+
+        assert first.startswith("<!DOCTYPE html>")
+        assert "步骤40" not in first
+
+    def test_unsupported_format(self, long_session):
+        """测试不支持的格式"""
+        with pytest.raises(ValueError, match="不支持的格式"):
+            next(iter_render_session(long_session, "pdf"))
+
+
 # =============================================================================
 # export_session_to_file 测试
 # =============================================================================
@@ -362,6 +411,8 @@ class TestExportSessionTool:
 
         assert "会话已导出" in result
         assert "json" in result
+        # JSON 格式渲染工具调用结果内容，加载已移出的结果
+        mock_manager.get_session.assert_called_once_with("test-session-123", True)
 
     async def test_export_session_custom_path(self, sample_session_data, temp_dir, clean_env):
         """测试自定义输出路径"""
@@ -402,6 +453,263 @@ class TestExportSessionTool:
         ):
             await export.export_session("test-session-123", "invalid_format")
 
+    async def test_export_session_external_css(self, sample_session_data, temp_dir, clean_env):
+        """测试 HTML 导出使用外部样式表"""
+        session = ThinkingSession(**sample_session_data)
+        session.add_thought(Thought(thought_number=1, content="思考"))
+        output_path = temp_dir / "session.html"
+
+        mock_manager = MagicMock()
+        mock_manager.get_session.return_value = session
+
+        with patch("deep_thinking.tools.export.get_storage_manager", return_value=mock_manager):
+            await export.export_session("test-session-123", "html", str(output_path), True)
+
+        html = output_path.read_text(encoding="utf-8")
+        assert '<link rel="stylesheet" href="deepthinking.css">' in html
+        assert "<style>" not in html
+        assert (temp_dir / "deepthinking.css").read_text(encoding="utf-8").startswith("* {")
+
+
+# =============================================================================
+# export_sessions 批量导出测试
+# =============================================================================
+
+
+@pytest.fixture
+def bulk_storage(temp_dir):
+    """包含多个会话的真实存储管理器"""
+    from deep_thinking.storage.storage_manager import StorageManager
+
+    manager = StorageManager(temp_dir / "data")
+    for i in range(5):
+        session = manager.create_session(name=f"批量会话{i}", session_id=f"bulk-session-{i}")
+        session.add_thought(Thought(thought_number=1, content=f"思考内容{i}"))
+        if i % 2 == 0:
+            session.mark_completed()
+        manager.update_session(session)
+    return manager
+
+
+@pytest.mark.asyncio
+class TestExportSessionsTool:
+    """测试 export_sessions MCP 工具"""
+
+    async def test_export_sessions_to_dir(self, bulk_storage, temp_dir):
+        """测试导出到目录"""
+        output = temp_dir / "out"
+
+        with patch("deep_thinking.tools.export.get_storage_manager", return_value=bulk_storage):
+            result = await export.export_sessions("json", str(output), workers=1)
+
+        assert "批量导出完成" in result
+        files = sorted(p.name for p in output.glob("*.json"))
+        assert len(files) == 5
+        # 全部成功后移除检查点
+        assert not (output / ".export_checkpoint.json").exists()
+
+    async def test_export_sessions_status_filter(self, bulk_storage, temp_dir):
+        """测试按状态过滤"""
+        output = temp_dir / "out"
+
+        with patch("deep_thinking.tools.export.get_storage_manager", return_value=bulk_storage):
+            await export.export_sessions("markdown", str(output), status="completed", workers=1)
+
+        assert len(list(output.glob("*.md"))) == 3
+
+    async def test_export_sessions_zip_parallel(self, bulk_storage, temp_dir):
+        """测试多进程导出到 ZIP 归档"""
+        import zipfile
+
+        output = temp_dir / "sessions.zip"
+
+        with patch("deep_thinking.tools.export.get_storage_manager", return_value=bulk_storage):
+            await export.export_sessions("html", str(output), archive="zip", workers=2)
+
+        with zipfile.ZipFile(output) as zf:
+            names = zf.namelist()
+        assert len(names) == 5
+        assert all(name.endswith(".html") for name in names)
+
+    async def test_export_sessions_pool_uses_spawn(self, bulk_storage, temp_dir):
+        """测试多进程导出使用 spawn 启动方式"""
+        from concurrent.futures import ProcessPoolExecutor
+
+        contexts = []
+
+        class RecordingPool(ProcessPoolExecutor):
+            def __init__(self, *args, **kwargs):
+                contexts.append(kwargs.get("mp_context"))
+                super().__init__(*args, **kwargs)
+
+        output = temp_dir / "out"
+
+        with (
+            patch("deep_thinking.tools.export.get_storage_manager", return_value=bulk_storage),
+            patch("concurrent.futures.ProcessPoolExecutor", RecordingPool),
+        ):
+            await export.export_sessions("json", str(output), workers=2)
+
+        assert len(contexts) == 1
+        assert contexts[0].get_start_method() == "spawn"
+        assert len(list(output.glob("*.json"))) == 5
+
+    async def test_export_sessions_external_css(self, bulk_storage, temp_dir):
+        """测试批量 HTML 导出共享一个样式表"""
+        output = temp_dir / "out"
+
+        with patch("deep_thinking.tools.export.get_storage_manager", return_value=bulk_storage):
+            await export.export_sessions("html", str(output), workers=1, external_css=True)
+
+        assert (output / "deepthinking.css").exists()
+        pages = list(output.glob("*.html"))
+        assert len(pages) == 5
+        assert all("deepthinking.css" in page.read_text(encoding="utf-8") for page in pages)
+
+    async def test_export_sessions_tar_with_ids(self, bulk_storage, temp_dir):
+        """测试按会话ID导出到 TAR 归档"""
+        import tarfile
+
+        output = temp_dir / "sessions.tar"
+        ids = ["bulk-session-1", "bulk-session-3", "missing"]
+
+        with patch("deep_thinking.tools.export.get_storage_manager", return_value=bulk_storage):
+            await export.export_sessions(
+                "text", str(output), archive="tar", session_ids=ids, workers=1
+            )
+
+        with tarfile.open(output) as tf:
+            names = tf.getnames()
+        assert len(names) == 2
+
+    async def test_export_sessions_resume_from_checkpoint(self, bulk_storage, temp_dir):
+        """测试从检查点续传"""
+        from deep_thinking.utils.bulk_export import export_sessions_bulk
+
+        output = temp_dir / "out"
+        checkpoint = output / ".export_checkpoint.json"
+        output.mkdir()
+        checkpoint.write_text(
+            json.dumps({"format": "json", "completed": ["bulk-session-0", "bulk-session-1"]}),
+            encoding="utf-8",
+        )
+
+        ids = bulk_storage.find_session_ids()
+        result = export_sessions_bulk(bulk_storage.data_dir, ids, "json", output, workers=1)
+
+        assert result.skipped == 2
+        assert result.exported == 3
+        assert len(list(output.glob("*.json"))) == 3
+        assert not checkpoint.exists()
+
+    async def test_export_sessions_failure_keeps_checkpoint(self, bulk_storage, temp_dir):
+        """测试存在失败会话时保留检查点"""
+        from deep_thinking.utils.bulk_export import export_sessions_bulk
+
+        output = temp_dir / "out"
+        ids = ["bulk-session-0", "missing"]
+        result = export_sessions_bulk(bulk_storage.data_dir, ids, "json", output, workers=1)
+
+        assert result.exported == 1
+        assert "missing" in result.failed
+        data = json.loads((output / ".export_checkpoint.json").read_text(encoding="utf-8"))
+        assert data["completed"] == ["bulk-session-0"]
+
+    @pytest.mark.parametrize("archive", ["zip", "tar"])
+    async def test_export_sessions_resume_after_kill(self, bulk_storage, temp_dir, archive):
+        """测试导出进程在写归档途中被杀死后续传，归档完整且没有重复成员"""
+        import subprocess
+        import sys
+        import tarfile
+        import zipfile
+
+        import deep_thinking
+        from deep_thinking.utils.bulk_export import export_sessions_bulk, staging_path
+
+        output = temp_dir / f"sessions.{archive}"
+        ids = bulk_storage.find_session_ids()
+        # 每 2 个会话写一次检查点，导出第 3 个会话后直接退出进程（不执行清理）
+        script = f"""
+import os
+from deep_thinking.utils import bulk_export
+
+bulk_export.CHECKPOINT_INTERVAL = 2
+
+def report(done, total):
+    if done == 3:
+        os._exit(9)
+
+bulk_export.export_sessions_bulk(
+    {str(bulk_storage.data_dir)!r}, {ids!r}, "json", {str(output)!r},
+    archive={archive!r}, workers=1, progress=report,
+)
+"""
+        src_dir = str(Path(deep_thinking.__file__).resolve().parent.parent)
+        killed = subprocess.run(
+            [sys.executable, "-c", script], env={**os.environ, "PYTHONPATH": src_dir}
+        )
+        assert killed.returncode == 9
+        assert not output.exists()
+
+        result = export_sessions_bulk(
+            bulk_storage.data_dir, ids, "json", output, archive=archive, workers=1
+        )
+
+        assert (result.skipped, result.exported) == (2, 3)
+        if archive == "zip":
+            with zipfile.ZipFile(output) as zf:
+                assert zf.testzip() is None
+                names = zf.namelist()
+        else:
+            with tarfile.open(output) as tf:
+                names = tf.getnames()
+        assert len(names) == 5
+        assert len(set(names)) == 5
+        assert not staging_path(output).exists()
+
+    async def test_export_sessions_default_output_resumes(
+        self, bulk_storage, temp_dir, monkeypatch
+    ):
+        """测试默认输出路径由导出参数决定，重新调用时续传同一输出"""
+        from deep_thinking.utils.bulk_export import checkpoint_path, default_output_path
+
+        monkeypatch.setattr(Path, "home", lambda: temp_dir)
+        output = default_output_path("json", "zip", "completed")
+        assert output == default_output_path("json", "zip", "completed")
+        assert output != default_output_path("json", "zip", "active")
+        assert output.parent == temp_dir / "exports"
+        assert output.name.endswith(".zip")
+
+        # 上次运行中断，检查点记录了一个已完成的会话
+        output.parent.mkdir()
+        checkpoint_path(output, "zip").write_text(
+            json.dumps({"format": "json", "completed": ["bulk-session-0"]}), encoding="utf-8"
+        )
+
+        with patch("deep_thinking.tools.export.get_storage_manager", return_value=bulk_storage):
+            result = await export.export_sessions(
+                "json", archive="zip", status="completed", workers=1
+            )
+
+        assert f"`{output}`" in result
+        assert "**检查点跳过**: 1" in result
+
+    async def test_export_sessions_invalid_archive(self, bulk_storage):
+        """测试无效输出模式"""
+        with (
+            patch("deep_thinking.tools.export.get_storage_manager", return_value=bulk_storage),
+            pytest.raises(ValueError, match="不支持的输出模式"),
+        ):
+            await export.export_sessions("json", archive="rar")
+
+    async def test_export_sessions_invalid_datetime(self, bulk_storage):
+        """测试无效时间参数"""
+        with (
+            patch("deep_thinking.tools.export.get_storage_manager", return_value=bulk_storage),
+            pytest.raises(ValueError, match="updated_after"),
+        ):
+            await export.export_sessions("json", updated_after="not-a-date")
+
 
 # =============================================================================
 # 辅助函数测试
@@ -0,0 +1,143 @@
+"""
+搜索工具单元测试
+"""
+
+import re
+
+import pytest
+
+from deep_thinking.models.thought import Thought
+from deep_thinking.storage.storage_manager import StorageManager
+from deep_thinking.tools import search
+
+
+@pytest.fixture
+def manager(temp_dir, monkeypatch):
+    """创建存储管理器并替换工具使用的全局实例"""
+    manager = StorageManager(temp_dir)
+    monkeypatch.setattr(search, "get_storage_manager", lambda: manager)
+    monkeypatch.setattr(search, "get_task_executor", lambda: None)
+    return manager
+
+
+class TestSearchThoughtsTool:
+    """测试 search_thoughts 工具"""
+
+    async def test_results_and_pagination(self, manager):
+        """测试返回排序结果和下一页游标"""
+        thoughts = [
+            Thought(thought_number=i, content=f"第{i}步：数据库连接池耗尽导致超时")
+            for i in range(1, 4)
+        ]
+        session = manager.create_session(name="故障排查", thoughts=thoughts)
+
+        result = await search.search_thoughts("连接池", limit=2)
+
+        assert "**匹配数**: 3" in result
+        assert f"**会话ID**: {session.session_id}（active）" in result
+        assert "故障排查 · 步骤" in result
+        assert "> 第3步：数据库连接池耗尽导致超时" in result
+        cursor = re.search(r"\*\*下一页游标\*\*: `([^`]+)`", result).group(1)
+
+        result = await search.search_thoughts("连接池", limit=2, cursor=cursor)
+
+        assert "### 3. 故障排查" in result
+        assert "**本页**: 第 3-3 个（共 3 个）" in result
+        assert "下一页游标" not in result
+
+    async def test_filters(self, manager):
+        """测试过滤条件"""
+        manager.create_session(
+            name="会话", thoughts=[Thought(thought_number=1, content="回滚方案")]
+        )
+
+        result = await search.search_thoughts(
+            "回滚", status="Completed", since="2020-01-01", phase="analysis"
+        )
+
+        assert (
+            "**过滤条件**: status=completed, phase=analysis, since=2020-01-01T00:00:00+00:00"
+            in result
+        )
+        assert "没有匹配的思考步骤" in result
+
+    async def test_invalid_arguments(self, manager):
+        """测试无效参数"""
+        with pytest.raises(ValueError, match="无效的思考类型"):
+            await search.search_thoughts("回滚", thought_type="unknown")
+        with pytest.raises(ValueError, match="since 时间格式无效"):
+            await search.search_thoughts("回滚", since="昨天")
+        with pytest.raises(ValueError, match="limit 必须大于0"):
+            await search.search_thoughts("回滚", limit=0)
+
+
+def test_make_snippet():
+    """测试截取匹配词附近的片段"""
+    content = "前言" * 100 + "关键结论" + "后记" * 100
+
+    snippet = search.make_snippet(content, "关键结论", max_chars=40)
+
+    assert snippet.startswith("…")
+    assert snippet.endswith("…")
+    assert "关键结论" in snippet
+
+
+class TestFindSimilarThoughtsTool:
+    """测试 find_similar_thoughts 工具"""
+
+    async def test_by_text(self, manager):
+        """测试按文本查找相似思考步骤"""
+        pytest.importorskip("numpy")
+        session = manager.create_session(
+            name="故障排查",
+            thoughts=[
+                Thought(thought_number=1, content="数据库连接池耗尽导致请求超时"),
+                Thought(thought_number=2, content="界面配色方案", phase="analysis"),
+            ],
+        )
+
+        result = await search.find_similar_thoughts(text="连接池耗尽，请求超时")
+
+        assert "## 🧭 相似思考" in result
+        assert "**结果数**: 1" in result
+        assert "### 1. 故障排查 · 步骤 1" in result
+        assert f"**会话ID**: {session.session_id}（active）" in result
+        assert "> 数据库连接池耗尽导致请求超时" in result
+
+    async def test_by_reference(self, manager):
+        """测试按已有思考步骤查找，结果不包含该步骤本身"""
+        pytest.importorskip("numpy")
+        first = manager.create_session(
+            name="A",
+            thoughts=[
+                Thought(thought_number=1, content="缓存命中率下降"),
+                Thought(thought_number=2, content="缓存命中率明显下降"),
+            ],
+        )
+        manager.create_session(
+            name="B", thoughts=[Thought(thought_number=1, content="缓存命中率下降的原因")]
+        )
+
+        result = await search.find_similar_thoughts(session_id=first.session_id, thought_number=1)
+
+        assert f"**参考步骤**: {first.session_id} · 步骤 1" in result
+        assert "**结果数**: 2" in result
+        assert "A · 步骤 1" not in result
+
+        result = await search.find_similar_thoughts(
+            session_id=first.session_id, thought_number=1, exclude_same_session=True
+        )
+
+        assert "**结果数**: 1" in result
+        assert "### 1. B · 步骤 1" in result
+
+    async def test_invalid_arguments(self, manager):
+        """测试无效参数"""
+        with pytest.raises(ValueError, match="二选一"):
+            await search.find_similar_thoughts()
+        with pytest.raises(ValueError, match="二选一"):
+            await search.find_similar_thoughts(text="内容", session_id="s", thought_number=1)
+        with pytest.raises(ValueError, match="top_k 必须大于0"):
+            await search.find_similar_thoughts(text="内容", top_k=0)
+        with pytest.raises(ValueError, match="会话不存在"):
+            await search.find_similar_thoughts(session_id="missing", thought_number=1)
@@ -8,8 +8,10 @@ from unittest.mock import MagicMock, patch
 
 import pytest
 
+from deep_thinking.storage.storage_manager import StorageManager
 from deep_thinking.tools import template
 from deep_thinking.utils.template_loader import TemplateLoader
+from deep_thinking.utils.template_registry import TemplateRegistry, compile_thoughts
 
 # =============================================================================
 # TemplateLoader 测试
@@ -356,7 +358,7 @@ class TestApplyTemplateTool:
 
         with (
             patch("deep_thinking.tools.template.get_storage_manager", return_value=mock_manager),
-            patch("deep_thinking.tools.template.TemplateLoader") as MockLoader,
+            patch("deep_thinking.tools.template.get_template_registry") as mock_get_registry,
         ):
             # Mock模板
             mock_template = {
@@ -370,12 +372,18 @@ class TestApplyTemplateTool:
                     ]
                 },
             }
-            mock_loader_instance = MagicMock()
-            mock_loader_instance.load_template.return_value = mock_template
-            MockLoader.return_value = mock_loader_instance
+            mock_registry = MagicMock()
+            mock_registry.get_template.return_value = mock_template
+            mock_registry.get_thoughts.return_value = compile_thoughts(mock_template)
+            mock_get_registry.return_value = mock_registry
 
             result = await template.apply_template("test")
 
+        # 会话和思考步骤一次写入
+        mock_manager.update_session.assert_not_called()
+        thoughts = mock_manager.create_session.call_args.kwargs["thoughts"]
+        assert [t.content for t in thoughts] == ["第一步", "第二步"]
+
         assert "测试模板 已应用" in result
         assert "test-session-123" in result
         assert "第一步" in result
@@ -393,7 +401,7 @@ class TestApplyTemplateTool:
 
         with (
             patch("deep_thinking.tools.template.get_storage_manager", return_value=mock_manager),
-            patch("deep_thinking.tools.template.TemplateLoader") as MockLoader,
+            patch("deep_thinking.tools.template.get_template_registry") as mock_get_registry,
         ):
             mock_template = {
                 "template_id": "test",
@@ -401,13 +409,32 @@ class TestApplyTemplateTool:
                 "description": "测试描述",
                 "structure": {"steps": [{"step_number": 1, "prompt": "第一步", "type": "regular"}]},
             }
-            mock_loader_instance = MagicMock()
-            mock_loader_instance.load_template.return_value = mock_template
-            MockLoader.return_value = mock_loader_instance
+            mock_registry = MagicMock()
+            mock_registry.get_template.return_value = mock_template
+            mock_registry.get_thoughts.return_value = compile_thoughts(mock_template)
+            mock_get_registry.return_value = mock_registry
 
             result = await template.apply_template("test", "我的问题上下文")
 
         assert "我的问题上下文" in result
+        thoughts = mock_manager.create_session.call_args.kwargs["thoughts"]
+        assert thoughts[0].content == "第一步\n\n当前上下文: 我的问题上下文"
+        # 原型不被修改
+        assert mock_registry.get_thoughts.return_value[0].content == "第一步"
+
+    async def test_apply_template_context_too_long(self, clean_env):
+        """测试插入上下文后内容超长时重新验证失败"""
+        mock_manager = MagicMock()
+        registry = TemplateRegistry()
+
+        with (
+            patch("deep_thinking.tools.template.get_storage_manager", return_value=mock_manager),
+            patch("deep_thinking.tools.template.get_template_registry", return_value=registry),
+            pytest.raises(ValueError),
+        ):
+            await template.apply_template("analysis", "长" * 10000)
+
+        mock_manager.create_session.assert_not_called()
 
     async def test_apply_template_not_found(self, clean_env):
         """测试模板不存在时的错误处理"""
@@ -415,17 +442,60 @@ class TestApplyTemplateTool:
 
         with (
             patch("deep_thinking.tools.template.get_storage_manager", return_value=mock_manager),
-            patch("deep_thinking.tools.template.TemplateLoader") as MockLoader,
+            patch("deep_thinking.tools.template.get_template_registry") as mock_get_registry,
         ):
-            mock_loader_instance = MagicMock()
-            mock_loader_instance.load_template.side_effect = FileNotFoundError("模板不存在")
-            mock_loader_instance.list_available_templates.return_value = ["t1", "t2"]
-            MockLoader.return_value = mock_loader_instance
+            mock_registry = MagicMock()
+            mock_registry.get_template.side_effect = FileNotFoundError("模板不存在")
+            mock_registry.list_template_ids.return_value = ["t1", "t2"]
+            mock_get_registry.return_value = mock_registry
 
             with pytest.raises(ValueError, match="模板不存在"):
                 await template.apply_template("nonexistent")
 
 
+class TestApplyTemplateBatchTool:
+    """测试 apply_template_batch MCP 工具"""
+
+    async def test_apply_template_batch(self, temp_dir):
+        """测试批量创建会话：每个会话文件写入一次，索引只更新一次"""
+        manager = StorageManager(temp_dir)
+
+        with (
+            patch("deep_thinking.tools.template.get_storage_manager", return_value=manager),
+            patch(
+                "deep_thinking.tools.template.get_template_registry",
+                return_value=TemplateRegistry(),
+            ),
+            patch.object(manager.store, "write", wraps=manager.store.write) as mock_write,
+            patch.object(manager, "_write_index", wraps=manager._write_index) as mock_index,
+        ):
+            result = await template.apply_template_batch(
+                "analysis", ["方案A", "方案B", "方案C"], session_name_prefix="评估"
+            )
+
+        assert mock_write.call_count == 3
+        assert mock_index.call_count == 1
+        assert "**会话数**: 3" in result
+
+        sessions = sorted(manager.list_sessions(), key=lambda s: s["name"])
+        assert [s["name"] for s in sessions] == ["评估 1", "评估 2", "评估 3"]
+        session = manager.get_session(sessions[1]["session_id"])
+        assert session.metadata["context"] == "方案B"
+        assert session.thoughts[0].content.endswith("当前上下文: 方案B")
+        assert session.thoughts[0].timestamp == session.thoughts[-1].timestamp
+
+    @pytest.mark.parametrize("contexts", [[], ["x"] * (template.MAX_BATCH_SESSIONS + 1)])
+    async def test_apply_template_batch_invalid_size(self, contexts):
+        """测试上下文列表为空或超出数量限制"""
+        with (
+            patch("deep_thinking.tools.template.get_storage_manager") as mock_get_manager,
+            pytest.raises(ValueError, match="上下文列表不能为空|单次最多创建"),
+        ):
+            await template.apply_template_batch("analysis", contexts)
+
+        mock_get_manager.assert_not_called()
+
+
 # =============================================================================
 # list_templates MCP 工具测试
 # =============================================================================
@@ -436,9 +506,9 @@ class TestListTemplatesTool:
 
     async def test_list_templates_all(self, clean_env):
         """测试列出所有模板"""
-        with patch("deep_thinking.tools.template.TemplateLoader") as MockLoader:
-            mock_loader_instance = MagicMock()
-            mock_loader_instance.list_templates.return_value = [
+        with patch("deep_thinking.tools.template.get_template_registry") as mock_get_registry:
+            mock_registry = MagicMock()
+            mock_registry.list_templates.return_value = [
                 {
                     "template_id": "problem_solving",
                     "name": "问题求解",
@@ -454,7 +524,7 @@ class TestListTemplatesTool:
                     "metadata": {"tags": ["决策"]},
                 },
             ]
-            MockLoader.return_value = mock_loader_instance
+            mock_get_registry.return_value = mock_registry
 
             result = await template.list_templates()
 
@@ -466,9 +536,9 @@ class TestListTemplatesTool:
 
     async def test_list_templates_with_category(self, clean_env):
         """测试按类别过滤模板"""
-        with patch("deep_thinking.tools.template.TemplateLoader") as MockLoader:
-            mock_loader_instance = MagicMock()
-            mock_loader_instance.list_templates.return_value = [
+        with patch("deep_thinking.tools.template.get_template_registry") as mock_get_registry:
+            mock_registry = MagicMock()
+            mock_registry.list_templates.return_value = [
                 {
                     "template_id": "decision_making",
                     "name": "决策",
@@ -477,7 +547,7 @@ class TestListTemplatesTool:
                     "metadata": {},
                 }
             ]
-            MockLoader.return_value = mock_loader_instance
+            mock_get_registry.return_value = mock_registry
 
             result = await template.list_templates("decision")
 
@@ -486,16 +556,34 @@ class TestListTemplatesTool:
 
     async def test_list_templates_empty(self, clean_env):
         """测试空模板列表"""
-        with patch("deep_thinking.tools.template.TemplateLoader") as MockLoader:
-            mock_loader_instance = MagicMock()
-            mock_loader_instance.list_templates.return_value = []
-            MockLoader.return_value = mock_loader_instance
+        with patch("deep_thinking.tools.template.get_template_registry") as mock_get_registry:
+            mock_registry = MagicMock()
+            mock_registry.list_templates.return_value = []
+            mock_get_registry.return_value = mock_registry
 
             result = await template.list_templates()
 
         assert "没有找到匹配的模板" in result
 
 
+class TestReloadTemplatesTool:
+    """测试 reload_templates MCP 工具"""
+
+    async def test_reload_templates(self, temp_dir):
+        """测试重新加载模板并报告格式无效的模板"""
+        from deep_thinking.utils.template_registry import TemplateRegistry
+
+        (temp_dir / "broken.json").write_text("{", encoding="utf-8")
+        registry = TemplateRegistry([temp_dir])
+
+        with patch("deep_thinking.tools.template.get_template_registry", return_value=registry):
+            result = await template.reload_templates()
+
+        assert "模板已重新加载" in result
+        assert "**模板数**: 0" in result
+        assert "`broken`" in result
+
+
 # =============================================================================
 # 辅助函数测试
 # =============================================================================
@@ -11,8 +11,11 @@ import pytest
 from deep_thinking.models.thinking_session import ThinkingSession
 from deep_thinking.models.thought import Thought
 from deep_thinking.models.tool_call import ToolCallData, ToolCallRecord, ToolResultData
+from deep_thinking.storage.storage_manager import StorageManager
 from deep_thinking.tools import visualization
+from deep_thinking.utils.executor import TaskExecutor
 from deep_thinking.utils.formatters import Visualizer
+from deep_thinking.utils.incremental_visualizer import incremental_visualizer
 
 # =============================================================================
 # Visualizer.to_mermaid 测试
@@ -448,6 +451,31 @@ class TestVisualizeSessionSimpleTool:
 
         assert "🧠 思考流程树" in result
 
+    async def test_second_call_renders_incrementally(self, temp_dir, monkeypatch, clean_env):
+        """测试启用渲染进程池时，追加思考步骤后的再次可视化走增量路径"""
+        manager = StorageManager(temp_dir)
+        session = manager.create_session(
+            name="增量", thoughts=[Thought(thought_number=1, content="第一步")]
+        )
+        executor = TaskExecutor(render_workers=1, io_threads=2)
+        monkeypatch.setattr(visualization, "get_storage_manager", lambda: manager)
+        monkeypatch.setattr(visualization, "get_task_executor", lambda: executor)
+        monkeypatch.setattr(visualization, "get_render_cache", lambda: None)
+        try:
+            await visualization.visualize_session_simple(session.session_id, "mermaid")
+            updates = incremental_visualizer.incremental_updates
+            rebuilds = incremental_visualizer.full_rebuilds
+
+            manager.add_thought(session.session_id, Thought(thought_number=2, content="第二步"))
+            result = await visualization.visualize_session_simple(session.session_id, "mermaid")
+        finally:
+            incremental_visualizer.forget(session.session_id)
+            executor.shutdown()
+
+        assert "第二步" in result
+        assert incremental_visualizer.incremental_updates == updates + 1
+        assert incremental_visualizer.full_rebuilds == rebuilds
+
 
 # =============================================================================
 # 辅助函数测试
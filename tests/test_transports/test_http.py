@@ -0,0 +1,410 @@
+"""
+HTTP传输层测试
+
+测试Streamable HTTP传输模式的功能。
+"""
+
+import asyncio
+import gzip
+import json
+import logging
+import threading
+import zlib
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from aiohttp.web_response import ContentCoding
+
+from deep_thinking import server
+from deep_thinking.models.thought import Thought
+from deep_thinking.server import app
+from deep_thinking.transports import http
+from deep_thinking.transports.http import HTTPTransport, negotiate_encoding, run_http
+
+
+@pytest.fixture(autouse=True)
+def isolated_data_dir(temp_dir, monkeypatch):
+    """服务器生命周期使用临时数据目录"""
+    monkeypatch.setenv("DEEP_THINKING_DATA_DIR", str(temp_dir))
+
+
+INITIALIZE = {
+    "jsonrpc": "2.0",
+    "id": 1,
+    "method": "initialize",
+    "params": {
+        "protocolVersion": "2025-06-18",
+        "capabilities": {},
+        "clientInfo": {"name": "test-client", "version": "1.0"},
+    },
+}
+
+
+def _tool_call(request_id, name, arguments):
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "method": "tools/call",
+        "params": {"name": name, "arguments": arguments},
+    }
+
+
+@pytest.fixture
+async def client():
+    """连接到HTTP传输的测试客户端（不监听真实端口）"""
+    transport = HTTPTransport(app)
+    await transport._start_session()
+    try:
+        async with TestClient(TestServer(transport.create_web_app())) as test_client:
+            test_client.transport = transport
+            yield test_client
+    finally:
+        await transport.stop()
+
+
+def _create_long_session(thought_count: int) -> str:
+    manager = server.get_storage_manager()
+    session = manager.create_session(name="长会话")
+    for number in range(1, thought_count + 1):
+        manager.add_thought(
+            session.session_id,
+            Thought(thought_number=number, content=f"第{number}步 <分析> " * 30),
+        )
+    return session.session_id
+
+
+class TestNegotiateEncoding:
+    """压缩协商测试"""
+
+    @pytest.mark.parametrize(
+        ("header", "expected"),
+        [
+            ("", None),
+            ("identity", None),
+            ("br", None),
+            ("gzip", ContentCoding.gzip),
+            ("deflate", ContentCoding.deflate),
+            ("deflate, gzip", ContentCoding.gzip),
+            ("gzip;q=0.5, deflate", ContentCoding.deflate),
+            ("gzip;q=0, deflate;q=0", None),
+            ("GZIP;q=bad, deflate", ContentCoding.deflate),
+        ],
+    )
+    def test_negotiate_encoding(self, header, expected):
+        """测试按权重选择 gzip/deflate"""
+        assert negotiate_encoding(header) is expected
+
+
+class TestHTTPTransport:
+    """HTTP传输类测试"""
+
+    def test_http_transport_init(self):
+        """测试HTTPTransport初始化"""
+        transport = HTTPTransport(app, auth_token="token", keepalive_timeout=30.0)
+
+        assert transport.app is app
+        assert transport.auth_token == "token"
+        assert transport.api_key is None
+        assert transport.keepalive_timeout == 30.0
+        assert transport.runner is None
+
+    @pytest.mark.asyncio
+    async def test_http_transport_start_and_stop(self, caplog):
+        """测试启动时传入keep-alive超时并记录端点日志"""
+        transport = HTTPTransport(app, api_key="key", keepalive_timeout=12.0)
+
+        with (
+            patch("deep_thinking.transports.http.web.AppRunner") as mock_runner_class,
+            patch("deep_thinking.transports.http.web.TCPSite") as mock_site_class,
+        ):
+            mock_runner = MagicMock()
+            mock_runner.setup = AsyncMock()
+            mock_runner.cleanup = AsyncMock()
+            mock_runner_class.return_value = mock_runner
+            mock_site_class.return_value.start = AsyncMock()
+
+            with caplog.at_level(logging.INFO):
+                await transport.start("localhost", 8000)
+
+            assert mock_runner_class.call_args.kwargs["keepalive_timeout"] == 12.0
+            assert "MCP端点: http://localhost:8000/mcp" in caplog.text
+            assert "认证已启用" in caplog.text
+
+            await transport.stop()
+            mock_runner.cleanup.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_run_http_cleanup_on_error(self):
+        """测试启动失败时仍然清理"""
+        with patch("deep_thinking.transports.http.HTTPTransport") as mock_transport_class:
+            mock_transport = MagicMock()
+            mock_transport.start = AsyncMock(side_effect=OSError("port in use"))
+            mock_transport.stop = AsyncMock()
+            mock_transport_class.return_value = mock_transport
+
+            with pytest.raises(OSError):
+                await run_http(app, port=8000)
+
+            mock_transport.stop.assert_called_once()
+
+
+class TestHTTPMCPEndpoint:
+    """MCP消息端点端到端测试"""
+
+    async def test_initialize_and_list_tools(self, client):
+        """测试请求响应直接作为HTTP响应体返回"""
+        response = await client.post("/mcp", json=INITIALIZE)
+        assert response.status == 200
+        assert (await response.json())["result"]["serverInfo"]["name"] == "DeepThinking"
+
+        notified = await client.post(
+            "/mcp", json={"jsonrpc": "2.0", "method": "notifications/initialized"}
+        )
+        assert notified.status == 202
+
+        response = await client.post(
+            "/mcp", json={"jsonrpc": "2.0", "id": 2, "method": "tools/list"}
+        )
+        message = await response.json()
+        assert message["id"] == 2
+        assert "create_session" in {tool["name"] for tool in message["result"]["tools"]}
+
+    async def test_stateless_without_initialize(self, client):
+        """测试无状态模式下无需初始化即可调用工具"""
+        response = await client.post(
+            "/mcp", json=_tool_call("call-1", "create_session", {"name": "HTTP会话"})
+        )
+        message = await response.json()
+
+        assert message["id"] == "call-1"
+        assert "会话已创建" in message["result"]["content"][0]["text"]
+
+    async def test_concurrent_clients_with_same_ids(self, client):
+        """测试不同客户端使用相同请求ID时响应不会串扰"""
+        requests = [_tool_call(1, "create_session", {"name": f"并发{i}"}) for i in range(8)]
+        responses = await asyncio.gather(*(client.post("/mcp", json=r) for r in requests))
+        messages = [await r.json() for r in responses]
+
+        assert all(m["id"] == 1 for m in messages)
+        texts = [m["result"]["content"][0]["text"] for m in messages]
+        assert all(f"并发{i}" in text for i, text in enumerate(texts))
+        assert len(server.get_storage_manager().list_sessions()) == 8
+
+    async def test_large_response_compressed(self, client):
+        """测试大响应按 Accept-Encoding 分块压缩"""
+        session_id = _create_long_session(20)
+        request = _tool_call(5, "get_session", {"session_id": session_id})
+
+        response = await client.post(
+            "/mcp", json=request, headers={"Accept-Encoding": "gzip"}, auto_decompress=False
+        )
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers["Transfer-Encoding"] == "chunked"
+        message = json.loads(gzip.decompress(await response.read()))
+        assert "第20步" in message["result"]["content"][0]["text"]
+
+        plain = await client.post("/mcp", json=request, headers={"Accept-Encoding": "identity"})
+        assert "Content-Encoding" not in plain.headers
+        assert (await plain.json())["id"] == 5
+
+    async def test_small_response_not_compressed(self, client):
+        """测试小响应不压缩"""
+        response = await client.post(
+            "/mcp",
+            json={"jsonrpc": "2.0", "id": 1, "method": "ping"},
+            headers={"Accept-Encoding": "gzip"},
+        )
+        assert "Content-Encoding" not in response.headers
+        assert (await response.json())["result"] == {}
+
+    async def test_invalid_message(self, client):
+        """测试无效消息返回400和JSON-RPC解析错误"""
+        response = await client.post("/mcp", data=b"not json")
+
+        assert response.status == 400
+        assert (await response.json())["error"]["code"] == -32700
+
+    async def test_keep_alive_connection_reused(self, client):
+        """测试多个请求复用同一连接"""
+        for request_id in range(3):
+            response = await client.post(
+                "/mcp", json={"jsonrpc": "2.0", "id": request_id, "method": "ping"}
+            )
+            await response.read()
+
+        assert len(client.session.connector._conns) == 1
+
+
+class _RecordingStream:
+    """记录投递给服务器会话的消息"""
+
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, message):
+        self.messages.append(message.message.root)
+
+
+class TestHTTPCancellation:
+    """取消通知映射测试"""
+
+    async def test_cancel_with_overlapping_ids(self):
+        """测试不同客户端使用相同请求ID时，取消通知只对应发送方的请求"""
+        from mcp import types
+
+        transport = HTTPTransport(app)
+        sent = _RecordingStream()
+        transport._to_server = sent
+
+        def post(client_id, payload):
+            return client.post("/mcp", json=payload, headers={"Mcp-Session-Id": client_id})
+
+        def cancel(request_id):
+            return {
+                "jsonrpc": "2.0",
+                "method": "notifications/cancelled",
+                "params": {"requestId": request_id},
+            }
+
+        async with TestClient(TestServer(transport.create_web_app())) as client:
+            ping = {"jsonrpc": "2.0", "id": 1, "method": "ping"}
+            pending = [
+                asyncio.ensure_future(post(client_id, ping)) for client_id in ("a", "b", "c", "c")
+            ]
+            while len(transport._pending) < 4:
+                await asyncio.sleep(0.01)
+            (internal_a,) = transport._client_requests[("a", 1)]
+            (internal_b,) = transport._client_requests[("b", 1)]
+            assert internal_a != internal_b
+
+            assert (await post("a", cancel(1))).status == 202
+            forwarded = sent.messages[-1]
+            assert forwarded.method == "notifications/cancelled"
+            assert forwarded.params["requestId"] == internal_a
+
+            # 未知ID、同一客户端的重复ID和客户端响应都不投递
+            count = len(sent.messages)
+            await post("a", cancel(7))
+            await post("c", cancel(1))
+            await post("a", {"jsonrpc": "2.0", "id": 1, "result": {}})
+            assert len(sent.messages) == count
+
+            for internal_id, future in list(transport._pending.items()):
+                future.set_result(types.JSONRPCResponse(jsonrpc="2.0", id=internal_id, result={}))
+            responses = await asyncio.gather(*pending)
+            assert [(await r.json())["id"] for r in responses] == [1, 1, 1, 1]
+
+        assert transport._client_requests == {}
+
+
+class TestHTTPExportEndpoint:
+    """会话导出端点测试"""
+
+    async def test_export_streams_chunks(self, client):
+        """测试导出内容以分块传输返回"""
+        session_id = _create_long_session(60)
+
+        response = await client.get(f"/sessions/{session_id}/export?format=html")
+        assert response.status == 200
+        assert response.headers["Transfer-Encoding"] == "chunked"
+        assert response.content_type == "text/html"
+        assert "filename*=UTF-8''" in response.headers["Content-Disposition"]
+
+        body = await response.text()
+        assert body.startswith("<!DOCTYPE html>")
+        assert body.rstrip().endswith("</html>")
+        assert "第60步" in body
+
+    async def test_export_deflate(self, client):
+        """测试导出协商 deflate 压缩"""
+        session_id = _create_long_session(10)
+
+        response = await client.get(
+            f"/sessions/{session_id}/export?format=json",
+            headers={"Accept-Encoding": "deflate"},
+            auto_decompress=False,
+        )
+        assert response.headers["Content-Encoding"] == "deflate"
+        data = json.loads(zlib.decompress(await response.read()))
+        assert data["session_id"] == session_id
+        assert len(data["thoughts"]) == 10
+
+    async def test_export_renders_off_event_loop(self, client):
+        """测试会话加载和导出渲染不在事件循环线程中执行"""
+        session_id = _create_long_session(5)
+        manager = server.get_storage_manager()
+        get_session = manager.get_session
+        render_session = http.iter_render_session
+        threads = []
+
+        def load(*args):
+            threads.append(threading.get_ident())
+            return get_session(*args)
+
+        def render(session, format_type):
+            for chunk in render_session(session, format_type):
+                threads.append(threading.get_ident())
+                yield chunk
+
+        with (
+            patch.object(manager, "get_session", side_effect=load),
+            patch.object(http, "iter_render_session", side_effect=render),
+        ):
+            response = await client.get(f"/sessions/{session_id}/export?format=markdown")
+            body = await response.text()
+
+        assert response.status == 200
+        assert "第5步" in body
+        assert len(threads) > 1
+        assert threading.get_ident() not in threads
+
+    async def test_iter_in_thread(self):
+        """测试线程生成的块按顺序交给事件循环，异常在事件循环一侧抛出"""
+
+        def failing():
+            yield b"a"
+            yield b"b"
+            raise ValueError("渲染失败")
+
+        received = []
+        with pytest.raises(ValueError, match="渲染失败"):
+            async for chunk in http._iter_in_thread(failing()):
+                received.append(chunk)
+        assert received == [b"a", b"b"]
+
+    async def test_iter_in_thread_stops_when_closed(self):
+        """测试迭代器关闭后生成线程停止"""
+        produced = []
+
+        def chunks():
+            for number in range(1000):
+                produced.append(number)
+                yield b"x"
+
+        iterator = http._iter_in_thread(chunks())
+        assert await iterator.__anext__() == b"x"
+        await iterator.aclose()
+        await asyncio.sleep(0.2)
+
+        # 已取走 1 块、队列中 EXPORT_QUEUE_SIZE 块，另有等待写入和停止前生成的各 1 块
+        assert len(produced) <= http.EXPORT_QUEUE_SIZE + 3
+
+    async def test_export_errors(self, client):
+        """测试导出端点的错误处理"""
+        unknown = await client.get("/sessions/missing/export")
+        assert unknown.status == 404
+
+        session_id = _create_long_session(1)
+        unsupported = await client.get(f"/sessions/{session_id}/export?format=pdf")
+        assert unsupported.status == 400
+
+    async def test_auth_required(self):
+        """测试认证中间件同样作用于HTTP传输"""
+        transport = HTTPTransport(app, auth_token="secret")
+        async with TestClient(TestServer(transport.create_web_app())) as test_client:
+            denied = await test_client.get("/health")
+            assert denied.status == 401
+
+            allowed = await test_client.get("/health", headers={"Authorization": "Bearer secret"})
+            assert allowed.status == 200
@@ -5,13 +5,28 @@ SSE传输层测试
 """
 
 import asyncio
+import json
 import logging
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
+from deep_thinking import server
 from deep_thinking.server import app
-from deep_thinking.transports.sse import SSETransport, run_sse
+from deep_thinking.transports.sse import (
+    DEFAULT_HEARTBEAT_INTERVAL,
+    DEFAULT_IDLE_TIMEOUT,
+    DEFAULT_MAX_CONNECTIONS,
+    DEFAULT_WRITE_BUFFER_LIMIT,
+    SSETransport,
+    run_sse,
+)
+
+
+@pytest.fixture(autouse=True)
+def isolated_data_dir(temp_dir, monkeypatch):
+    """服务器生命周期使用临时数据目录"""
+    monkeypatch.setenv("DEEP_THINKING_DATA_DIR", str(temp_dir))
 
 
 class TestSSETransport:
@@ -64,6 +79,7 @@ class TestSSETransport:
 
             mock_runner = MagicMock()
             mock_runner.setup = AsyncMock()
+            mock_runner.cleanup = AsyncMock()
             mock_runner_class.return_value = mock_runner
 
             mock_site = MagicMock()
@@ -77,6 +93,8 @@ class TestSSETransport:
             mock_runner.setup.assert_called_once()
             mock_site.start.assert_called_once()
 
+            await transport.stop()
+
     @pytest.mark.asyncio
     async def test_sse_transport_stop(self):
         """测试SSETransport停止"""
@@ -178,7 +196,15 @@ class TestRunSSE:
                     await run_sse(app, host="localhost", port=8000)
 
                 # 验证transport被创建
-                mock_transport_class.assert_called_once_with(app, auth_token=None, api_key=None)
+                mock_transport_class.assert_called_once_with(
+                    app,
+                    auth_token=None,
+                    api_key=None,
+                    heartbeat_interval=DEFAULT_HEARTBEAT_INTERVAL,
+                    idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                    max_connections=DEFAULT_MAX_CONNECTIONS,
+                    write_buffer_limit=DEFAULT_WRITE_BUFFER_LIMIT,
+                )
 
     @pytest.mark.asyncio
     async def test_run_sse_with_auth(self):
@@ -205,7 +231,15 @@ class TestRunSSE:
                     )
 
                 # 验证transport被创建时包含认证参数
-                mock_transport_class.assert_called_once_with(app, auth_token="token", api_key="key")
+                mock_transport_class.assert_called_once_with(
+                    app,
+                    auth_token="token",
+                    api_key="key",
+                    heartbeat_interval=DEFAULT_HEARTBEAT_INTERVAL,
+                    idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                    max_connections=DEFAULT_MAX_CONNECTIONS,
+                    write_buffer_limit=DEFAULT_WRITE_BUFFER_LIMIT,
+                )
 
     @pytest.mark.asyncio
     async def test_run_sse_cleanup_on_error(self):
@@ -583,86 +617,8 @@ class TestSSEModuleLogging:
         assert sse.SSETransport is not None
 
 
-class TestSSEHandlerErrorPaths:
-    """SSE处理器错误路径测试"""
-
-    @pytest.mark.asyncio
-    async def test_sse_handler_cancelled_error(self, caplog):
-        """测试SSE处理器的CancelledError处理"""
-        from aiohttp.test_utils import make_mocked_request
-
-        transport = SSETransport(app)
-
-        # 创建模拟请求，但会在write时抛出CancelledError
-        request = make_mocked_request("POST", "/sse")
-
-        # Mock StreamResponse在write时抛出CancelledError
-        with patch("deep_thinking.transports.sse.web.StreamResponse") as mock_response_class:
-            mock_response = MagicMock()
-            mock_response.prepare = AsyncMock()
-            mock_response.write = AsyncMock(side_effect=asyncio.CancelledError())
-            mock_response_class.return_value = mock_response
-
-            # 调用_sse_handler，应该抛出CancelledError
-            with pytest.raises((asyncio.CancelledError, NotImplementedError)):
-                await transport._sse_handler(request)
-
-        # 验证日志记录（如果finally块执行了）
-        # 注意：由于抛出异常，finally可能不会执行
-
-    @pytest.mark.asyncio
-    async def test_sse_handler_general_exception(self, caplog):
-        """测试SSE处理器的通用Exception处理"""
-        from aiohttp.test_utils import make_mocked_request
-
-        transport = SSETransport(app)
-
-        # 创建模拟请求
-        request = make_mocked_request("POST", "/sse")
-
-        # Mock request.json()抛出通用异常
-        with (
-            patch.object(request, "json", side_effect=RuntimeError("JSON parse error")),
-            patch("deep_thinking.transports.sse.web.StreamResponse") as mock_response_class,
-            pytest.raises((NotImplementedError, Exception)),
-        ):
-            mock_response = MagicMock()
-            mock_response.prepare = AsyncMock()
-            mock_response.write = AsyncMock()
-            mock_response_class.return_value = mock_response
-
-            # 调用_sse_handler
-            await transport._sse_handler(request)
-
-        # 验证错误日志被记录
-        # 注意：由于异常抛出，可能不会到达except块
-
-    @pytest.mark.asyncio
-    async def test_sse_handler_json_decode_error(self, caplog):
-        """测试SSE处理器JSON解析失败"""
-        from aiohttp.test_utils import make_mocked_request
-
-        transport = SSETransport(app)
-
-        # 创建模拟请求
-        request = make_mocked_request("POST", "/sse")
-
-        # Mock request.json()返回无效数据导致dumps失败
-        with (
-            patch.object(request, "json", return_value={"method": "test"}),
-            patch(
-                "deep_thinking.transports.sse.json.dumps", side_effect=TypeError("Not serializable")
-            ),
-            patch("deep_thinking.transports.sse.web.StreamResponse") as mock_response_class,
-            pytest.raises((NotImplementedError, TypeError)),
-        ):
-            mock_response = MagicMock()
-            mock_response.prepare = AsyncMock()
-            mock_response.write = AsyncMock()
-            mock_response_class.return_value = mock_response
-
-            # 调用_sse_handler
-            await transport._sse_handler(request)
+class TestSSEStartLogging:
+    """SSE服务器启动日志测试"""
 
     @pytest.mark.asyncio
     async def test_sse_start_with_auth_logging(self, caplog):
@@ -680,6 +636,7 @@ class TestSSEHandlerErrorPaths:
 
             mock_runner = MagicMock()
             mock_runner.setup = AsyncMock()
+            mock_runner.cleanup = AsyncMock()
             mock_runner_class.return_value = mock_runner
 
             mock_site = MagicMock()
@@ -691,9 +648,11 @@ class TestSSEHandlerErrorPaths:
                 # 调用start
                 await transport.start("localhost", 8000)
 
-                # 验证认证启用日志被记录（行161）
+                # 验证认证启用日志被记录
                 assert "认证已启用" in caplog.text
 
+            await transport.stop()
+
     @pytest.mark.asyncio
     async def test_sse_start_without_auth_no_logging(self, caplog):
         """测试SSE服务器启动时无认证不记录认证日志"""
@@ -710,6 +669,7 @@ class TestSSEHandlerErrorPaths:
 
             mock_runner = MagicMock()
             mock_runner.setup = AsyncMock()
+            mock_runner.cleanup = AsyncMock()
             mock_runner_class.return_value = mock_runner
 
             mock_site = MagicMock()
@@ -724,50 +684,309 @@ class TestSSEHandlerErrorPaths:
                 # 验证没有认证启用日志
                 assert "认证已启用" not in caplog.text
 
-    @pytest.mark.asyncio
-    async def test_sse_handler_heartbeat_interrupt(self, caplog):
-        """测试SSE心跳被中断"""
-        from aiohttp.test_utils import make_mocked_request
+            await transport.stop()
+
+
+async def _read_event(response) -> tuple[str, str]:
+    """从SSE响应读取下一个事件（跳过心跳注释）"""
+    event, data = "", ""
+    while True:
+        line = (await response.content.readline()).decode().rstrip("\r\n")
+        if not line:
+            if event or data:
+                return event, data
+            continue
+        if line.startswith(":"):
+            continue
+        field, _, value = line.partition(": ")
+        if field == "event":
+            event = value
+        elif field == "data":
+            data = value
+
+
+class TestSSEMCPSession:
+    """SSE传输端到端测试（事件流 + 消息端点）"""
+
+    INITIALIZE = {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "method": "initialize",
+        "params": {
+            "protocolVersion": "2025-06-18",
+            "capabilities": {},
+            "clientInfo": {"name": "test-client", "version": "1.0"},
+        },
+    }
+
+    @pytest.fixture
+    async def client(self):
+        """连接到SSE传输的测试客户端"""
+        from aiohttp.test_utils import TestClient, TestServer
 
         transport = SSETransport(app)
-        request = make_mocked_request("POST", "/sse")
-
-        call_count = [0]
-
-        async def mock_write_with_cancel(data):
-            """模拟write，在第三次调用时取消"""
-            call_count[0] += 1
-            if call_count[0] >= 3:
-                raise asyncio.CancelledError()
-            # 前几次调用成功
-
-        with (
-            patch("deep_thinking.transports.sse.web.StreamResponse") as mock_response_class,
-            patch("deep_thinking.transports.sse.asyncio.sleep", new=AsyncMock()),
-            pytest.raises((asyncio.CancelledError, NotImplementedError)),
-        ):
-            mock_response = MagicMock()
-            mock_response.prepare = AsyncMock()
-            mock_response.write = mock_write_with_cancel
-            mock_response_class.return_value = mock_response
-
-            # 调用_sse_handler，应该在心跳循环中被取消
-            await transport._sse_handler(request)
-
-    @pytest.mark.asyncio
-    async def test_sse_handler_response_prepare_failure(self, caplog):
-        """测试SSE响应prepare失败"""
-        from aiohttp.test_utils import make_mocked_request
-
+        async with TestClient(TestServer(transport.create_web_app())) as client:
+            client.transport = transport
+            yield client
+
+    async def _open_session(self, client):
+        """建立事件流并完成MCP初始化"""
+        stream = await client.get("/sse")
+        event, endpoint = await _read_event(stream)
+        assert event == "endpoint"
+        assert endpoint.startswith("/messages/?session_id=")
+
+        response = await client.post(endpoint, json=self.INITIALIZE)
+        assert response.status == 202
+        event, data = await _read_event(stream)
+        assert event == "message"
+        assert json.loads(data)["id"] == 1
+
+        await client.post(endpoint, json={"jsonrpc": "2.0", "method": "notifications/initialized"})
+        return stream, endpoint
+
+    async def test_requests_routed_to_fastmcp(self, client):
+        """测试JSON-RPC请求路由到FastMCP并通过事件流返回"""
+        stream, endpoint = await self._open_session(client)
+
+        await client.post(endpoint, json={"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+        _, data = await _read_event(stream)
+        message = json.loads(data)
+
+        assert message["id"] == 2
+        tool_names = {tool["name"] for tool in message["result"]["tools"]}
+        assert "create_session" in tool_names
+        stream.close()
+
+    async def test_concurrent_requests_multiplexed(self, client):
+        """测试同一连接上的多个请求并发处理"""
+        stream, endpoint = await self._open_session(client)
+
+        requests = [
+            {
+                "jsonrpc": "2.0",
+                "id": 10 + i,
+                "method": "tools/call",
+                "params": {"name": "create_session", "arguments": {"name": f"并发会话{i}"}},
+            }
+            for i in range(5)
+        ]
+        responses = await asyncio.gather(*(client.post(endpoint, json=r) for r in requests))
+        assert all(r.status == 202 for r in responses)
+
+        ids = set()
+        for _ in requests:
+            _, data = await _read_event(stream)
+            message = json.loads(data)
+            assert "会话已创建" in message["result"]["content"][0]["text"]
+            ids.add(message["id"])
+
+        assert ids == {10, 11, 12, 13, 14}
+        assert len(server.get_storage_manager().list_sessions()) == 5
+        stream.close()
+
+    async def test_sessions_are_isolated(self, client):
+        """测试每个连接拥有独立会话"""
+        first, first_endpoint = await self._open_session(client)
+        second, second_endpoint = await self._open_session(client)
+
+        assert first_endpoint != second_endpoint
+        assert client.transport.session_count == 2
+
+        first.close()
+        second.close()
+
+    async def test_message_endpoint_errors(self, client):
+        """测试消息端点的错误处理"""
+        missing = await client.post("/messages/", json=self.INITIALIZE)
+        assert missing.status == 400
+
+        unknown = await client.post("/messages/?session_id=unknown", json=self.INITIALIZE)
+        assert unknown.status == 404
+
+        stream = await client.get("/sse")
+        _, endpoint = await _read_event(stream)
+        invalid = await client.post(endpoint, data=b"not json")
+        assert invalid.status == 400
+        stream.close()
+
+    async def test_disconnect_closes_session(self, client):
+        """测试客户端断开后会话被清理"""
+        stream, _ = await self._open_session(client)
+        assert client.transport.session_count == 1
+
+        stream.close()
+        for _ in range(50):
+            if client.transport.session_count == 0:
+                break
+            await asyncio.sleep(0.02)
+
+        assert client.transport.session_count == 0
+
+
+class TestSSEConnectionManagement:
+    """SSE连接管理测试（共享心跳、空闲回收、连接上限、慢速消费者）"""
+
+    @staticmethod
+    async def _client(transport):
+        from aiohttp.test_utils import TestClient, TestServer
+
+        client = TestClient(TestServer(transport.create_web_app()))
+        await client.start_server()
+        return client
+
+    async def _wait_closed(self, transport):
+        for _ in range(100):
+            if transport.session_count == 0:
+                return
+            await asyncio.sleep(0.02)
+        raise AssertionError("连接未被关闭")
+
+    def test_invalid_config(self):
+        """测试心跳间隔和写缓冲区高水位校验"""
+        with pytest.raises(ValueError, match="心跳间隔必须大于0"):
+            SSETransport(app, heartbeat_interval=0)
+        with pytest.raises(ValueError, match="写缓冲区高水位必须大于0"):
+            SSETransport(app, write_buffer_limit=0)
+
+    async def test_shared_heartbeat_skips_active_connections(self):
+        """测试共享定时器只向间隔内没有写入的连接发送心跳"""
+        transport = SSETransport(app, heartbeat_interval=60, idle_timeout=0)
+        client = await self._client(transport)
+        try:
+            stream = await client.get("/sse")
+            await _read_event(stream)
+            (connection,) = transport._connections.values()
+
+            # 刚写入过 endpoint 事件，不需要心跳
+            transport._check_connections()
+            assert not transport._heartbeat_writes
+
+            connection.last_write -= 60
+            transport._check_connections()
+            assert len(transport._heartbeat_writes) == 1
+            assert await stream.content.readline() == b": heartbeat\n"
+            stream.close()
+        finally:
+            await client.close()
+
+        assert transport._heartbeat_task is None
+
+    async def test_idle_connection_reaped(self):
+        """测试空闲连接被关闭并计入指标"""
+        transport = SSETransport(app, heartbeat_interval=0.05, idle_timeout=0.2)
+        client = await self._client(transport)
+        try:
+            stream = await client.get("/sse")
+            await _read_event(stream)
+
+            await self._wait_closed(transport)
+            assert transport.metrics["dropped_clients"] == {"idle": 1, "slow": 0}
+            stream.close()
+        finally:
+            await client.close()
+
+    async def test_max_connections_returns_503(self):
+        """测试超出最大连接数时返回503"""
+        transport = SSETransport(app, max_connections=1)
+        client = await self._client(transport)
+        try:
+            first = await client.get("/sse")
+            await _read_event(first)
+
+            second = await client.get("/sse")
+            assert second.status == 503
+            assert second.headers["Retry-After"] == "5"
+            assert transport.metrics["rejected_connections"] == 1
+            first.close()
+        finally:
+            await client.close()
+
+    async def test_slow_consumer_dropped(self):
+        """测试写缓冲区连续两次检查超出高水位的连接被中止"""
+        transport = SSETransport(app, heartbeat_interval=60, write_buffer_limit=1024)
+        client = await self._client(transport)
+        try:
+            stream = await client.get("/sse")
+            await _read_event(stream)
+            (connection,) = transport._connections.values()
+
+            with patch.object(connection, "buffered_bytes", return_value=4096):
+                transport._check_connections()
+                assert transport.session_count == 1
+                transport._check_connections()
+
+            await self._wait_closed(transport)
+            assert transport.metrics["dropped_clients"] == {"idle": 0, "slow": 1}
+            stream.close()
+        finally:
+            await client.close()
+
+    async def test_metrics_endpoint(self):
+        """测试指标端点输出Prometheus文本格式"""
         transport = SSETransport(app)
-        request = make_mocked_request("POST", "/sse")
-
-        with patch("deep_thinking.transports.sse.web.StreamResponse") as mock_response_class:
-            mock_response = MagicMock()
-            # prepare抛出异常
-            mock_response.prepare = AsyncMock(side_effect=OSError("Connection lost"))
-            mock_response_class.return_value = mock_response
-
-            # 调用_sse_handler，应该抛出异常
-            with pytest.raises((OSError, NotImplementedError)):
-                await transport._sse_handler(request)
+        client = await self._client(transport)
+        try:
+            stream = await client.get("/sse")
+            await _read_event(stream)
+
+            response = await client.get("/metrics")
+            text = await response.text()
+            assert response.status == 200
+            assert "deepthinking_sse_connections 1" in text
+            assert f"deepthinking_sse_bytes_sent_total {transport.bytes_sent}" in text
+            assert transport.bytes_sent > 0
+            assert 'deepthinking_sse_dropped_clients_total{reason="slow"} 0' in text
+            assert "# TYPE deepthinking_tool_duration_seconds histogram" in text
+            stream.close()
+        finally:
+            await client.close()
+
+    async def test_profile_route(self, temp_dir):
+        """测试性能分析管理端点受认证保护，可开始、查询和停止分析"""
+        from deep_thinking.utils.profiler import profiler
+
+        transport = SSETransport(app, auth_token="token")
+        client = await self._client(transport)
+        headers = {"Authorization": "Bearer token"}
+        try:
+            response = await client.post("/admin/profile", json={"action": "start"})
+            assert response.status == 401
+
+            response = await client.post(
+                "/admin/profile",
+                json={"action": "start", "mode": "sampling", "seconds": 60},
+                headers=headers,
+            )
+            status = await response.json()
+            assert response.status == 200
+            assert status["active"] is True
+            assert status["mode"] == "sampling"
+
+            response = await client.get("/admin/profile", headers=headers)
+            assert (await response.json())["active"] is True
+
+            response = await client.post("/admin/profile", json={"action": "stop"}, headers=headers)
+            status = await response.json()
+            assert status["active"] is False
+            assert status["stopped_output"].startswith(str(temp_dir / "profiles"))
+
+            response = await client.post("/admin/profile", data="{", headers=headers)
+            assert response.status == 400
+            response = await client.post(
+                "/admin/profile", json={"action": "start", "calls": "x"}, headers=headers
+            )
+            assert response.status == 400
+            assert not profiler.active
+        finally:
+            profiler.stop()
+            await client.close()
+
+    async def test_profile_route_requires_auth(self):
+        """测试未启用认证时不提供性能分析管理端点"""
+        client = await self._client(SSETransport(app))
+        try:
+            response = await client.post("/admin/profile", json={"action": "start"})
+            assert response.status == 404
+        finally:
+            await client.close()
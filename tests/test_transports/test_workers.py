@@ -0,0 +1,145 @@
+"""
+多工作进程测试
+
+测试监督进程的启动、重启、停止，以及SSE消息在工作进程之间的转发。
+"""
+
+import asyncio
+import json
+import os
+import signal
+import sys
+
+import aiohttp
+import pytest
+
+from deep_thinking.server import app
+from deep_thinking.transports import workers
+from deep_thinking.transports.sse import SSETransport
+from deep_thinking.transports.workers import (
+    WORKER_DIR_ENV,
+    WORKER_ID_ENV,
+    get_worker_id,
+    get_worker_socket,
+    reuse_port_supported,
+    run_workers,
+)
+
+
+@pytest.fixture(autouse=True)
+def isolated_data_dir(temp_dir, monkeypatch):
+    """服务器生命周期使用临时数据目录"""
+    monkeypatch.setenv("DEEP_THINKING_DATA_DIR", str(temp_dir))
+
+
+def _fake_spawn(script: str, spawned: list[int]):
+    """用执行指定脚本的子进程代替服务器工作进程"""
+
+    async def spawn(worker_id, _argv, _worker_dir):
+        spawned.append(worker_id)
+        return await asyncio.create_subprocess_exec(sys.executable, "-c", script)
+
+    return spawn
+
+
+class TestWorkerEnvironment:
+    """工作进程环境测试"""
+
+    def test_single_process_defaults(self, monkeypatch):
+        """测试未由监督进程启动时没有编号和套接字"""
+        monkeypatch.delenv(WORKER_ID_ENV, raising=False)
+        monkeypatch.delenv(WORKER_DIR_ENV, raising=False)
+
+        assert get_worker_id() is None
+        assert get_worker_socket("0") is None
+
+    def test_worker_environment(self, monkeypatch, temp_dir):
+        """测试工作进程从环境变量获得编号和套接字路径"""
+        monkeypatch.setenv(WORKER_ID_ENV, "2")
+        monkeypatch.setenv(WORKER_DIR_ENV, str(temp_dir))
+
+        assert get_worker_id() == "2"
+        assert get_worker_socket("2") == temp_dir / "worker-2.sock"
+
+    @pytest.mark.skipif(sys.platform != "linux", reason="Linux 支持 SO_REUSEPORT")
+    def test_reuse_port_supported(self):
+        """测试Linux上支持端口复用"""
+        assert reuse_port_supported()
+
+
+class TestRunWorkers:
+    """监督进程测试"""
+
+    async def test_invalid_worker_count(self):
+        """测试工作进程数校验"""
+        with pytest.raises(ValueError, match="工作进程数必须大于0"):
+            await run_workers(0, [])
+
+    async def test_immediate_exit_stops_all(self, monkeypatch):
+        """测试工作进程启动后立即退出时停止全部进程并返回1"""
+        spawned: list[int] = []
+        monkeypatch.setattr(workers, "_spawn", _fake_spawn("raise SystemExit(3)", spawned))
+
+        assert await run_workers(2, []) == 1
+        assert spawned == [0, 1]
+
+    async def test_restart_and_stop_on_signal(self, monkeypatch):
+        """测试异常退出的工作进程被重启，收到SIGTERM后全部停止"""
+        spawned: list[int] = []
+        monkeypatch.setattr(workers, "MIN_UPTIME", 0.0)
+        monkeypatch.setattr(workers, "_spawn", _fake_spawn("import time; time.sleep(0.2)", spawned))
+
+        async def stop_after_restart() -> None:
+            while len(spawned) < 3:
+                await asyncio.sleep(0.05)
+            os.kill(os.getpid(), signal.SIGTERM)
+
+        stopper = asyncio.create_task(stop_after_restart())
+        assert await asyncio.wait_for(run_workers(1, []), timeout=30) == 0
+        await stopper
+
+        assert spawned[:3] == [0, 0, 0]
+
+
+class TestSSEForwarding:
+    """SSE消息跨工作进程转发测试"""
+
+    async def test_message_forwarded_to_owner(self, monkeypatch, temp_dir):
+        """测试落到其他工作进程的消息转发到会话所在进程"""
+        worker_dir = temp_dir / "workers"
+        worker_dir.mkdir()
+        monkeypatch.setenv(WORKER_DIR_ENV, str(worker_dir))
+
+        transports = []
+        for worker_id in ("0", "1"):
+            monkeypatch.setenv(WORKER_ID_ENV, worker_id)
+            transport = SSETransport(app)
+            await transport.start("127.0.0.1", 0)
+            transports.append(transport)
+
+        try:
+            owner_port, other_port = (t.runner.addresses[0][1] for t in transports)
+            async with aiohttp.ClientSession() as http:
+                stream = await http.get(f"http://127.0.0.1:{owner_port}/sse", timeout=None)
+                await stream.content.readline()
+                endpoint = (await stream.content.readline()).decode().split(": ", 1)[1].strip()
+                assert "session_id=0." in endpoint
+
+                ping = {"jsonrpc": "2.0", "id": 7, "method": "ping"}
+                async with http.post(f"http://127.0.0.1:{other_port}{endpoint}", json=ping) as r:
+                    assert r.status == 202
+
+                while True:
+                    line = (await stream.content.readline()).decode()
+                    if line.startswith("data: "):
+                        break
+                assert json.loads(line[6:])["id"] == 7
+
+                async with http.post(
+                    f"http://127.0.0.1:{other_port}/messages/?session_id=0.missing", json=ping
+                ) as r:
+                    assert r.status == 404
+                stream.close()
+        finally:
+            for transport in transports:
+                await transport.stop()
@@ -0,0 +1,174 @@
+"""
+任务执行器模块测试
+"""
+
+import asyncio
+import gc
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from deep_thinking.models.thinking_session import ThinkingSession
+from deep_thinking.models.thought import Thought
+from deep_thinking.tools import export, visualization
+from deep_thinking.utils.executor import (
+    LoopLagProbe,
+    TaskExecutor,
+    parse_tool_timeouts,
+    run_io,
+    run_render,
+)
+
+
+def _large_session(thought_count: int) -> ThinkingSession:
+    session = ThinkingSession(name="大会话")
+    for number in range(1, thought_count + 1):
+        session.add_thought(Thought(thought_number=number, content=f"第{number}步 <分析> " * 20))
+    return session
+
+
+@pytest.fixture(scope="module")
+def process_executor():
+    """单进程渲染池（模块内共享，只启动一次工作进程）"""
+    executor = TaskExecutor(render_workers=1, render_timeout=60)
+    yield executor
+    executor.shutdown()
+
+
+class TestTaskExecutorConfig:
+    """执行器配置测试"""
+
+    def test_parse_tool_timeouts(self):
+        """测试解析按工具超时配置"""
+        assert parse_tool_timeouts("") == {}
+        assert parse_tool_timeouts("export_session=120, visualize_session=2.5") == {
+            "export_session": 120.0,
+            "visualize_session": 2.5,
+        }
+
+    @pytest.mark.parametrize("value", ["export_session", "=10", "export_session=abc"])
+    def test_parse_tool_timeouts_invalid(self, value):
+        """测试无效配置"""
+        with pytest.raises(ValueError, match="无效的工具超时配置"):
+            parse_tool_timeouts(value)
+
+    def test_timeout_for(self):
+        """测试按工具覆盖超时，0 表示不限制"""
+        executor = TaskExecutor(render_workers=0, render_timeout=30, tool_timeouts={"a": 5, "b": 0})
+
+        assert executor.timeout_for("a") == 5
+        assert executor.timeout_for("b") is None
+        assert executor.timeout_for("other") == 30
+
+    async def test_without_executor_runs_inline(self):
+        """测试未启用执行器时直接调用"""
+        assert await run_io(None, sum, [1, 2]) == 3
+        assert await run_render(None, "tool", max, 1, 2) == 2
+
+
+class TestTaskExecutor:
+    """执行器行为测试"""
+
+    async def test_render_in_process_pool(self, process_executor):
+        """测试会话快照在渲染进程中渲染，结果与直接渲染一致"""
+        session = _large_session(20)
+
+        result = await process_executor.run_render(
+            "export_session", export._render_export, session, "markdown"
+        )
+
+        assert result == export._render_export(session, "markdown")
+
+    async def test_render_error_propagates(self, process_executor):
+        """测试渲染进程中的异常传回调用方"""
+        with pytest.raises(ValueError, match="不支持的格式"):
+            await process_executor.run_render(
+                "export_session", export._render_export, _large_session(1), "pdf"
+            )
+
+    async def test_render_timeout_replaces_pool(self):
+        """测试渲染超时抛出ValueError并替换进程池"""
+        executor = TaskExecutor(render_workers=1, tool_timeouts={"slow": 0.5})
+        try:
+            # 先完成一次渲染，排除进程启动时间
+            await executor.run_render("warmup", max, 1, 2)
+            pool = executor._process_pool
+
+            with pytest.raises(ValueError, match="渲染超时"):
+                await executor.run_render("slow", time.sleep, 5)
+
+            assert executor._process_pool is None
+            await executor.run_render("warmup", max, 1, 2)
+            assert executor._process_pool is not pool
+        finally:
+            executor.shutdown()
+
+    async def test_cancel_pending_render(self):
+        """测试取消等待中的请求时，尚未开始的任务不再执行"""
+        executor = TaskExecutor(render_workers=0, io_threads=1)
+        calls: list[str] = []
+        try:
+            blocking = asyncio.create_task(executor.run_render("a", time.sleep, 0.3))
+            pending = asyncio.create_task(executor.run_render("b", calls.append, "b"))
+            await asyncio.sleep(0.05)
+
+            pending.cancel()
+            await blocking
+            await asyncio.sleep(0.05)
+
+            assert pending.cancelled()
+            assert calls == []
+        finally:
+            executor.shutdown()
+
+
+class TestLoopLagProbe:
+    """事件循环延迟探针测试"""
+
+    async def test_detects_blocking(self):
+        """测试同步阻塞被记录为延迟"""
+        async with LoopLagProbe(interval=0.005) as probe:
+            await asyncio.sleep(0.02)
+            time.sleep(0.1)
+            await asyncio.sleep(0.02)
+
+        assert probe.max_lag >= 0.09
+        assert probe.percentile(100) == probe.max_lag
+
+    async def test_concurrent_exports_keep_loop_responsive(self, process_executor, temp_dir):
+        """测试并发导出大会话时事件循环不被渲染阻塞"""
+        session = _large_session(3000)
+        mock_manager = MagicMock()
+        mock_manager.get_session.return_value = session
+
+        start = time.perf_counter()
+        visualization._build_visualization(session, "mermaid")
+        export._render_export(session, "html")
+        inline_seconds = time.perf_counter() - start
+
+        with (
+            patch("deep_thinking.tools.export.get_storage_manager", return_value=mock_manager),
+            patch("deep_thinking.tools.export.get_task_executor", return_value=process_executor),
+            patch(
+                "deep_thinking.tools.visualization.get_storage_manager", return_value=mock_manager
+            ),
+            patch(
+                "deep_thinking.tools.visualization.get_task_executor",
+                return_value=process_executor,
+            ),
+        ):
+            # 先做一次完整回收，避免测到的是全量垃圾回收的停顿而不是渲染阻塞
+            gc.collect()
+            async with LoopLagProbe() as probe:
+                results = await asyncio.gather(
+                    export.export_session("s", "html", str(temp_dir / "a.html")),
+                    export.export_session("s", "markdown", str(temp_dir / "b.md")),
+                    visualization.visualize_session("s", "mermaid"),
+                    visualization.visualize_session_simple("s", "tree"),
+                )
+
+        assert "会话已导出" in results[0]
+        assert (temp_dir / "a.html").read_text(encoding="utf-8").startswith("<!DOCTYPE html>")
+        assert "graph TD" in results[2]
+        assert probe.max_lag < inline_seconds / 2
@@ -0,0 +1,71 @@
+"""
+HTML 模板模块测试
+"""
+
+from deep_thinking.models.thinking_session import ThinkingSession
+from deep_thinking.models.thought import Thought
+from deep_thinking.utils.formatters import SessionFormatter
+from deep_thinking.utils.html_template import (
+    HTML_STYLESHEET,
+    HTML_STYLESHEET_NAME,
+    document_head,
+    escape_html,
+    thought_header_tail,
+)
+
+
+class TestEscapeHtml:
+    """escape_html测试"""
+
+    def test_plain_text_returned_unchanged(self):
+        """测试不含特殊字符的文本原样返回"""
+        text = "普通的思考内容"
+        assert escape_html(text) is text
+
+    def test_escapes_special_characters(self):
+        """测试转义全部特殊字符"""
+        assert escape_html("<a href=\"x\">'&'</a>") == (
+            "&lt;a href=&quot;x&quot;&gt;&#x27;&amp;&#x27;&lt;/a&gt;"
+        )
+
+
+class TestDocumentHead:
+    """document_head测试"""
+
+    def test_inline_style(self):
+        """测试默认内联样式表"""
+        head = document_head("会话 <1>")
+
+        assert "<title>会话 &lt;1&gt;</title>" in head
+        assert "<style>" in head
+        assert "<link" not in head
+
+    def test_external_stylesheet(self):
+        """测试外部样式表只输出 <link>"""
+        head = document_head("会话", HTML_STYLESHEET_NAME)
+
+        assert f'<link rel="stylesheet" href="{HTML_STYLESHEET_NAME}">' in head
+        assert "<style>" not in head
+        assert len(head) < len(HTML_STYLESHEET)
+
+    def test_header_fragment_cached(self):
+        """测试思考步骤标题片段被缓存"""
+        first = thought_header_tail("regular", None, "analysis", "🔍", "分析")
+        second = thought_header_tail("regular", None, "analysis", "🔍", "分析")
+        assert first is second
+
+
+class TestToHtmlExternalCss:
+    """SessionFormatter.to_html 外部样式表测试"""
+
+    def test_external_css_document_is_smaller(self, sample_session_data):
+        """测试外部样式表模式的文档体积更小且正文一致"""
+        session = ThinkingSession(**sample_session_data)
+        session.add_thought(Thought(thought_number=1, content="a < b & c"))
+
+        inline = SessionFormatter.to_html(session)
+        linked = SessionFormatter.to_html(session, css_href=HTML_STYLESHEET_NAME)
+
+        assert len(linked) < len(inline)
+        assert "a &lt; b &amp; c" in linked
+        assert inline.split("<body>")[1] == linked.split("<body>")[1]
@@ -0,0 +1,201 @@
+"""
+增量可视化模块测试
+"""
+
+import pytest
+
+from deep_thinking.models.thinking_session import ThinkingSession
+from deep_thinking.models.thought import Thought
+from deep_thinking.models.tool_call import ToolCallData, ToolCallRecord
+from deep_thinking.utils.formatters import Visualizer
+from deep_thinking.utils.incremental_visualizer import IncrementalVisualizer
+
+FORMATS = ["mermaid", "ascii", "tree"]
+
+
+def _full_render(session: ThinkingSession, format_type: str) -> str:
+    """使用完整渲染器生成结果"""
+    return {
+        "mermaid": Visualizer.to_mermaid,
+        "ascii": Visualizer.to_ascii,
+        "tree": Visualizer.to_tree,
+    }[format_type](session)
+
+
+def _growing_thoughts() -> list[Thought]:
+    """覆盖常规、修订、分支、对比和工具调用的思考序列"""
+    return [
+        Thought(thought_number=1, content="分析问题"),
+        Thought(thought_number=2, content="提出方案", tool_calls=["rec-1"]),
+        Thought(
+            thought_number=3,
+            content="修订方案",
+            type="revision",
+            is_revision=True,
+            revises_thought=2,
+        ),
+        Thought(
+            thought_number=4,
+            content="备选路线",
+            type="branch",
+            branch_from_thought=2,
+            branch_id="branch-a",
+        ),
+        Thought(thought_number=5, content="继续备选", branch_id="branch-a"),
+        Thought(
+            thought_number=6,
+            content="子分支",
+            type="branch",
+            branch_from_thought=5,
+            branch_id="branch-a-1",
+        ),
+        Thought(thought_number=7, content="回到主线"),
+        Thought(
+            thought_number=8,
+            content="比较两条路线",
+            type="comparison",
+            comparison_items=["主线", "备选"],
+        ),
+        Thought(thought_number=9, content="得出结论", phase="analysis"),
+    ]
+
+
+class TestIncrementalVisualizer:
+    """IncrementalVisualizer测试"""
+
+    @pytest.fixture
+    def session(self, sample_session_data):
+        """带工具调用记录的会话"""
+        session = ThinkingSession(**sample_session_data)
+        session.tool_call_history.append(
+            ToolCallRecord(
+                record_id="rec-1",
+                thought_number=2,
+                call_data=ToolCallData(tool_name="search"),
+                status="completed",
+            )
+        )
+        return session
+
+    @pytest.mark.parametrize("format_type", FORMATS)
+    def test_matches_full_render_while_growing(self, session, format_type):
+        """测试逐步追加时输出与完整渲染一致"""
+        visualizer = IncrementalVisualizer()
+
+        assert visualizer.render(session, format_type) == _full_render(session, format_type)
+        for thought in _growing_thoughts():
+            session.add_thought(thought)
+            assert visualizer.render(session, format_type) == _full_render(session, format_type)
+
+        # 首次渲染后全部为增量更新
+        assert visualizer.full_rebuilds == 1
+        assert visualizer.incremental_updates == len(_growing_thoughts()) - 1
+
+    @pytest.mark.parametrize("format_type", FORMATS)
+    def test_appending_several_thoughts_at_once(self, session, format_type):
+        """测试一次追加多个步骤"""
+        visualizer = IncrementalVisualizer()
+        thoughts = _growing_thoughts()
+
+        for thought in thoughts[:2]:
+            session.add_thought(thought)
+        visualizer.render(session, format_type)
+
+        for thought in thoughts[2:]:
+            session.add_thought(thought)
+        assert visualizer.render(session, format_type) == _full_render(session, format_type)
+        assert visualizer.incremental_updates == 1
+
+    @pytest.mark.parametrize("format_type", FORMATS)
+    def test_mutation_falls_back_to_full_rebuild(self, session, format_type):
+        """测试修改已有步骤时回退为完整重建"""
+        visualizer = IncrementalVisualizer()
+        for thought in _growing_thoughts()[:5]:
+            session.add_thought(thought)
+        visualizer.render(session, format_type)
+
+        session.thoughts[1].content = "修改后的方案"
+        assert visualizer.render(session, format_type) == _full_render(session, format_type)
+
+        session.remove_thought(5)
+        assert visualizer.render(session, format_type) == _full_render(session, format_type)
+        assert visualizer.full_rebuilds == 3
+
+    @pytest.mark.parametrize("format_type", FORMATS)
+    def test_tool_call_status_change_rebuilds(self, session, format_type):
+        """测试工具调用记录变化时回退为完整重建"""
+        visualizer = IncrementalVisualizer()
+        session.tool_call_history[0].status = "pending"
+        for thought in _growing_thoughts()[:3]:
+            session.add_thought(thought)
+        visualizer.render(session, format_type)
+
+        session.tool_call_history[0].status = "completed"
+        assert visualizer.render(session, format_type) == _full_render(session, format_type)
+        assert visualizer.full_rebuilds == 2
+
+    @pytest.mark.parametrize("format_type", FORMATS)
+    def test_late_tool_call_record_rebuilds(self, sample_session_data, format_type):
+        """测试新记录补全此前找不到的工具调用引用"""
+        visualizer = IncrementalVisualizer()
+        session = ThinkingSession(**sample_session_data)
+        session.add_thought(Thought(thought_number=1, content="调用工具", tool_calls=["rec-late"]))
+        visualizer.render(session, format_type)
+
+        session.tool_call_history.append(
+            ToolCallRecord(
+                record_id="rec-late",
+                thought_number=1,
+                call_data=ToolCallData(tool_name="fetch"),
+            )
+        )
+        session.add_thought(Thought(thought_number=2, content="分析结果"))
+        assert visualizer.render(session, format_type) == _full_render(session, format_type)
+        assert visualizer.full_rebuilds == 2
+
+    def test_missing_target_resolved_rebuilds(self, sample_session_data):
+        """测试新步骤补全此前找不到的修订目标"""
+        visualizer = IncrementalVisualizer()
+        session = ThinkingSession(**sample_session_data)
+        session.add_thought(Thought(thought_number=1, content="起点"))
+        session.add_thought(
+            Thought(
+                thought_number=4,
+                content="修订",
+                type="revision",
+                is_revision=True,
+                revises_thought=3,
+            )
+        )
+        visualizer.to_mermaid(session)
+
+        session.add_thought(Thought(thought_number=3, content="迟到的步骤"))
+        assert visualizer.to_mermaid(session) == Visualizer.to_mermaid(session)
+        assert visualizer.full_rebuilds == 2
+
+    def test_empty_session(self, sample_session_data):
+        """测试空会话"""
+        visualizer = IncrementalVisualizer()
+        session = ThinkingSession(**sample_session_data)
+
+        for format_type in FORMATS:
+            assert visualizer.render(session, format_type) == _full_render(session, format_type)
+
+    def test_invalid_format(self, session):
+        """测试无效格式"""
+        with pytest.raises(ValueError, match="不支持的格式"):
+            IncrementalVisualizer().render(session, "svg")
+
+    def test_lru_eviction(self, sample_session_data):
+        """测试渲染状态按LRU淘汰"""
+        visualizer = IncrementalVisualizer(max_sessions=1)
+        first = ThinkingSession(**sample_session_data)
+        first.add_thought(Thought(thought_number=1, content="A"))
+        second = ThinkingSession(**{**sample_session_data, "session_id": "other-session"})
+        second.add_thought(Thought(thought_number=1, content="B"))
+
+        visualizer.to_tree(first)
+        visualizer.to_tree(second)
+        visualizer.to_tree(first)
+
+        assert visualizer.full_rebuilds == 3
@@ -2,10 +2,24 @@
 Logger模块测试
 """
 
+import io
+import json
 import logging
+import os
+import queue
 import sys
+from unittest.mock import patch
 
-from deep_thinking.utils.logger import LoggingContext, get_logger, setup_logging
+import pytest
+
+from deep_thinking.utils.logger import (
+    BoundedQueueHandler,
+    LoggingContext,
+    get_log_handlers,
+    get_logger,
+    setup_logging,
+    shutdown_logging,
+)
 
 
 class TestSetupLogging:
@@ -18,9 +32,9 @@ class TestSetupLogging:
         assert logger is not None
         assert logger.level == logging.INFO
         # STDIO模式应该使用stderr
-        assert any(isinstance(h, logging.StreamHandler) for h in logger.handlers)
+        assert any(isinstance(h, logging.StreamHandler) for h in get_log_handlers())
         # 检查handler输出到stderr
-        for handler in logger.handlers:
+        for handler in get_log_handlers():
             if isinstance(handler, logging.StreamHandler):
                 assert handler.stream == sys.stderr
 
@@ -31,7 +45,7 @@ class TestSetupLogging:
         assert logger is not None
         assert logger.level == logging.INFO
         # SSE模式应该使用stdout
-        for handler in logger.handlers:
+        for handler in get_log_handlers():
             if isinstance(handler, logging.StreamHandler):
                 assert handler.stream == sys.stdout
 
@@ -67,9 +81,9 @@ class TestSetupLogging:
 
     def test_setup_logging_formatter(self):
         """测试日志格式化器"""
-        logger = setup_logging("stdio")
+        setup_logging("stdio")
 
-        for handler in logger.handlers:
+        for handler in get_log_handlers():
             if isinstance(handler, logging.StreamHandler):
                 assert handler.formatter is not None
                 assert isinstance(handler.formatter, logging.Formatter)
@@ -80,7 +94,94 @@ class TestSetupLogging:
 
         # 验证handler被创建
         assert len(logger.handlers) > 0
-        assert any(isinstance(h, logging.StreamHandler) for h in logger.handlers)
+        assert any(isinstance(h, logging.StreamHandler) for h in get_log_handlers())
+
+
+class TestQueuedLogging:
+    """非阻塞日志测试"""
+
+    def test_stdio_writes_stderr_only(self):
+        """测试STDIO模式经后台线程写到stderr，不写stdout"""
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with patch("sys.stdout", stdout), patch("sys.stderr", stderr):
+            logger = setup_logging("stdio")
+            assert [type(h) for h in logger.handlers] == [BoundedQueueHandler]
+
+            logging.getLogger("test.queued").warning("队列日志 %s", 1)
+            shutdown_logging()
+
+        assert "队列日志 1" in stderr.getvalue()
+        assert stdout.getvalue() == ""
+
+    def test_synchronous_mode(self):
+        """测试队列长度为0时直接挂处理器"""
+        logger = setup_logging("sse", queue_size=0)
+
+        assert [type(h) for h in logger.handlers] == [logging.StreamHandler]
+        assert get_log_handlers() == logger.handlers
+
+    def test_json_format_and_log_file(self, temp_dir):
+        """测试 JSON 格式写入日志文件"""
+        log_file = temp_dir / "logs" / "server.log"
+        setup_logging("sse", log_format="json", log_file=log_file)
+
+        try:
+            raise RuntimeError("出错了")
+        except RuntimeError:
+            logging.getLogger("test.json").exception("请求失败: %s", "abc")
+        shutdown_logging()
+
+        record = json.loads(log_file.read_text(encoding="utf-8").splitlines()[-1])
+        assert record["level"] == "ERROR"
+        assert record["logger"] == "test.json"
+        assert record["message"] == "请求失败: abc"
+        assert "RuntimeError: 出错了" in record["exception"]
+
+    def test_drop_policy(self):
+        """测试队列已满时丢弃并在之后记录丢弃条数"""
+        log_queue: queue.Queue[logging.LogRecord] = queue.Queue(maxsize=2)
+        handler = BoundedQueueHandler(log_queue, "drop")
+        logger = logging.getLogger("test.drop")
+        records = [
+            logger.makeRecord(logger.name, logging.INFO, "", 0, f"m{i}", None, None)
+            for i in range(4)
+        ]
+
+        for record in records:
+            handler.handle(record)
+        assert handler.dropped == 2
+
+        log_queue.get_nowait()
+        log_queue.get_nowait()
+        handler.handle(records[0])
+        messages = [log_queue.get_nowait().getMessage() for _ in range(2)]
+        assert messages == ["m0", "日志队列已满，丢弃了 2 条日志"]
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="需要 fork")
+    def test_forked_child_writes_synchronously(self, temp_dir):
+        """测试 fork 出的子进程不依赖后台日志线程"""
+        log_file = temp_dir / "server.log"
+        setup_logging("sse", log_file=log_file, overflow="block", queue_size=1)
+
+        pid = os.fork()
+        if pid == 0:
+            for i in range(5):
+                logging.getLogger("test.child").info(f"子进程日志 {i}")
+            os._exit(0)
+        _, status = os.waitpid(pid, 0)
+        shutdown_logging()
+
+        assert os.waitstatus_to_exitcode(status) == 0
+        assert "子进程日志 4" in log_file.read_text(encoding="utf-8")
+
+    def test_invalid_options(self):
+        """测试无效参数"""
+        with pytest.raises(ValueError, match="无效的日志格式"):
+            setup_logging("stdio", log_format="xml")
+        with pytest.raises(ValueError, match="无效的日志队列溢出策略"):
+            setup_logging("stdio", overflow="wait")
+        with pytest.raises(ValueError, match="日志队列长度"):
+            setup_logging("stdio", queue_size=-1)
 
 
 class TestGetLogger:
@@ -0,0 +1,184 @@
+"""
+运行指标测试
+"""
+
+import pytest
+
+from deep_thinking.storage.json_file_store import JsonFileStore
+from deep_thinking.storage.storage_manager import StorageManager
+from deep_thinking.utils.metrics import Histogram, Metrics, metrics, metrics_enabled_from_env
+from deep_thinking.utils.render_cache import RenderCache
+
+
+@pytest.fixture
+def global_metrics(monkeypatch):
+    """启用并清空全局指标"""
+    monkeypatch.setattr(metrics, "enabled", True)
+    metrics.reset()
+    yield metrics
+    metrics.reset()
+
+
+class TestHistogram:
+    """直方图测试"""
+
+    def test_observe(self):
+        """测试观测值落入对应的桶"""
+        histogram = Histogram((0.01, 0.1, 1.0))
+        for value in (0.005, 0.01, 0.05, 0.5, 2.0):
+            histogram.observe(value)
+
+        assert histogram.counts == [2, 1, 1, 1]
+        assert histogram.count == 5
+        assert histogram.sum == pytest.approx(2.565)
+        assert histogram.max == 2.0
+
+    def test_quantile(self):
+        """测试分位数在桶内插值，超出最后一个桶时返回最大值"""
+        histogram = Histogram((0.01, 0.1))
+        assert histogram.quantile(0.5) == 0.0
+
+        for _ in range(10):
+            histogram.observe(0.05)
+        assert histogram.quantile(0.5) == pytest.approx(0.05)
+        assert histogram.quantile(1.0) == pytest.approx(0.05)
+
+        histogram.observe(3.0)
+        assert histogram.quantile(1.0) == 3.0
+
+    def test_prometheus_lines(self):
+        """测试输出累计桶计数"""
+        histogram = Histogram((0.1, 1.0))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+
+        lines = histogram.prometheus_lines("x_seconds", 'tool="a"')
+
+        assert lines == [
+            'x_seconds_bucket{tool="a",le="0.1"} 1',
+            'x_seconds_bucket{tool="a",le="1"} 2',
+            'x_seconds_bucket{tool="a",le="+Inf"} 2',
+            'x_seconds_sum{tool="a"} 0.550000',
+            'x_seconds_count{tool="a"} 2',
+        ]
+
+
+class TestMetrics:
+    """指标汇总测试"""
+
+    def test_snapshot(self):
+        """测试快照汇总工具耗时、存储、验证和缓存命中率"""
+        m = Metrics()
+        m.observe_tool("get_session", 0.002)
+        m.observe_tool("get_session", 0.004, error=True)
+        m.count_storage("read")
+        m.add_bytes(read=100, written=50)
+        m.observe_fsync(0.001)
+        m.observe_validation(0.003)
+        m.count_cache("render", "hit")
+        m.count_cache("render", "disk_hit")
+        m.count_cache("render", "miss")
+        m.count_cache("render", "miss")
+
+        snapshot = m.snapshot()
+
+        assert snapshot["tools"]["get_session"]["calls"] == 2
+        assert snapshot["tools"]["get_session"]["errors"] == 1
+        assert snapshot["tools"]["get_session"]["avg_ms"] == pytest.approx(3.0)
+        assert snapshot["storage"]["operations"] == {"read": 1}
+        assert snapshot["storage"]["bytes_read"] == 100
+        assert snapshot["storage"]["bytes_written"] == 50
+        assert snapshot["storage"]["fsync_count"] == 1
+        assert snapshot["validation"] == {"count": 1, "total_ms": 3.0}
+        assert snapshot["cache"]["render"]["hit_ratio"] == 0.5
+
+        m.reset()
+        assert m.snapshot()["tools"] == {}
+
+    def test_format_prometheus(self):
+        """测试Prometheus文本格式"""
+        m = Metrics()
+        m.observe_tool("list_sessions", 0.02)
+        m.observe_tool("list_sessions", 0.02, error=True)
+        m.count_storage("write")
+        m.count_cache("layout", "hit")
+
+        text = m.format_prometheus()
+
+        assert text.endswith("\n")
+        assert 'deepthinking_tool_duration_seconds_count{tool="list_sessions"} 2' in text
+        assert 'deepthinking_tool_errors_total{tool="list_sessions"} 1' in text
+        assert 'deepthinking_storage_operations_total{op="write"} 1' in text
+        assert "deepthinking_storage_fsync_seconds_count 0" in text
+        assert 'deepthinking_cache_requests_total{cache="layout",result="hit"} 1' in text
+        assert 'deepthinking_cache_hit_ratio{cache="layout"} 1.0000' in text
+
+    @pytest.mark.parametrize(
+        ("value", "expected"),
+        [(None, True), ("1", True), ("0", False), ("off", False), ("False", False)],
+    )
+    def test_enabled_from_env(self, monkeypatch, value, expected):
+        """测试环境变量控制是否启用"""
+        if value is None:
+            monkeypatch.delenv("DEEP_THINKING_METRICS", raising=False)
+        else:
+            monkeypatch.setenv("DEEP_THINKING_METRICS", value)
+        assert metrics_enabled_from_env() is expected
+
+
+class TestInstrumentation:
+    """存储和缓存埋点测试"""
+
+    def test_storage(self, temp_dir, global_metrics):
+        """测试会话读写记录操作次数、字节数、fsync和验证耗时"""
+        manager = StorageManager(temp_dir)
+        session = manager.create_session(name="指标")
+        global_metrics.reset()
+
+        manager.get_session(session.session_id)
+        with manager.open_session_range(session.session_id):
+            pass
+        manager.delete_session(session.session_id)
+
+        snapshot = global_metrics.snapshot()
+        assert snapshot["storage"]["operations"]["read"] >= 1
+        assert snapshot["storage"]["operations"]["range_read"] == 1
+        assert snapshot["storage"]["operations"]["delete"] == 1
+        assert snapshot["storage"]["bytes_read"] > 0
+        assert snapshot["validation"]["count"] == 1
+        assert snapshot["cache"]["layout"]["hit"] == 1
+
+    def test_write(self, temp_dir, global_metrics):
+        """测试写入记录字节数和fsync耗时"""
+        store = JsonFileStore(temp_dir, enable_backup=False)
+        store.write("a", {"x": 1})
+
+        snapshot = global_metrics.snapshot()
+        assert snapshot["storage"]["operations"] == {"write": 1}
+        assert snapshot["storage"]["bytes_written"] == (temp_dir / "a.json").stat().st_size
+        assert snapshot["storage"]["fsync_count"] == 1
+
+    def test_render_cache(self, temp_dir, global_metrics):
+        """测试渲染缓存命中和未命中"""
+        cache = RenderCache(temp_dir)
+        assert cache.get("s", "r1", "visualize.mermaid") is None
+        cache.put("s", "r1", "visualize.mermaid", "graph")
+        assert cache.get("s", "r1", "visualize.mermaid") == "graph"
+
+        assert global_metrics.snapshot()["cache"]["render"] == {
+            "hit": 1,
+            "miss": 1,
+            "hit_ratio": 0.5,
+        }
+
+    def test_disabled(self, temp_dir, monkeypatch, global_metrics):
+        """测试禁用时不记录"""
+        monkeypatch.setattr(global_metrics, "enabled", False)
+        manager = StorageManager(temp_dir)
+        session = manager.create_session(name="禁用")
+        manager.get_session(session.session_id)
+
+        snapshot = global_metrics.snapshot()
+        assert snapshot["storage"]["operations"] == {}
+        assert snapshot["storage"]["fsync_count"] == 0
+        assert snapshot["validation"]["count"] == 0
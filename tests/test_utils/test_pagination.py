@@ -0,0 +1,82 @@
+"""
+分页模块测试
+"""
+
+import pytest
+
+from deep_thinking.utils.pagination import (
+    DEFAULT_MAX_RESPONSE_BYTES,
+    ResponseBudget,
+    decode_cursor,
+    encode_cursor,
+    get_max_response_bytes,
+    shorten_content,
+    truncate_bytes,
+    validate_page_params,
+)
+
+
+class TestCursor:
+    """分页游标测试"""
+
+    def test_round_trip(self):
+        """测试编码后解码得到原位置"""
+        for offset in (0, 1, 50, 123456):
+            assert decode_cursor(encode_cursor(offset)) == offset
+
+    def test_empty_cursor_is_first_page(self):
+        """测试空游标表示第一页"""
+        assert decode_cursor(None) == 0
+        assert decode_cursor("") == 0
+
+    @pytest.mark.parametrize("cursor", ["???", "bm9wZQ", encode_cursor(1)[:-1] + "!"])
+    def test_invalid_cursor(self, cursor):
+        """测试无效游标"""
+        with pytest.raises(ValueError, match="无效的分页游标"):
+            decode_cursor(cursor)
+
+
+class TestContent:
+    """内容缩短测试"""
+
+    def test_modes(self):
+        """测试三种内容模式"""
+        content = "第一行" + "长" * 600 + "\n第二行"
+
+        assert shorten_content(content, "full") == content
+        assert shorten_content(content, "truncate", 10).startswith("第一行长长长长长长长…")
+        summary = shorten_content(content, "summary")
+        assert "第二行" not in summary
+        assert summary.endswith(f"（共 {len(content)} 字）")
+
+    def test_truncate_bytes_keeps_characters_whole(self):
+        """测试按字节截断不破坏多字节字符"""
+        assert truncate_bytes("中文内容", 7) == "中文"
+        assert truncate_bytes("abc", 10) == "abc"
+
+    def test_validate_page_params(self):
+        """测试分页参数验证"""
+        with pytest.raises(ValueError, match="limit"):
+            validate_page_params(0)
+        with pytest.raises(ValueError, match="不支持的内容模式"):
+            validate_page_params(10, "brief")
+
+
+class TestResponseBudget:
+    """响应字节预算测试"""
+
+    def test_budget(self):
+        """测试预算累计与不限制模式"""
+        budget = ResponseBudget(300)
+        assert budget.fits(["a" * 40])
+        budget.add(["a" * 40])
+        assert not budget.fits(["a" * 40])
+        assert ResponseBudget(0).fits(["a" * 100000])
+
+    def test_env_override(self, monkeypatch):
+        """测试环境变量设置默认预算"""
+        monkeypatch.setenv("DEEP_THINKING_MAX_RESPONSE_BYTES", "4096")
+        assert get_max_response_bytes() == 4096
+
+        monkeypatch.setenv("DEEP_THINKING_MAX_RESPONSE_BYTES", "abc")
+        assert get_max_response_bytes() == DEFAULT_MAX_RESPONSE_BYTES
@@ -0,0 +1,109 @@
+"""
+运行时性能分析测试
+"""
+
+import asyncio
+import pstats
+import threading
+import time
+
+import pytest
+
+from deep_thinking.utils.profiler import Profiler
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class TestProfiler:
+    """性能分析控制器测试"""
+
+    def test_cprofile_stops_after_calls(self, temp_dir):
+        """测试 cprofile 模式在指定次数的调用完成后写出 pstats 文件"""
+        profiler = Profiler()
+        before = time.perf_counter()
+        output = profiler.start(temp_dir, calls=2)
+        assert output.suffix == ".pstats"
+
+        # 分析开始前已开始的调用不计入
+        profiler.on_tool_call(before)
+        assert profiler.status()["calls"] == 0
+
+        for _ in range(2):
+            started = time.perf_counter()
+            _busy(0.001)
+            profiler.on_tool_call(started)
+
+        assert not profiler.active
+        assert profiler.last_output == output
+        stats = pstats.Stats(str(output))
+        assert any(func[2] == "_busy" for func in stats.stats)
+
+    def test_sampling(self, temp_dir):
+        """测试 sampling 模式采样其他线程的调用栈"""
+        profiler = Profiler()
+        worker = threading.Thread(target=_busy, args=(0.2,), name="busy-worker")
+        worker.start()
+        output = profiler.start(temp_dir, mode="sampling", interval=0.001)
+        worker.join()
+
+        assert profiler.stop() == output
+        lines = output.read_text(encoding="utf-8").splitlines()
+        assert any(line.startswith("busy-worker;") and "_busy" in line for line in lines)
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+    async def test_stops_after_seconds(self, temp_dir):
+        """测试在事件循环中按时长自动停止"""
+        profiler = Profiler()
+        output = profiler.start(temp_dir, seconds=0.05)
+
+        await asyncio.sleep(0.2)
+
+        assert not profiler.active
+        assert output.exists()
+
+    def test_deadline_without_loop(self, temp_dir):
+        """测试没有事件循环时查询状态会停止超时的分析"""
+        profiler = Profiler()
+        output = profiler.start(temp_dir, mode="sampling", seconds=0.01)
+        time.sleep(0.05)
+
+        status = profiler.status()
+
+        assert status == {"active": False, "last_output": str(output)}
+        assert output.exists()
+
+    def test_invalid(self, temp_dir):
+        """测试无效参数和重复开始"""
+        profiler = Profiler()
+        with pytest.raises(ValueError, match="无效的分析模式"):
+            profiler.start(temp_dir, mode="perf")
+        with pytest.raises(ValueError, match="调用次数"):
+            profiler.start(temp_dir, calls=0)
+        with pytest.raises(ValueError, match="分析时长"):
+            profiler.start(temp_dir, seconds=-1)
+        with pytest.raises(ValueError, match="无效的分析动作"):
+            profiler.control("pause", temp_dir)
+
+        profiler.start(temp_dir)
+        try:
+            with pytest.raises(ValueError, match="性能分析已在进行中"):
+                profiler.start(temp_dir)
+        finally:
+            profiler.stop()
+        assert profiler.stop() is None
+
+    def test_control(self, temp_dir):
+        """测试控制动作返回状态"""
+        profiler = Profiler()
+
+        assert profiler.control("status", temp_dir) == {"active": False, "last_output": None}
+        status = profiler.control("start", temp_dir, mode="sampling", calls=3)
+        assert status["active"] is True
+        assert status["calls_limit"] == 3
+        status = profiler.control("stop", temp_dir)
+        assert status["active"] is False
+        assert status["stopped_output"] == status["last_output"]
@@ -0,0 +1,222 @@
+"""
+渲染缓存模块测试
+"""
+
+import os
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from deep_thinking.models.thought import Thought
+from deep_thinking.storage.storage_manager import StorageManager
+from deep_thinking.tools import export, session_manager, visualization
+from deep_thinking.utils.executor import TaskExecutor
+from deep_thinking.utils.render_cache import RenderCache, render_with_cache
+
+
+class TestRenderCache:
+    """RenderCache测试"""
+
+    def test_memory_hit_and_revision_mismatch(self):
+        """测试内存命中与修订不一致时未命中"""
+        cache = RenderCache()
+        cache.put("s1", "r1", "visualize.tree", "内容")
+
+        assert cache.get("s1", "r1", "visualize.tree") == "内容"
+        assert cache.get("s1", "r2", "visualize.tree") is None
+        assert cache.get("s1", "r1", "visualize.ascii") is None
+
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 2
+
+    def test_lru_eviction(self):
+        """测试LRU淘汰"""
+        cache = RenderCache(max_entries=2)
+        cache.put("s1", "r", "k", "1")
+        cache.put("s2", "r", "k", "2")
+        cache.get("s1", "r", "k")
+        cache.put("s3", "r", "k", "3")
+
+        assert cache.get("s1", "r", "k") == "1"
+        assert cache.get("s2", "r", "k") is None
+        assert cache.get_stats()["entries"] == 2
+
+    def test_disk_tier_survives_new_instance(self, temp_dir):
+        """测试磁盘层在新实例中命中"""
+        RenderCache(temp_dir).put("s1", "r1", "visualize.mermaid", "graph TD\n  A --> B")
+
+        cache = RenderCache(temp_dir)
+        assert cache.get("s1", "r1", "visualize.mermaid") == "graph TD\n  A --> B"
+        assert cache.get("s1", "r2", "visualize.mermaid") is None
+        assert cache.get_stats()["disk_hits"] == 1
+
+    def test_invalidate(self, temp_dir):
+        """测试失效清除内存层和磁盘层"""
+        cache = RenderCache(temp_dir)
+        cache.put("s1", "r1", "k", "内容")
+        cache.put("s2", "r1", "k", "其他")
+
+        cache.invalidate("s1")
+
+        assert cache.get("s1", "r1", "k") is None
+        assert not (temp_dir / "s1").exists()
+        assert cache.get("s2", "r1", "k") == "其他"
+
+    def test_disk_tier_evicts_least_recently_used(self, temp_dir):
+        """测试磁盘层超出容量时删除最久未使用的文件"""
+        cache = RenderCache(temp_dir, max_entries=1, max_disk_bytes=3000)
+        for index, session_id in enumerate(("s1", "s2")):
+            cache.put(session_id, "r", "k", "x" * 1000)
+            os.utime(temp_dir / session_id / "k.cache", (1000 + index, 1000 + index))
+        # 命中后更新使用时间，s2 成为最久未使用
+        assert cache.get("s1", "r", "k") == "x" * 1000
+
+        cache.put("s3", "r", "k", "x" * 1000)
+
+        assert not (temp_dir / "s2").exists()
+        assert (temp_dir / "s1" / "k.cache").exists()
+        stats = cache.get_stats()
+        assert stats["disk_evictions"] == 1
+        assert 0 < stats["disk_bytes"] <= 3000 * 0.8
+
+    def test_disk_tier_prunes_expired_on_start(self, temp_dir):
+        """测试启动时删除过期文件并统计磁盘层大小"""
+        cache = RenderCache(temp_dir)
+        cache.put("old", "r", "k", "旧")
+        cache.put("new", "r", "k", "新")
+        os.utime(temp_dir / "old" / "k.cache", (1000, 1000))
+        cache.invalidate("new")
+        assert cache.get_stats()["disk_bytes"] == (temp_dir / "old" / "k.cache").stat().st_size
+
+        reopened = RenderCache(temp_dir, max_disk_age=3600)
+        # 启动时不遍历磁盘层，总大小未知
+        assert (temp_dir / "old").exists()
+        assert reopened.get_stats()["disk_bytes"] is None
+
+        reopened.prune_disk()
+
+        assert not (temp_dir / "old").exists()
+        assert reopened.get_stats()["disk_bytes"] == 0
+        unlimited = RenderCache(temp_dir, max_disk_age=0)
+        unlimited.prune_disk()
+        assert unlimited.get_stats()["disk_evictions"] == 0
+
+    def test_disk_size_computed_on_first_write(self, temp_dir):
+        """测试未扫描时首次写入统计磁盘层大小"""
+        RenderCache(temp_dir).put("s1", "r", "k", "x" * 100)
+
+        cache = RenderCache(temp_dir)
+        cache.put("s2", "r", "k", "y" * 100)
+
+        total = sum(path.stat().st_size for path in temp_dir.glob("*/*.cache"))
+        assert cache.get_stats()["disk_bytes"] == total
+
+
+class TestRenderWithCache:
+    """render_with_cache及工具集成测试"""
+
+    @pytest.fixture
+    def manager(self, temp_dir):
+        """带渲染缓存监听的存储管理器"""
+        manager = StorageManager(temp_dir / "data")
+        session = manager.create_session(name="缓存会话", session_id="cache-session")
+        session.add_thought(Thought(thought_number=1, content="第一步"))
+        manager.update_session(session)
+        return manager
+
+    @pytest.fixture
+    def cache(self, manager, temp_dir):
+        """注册到存储管理器的渲染缓存"""
+        cache = RenderCache(temp_dir / "cache")
+        manager.add_change_listener(cache.invalidate)
+        return cache
+
+    def test_disabled_cache_always_renders(self, manager):
+        """测试禁用缓存时每次都渲染"""
+        calls = []
+
+        def render() -> str:
+            calls.append(1)
+            return "结果"
+
+        render_with_cache(None, manager, "cache-session", "k", render)
+        render_with_cache(None, manager, "cache-session", "k", render)
+        assert len(calls) == 2
+
+    async def test_visualize_renders_once(self, manager, cache):
+        """测试会话未变化时可视化只渲染一次"""
+        with (
+            patch.object(visualization, "get_storage_manager", return_value=manager),
+            patch.object(visualization, "get_render_cache", return_value=cache),
+            patch.object(manager, "get_session", wraps=manager.get_session) as spy,
+        ):
+            first = await visualization.visualize_session("cache-session", "mermaid")
+            second = await visualization.visualize_session("cache-session", "mermaid")
+
+        assert first == second
+        assert spy.call_count == 1
+
+    async def test_cache_lookup_runs_in_io_thread(self, manager, cache):
+        """测试异步渲染时读取修订标记和缓存在I/O线程池中执行"""
+        loop_thread = threading.current_thread()
+        threads = []
+
+        def record(func):
+            def wrapper(*args):
+                threads.append(threading.current_thread())
+                return func(*args)
+
+            return wrapper
+
+        executor = TaskExecutor(render_workers=0, io_threads=1)
+        try:
+            with (
+                patch.object(visualization, "get_storage_manager", return_value=manager),
+                patch.object(visualization, "get_render_cache", return_value=cache),
+                patch.object(visualization, "get_task_executor", return_value=executor),
+                patch.object(manager, "get_session_revision", record(manager.get_session_revision)),
+                patch.object(cache, "get", record(cache.get)),
+                patch.object(cache, "put", record(cache.put)),
+            ):
+                await visualization.visualize_session("cache-session", "mermaid")
+        finally:
+            executor.shutdown()
+
+        assert len(threads) == 3
+        assert all(thread is not loop_thread for thread in threads)
+
+    async def test_update_session_invalidates(self, manager, cache):
+        """测试更新会话后缓存失效"""
+        with (
+            patch.object(visualization, "get_storage_manager", return_value=manager),
+            patch.object(visualization, "get_render_cache", return_value=cache),
+        ):
+            before = await visualization.visualize_session_simple("cache-session", "tree")
+
+            manager.add_thought("cache-session", Thought(thought_number=2, content="第二步"))
+            after = await visualization.visualize_session_simple("cache-session", "tree")
+
+        assert "第二步" not in before
+        assert "第二步" in after
+
+    async def test_export_and_get_session_cached(self, manager, cache, temp_dir):
+        """测试导出和会话详情使用缓存"""
+        with (
+            patch.object(export, "get_storage_manager", return_value=manager),
+            patch.object(export, "get_render_cache", return_value=cache),
+            patch.object(session_manager, "get_storage_manager", return_value=manager),
+            patch.object(session_manager, "get_render_cache", return_value=cache),
+            patch.object(manager, "get_session", wraps=manager.get_session) as spy,
+            patch.object(
+                manager, "open_session_range", wraps=manager.open_session_range
+            ) as range_spy,
+        ):
+            for _ in range(2):
+                await export.export_session("cache-session", "html", str(temp_dir / "a.html"))
+                session_manager.get_session("cache-session")
+
+        assert spy.call_count == 1
+        assert range_spy.call_count == 1
+        assert "缓存会话" in (temp_dir / "a.html").read_text(encoding="utf-8")
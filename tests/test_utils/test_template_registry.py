@@ -0,0 +1,136 @@
+"""
+模板注册表测试
+"""
+
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+from deep_thinking.utils.template_registry import TemplateRegistry
+
+
+def _write_template(directory, template_id, name, category="analysis"):
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{template_id}.json"
+    data = {
+        "template_id": template_id,
+        "name": name,
+        "description": f"{name}描述",
+        "category": category,
+        "structure": {"steps": [{"step_number": 1, "prompt": "第一步", "type": "regular"}]},
+    }
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+def _bump_mtime(path):
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+class TestTemplateRegistry:
+    """模板注册表测试"""
+
+    def test_builtin_templates(self):
+        """测试默认加载包内模板"""
+        registry = TemplateRegistry()
+
+        assert {"analysis", "decision_making", "problem_solving"} <= set(
+            registry.list_template_ids()
+        )
+        assert registry.get_template("analysis")["name"] == "分析模板"
+        assert registry.errors == {}
+
+    def test_parses_each_file_once(self, temp_dir):
+        """测试模板只解析一次，之后的读取直接使用缓存"""
+        _write_template(temp_dir, "a", "模板A")
+        registry = TemplateRegistry([temp_dir], check_interval=0)
+
+        with patch.object(TemplateRegistry, "_load", wraps=TemplateRegistry._load) as mock_load:
+            for _ in range(3):
+                registry.list_templates()
+                registry.get_template("a")
+
+        assert mock_load.call_count == 1
+
+    def test_user_dir_overrides_builtin(self, temp_dir):
+        """测试后面的目录覆盖同名模板"""
+        builtin = temp_dir / "builtin"
+        user = temp_dir / "user"
+        _write_template(builtin, "a", "内置A")
+        _write_template(builtin, "b", "内置B")
+        _write_template(user, "a", "用户A")
+
+        registry = TemplateRegistry([builtin, user])
+
+        assert registry.get_template("a")["name"] == "用户A"
+        assert [t["name"] for t in registry.list_templates()] == ["用户A", "内置B"]
+
+    def test_reloads_changed_file(self, temp_dir):
+        """测试文件修改、新增和删除后自动重新加载"""
+        path = _write_template(temp_dir, "a", "模板A")
+        registry = TemplateRegistry([temp_dir], check_interval=0)
+        assert registry.get_template("a")["name"] == "模板A"
+
+        _write_template(temp_dir, "a", "模板A2")
+        _bump_mtime(path)
+        _write_template(temp_dir, "b", "模板B")
+
+        assert registry.get_template("a")["name"] == "模板A2"
+        assert registry.list_template_ids() == ["a", "b"]
+
+        path.unlink()
+        assert registry.list_template_ids() == ["b"]
+
+    def test_check_interval(self, temp_dir):
+        """测试检查间隔内不扫描目录，reload() 立即生效"""
+        _write_template(temp_dir, "a", "模板A")
+        registry = TemplateRegistry([temp_dir], check_interval=3600)
+        assert registry.list_template_ids() == ["a"]
+
+        _write_template(temp_dir, "b", "模板B")
+        assert registry.list_template_ids() == ["a"]
+
+        assert registry.reload() == 2
+        assert registry.list_template_ids() == ["a", "b"]
+
+    def test_invalid_template(self, temp_dir):
+        """测试格式无效的模板被跳过并记录错误"""
+        _write_template(temp_dir, "a", "模板A")
+        (temp_dir / "broken.json").write_text("{", encoding="utf-8")
+        (temp_dir / "missing.json").write_text(json.dumps({"name": "缺字段"}), encoding="utf-8")
+
+        registry = TemplateRegistry([temp_dir])
+
+        assert registry.list_template_ids() == ["a"]
+        assert set(registry.errors) == {"broken", "missing"}
+        with pytest.raises(ValueError, match="模板文件格式错误"):
+            registry.get_template("broken")
+        with pytest.raises(ValueError, match="模板缺少必需字段"):
+            registry.get_template("missing")
+
+    def test_compiled_thoughts(self, temp_dir):
+        """测试模板步骤在加载时编译为思考步骤原型，无效步骤使模板无效"""
+        _write_template(temp_dir, "a", "模板A")
+        broken = json.loads((temp_dir / "a.json").read_text(encoding="utf-8"))
+        broken["structure"]["steps"].append({"step_number": 2, "prompt": "", "type": "regular"})
+        (temp_dir / "b.json").write_text(json.dumps(broken), encoding="utf-8")
+
+        registry = TemplateRegistry([temp_dir])
+
+        thoughts = registry.get_thoughts("a")
+        assert [(t.thought_number, t.content, t.type) for t in thoughts] == [
+            (1, "第一步", "regular")
+        ]
+        assert registry.get_thoughts("a") is thoughts
+        assert set(registry.errors) == {"b"}
+
+    def test_template_not_found(self, temp_dir):
+        """测试模板不存在"""
+        _write_template(temp_dir, "a", "模板A")
+        registry = TemplateRegistry([temp_dir, temp_dir / "missing"])
+
+        with pytest.raises(FileNotFoundError, match="模板不存在: x。可用模板: a"):
+            registry.get_template("x")
@@ -0,0 +1,175 @@
+"""
+请求追踪测试
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from deep_thinking.storage.storage_manager import StorageManager
+from deep_thinking.utils.executor import TaskExecutor
+from deep_thinking.utils.formatters import SessionFormatter
+from deep_thinking.utils.tracing import Tracer, fold_spans, read_spans, span, traced, tracer
+
+
+@pytest.fixture
+def trace_file(temp_dir, monkeypatch):
+    """为全局追踪器设置输出文件"""
+    path = temp_dir / "trace.jsonl"
+    monkeypatch.setattr(tracer, "path", path)
+    monkeypatch.setattr(tracer, "sample_rate", 1.0)
+    return path
+
+
+def _spans(path):
+    return list(read_spans(path))
+
+
+class TestTracer:
+    """追踪器测试"""
+
+    def test_spans_nested(self, trace_file):
+        """测试子 span 记录在根 span 下，同一追踪共享 trace_id"""
+        with tracer.trace("tool.a", tool="a") as root, span("child", size=1), span("grandchild"):
+            pass
+
+        records = {r["name"]: r for r in _spans(trace_file)}
+        assert set(records) == {"tool.a", "child", "grandchild"}
+        assert {r["trace_id"] for r in records.values()} == {root.trace_id}
+        assert records["tool.a"]["parent_span_id"] == ""
+        assert records["child"]["parent_span_id"] == records["tool.a"]["span_id"]
+        assert records["grandchild"]["parent_span_id"] == records["child"]["span_id"]
+        assert records["child"]["attributes"] == {"size": 1}
+        assert records["tool.a"]["attributes"]["tool"] == "a"
+        assert len(root.trace_id) == 32 and len(root.span_id) == 16
+        for record in records.values():
+            assert record["end_time_unix_nano"] >= record["start_time_unix_nano"]
+            assert record["status"] == "OK"
+
+    def test_error_status(self, trace_file):
+        """测试异常记录为 ERROR 状态并继续抛出"""
+        with pytest.raises(ValueError), tracer.trace("tool.a"), span("child"):
+            raise ValueError("失败")
+
+        records = _spans(trace_file)
+        assert [r["status"] for r in records] == ["ERROR", "ERROR"]
+        assert records[0]["attributes"]["error.type"] == "ValueError"
+
+    def test_no_trace(self, trace_file):
+        """测试不在追踪中时 span 不记录"""
+        with span("orphan") as orphan:
+            assert orphan is None
+
+        @traced("decorated")
+        def add(a, b):
+            return a + b
+
+        assert add(1, 2) == 3
+        assert not trace_file.exists()
+
+    def test_sampling(self, trace_file, monkeypatch):
+        """测试采样率为 0 时不追踪，禁用时 enabled 为 False"""
+        monkeypatch.setattr(tracer, "sample_rate", 0.0)
+        with tracer.trace("tool.a") as root:
+            assert root is None
+        assert not trace_file.exists()
+
+        assert Tracer().enabled is False
+        with pytest.raises(ValueError, match="追踪采样率"):
+            Tracer("x.jsonl", sample_rate=2)
+
+    async def test_context_per_task(self, trace_file):
+        """测试并发任务各自一条追踪"""
+
+        async def call(name):
+            with tracer.trace(name):
+                await asyncio.sleep(0)
+                with span(f"{name}.child"):
+                    await asyncio.sleep(0)
+
+        await asyncio.gather(call("a"), call("b"))
+
+        records = {r["name"]: r for r in _spans(trace_file)}
+        assert records["a.child"]["trace_id"] == records["a"]["trace_id"]
+        assert records["b.child"]["trace_id"] == records["b"]["trace_id"]
+        assert records["a"]["trace_id"] != records["b"]["trace_id"]
+
+
+class TestInstrumentation:
+    """存储、渲染和执行器的 span 测试"""
+
+    def test_storage_spans(self, trace_file, temp_dir):
+        """测试会话读写记录存储、验证、备份、fsync 和索引 span"""
+        manager = StorageManager(temp_dir / "data")
+        with tracer.trace("tool.test"):
+            session = manager.create_session(name="追踪")
+            loaded = manager.get_session(session.session_id)
+            manager.update_session(loaded)
+            SessionFormatter.to_markdown(loaded)
+
+        names = {r["name"] for r in _spans(trace_file)}
+        assert {
+            "storage.create_sessions",
+            "storage.get_session",
+            "storage.validate",
+            "storage.update_session",
+            "storage.serialize",
+            "storage.write_index",
+            "store.read",
+            "store.write",
+            "store.backup",
+            "store.fsync",
+            "render.markdown",
+        } <= names
+
+    async def test_executor_propagates_context(self, trace_file):
+        """测试I/O线程池和线程池渲染中的 span 记录在调用方的追踪中"""
+        executor = TaskExecutor(render_workers=0, io_threads=1)
+
+        @traced("io")
+        def io_work():
+            return 1
+
+        try:
+            with tracer.trace("tool.test"):
+                await executor.run_io(io_work)
+                await executor.run_render("export_session", io_work)
+        finally:
+            executor.shutdown()
+
+        records = {r["name"]: r for r in _spans(trace_file)}
+        assert records["executor.render"]["attributes"]["process_pool"] is False
+        assert {r["trace_id"] for r in records.values()} == {records["tool.test"]["trace_id"]}
+
+
+class TestFoldSpans:
+    """折叠栈测试"""
+
+    def test_fold(self, trace_file):
+        """测试自身耗时扣除子 span，相同调用栈累加"""
+
+        def record(span_id, parent, name, start, end, trace_id="t"):
+            return {
+                "trace_id": trace_id,
+                "span_id": span_id,
+                "parent_span_id": parent,
+                "name": name,
+                "start_time_unix_nano": start,
+                "end_time_unix_nano": end,
+            }
+
+        records = [
+            record("1", "", "tool.a", 0, 10_000_000),
+            record("2", "1", "store.read", 1_000_000, 4_000_000),
+            record("3", "1", "store.read", 5_000_000, 6_000_000),
+            record("4", "", "tool.a", 0, 2_000_000, trace_id="u"),
+        ]
+        trace_file.write_text(
+            "\n".join(json.dumps(r) for r in records) + "\nnot json\n", encoding="utf-8"
+        )
+
+        assert fold_spans(read_spans(trace_file)) == [
+            "tool.a 8000",
+            "tool.a;store.read 4000",
+        ]